@@ -6,10 +6,7 @@ import re
 import threading
 import uuid
 import time
-import zipfile
 from datetime import datetime
-from io import BytesIO
-from xml.sax.saxutils import escape
 
 import requests
 
@@ -17,7 +14,6 @@ from django.contrib.auth import get_user_model
 from django.db import close_old_connections, transaction
 from django.db.models import Q
 from django.core.exceptions import ValidationError
-from django.http import HttpResponse
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 from rest_framework.response import Response
@@ -39,6 +35,7 @@ from people.models import Cliente, Person, PersonType
 from access_control.serializers import BioStarDeviceSerializer, BioStarUserSerializer
 
 from access_control.services.biostar2_client import BioStar2Client
+from access_control.services import anses_candidates, biostar_device_index, exportacion
 
 from access_control.services import (
     AccessCheckError,
@@ -161,21 +158,25 @@ def _save_anses_records(
         )
 
 
-def _fetch_all_anses_candidates(*, min_age: int, max_age: int) -> list[dict]:
-    service = AnsesVerificationService()
-    items: list[dict] = []
-    offset = 0
-    batch_size = 500
-    while True:
-        payload = service.fetch_candidates(min_age=min_age, max_age=max_age, limit=batch_size, offset=offset)
-        rows = payload.get("results", [])
-        if not rows:
-            break
-        items.extend(rows)
-        offset += len(rows)
-        if len(rows) < batch_size:
-            break
-    return items
+def _filtered_anses_candidates(
+    user,
+    *,
+    min_age: int,
+    max_age: int,
+    exclude_consulted: bool,
+    verification_status: str,
+) -> list[dict]:
+    """Todos los candidatos que pasan los filtros, desde la copia local."""
+    anses_candidates.asegurar()
+    qs = anses_candidates.filtrar(
+        user,
+        min_age=min_age,
+        max_age=max_age,
+        exclude_consulted=exclude_consulted,
+        verification_status=verification_status,
+    )
+    hoy = timezone.localdate()
+    return [anses_candidates.item(fila, hoy) for fila in qs.iterator(chunk_size=2000)]
 
 
 def _apply_candidate_filters(
@@ -221,12 +222,10 @@ def _run_anses_filtered_job(job_id: str, user_id: int, min_age: int, max_age: in
     try:
         with ANSES_BACKGROUND_LOCK:
             ANSES_BACKGROUND_JOBS[job_id]["status"] = "running"
-        all_items = _fetch_all_anses_candidates(min_age=min_age, max_age=max_age)
-        records_qs = AnsesVerificationRecord.objects.filter(requested_by=user)
-        records_map = {record.id_cliente: record for record in records_qs}
-        clients = _apply_candidate_filters(
-            items=all_items,
-            records_map=records_map,
+        clients = _filtered_anses_candidates(
+            user,
+            min_age=min_age,
+            max_age=max_age,
             exclude_consulted=exclude_consulted,
             verification_status=verification_status,
         )
@@ -314,6 +313,8 @@ class BioStarUserSyncAPI(views.APIView):
 
 
 class BioStarDeviceUsersAPI(views.APIView):
+    """Usuarios de un equipo; con ``?document=`` busca uno (índice local o en vivo)."""
+
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, device_id: int):
@@ -336,52 +337,46 @@ class BioStarDeviceUsersAPI(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        def normalize_doc(value: object) -> str:
-            if value is None:
-                return ""
-            raw = str(value).strip()
-            digits = "".join(ch for ch in raw if ch.isdigit())
-            return digits if digits else raw.lower()
-
-        def extract_collection(payload: dict) -> dict:
-            return (
-                payload.get("DeviceUserCollection")
-                or payload.get("device_user_collection")
-                or payload.get("UserCollection")
-                or payload.get("user_collection")
-                or {}
-            )
-
-        def match_document(row: dict, doc_value: str) -> bool:
-            normalized = normalize_doc(doc_value)
-            if not normalized:
-                return False
-            for key in ("user_unique_id", "user_unique_id_str", "user_id", "id", "name"):
-                candidate = row.get(key)
-                if candidate is None:
-                    continue
-                if normalize_doc(candidate) == normalized:
-                    return True
-            return False
-
         if not document:
             payload = client.list_device_users(device_id, limit=limit, offset=offset)
             return Response(payload, status=status.HTTP_200_OK)
 
-        limit = 200 if limit <= 0 else limit
+        # Con el índice vigente la búsqueda es una query local. ``verify=1``, un
+        # índice viejo o sin armar, o un documento que el índice no tiene (pudo
+        # cargarse en el equipo después del último refresco) recorren el equipo
+        # en vivo como antes.
+        verify = request.query_params.get("verify") in ("1", "true")
+        if not verify and biostar_device_index.vigente(device_id):
+            match = biostar_device_index.buscar(device_id, document)
+            if match is not None:
+                return Response(
+                    {
+                        "device_id": device_id,
+                        "document": document,
+                        "total": biostar_device_index.contar(device_id),
+                        "scanned": 0,
+                        "match": match,
+                        "source": "index",
+                    },
+                    status=status.HTTP_200_OK,
+                )
+
+        # Sin ``limit`` explícito se pagina de a 200 (antes quedaba en 1: un
+        # pedido HTTP por usuario del equipo).
+        limit = biostar_device_index.PAGE_SIZE if limit <= 0 or limit_param is None else limit
         offset = 0 if offset < 0 else offset
         matched = None
         total = None
         scanned = 0
         while True:
             payload = client.list_device_users(device_id, limit=limit, offset=offset)
-            collection = extract_collection(payload)
+            collection = biostar_device_index.extract_collection(payload)
             rows = collection.get("rows") or []
             scanned += len(rows)
             if total is None:
                 total = collection.get("total")
             for row in rows:
-                if match_document(row, document):
+                if biostar_device_index.match_document(row, document):
                     matched = row
                     break
             if matched or not rows:
@@ -390,6 +385,8 @@ class BioStarDeviceUsersAPI(views.APIView):
                 break
             offset += limit
 
+        if matched:
+            biostar_device_index.registrar_fila(device_id, matched)
         return Response(
             {
                 "device_id": device_id,
@@ -397,6 +394,7 @@ class BioStarDeviceUsersAPI(views.APIView):
                 "total": total,
                 "scanned": scanned,
                 "match": matched,
+                "source": "live",
             },
             status=status.HTTP_200_OK,
         )
@@ -494,48 +492,44 @@ class BioStarDeviceUserdataAPI(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, device_id: int):
+        from access_control.services import biostar_device_stats
+
         client = BioStar2Client.from_db_and_env()
         payload = client.discover_device_userdata(device_id)
+        biostar_device_stats.registrar(device_id, payload)
         return Response(payload, status=status.HTTP_200_OK)
 
 
 class BioStarDeviceStatsAPI(views.APIView):
-    """Rostros y usuarios registrados por equipo (en vivo).
+    """Rostros y usuarios registrados por equipo.
 
-    Recorre los dispositivos de la caché local y consulta discover_userdata en
-    BioStar para cada uno. Devuelve conteos por equipo + totales.
+    Contesta desde la caché de ``biostar_device_stats`` (consultada en paralelo
+    y refrescada en segundo plano). Cada equipo trae la antigüedad del dato y
+    ``stale`` si no se pudo actualizar: un facial caído muestra lo último
+    conocido, marcado, en vez de frenar la página. ``?refresh=1`` fuerza la
+    consulta en vivo.
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        client = BioStar2Client.from_db_and_env()
-        stats = []
-        total_faces = total_users = 0
-        for device in BioStarDevice.objects.order_by("name", "device_id"):
-            entry = {
-                "device_id": device.device_id,
-                "name": device.name,
-                "num_faces": None,
-                "num_users": None,
-                "error": None,
-            }
-            try:
-                payload = client.discover_device_userdata(device.device_id)
-                s = payload.get("UserStatistics") or payload.get("user_statistics") or {}
-                faces = int(s.get("numFaces") or 0)
-                users = int(s.get("numUsers") or 0)
-                entry["num_faces"] = faces
-                entry["num_users"] = users
-                total_faces += faces
-                total_users += users
-            except requests.RequestException as exc:
-                entry["error"] = str(exc)
-            except (TypeError, ValueError):
-                entry["error"] = "Respuesta inesperada de BioStar."
-            stats.append(entry)
+        from access_control.services import biostar_device_stats
+
+        devices = BioStarDevice.objects.order_by("name", "device_id").values_list("device_id", "name")
+        stats = biostar_device_stats.snapshot(
+            BioStar2Client.from_db_and_env,
+            devices,
+            refrescar=request.query_params.get("refresh") in ("1", "true"),
+        )
+        total_faces = sum(s["num_faces"] or 0 for s in stats)
+        total_users = sum(s["num_users"] or 0 for s in stats)
         return Response(
-            {"stats": stats, "total_faces": total_faces, "total_users": total_users},
+            {
+                "stats": stats,
+                "total_faces": total_faces,
+                "total_users": total_users,
+                "stale": sum(1 for s in stats if s["stale"]),
+            },
             status=status.HTTP_200_OK,
         )
 
@@ -1064,6 +1058,7 @@ class BioStarDeviceUserAddAPI(views.APIView):
                 {"detail": "No se pudo agregar el usuario en BioStar: " + str(exc)},
                 status=status.HTTP_502_BAD_GATEWAY,
             )
+        biostar_device_index.agregado(device_id, id_cliente)
         biostar_logger.info(
             "user_add device=%s user=%s by=%s", device_id, id_cliente, request.user
         )
@@ -1092,6 +1087,7 @@ class BioStarDeviceUserRemoveAPI(views.APIView):
                 {"detail": "No se pudo quitar el usuario en BioStar: " + str(exc)},
                 status=status.HTTP_502_BAD_GATEWAY,
             )
+        biostar_device_index.quitado(device_id, id_cliente)
         biostar_logger.info(
             "user_remove device=%s user=%s by=%s", device_id, id_cliente, request.user
         )
@@ -1117,6 +1113,7 @@ class BioStarDeviceUsersClearAPI(views.APIView):
                 {"detail": "No se pudo vaciar el equipo en BioStar: " + str(exc)},
                 status=status.HTTP_502_BAD_GATEWAY,
             )
+        biostar_device_index.vaciado(device_id)
         biostar_logger.warning("users_clear device=%s by=%s", device_id, request.user)
         return Response({"ok": True, "biostar": payload}, status=status.HTTP_200_OK)
 
@@ -1422,21 +1419,32 @@ class AnsesCandidatesAPI(views.APIView):
                 {"detail": "Rango de edades inválido."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        after = (request.query_params.get("after") or "").strip() or None
+        if after:
+            try:
+                anses_candidates.parse_cursor(after)
+            except ValueError:
+                return Response({"detail": "El parámetro 'after' es inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        next_cursor = None
         try:
             has_local_filters = exclude_consulted or verification_status != "all"
-            if has_local_filters:
-                all_items = _fetch_all_anses_candidates(min_age=min_age, max_age=max_age)
-                records_qs = AnsesVerificationRecord.objects.filter(requested_by=request.user)
-                records_map = {record.id_cliente: record for record in records_qs}
-                filtered = _apply_candidate_filters(
-                    items=all_items,
-                    records_map=records_map,
+            # Los filtros necesitan el universo entero: sale de la copia local
+            # (la refresca anses-candidates; acá sólo se carga si nunca se
+            # cargó). Sin filtros, alcanza con la página de MSSQL mientras la
+            # copia no exista.
+            if has_local_filters or after or anses_candidates.cargado():
+                anses_candidates.asegurar()
+                qs = anses_candidates.filtrar(
+                    request.user,
+                    min_age=min_age,
+                    max_age=max_age,
                     exclude_consulted=exclude_consulted,
                     verification_status=verification_status,
                 )
-                total_count = len(filtered)
-                offset = (page - 1) * page_size
-                items = filtered[offset : offset + page_size]
+                total_count = qs.count()
+                filas, next_cursor = anses_candidates.pagina(qs, page_size=page_size, after=after, page=page)
+                hoy = timezone.localdate()
+                items = [anses_candidates.item(fila, hoy) for fila in filas]
             else:
                 offset = (page - 1) * page_size
                 payload = AnsesVerificationService().fetch_candidates(
@@ -1445,7 +1453,10 @@ class AnsesCandidatesAPI(views.APIView):
                     limit=page_size,
                     offset=offset,
                 )
-                records_qs = AnsesVerificationRecord.objects.filter(requested_by=request.user)
+                records_qs = AnsesVerificationRecord.objects.filter(
+                    requested_by=request.user,
+                    id_cliente__in=[i["id_cliente"] for i in payload.get("results", []) if i.get("id_cliente")],
+                )
                 records_map = {record.id_cliente: record for record in records_qs}
                 items = _apply_candidate_filters(
                     items=payload.get("results", []),
@@ -1466,6 +1477,7 @@ class AnsesCandidatesAPI(views.APIView):
                 "count": total_count,
                 "page": page,
                 "page_size": page_size,
+                "next_cursor": next_cursor,
                 "results": items,
             },
             status=status.HTTP_200_OK,
@@ -1611,89 +1623,27 @@ def _calculate_age(fecha_nac) -> str:
     return str(years)
 
 
-class AnsesProcessedExportAPI(views.APIView):
-    permission_classes = [permissions.IsAuthenticated]
-
-    @staticmethod
-    def _xlsx_header_row(cells: list[str]) -> str:
-        values = []
-        for index, value in enumerate(cells):
-            column = chr(65 + index)
-            safe_value = escape(str(value or ""))
-            values.append(f'<c r="{column}1" t="inlineStr"><is><t>{safe_value}</t></is></c>')
-        return f'<row r="1">{"".join(values)}</row>'
-
-    @staticmethod
-    def _xlsx_data_row(row_index: int, cells: list[str]) -> str:
-        values = []
-        for index, value in enumerate(cells):
-            column = chr(65 + index)
-            safe_value = escape(str(value or ""))
-            values.append(f'<c r="{column}{row_index}" t="inlineStr"><is><t>{safe_value}</t></is></c>')
-        return f'<row r="{row_index}">{"".join(values)}</row>'
-
-    def _build_xlsx(self, headers: list[str], rows: list[list[str]]) -> bytes:
-        workbook_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"
-  xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
-  <sheets><sheet name="Vitalicios procesados" sheetId="1" r:id="rId1"/></sheets>
-</workbook>"""
-        workbook_rels_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
-  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
-</Relationships>"""
-        root_rels_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
-  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
-</Relationships>"""
-        content_types_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
-  <Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
-  <Default Extension="xml" ContentType="application/xml"/>
-  <Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
-  <Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
-</Types>"""
-
-        header_row = self._xlsx_header_row(headers)
-        data_rows = [self._xlsx_data_row(index, row) for index, row in enumerate(rows, start=2)]
-        worksheet_xml = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
-  <sheetData>{header_row}{"".join(data_rows)}</sheetData>
-</worksheet>"""
-
-        output = BytesIO()
-        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
-            archive.writestr("[Content_Types].xml", content_types_xml)
-            archive.writestr("_rels/.rels", root_rels_xml)
-            archive.writestr("xl/workbook.xml", workbook_xml)
-            archive.writestr("xl/_rels/workbook.xml.rels", workbook_rels_xml)
-            archive.writestr("xl/worksheets/sheet1.xml", worksheet_xml)
-        return output.getvalue()
-
-    def get(self, request):
-        records = (
-            AnsesVerificationRecord.objects.filter(requested_by=request.user)
-            .order_by("-last_checked_at", "-created_at")
+_ANSES_EXPORT_HEADERS = [
+    "Cliente_id",
+    "DNI",
+    "Apellido",
+    "Nombre",
+    "Fecha Nacimiento",
+    "Edad",
+    "Procesado",
+    "Fecha de ultimo procesamiento",
+    "Resultado",
+]
+
+
+def _anses_processed_rows(records):
+    """Filas de la exportación, con los ``Cliente`` de cada tanda en una sola consulta."""
+    for tanda in exportacion.por_tandas(records):
+        clientes_map = (
+            Cliente.objects.only("id_cliente", "apellido", "nombre", "fecha_nac")
+            .in_bulk([record.id_cliente for record in tanda], field_name="id_cliente")
         )
-        timestamp = timezone.localtime(timezone.now()).strftime("%Y%m%d_%H%M%S")
-        filename = f"vitalicios_procesados_{timestamp}.xlsx"
-
-        record_ids = [record.id_cliente for record in records]
-        clientes_map = Cliente.objects.in_bulk(record_ids, field_name="id_cliente")
-
-        headers = [
-            "Cliente_id",
-            "DNI",
-            "Apellido",
-            "Nombre",
-            "Fecha Nacimiento",
-            "Edad",
-            "Procesado",
-            "Fecha de ultimo procesamiento",
-            "Resultado",
-        ]
-        rows = []
-        for record in records:
+        for record in tanda:
             cliente = clientes_map.get(record.id_cliente)
             apellido = (cliente.apellido if cliente and cliente.apellido else record.apellido) or ""
             nombre = (cliente.nombre if cliente and cliente.nombre else record.nombre) or ""
@@ -1705,29 +1655,46 @@ class AnsesProcessedExportAPI(views.APIView):
             elif record.fecha_nacimiento:
                 fecha_nac = record.fecha_nacimiento.isoformat()
                 edad = str(record.edad) if record.edad is not None else _calculate_age(record.fecha_nacimiento)
-            rows.append(
-                [
-                    str(record.id_cliente),
-                    str(record.dni or ""),
-                    apellido,
-                    nombre,
-                    fecha_nac,
-                    edad,
-                    "Si",
-                    timezone.localtime(record.last_checked_at).strftime("%Y-%m-%d %H:%M:%S")
-                    if record.last_checked_at
-                    else "",
-                    record.verification_message or record.get_verification_status_display(),
-                ]
-            )
+            yield [
+                str(record.id_cliente),
+                str(record.dni or ""),
+                apellido,
+                nombre,
+                fecha_nac,
+                edad,
+                "Si",
+                timezone.localtime(record.last_checked_at).strftime("%Y-%m-%d %H:%M:%S")
+                if record.last_checked_at
+                else "",
+                record.verification_message or record.get_verification_status_display(),
+            ]
 
-        content = self._build_xlsx(headers=headers, rows=rows)
-        response = HttpResponse(
-            content,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+
+class AnsesProcessedExportAPI(views.APIView):
+    """Descarga de lo procesado por el usuario: ``?formato=xlsx`` (default) o ``csv``."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # "formato" y no "format": DRF reserva ?format= para elegir renderer.
+        formato = (request.query_params.get("formato") or "xlsx").lower()
+        if formato not in exportacion.FORMATOS:
+            return Response(
+                {"detail": f"formato debe ser uno de: {', '.join(exportacion.FORMATOS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        records = (
+            AnsesVerificationRecord.objects.filter(requested_by=request.user)
+            .order_by("-last_checked_at", "-created_at")
+        )
+        timestamp = timezone.localtime(timezone.now()).strftime("%Y%m%d_%H%M%S")
+        return exportacion.respuesta(
+            formato,
+            _ANSES_EXPORT_HEADERS,
+            _anses_processed_rows(records),
+            nombre=f"vitalicios_procesados_{timestamp}",
+            hoja="Vitalicios procesados",
         )
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
 
 
 class Api3000CommandCatalogAPI(views.APIView):
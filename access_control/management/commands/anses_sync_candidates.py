@@ -0,0 +1,60 @@
+"""Refresca la copia local de candidatos ANSES (``AnsesCandidate``) desde MSSQL.
+
+Con ``--loop`` es el servicio ``anses-candidates``: relee la copia cada
+``ANSES_CANDIDATES_TTL_SECONDS``, así la consola nunca paga la carga completa
+(ver ``access_control.services.anses_candidates``). Sin ``--loop`` es para la
+primera carga o para forzarlo después de cambios en xSys.
+
+Ejemplo:
+    python manage.py anses_sync_candidates
+    python manage.py anses_sync_candidates --loop
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from access_control.services import anses_candidates
+from access_control.services.anses_verification_service import AnsesVerificationError
+from common.dbhealth import reset_db_connections
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Copia localmente los candidatos a verificar en ANSES (vitalicios activos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Repetir indefinidamente.")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Con --loop: segundos entre corridas "
+                                 "(default ANSES_CANDIDATES_TTL_SECONDS).")
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            try:
+                self._run_once()
+            except AnsesVerificationError as exc:
+                raise CommandError(str(exc))
+            return
+        interval = max(60.0, options["interval"] or anses_candidates.ttl_seconds())
+        while True:
+            inicio = time.time()
+            try:
+                self._run_once()
+            except Exception as exc:  # pragma: no cover - servicio de larga vida
+                logger.exception("anses_sync_candidates: falló: %s", exc)
+                self.stderr.write(self.style.ERROR(f"anses_sync_candidates falló: {exc}"))
+                reset_db_connections()
+            espera = max(0.0, interval - (time.time() - inicio))
+            if espera:
+                time.sleep(espera)
+
+    def _run_once(self):
+        res = anses_candidates.refrescar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Candidatos ANSES OK. vistos={res['vistos']} escritos={res['escritos']} borrados={res['borrados']}"
+        ))
@@ -0,0 +1,44 @@
+"""Refresca el índice local de usuarios por equipo (``BioStarDeviceUser``).
+
+Con el índice armado, buscar un documento en un equipo es una query local en
+vez de paginar el equipo por HTTP (ver ``biostar_device_index``). Sólo escribe
+las filas que cambiaron y borra las que ya no están.
+
+El poller de BioStar ya lo corre cada ``--index-refresh`` segundos; esto es para
+la primera carga o para forzarlo.
+
+Ejemplos:
+    python manage.py biostar_index_device_users
+    python manage.py biostar_index_device_users --device 541531029 --device 541531030
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from access_control.services import biostar_device_index
+from access_control.services.biostar2_client import BioStar2Client
+
+
+class Command(BaseCommand):
+    help = "Indexa localmente los usuarios cargados en cada equipo BioStar."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--device", type=int, action="append", default=None,
+                            help="device_id a indexar (repetible; default: todos los de la caché).")
+
+    def handle(self, *args, **options):
+        client = BioStar2Client.from_db_and_env()
+        resultados = biostar_device_index.indexar_todos(client, options["device"])
+        errores = 0
+        for device_id, res in resultados.items():
+            if "error" in res:
+                errores += 1
+                self.stderr.write(f"device={device_id} error: {res['error']}")
+            else:
+                self.stdout.write(
+                    f"device={device_id} vistos={res['vistos']} escritos={res['escritos']} "
+                    f"borrados={res['borrados']}"
+                )
+        estilo = self.style.WARNING if errores else self.style.SUCCESS
+        self.stdout.write(estilo(f"Listo. Equipos: {len(resultados)} · con error: {errores}"))
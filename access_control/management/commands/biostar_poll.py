@@ -11,6 +11,16 @@ es monótono en el tiempo (hay bloques viejos con ids más altos, por reinicios
 su base): el high-water se estancaba y los pasos aparecían en ráfagas de minutos.
 El tail-poll + dedup es inmune y da latencia de ~1 ciclo. Reconecta ante caídas.
 
+Con ``--mode hybrid`` (default) el tail-poll queda como verificación cada
+``--verify-every`` segundos y en régimen se piden sólo los eventos posteriores a
+la última fecha ingerida (``biostar_events.ingest_hybrid``): unas decenas de
+filas por ciclo en vez de 300. Si la verificación encuentra algo que el cursor
+no trajo, vuelve a tail un rato. ``--mode tail`` es el comportamiento anterior.
+Cada ~10 min se loguea el retardo de ingesta (evento → alta local).
+Cada ``--index-refresh`` segundos refresca además el índice de usuarios por
+equipo (``biostar_index_device_users``), en el mismo hilo de fondo que el espejo
+de usuarios.
+
 Ejemplo (contenedor `biostar-poller`):
     python manage.py biostar_poll --interval 1
 """
@@ -24,7 +34,7 @@ import time
 
 from django.core.management.base import BaseCommand
 
-from access_control.services import biostar_events
+from access_control.services import biostar_device_index, biostar_events
 from access_control.services.watchdog import run_with_deadline
 
 
@@ -53,22 +63,43 @@ class Command(BaseCommand):
             default=21600.0,
             help="Segundos entre refrescos del espejo BioStarUser (default 6h; 0 = off).",
         )
+        parser.add_argument(
+            "--index-refresh",
+            type=float,
+            default=3600.0,
+            help="Segundos entre refrescos del índice de usuarios por equipo (default 1h; 0 = off).",
+        )
+        parser.add_argument("--mode", choices=("hybrid", "tail"), default="hybrid",
+                            help="hybrid: cursor por fecha + tail de verificación (default); tail: sólo tail.")
+        parser.add_argument("--overlap", type=float, default=10.0,
+                            help="Con hybrid: segundos de solape por detrás de la marca (default 10).")
+        parser.add_argument("--verify-every", type=float, default=15.0,
+                            help="Con hybrid: segundos entre tail-polls de verificación (default 15).")
         parser.add_argument("--once", action="store_true", help="Un solo ciclo y termina (para pruebas).")
 
     def _client(self):
         from access_control.services.biostar2_client import BioStar2Client
 
+        # Es el cliente compartido del proceso: pedirlo en cada ciclo no abre
+        # sesión ni conexión nuevas.
         return BioStar2Client.from_db_and_env()
 
-    def _refresh_users(self):
-        """Refresca el espejo BioStarUser en un thread aparte (no bloquea el poll
-        de eventos, para no meter huecos de latencia en las pasadas faciales)."""
+    def _refresh_users(self, usuarios: bool = True, indice: bool = False):
+        """Refresca el espejo BioStarUser y/o el índice por equipo en un thread
+        aparte (no bloquea el poll de eventos, para no meter huecos de latencia
+        en las pasadas faciales)."""
         from django.core.management import call_command
         from django.db import close_old_connections
 
         try:
-            call_command("biostar_sync_users", verbosity=0)
-            self.stdout.write("espejo BioStarUser refrescado")
+            if usuarios:
+                call_command("biostar_sync_users", verbosity=0)
+                self.stdout.write("espejo BioStarUser refrescado")
+            if indice:
+                res = biostar_device_index.indexar_todos(self._client())
+                escritos = sum(r.get("escritos", 0) for r in res.values())
+                errores = sum(1 for r in res.values() if "error" in r)
+                self.stdout.write(f"índice por equipo refrescado: {escritos} cambios, {errores} equipos con error")
         except Exception as exc:  # pragma: no cover - depende de BioStar
             self.stderr.write(f"refresh de usuarios falló: {exc}")
         finally:
@@ -80,8 +111,12 @@ class Command(BaseCommand):
         retention = options["retention_days"]
         reconnect_delay = options["reconnect_delay"]
         users_refresh = options["users_refresh"]
+        index_refresh = options["index_refresh"]
         call_timeout = options["call_timeout"]
         once = options["once"]
+        cursor = biostar_events.CursorEventos(
+            solape=max(0.0, options["overlap"]), verificar_cada=max(1.0, options["verify_every"]),
+        )
 
         self.stdout.write(self.style.SUCCESS(
             f"Iniciando poller BioStar (más recientes) cada {interval}s. Ctrl-C para salir."
@@ -93,6 +128,11 @@ class Command(BaseCommand):
         # Se arranca el timer "ya corrido" para NO refrescar usuarios al inicio
         # (el espejo ya está poblado); el primer refresco es a los users_refresh s.
         last_users = time.monotonic()
+        # El índice por equipo, en cambio, se arma al inicio si nunca se armó.
+        from access_control.models import BioStarDevice
+
+        ya_indexado = BioStarDevice.objects.filter(users_indexed_at__isnull=False).exists()
+        last_index = time.monotonic() if ya_indexado else float("-inf")
         users_thread: threading.Thread | None = None
 
         try:
@@ -102,13 +142,26 @@ class Command(BaseCommand):
                     now = time.monotonic()
                     # Catálogo de tipos de evento: refrescar cada ~10 min.
                     if not event_types or (now - last_meta) >= 600:
+                        if last_meta:
+                            # Latencia por endpoint y retardo de ingesta de los últimos ~10 min.
+                            self.stdout.write(f"latencia BioStar: {client.metrics(reset=True)}")
+                            self.stdout.write(
+                                f"retardo de ingesta: {biostar_events.ingest_lag(reset=True)} "
+                                f"(modo {cursor.modo if options['mode'] == 'hybrid' else 'tail'}, "
+                                f"huecos {cursor.huecos})"
+                            )
                         event_types = run_with_deadline(client.event_types, call_timeout)
                         last_meta = now
                         self.stdout.write(f"meta: {len(event_types)} tipos de evento")
 
-                    nuevos = run_with_deadline(
-                        biostar_events.ingest_recent, call_timeout, client, event_types, limit=limit
-                    )
+                    if options["mode"] == "hybrid":
+                        nuevos = run_with_deadline(
+                            biostar_events.ingest_hybrid, call_timeout, client, event_types, cursor, limit=limit
+                        )
+                    else:
+                        nuevos = run_with_deadline(
+                            biostar_events.ingest_recent, call_timeout, client, event_types, limit=limit
+                        )
                     if nuevos:
                         self.stdout.write(f"+{nuevos} accesos faciales")
 
@@ -123,11 +176,17 @@ class Command(BaseCommand):
                     # Corre en un THREAD aparte para NO bloquear el poll de eventos
                     # (si no, cada refresco metería ~1 min sin captar pasos). El
                     # guard evita solaparlos si un refresco tarda más que el intervalo.
-                    if users_refresh and (time.monotonic() - last_users) >= users_refresh:
-                        last_users = time.monotonic()
-                        if users_thread is None or not users_thread.is_alive():
-                            users_thread = threading.Thread(target=self._refresh_users, daemon=True)
-                            users_thread.start()
+                    toca_usuarios = bool(users_refresh) and (time.monotonic() - last_users) >= users_refresh
+                    toca_indice = bool(index_refresh) and (time.monotonic() - last_index) >= index_refresh
+                    if (toca_usuarios or toca_indice) and (users_thread is None or not users_thread.is_alive()):
+                        if toca_usuarios:
+                            last_users = time.monotonic()
+                        if toca_indice:
+                            last_index = time.monotonic()
+                        users_thread = threading.Thread(
+                            target=self._refresh_users, args=(toca_usuarios, toca_indice), daemon=True
+                        )
+                        users_thread.start()
 
                 except Exception as exc:  # pragma: no cover - depende de red/BioStar
                     self.stderr.write(f"Error en el poll BioStar ({exc}); reintento en {reconnect_delay}s")
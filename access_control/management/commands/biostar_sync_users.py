@@ -1,5 +1,35 @@
+"""Sincroniza el espejo ``BioStarUser`` desde BioStar 2.
+
+``resolve_state_targets`` (estado de acceso) y ``acs_consistencia`` leen este
+espejo, y ``biostar_poll`` lo refresca cada ``--users-refresh`` segundos.
+
+Cómo
+----
+- Las páginas de ``/api/users`` se piden en paralelo (``--workers``) después de
+  la primera, que da el total (``biostar2_client.fetch_pages``).
+- Cada usuario guarda un sha256 de su payload (``payload_hash``). Sólo se
+  escriben los nuevos, los que cambiaron y los que vuelven a estar activos, en
+  un ``bulk_create(update_conflicts=True)``: en régimen son unas decenas de
+  filas, no los ~16.000 ``update_or_create`` de antes.
+- Los activos que no vinieron en una pasada COMPLETA se marcan inactivos en un
+  solo UPDATE. Con ``--max-pages`` (pasada parcial) o si el listado vino vacío
+  no se desactiva a nadie.
+- ``last_seen_at`` de los que vinieron sin cambios se actualiza con otro UPDATE
+  masivo (no reescribe el payload).
+
+``/api/users`` no filtra por fecha de modificación, así que el listado se trae
+entero; lo incremental es la escritura.
+
+Ejemplos:
+    python manage.py biostar_sync_users
+    python manage.py biostar_sync_users --workers 8
+    python manage.py biostar_sync_users --force      # reescribe todos
+"""
+
 from __future__ import annotations
 
+import hashlib
+import json
 from typing import Any
 
 from django.core.management.base import BaseCommand
@@ -7,7 +37,25 @@ from django.db import transaction
 from django.utils import timezone
 
 from access_control.models import BioStarUser
-from access_control.services.biostar2_client import BioStar2Client
+from access_control.services.biostar2_client import BioStar2Client, fetch_pages
+
+_CHUNK = 500
+
+
+def _rows_and_total(payload: Any) -> tuple[list, Any]:
+    if isinstance(payload, dict):
+        for key in ("UserCollection", "user_collection", "users"):
+            if key in payload and isinstance(payload[key], dict) and "rows" in payload[key]:
+                return payload[key]["rows"], payload[key].get("total")
+        rows = payload.get("rows")
+        return rows, payload.get("total")
+    return payload, None
+
+
+def payload_hash(item: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(item, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()
 
 
 class Command(BaseCommand):
@@ -16,98 +64,118 @@ class Command(BaseCommand):
     def add_arguments(self, parser) -> None:
         parser.add_argument("--limit", type=int, default=200)
         parser.add_argument("--max-pages", type=int, default=0)  # 0 = sin limite (para debug)
+        parser.add_argument("--workers", type=int, default=4, help="Páginas pedidas en paralelo (default 4).")
+        parser.add_argument("--force", action="store_true", help="Reescribe todos aunque no hayan cambiado.")
+
+    def _fetch(self, client, limit: int, max_pages: int, workers: int) -> list:
+        def fetch(lim, offset):
+            payload = client.list_users(limit=lim, offset=offset)
+            rows, total = _rows_and_total(payload)
+            if not isinstance(rows, list):
+                raise RuntimeError(f"Formato inesperado de respuesta list_users(): {payload}")
+            return rows, total
+
+        if not max_pages:
+            return fetch_pages(fetch, page_size=limit, workers=workers, thread_name="biostar-users")
+
+        # Pasada parcial (debug): en serie, como antes.
+        filas: list = []
+        for page in range(max_pages):
+            rows, _ = fetch(limit, page * limit)
+            filas.extend(rows)
+            if len(rows) < limit:
+                break
+        return filas
 
     def handle(self, *args: Any, **options: Any) -> None:
         client = BioStar2Client.from_db_and_env()
 
         limit: int = options["limit"]
         max_pages: int = options["max_pages"]
+        completa = not max_pages
 
-        offset = 0
-        page = 0
-        seen_ids: set[int] = set()
+        rows = self._fetch(client, limit, max_pages, max(1, options["workers"]))
 
-        created = 0
-        updated = 0
+        vistos: dict[int, dict] = {}
         skipped_duplicates = 0
+        for item in rows:
+            if not isinstance(item, dict):
+                continue
+            user_id = item.get("id") or item.get("user_id")
+            if user_id is None:
+                continue
+            try:
+                user_id_int = int(user_id)
+            except (TypeError, ValueError):
+                continue
+            # Anti-repetidos dentro de la corrida (por si BioStar repite)
+            if user_id_int in vistos:
+                skipped_duplicates += 1
+                continue
+            vistos[user_id_int] = item
+
+        actuales = {
+            uid: (h, activo)
+            for uid, h, activo in BioStarUser.objects.values_list("user_id", "payload_hash", "is_active")
+        }
 
         now = timezone.now()
-
-        while True:
-            page += 1
-            if max_pages and page > max_pages:
-                break
-
-            payload = client.list_users(limit=limit, offset=offset)
-
-            rows = None
-            if isinstance(payload, dict):
-                for key in ("UserCollection", "user_collection", "users"):
-                    if key in payload and isinstance(payload[key], dict) and "rows" in payload[key]:
-                        rows = payload[key]["rows"]
-                        break
-            if rows is None:
-                rows = payload.get("rows") if isinstance(payload, dict) else payload
-
-            if not isinstance(rows, list):
-                raise RuntimeError(f"Formato inesperado de respuesta list_users(): {payload}")
-
-            if not rows:
-                break
-
-            with transaction.atomic():
-                for item in rows:
-                    if not isinstance(item, dict):
-                        continue
-
-                    user_id = item.get("id") or item.get("user_id")
-                    if user_id is None:
-                        continue
-
-                    # Normalizar a int
-                    try:
-                        user_id_int = int(user_id)
-                    except (TypeError, ValueError):
-                        continue
-
-                    # Anti-repetidos dentro de la corrida (por si BioStar repite)
-                    if user_id_int in seen_ids:
-                        skipped_duplicates += 1
-                        continue
-                    seen_ids.add(user_id_int)
-
-                    defaults = {
-                        "user_unique_id": str(item.get("user_id") or item.get("user_unique_id") or ""),
-                        "name": (item.get("name") or item.get("display_name") or "")[:255],
-                        "email": (item.get("email") or "")[:254],
-                        "phone": (item.get("phone") or item.get("mobile") or "")[:64],
-                        "raw_payload": item,
-                        "last_seen_at": now,
-                        "is_active": True,
-                    }
-
-                    obj, was_created = BioStarUser.objects.update_or_create(
-                        user_id=user_id_int,
-                        defaults=defaults,
-                    )
-                    created += int(was_created)
-                    updated += int(not was_created)
-
-            self.stdout.write(
-                f"page={page} offset={offset} fetched={len(rows)} created={created} updated={updated} dup_skipped={skipped_duplicates}"
-            )
-
-            # Si vino menos que el limite, era la ultima pagina
-            if len(rows) < limit:
-                break
-
-            offset += limit
-
-        # Marcar inactivos los que no se vieron en esta corrida (opcional, recomendado)
-        BioStarUser.objects.filter(is_active=True).exclude(last_seen_at=now).update(is_active=False)
+        objs = []
+        created = updated = 0
+        for user_id_int, item in vistos.items():
+            h = payload_hash(item)
+            previo = actuales.get(user_id_int)
+            if previo == (h, True) and not options["force"]:
+                continue
+            created += int(previo is None)
+            updated += int(previo is not None)
+            objs.append(BioStarUser(
+                user_id=user_id_int,
+                user_unique_id=str(item.get("user_id") or item.get("user_unique_id") or ""),
+                name=(item.get("name") or item.get("display_name") or "")[:255],
+                email=(item.get("email") or "")[:254],
+                phone=(item.get("phone") or item.get("mobile") or "")[:64],
+                raw_payload=item,
+                payload_hash=h,
+                last_seen_at=now,
+                is_active=True,
+            ))
+
+        # Un listado vacío es más probable que sea un error de BioStar que el
+        # padrón entero dado de baja: en ese caso no se desactiva a nadie.
+        desaparecidos = (
+            [uid for uid, (_, activo) in actuales.items() if activo and uid not in vistos]
+            if completa and vistos else []
+        )
+        with transaction.atomic():
+            if objs:
+                BioStarUser.objects.bulk_create(
+                    objs,
+                    batch_size=1000,
+                    update_conflicts=True,
+                    unique_fields=["user_id"],
+                    update_fields=[
+                        "user_unique_id", "name", "email", "phone", "raw_payload",
+                        "payload_hash", "last_seen_at", "is_active", "last_synced_at",
+                    ],
+                )
+            # Casi siempre es un solo UPDATE; se parte sólo si faltan muchos.
+            for i in range(0, len(desaparecidos), _CHUNK):
+                BioStarUser.objects.filter(user_id__in=desaparecidos[i:i + _CHUNK]).update(is_active=False)
+            # ``last_seen_at`` de los que vinieron sin cambios. En una pasada
+            # completa los activos son justo los vistos: un solo UPDATE.
+            if completa and vistos:
+                BioStarUser.objects.filter(is_active=True).update(last_seen_at=now)
+            else:
+                escritos = {o.user_id for o in objs}
+                sin_cambios = [uid for uid in vistos if uid not in escritos]
+                for i in range(0, len(sin_cambios), _CHUNK):
+                    BioStarUser.objects.filter(user_id__in=sin_cambios[i:i + _CHUNK]).update(last_seen_at=now)
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Sync users OK. created={created} updated={updated} dup_skipped={skipped_duplicates} total_seen={len(seen_ids)}"
+                f"Sync users OK. created={created} updated={updated} "
+                f"unchanged={len(vistos) - created - updated} deactivated={len(desaparecidos)} "
+                f"dup_skipped={skipped_duplicates} total_seen={len(vistos)}"
             )
         )
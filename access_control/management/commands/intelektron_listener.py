@@ -5,8 +5,11 @@ lee ``list_marks`` y persiste en ``IntelektronEvent`` las marcas nuevas
 (deduplicadas por contenido). No autoriza accesos.
 
 Es la vía SEGURA (sin callbacks ctypes, que no tienen firma documentada). Para
-push en tiempo real habría que implementar los callbacks de ``itk_open`` — ver
-el README del wrapper.
+latencia sub-segundo con varias placas está ``intelektron_server`` (la placa se
+conecta a nosotros y el link queda abierto). El alta es la misma
+(``intelectron.marcas.guardar``: dedupe en lote + paso pendiente + visores).
+Para leer varias placas desde un solo proceso (registro de equipos, link
+abierto y cursor por placa) está ``intelektron_supervisor``.
 
 Ejemplo:
     python manage.py intelektron_listener --ip 10.0.0.60 --dest-node 1 --interval 5
@@ -15,27 +18,16 @@ Ejemplo:
 
 from __future__ import annotations
 
-import hashlib
 import time
 
 from django.core.management.base import BaseCommand
 from django.db import close_old_connections
 from django.utils import timezone
 
+from access_control.services.intelectron import marcas
 from access_control.services.watchdog import run_with_deadline
 
 
-# Mapeos de códigos → nombre legible (constants.py del wrapper).
-EVENT_NAMES = {
-    0: "Desconocido", 1: "OK", 106: "Intruso", 146: "Huella inválida",
-    108: "Deshabilitado", 150: "Password", 148: "Licencia", 107: "No autorizado",
-}
-DIRECTION_NAMES = {
-    0: "Desconocido", 200: "Entrada", 201: "Salida",
-    202: "Inter-entrada", 203: "Inter-salida", 204: "Software",
-}
-
-
 class Command(BaseCommand):
     help = "Escucha (polling) marcas de un molinete Intelektron y las guarda en IntelektronEvent."
 
@@ -100,7 +92,6 @@ class Command(BaseCommand):
 
     def _poll_once(self, base: dict, params: dict, id_controlador, call_timeout: float = 20.0) -> int:
         from access_control.services.intelectron.api3000_console import execute_command
-        from access_control.models import IntelektronEvent
 
         # La lectura del equipo (ctypes/socket) puede colgarse indefinidamente si el
         # molinete acepta la conexión pero no responde: el watchdog acota el ciclo.
@@ -108,67 +99,10 @@ class Command(BaseCommand):
             execute_command, call_timeout, command="list_marks", base=base, params=params
         )
         marks = result.get("marks", []) if isinstance(result, dict) else []
-        new_count = 0
-        for mark in marks:
-            key = self._dedupe_key(base["ip"], mark)
-            device_time = self._parse_time(mark.get("timestamp"))
-            event_code = mark.get("event_code")
-            direction = mark.get("direction")
-            _, created = IntelektronEvent.objects.get_or_create(
-                dedupe_key=key,
-                defaults={
-                    "device_ip": base["ip"],
-                    "dest_node": base["dest_node"],
-                    "id_controlador": id_controlador,
-                    "access_id": mark.get("access_id"),
-                    "event_code": event_code,
-                    "event_name": EVENT_NAMES.get(event_code, ""),
-                    "direction": direction,
-                    "direction_name": DIRECTION_NAMES.get(direction, ""),
-                    "source": mark.get("source"),
-                    "device_time": device_time,
-                    "raw": mark,
-                },
-            )
-            if created:
-                new_count += 1
-        return new_count
-
-    @staticmethod
-    def _dedupe_key(ip: str, mark: dict) -> str:
-        ts = mark.get("timestamp") or {}
-        parts = [
-            ip,
-            str(ts.get("year")), str(ts.get("month")), str(ts.get("day")),
-            str(ts.get("hour")), str(ts.get("minute")), str(ts.get("seconds")),
-            str(mark.get("access_id")), str(mark.get("event_code")),
-            str(mark.get("direction")), str(mark.get("source")),
-        ]
-        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
-
-    @staticmethod
-    def _parse_time(ts: dict | None):
-        if not ts:
-            return None
-        try:
-            year = int(ts.get("year") or 0)
-            if year < 100:
-                year += 2000
-            month = int(ts.get("month") or 0)
-            day = int(ts.get("day") or 0)
-            if not (year and month and day):
-                return None
-            naive = timezone.datetime(
-                year, month, day,
-                int(ts.get("hour") or 0), int(ts.get("minute") or 0), int(ts.get("seconds") or 0),
-            )
-            return timezone.make_aware(naive, timezone.get_current_timezone())
-        except (ValueError, TypeError):
-            return None
+        return marcas.guardar(
+            marks, device_ip=base["ip"], dest_node=base["dest_node"], id_controlador=id_controlador
+        )
 
     @staticmethod
     def _purge_old(retention_days: int) -> None:
-        from access_control.models import IntelektronEvent
-
-        cutoff = timezone.now() - timezone.timedelta(days=retention_days)
-        IntelektronEvent.objects.filter(created_at__lt=cutoff).delete()
+        marcas.purgar(retention_days)
@@ -0,0 +1,100 @@
+"""Servidor de eventos Intelektron: las placas se conectan y quedan conectadas.
+
+Reemplaza el polling por ciclo de ``intelektron_listener`` (abrir, listar,
+cerrar cada 5 s, un proceso por placa) por un único proceso que hace
+``itk_listen`` y mantiene una sesión por placa, leyendo sus marcas nuevas cada
+``--interval`` (250 ms). Ver ``access_control.services.intelectron.servidor``.
+
+Las placas tienen que estar configuradas en modo online apuntando a este host y
+puerto. ``--nodo NODO=ID_CONTROLADOR`` (o ``IP=ID_CONTROLADOR``, para placas
+que comparten nodo) asocia cada placa al controlador de xSys, para ubicar la
+marca en su molinete (paso pendiente). Sin ``--nodo`` se toma
+``INTELEKTRON_NODOS`` (``1=53,10.0.0.61=54``).
+
+Ejemplos:
+    python manage.py intelektron_server --port 3002 --nodo 1=53 --nodo 2=54
+    python manage.py intelektron_server --port 3002 --interval 0.5
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from access_control.services.intelectron import marcas
+from access_control.services.intelectron.servidor import ServidorMarcas
+
+
+def _parse_nodos(valores: list[str] | None) -> dict[int | str, int]:
+    nodos: dict[int | str, int] = {}
+    for v in valores or []:
+        try:
+            nodo, ctrl = v.split("=", 1)
+            nodo = nodo.strip()
+            nodos[int(nodo) if nodo.isdigit() else nodo] = int(ctrl)
+        except ValueError:
+            raise CommandError(f"--nodo debe ser NODO=ID_CONTROLADOR o IP=ID_CONTROLADOR (recibido: {v!r})")
+    return nodos
+
+
+class Command(BaseCommand):
+    help = "Servidor (itk_listen) que mantiene una sesión por placa Intelektron y guarda sus marcas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=3002, help="Puerto TCP donde escuchar (default 3002).")
+        parser.add_argument("--source-node", type=int, default=0, help="Nodo origen (default 0).")
+        parser.add_argument("--nodo", action="append", default=None, metavar="NODO|IP=ID_CONTROLADOR",
+                            help="Asocia el nodo (o la IP) de una placa a su Id_Controlador de xSys (repetible).")
+        parser.add_argument("--interval", type=float, default=0.25,
+                            help="Segundos entre lecturas de cada sesión (default 0.25).")
+        parser.add_argument("--batch", type=int, default=50, help="Marcas por lectura (default 50).")
+        parser.add_argument("--accept-timeout", type=float, default=0.25,
+                            help="Segundos que espera cada accept (con el semáforo nativo tomado) "
+                                 "antes de soltarlo y volver a intentar (default 0.25).")
+        parser.add_argument("--rcv-timeout", type=float, default=20.0, help="Timeout de recepción del link (s).")
+        parser.add_argument("--retention-days", type=int, default=30, help="Días de retención de eventos.")
+        parser.add_argument("--status-every", type=float, default=60.0,
+                            help="Segundos entre resúmenes de estado en el log (default 60).")
+
+    def handle(self, *args, **options):
+        servidor = ServidorMarcas(
+            port=options["port"],
+            source_node=options["source_node"],
+            nodos=_parse_nodos(
+                options["nodo"] or [v for v in os.getenv("INTELEKTRON_NODOS", "").split(",") if v.strip()]
+            ),
+            lote=options["batch"],
+            intervalo=options["interval"],
+            accept_timeout=options["accept_timeout"],
+            rcv_timeout=options["rcv_timeout"],
+        )
+        try:
+            servidor.iniciar()
+        except Exception as exc:
+            raise CommandError(f"No se pudo abrir el listen en el puerto {options['port']}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Servidor Intelektron escuchando en 0.0.0.0:{options['port']} "
+            f"(nodos mapeados: {len(servidor.nodos)}). Ctrl-C para salir."
+        ))
+        ultima_purga = time.monotonic()
+        try:
+            while True:
+                time.sleep(max(1.0, options["status_every"]))
+                for e in servidor.estado():
+                    self.stdout.write(
+                        f"{e['placa']} ctrl={e['id_controlador']} viva={e['viva']} cursor={e['cursor']} "
+                        f"marcas={e['marcas']} lectura_hace={e['seg_desde_lectura']}s "
+                        f"marca_hace={e['seg_desde_marca']}s {e['error']}"
+                    )
+                if time.monotonic() - ultima_purga >= 3600:
+                    marcas.purgar(options["retention_days"])
+                    close_old_connections()
+                    ultima_purga = time.monotonic()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrumpido por el usuario."))
+        finally:
+            servidor.detener()
@@ -0,0 +1,121 @@
+"""Lee las marcas de TODAS las placas Intelektron desde un solo proceso.
+
+Reemplaza a un ``intelektron_listener --ip ...`` por molinete. Los equipos salen
+del registro (controladores asignados a puertas que en xSys son molinetes con
+IP; ver ``access_control.services.intelectron.supervisor``) más los que se
+agreguen con ``--equipo``. El registro se relee cada ``--reload`` segundos.
+
+Ejemplos:
+    python manage.py intelektron_supervisor
+    python manage.py intelektron_supervisor --equipo 10.0.0.60=53 --equipo 10.0.0.61:3001/2=54
+    python manage.py intelektron_supervisor --sin-registro --equipo 10.0.0.60=53 --once
+"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from access_control.services.intelectron import marcas
+from access_control.services.intelectron.supervisor import Equipo, Supervisor, _ip_y_puerto, registro
+
+
+def _parse_equipo(valor: str, *, port: int, dest_node: int) -> Equipo:
+    """``IP[:PUERTO][/NODO][=ID_CONTROLADOR]``."""
+    direccion, _, ctrl = valor.partition("=")
+    direccion, _, nodo = direccion.partition("/")
+    ip, puerto = _ip_y_puerto(direccion, port)
+    try:
+        return Equipo(
+            ip=ip, port=puerto, dest_node=int(nodo) if nodo else dest_node,
+            id_controlador=int(ctrl) if ctrl else None,
+        )
+    except ValueError:
+        raise CommandError(f"--equipo debe ser IP[:PUERTO][/NODO][=ID_CONTROLADOR] (recibido: {valor!r})")
+
+
+class Command(BaseCommand):
+    help = "Lee las marcas de todas las placas Intelektron (registro + --equipo) en un solo proceso."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--equipo", action="append", default=[], metavar="IP[:PUERTO][/NODO][=ID]",
+                            help="Equipo extra (o que pisa al del registro). Repetible.")
+        parser.add_argument("--sin-registro", action="store_true",
+                            help="Sólo los --equipo; no lee controladores de la base.")
+        parser.add_argument("--port", type=int, default=3001, help="Puerto host TCP por defecto (3001).")
+        parser.add_argument("--source-node", type=int, default=255, help="Nodo origen (default 255).")
+        parser.add_argument("--dest-node", type=int, default=1, help="Nodo destino por defecto (1).")
+        parser.add_argument("--interval", type=float, default=1.0, help="Segundos entre lecturas por equipo (default 1).")
+        parser.add_argument("--batch", type=int, default=50, help="Marcas por lectura (default 50).")
+        parser.add_argument("--call-timeout", type=float, default=20.0,
+                            help="Timeout de conexión/recepción de cada placa (s).")
+        parser.add_argument("--reload", type=float, default=300.0, help="Segundos entre relecturas del registro.")
+        parser.add_argument("--retention-days", type=int, default=30, help="Días de retención de eventos.")
+        parser.add_argument("--status-every", type=float, default=60.0,
+                            help="Segundos entre resúmenes de estado en el log (default 60).")
+        parser.add_argument("--once", action="store_true", help="Una ronda y termina (para pruebas).")
+
+    def _equipos(self, options) -> list[Equipo]:
+        base = [] if options["sin_registro"] else registro(port=options["port"], dest_node=options["dest_node"])
+        equipos = {e.clave: e for e in base}
+        for valor in options["equipo"]:
+            e = _parse_equipo(valor, port=options["port"], dest_node=options["dest_node"])
+            equipos[e.clave] = e
+        return list(equipos.values())
+
+    def handle(self, *args, **options):
+        equipos = self._equipos(options)
+        if not equipos and options["sin_registro"]:
+            raise CommandError("Con --sin-registro hay que indicar al menos un --equipo.")
+
+        supervisor = Supervisor(
+            equipos,
+            source_node=options["source_node"],
+            lote=options["batch"],
+            intervalo=options["interval"],
+            call_timeout=options["call_timeout"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Supervisor Intelektron: {len(supervisor.lectores)} equipo(s). Ctrl-C para salir."
+        ))
+        ultimo_estado = ultima_carga = ultima_purga = time.monotonic()
+        try:
+            while True:
+                nuevas = supervisor.ronda()
+                if nuevas:
+                    self.stdout.write(f"{nuevas} marca(s) nueva(s)")
+                if options["once"]:
+                    self._estado(supervisor)
+                    break
+
+                ahora = time.monotonic()
+                if ahora - ultimo_estado >= options["status_every"]:
+                    self._estado(supervisor)
+                    ultimo_estado = ahora
+                if ahora - ultima_carga >= options["reload"]:
+                    try:
+                        altas, bajas = supervisor.actualizar(self._equipos(options))
+                        if altas or bajas:
+                            self.stdout.write(f"Registro: +{altas} -{bajas} equipo(s)")
+                    except Exception as exc:  # la base puede no estar: se sigue con los que había
+                        self.stderr.write(self.style.ERROR(f"No se pudo releer el registro: {exc}"))
+                    ultima_carga = ahora
+                if ahora - ultima_purga >= 3600:
+                    marcas.purgar(options["retention_days"])
+                    ultima_purga = ahora
+                close_old_connections()
+                time.sleep(supervisor.espera())
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrumpido por el usuario."))
+        finally:
+            supervisor.detener()
+
+    def _estado(self, supervisor: Supervisor) -> None:
+        for e in supervisor.estado():
+            self.stdout.write(
+                f"{e['ip']}:{e['port']}/{e['dest_node']} ctrl={e['id_controlador']} "
+                f"conectado={e['conectado']} cursor={e['cursor']} al_dia={e['al_dia']} marcas={e['marcas']} "
+                f"lag={e['lag_segundos']}s errores={e['errores']} colgado={e['colgado']} {e['error']}"
+            )
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def _set_unlogged(apps, schema_editor):
+    # Reservas de segundos: perderlas en una caída no importa y así no pagan WAL.
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("ALTER TABLE acs_paso_pendiente SET UNLOGGED")
+
+
+def _set_logged(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("ALTER TABLE acs_paso_pendiente SET LOGGED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0019_pasopendiente_biostaraccessevent_conflicto_molinete_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(_set_unlogged, _set_logged),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0020_pasopendiente_unlogged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='biostardevice',
+            name='users_indexed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BioStarDeviceUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField()),
+                ('user_key', models.CharField(blank=True, default='', max_length=128)),
+                ('name_key', models.CharField(blank=True, default='', max_length=255)),
+                ('raw_payload', models.JSONField(blank=True, default=dict)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'BioStar Device User',
+                'verbose_name_plural': 'BioStar Device Users',
+                'indexes': [models.Index(fields=['device_id', 'user_key'], name='biostar_devuser_key_idx'), models.Index(fields=['device_id', 'name_key'], name='biostar_devuser_name_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device_id', 'user_id'), name='biostar_device_user_uniq')],
+            },
+        ),
+    ]
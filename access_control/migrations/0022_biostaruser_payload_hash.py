@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0021_biostardeviceuser'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='biostaruser',
+            name='payload_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0022_biostaruser_payload_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='intelektronevent',
+            name='conflicto_molinete',
+            field=models.CharField(blank=True, default='', max_length=60),
+        ),
+    ]
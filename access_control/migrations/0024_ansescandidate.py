@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0023_intelektronevent_conflicto_molinete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnsesCandidate',
+            fields=[
+                ('id_cliente', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('doc_nro', models.BigIntegerField()),
+                ('nombre', models.CharField(blank=True, default='', max_length=100)),
+                ('apellido', models.CharField(blank=True, default='', max_length=100)),
+                ('sexo', models.CharField(blank=True, default='', max_length=1)),
+                ('fecha_nac', models.DateField()),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Candidato ANSES',
+                'verbose_name_plural': 'Candidatos ANSES',
+                'ordering': ('fecha_nac', 'id_cliente'),
+                'indexes': [models.Index(fields=['fecha_nac', 'id_cliente'], name='anses_cand_keyset_idx')],
+            },
+        ),
+    ]
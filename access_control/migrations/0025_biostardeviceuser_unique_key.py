@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0024_ansescandidate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='biostardeviceuser',
+            name='unique_key',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+        migrations.AddIndex(
+            model_name='biostardeviceuser',
+            index=models.Index(fields=['device_id', 'unique_key'], name='biostar_devuser_unique_idx'),
+        ),
+    ]
@@ -1,8 +1,10 @@
+from .anses_candidate import AnsesCandidate
 from .biostar_config import BioStar2Config
 from .biostar_event import BiostarAccessEvent, BiostarPollState
 from .biostart_user import BioStarUser
 from .biostar_device_group import BioStarDeviceGroup
 from .device import BioStarDevice
+from .device_user import BioStarDeviceUser
 from .intelektron_event import IntelektronEvent
 from .paso_pendiente import PasoPendiente
 from .socio_aviso import SocioAviso
@@ -19,6 +21,7 @@ __all__ = [
     "BiostarAccessEvent",
     "BiostarPollState",
     "BioStarDevice",
+    "BioStarDeviceUser",
     "BioStarUser",
     "ExternalAccessLogEntry",
     "WhitelistEntry",
@@ -26,6 +29,7 @@ __all__ = [
     "BioStarDeviceGroup",
     "ParkingMovement",
     "AnsesVerificationRecord",
+    "AnsesCandidate",
     "IntelektronEvent",
     "SocioAviso",
     "PasoPendiente",
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from django.db import models
+
+
+class AnsesCandidate(models.Model):
+    """Copia local de los candidatos a verificar en ANSES (vitalicios activos).
+
+    La consola de ANSES filtraba contra los ``AnsesVerificationRecord`` del
+    usuario trayendo TODOS los candidatos de MSSQL en cada vista de página. Acá
+    queda el universo (lo refresca ``anses_candidates.refrescar``) y cada página
+    es una query local que cruza con las verificaciones y pagina por
+    ``(fecha_nac, id_cliente)``.
+
+    No se guarda la edad: se filtra por rango de ``fecha_nac`` (ver
+    ``anses_candidates.rango_fecha_nac``).
+    """
+
+    id_cliente = models.BigIntegerField(primary_key=True)
+    doc_nro = models.BigIntegerField()
+    nombre = models.CharField(max_length=100, blank=True, default="")
+    apellido = models.CharField(max_length=100, blank=True, default="")
+    sexo = models.CharField(max_length=1, blank=True, default="")
+    fecha_nac = models.DateField()
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("fecha_nac", "id_cliente")
+        indexes = [
+            models.Index(fields=["fecha_nac", "id_cliente"], name="anses_cand_keyset_idx"),
+        ]
+        verbose_name = "Candidato ANSES"
+        verbose_name_plural = "Candidatos ANSES"
+
+    def __str__(self) -> str:  # pragma: no cover - representación auxiliar
+        return f"Cliente {self.id_cliente} (DNI {self.doc_nro})"
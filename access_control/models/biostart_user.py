@@ -24,6 +24,8 @@ class BioStarUser(models.Model):
     last_seen_at = models.DateTimeField(null=True, blank=True)
 
     raw_payload = models.JSONField(default=dict, blank=True)
+    # sha256 del raw_payload normalizado: el sync sólo reescribe si cambió.
+    payload_hash = models.CharField(max_length=64, blank=True, default="")
     last_synced_at = models.DateTimeField(auto_now=True)
 
     class Meta:
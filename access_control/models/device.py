@@ -19,6 +19,9 @@ class BioStarDevice(models.Model):
     raw_payload = models.JSONField(default=dict, blank=True)
 
     last_synced_at = models.DateTimeField(auto_now=True)
+    # Última vez que se indexaron sus usuarios en ``BioStarDeviceUser``
+    # (NULL = nunca: la búsqueda por documento va en vivo).
+    users_indexed_at = models.DateTimeField(null=True, blank=True)
     device_group = models.ForeignKey(
         "access_control.BioStarDeviceGroup",
         null=True,
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from django.db import models
+
+
+class BioStarDeviceUser(models.Model):
+    """Espejo local de los usuarios cargados en cada equipo BioStar.
+
+    Sirve para buscar por documento sin paginar ``/api/devices/<id>/users`` (en
+    un equipo con decenas de miles de usuarios eran decenas de pedidos HTTP por
+    búsqueda). Lo arma ``biostar_device_index`` y lo mantienen al día el
+    refresco periódico y las acciones de agregar/quitar/vaciar de la consola.
+
+    ``user_key``, ``unique_key`` y ``name_key`` son el ``user_id`` (o ``id``),
+    el ``user_unique_id`` y el nombre normalizados igual que la búsqueda
+    (dígitos, o el texto en minúsculas si no hay).
+    """
+
+    device_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    user_key = models.CharField(max_length=128, blank=True, default="")
+    unique_key = models.CharField(max_length=128, blank=True, default="")
+    name_key = models.CharField(max_length=255, blank=True, default="")
+    raw_payload = models.JSONField(default=dict, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "BioStar Device User"
+        verbose_name_plural = "BioStar Device Users"
+        constraints = [
+            models.UniqueConstraint(fields=["device_id", "user_id"], name="biostar_device_user_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["device_id", "user_key"], name="biostar_devuser_key_idx"),
+            models.Index(fields=["device_id", "unique_key"], name="biostar_devuser_unique_idx"),
+            models.Index(fields=["device_id", "name_key"], name="biostar_devuser_name_idx"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - representación auxiliar
+        return f"{self.user_id} @ {self.device_id}"
@@ -7,10 +7,10 @@ from django.utils import timezone
 class IntelektronEvent(models.Model):
     """Evento (marca de acceso) leído de un molinete Intelektron API-3000.
 
-    Lo puebla el comando ``intelektron_listener``, que hace *polling* de
-    ``list_marks`` sobre un equipo y persiste las marcas nuevas (modo "solo
-    escuchar y loguear", sin autorizar accesos). Las marcas no traen un id
-    estable, así que la deduplicación es por contenido (``dedupe_key``).
+    Lo pueblan ``intelektron_server`` (sesión persistente con cada placa) y
+    ``intelektron_listener`` (*polling* de ``list_marks`` sobre un equipo), en
+    modo "solo escuchar y loguear", sin autorizar accesos. Las marcas no traen
+    un id estable, así que la deduplicación es por contenido (``dedupe_key``).
 
     ``access_id`` es el identificador de acceso reportado por la placa; suele
     coincidir con la credencial/Id_Cliente de xSys.
@@ -33,6 +33,8 @@ class IntelektronEvent(models.Model):
     # Fecha/hora reportada por el equipo (puede venir desfasada por su zona).
     device_time = models.DateTimeField(null=True, blank=True, db_index=True)
     raw = models.JSONField(default=dict, blank=True)
+    # Molinete donde el socio tenía un paso pendiente (ver paso_pendiente).
+    conflicto_molinete = models.CharField(max_length=60, blank=True, default="")
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
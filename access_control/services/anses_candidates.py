@@ -0,0 +1,219 @@
+"""Candidatos ANSES servidos desde la copia local (``AnsesCandidate``).
+
+Con un filtro activo, cada página de la consola traía todos los candidatos de
+MSSQL y filtraba en Python. ``refrescar`` trae el universo en una consulta y
+escribe sólo lo que cambió; ``anses_sync_candidates --loop`` lo corre cada
+``ANSES_CANDIDATES["TTL_SECONDS"]`` y ``asegurar`` sólo si la copia nunca se cargó.
+``filtrar`` es una query (la edad pasa a rango de ``fecha_nac`` y el estado de
+verificación va en subconsultas) y ``pagina`` pagina por keyset con el cursor
+``"<fecha_nac>:<id_cliente>"``.
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import date
+from typing import Any
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+STREAM = "anses_candidatos"
+_DELETE_CHUNK = 500
+_CERRADOS = ("generated", "deceased")  # AnsesVerificationRecord.VerificationStatus
+
+_refresco = threading.Lock()
+
+
+def ttl_seconds() -> int:
+    """Cada cuánto se relee la copia de MSSQL."""
+    return max(0, int(getattr(settings, "ANSES_CANDIDATES", {}).get("TTL_SECONDS") or 3600))
+
+
+def _fecha(value) -> date | None:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def refrescar(service=None) -> dict[str, int]:
+    """Sincroniza ``AnsesCandidate`` con MSSQL. Devuelve ``{"vistos", "escritos", "borrados"}``."""
+    from access_control.models import AnsesCandidate
+    from access_control.services.anses_verification_service import AnsesVerificationService
+    from xsys.models import SyncState
+
+    state, _ = SyncState.objects.get_or_create(stream=STREAM)
+    state.last_run_started_at = timezone.now()
+    try:
+        items = (service or AnsesVerificationService()).fetch_all_candidates()
+    except Exception as exc:
+        state.last_run_ok = False
+        state.last_error = str(exc)[:2000]
+        state.last_run_finished_at = timezone.now()
+        state.save()
+        raise
+
+    nuevos: dict[int, AnsesCandidate] = {}
+    for item in items:
+        fecha_nac = _fecha(item.get("fecha_nac"))
+        if item.get("id_cliente") is None or item.get("doc_nro") is None or fecha_nac is None:
+            continue
+        nuevos[int(item["id_cliente"])] = AnsesCandidate(
+            id_cliente=int(item["id_cliente"]),
+            doc_nro=int(item["doc_nro"]),
+            nombre=str(item.get("nombre") or "")[:100],
+            apellido=str(item.get("apellido") or "")[:100],
+            sexo=str(item.get("sexo") or "")[:1],
+            fecha_nac=fecha_nac,
+        )
+    actuales = {
+        pk: rest
+        for pk, *rest in AnsesCandidate.objects.values_list(
+            "id_cliente", "doc_nro", "nombre", "apellido", "sexo", "fecha_nac"
+        )
+    }
+    cambiados = [
+        obj for pk, obj in nuevos.items()
+        if actuales.get(pk) != [obj.doc_nro, obj.nombre, obj.apellido, obj.sexo, obj.fecha_nac]
+    ]
+    # Un listado vacío es más probable que sea un error de MSSQL que el
+    # padrón sin vitalicios: en ese caso no se borra nada.
+    sobran = [pk for pk in actuales if pk not in nuevos] if nuevos else []
+
+    with transaction.atomic():
+        if cambiados:
+            AnsesCandidate.objects.bulk_create(
+                cambiados,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["id_cliente"],
+                update_fields=["doc_nro", "nombre", "apellido", "sexo", "fecha_nac", "synced_at"],
+            )
+        for i in range(0, len(sobran), _DELETE_CHUNK):
+            AnsesCandidate.objects.filter(id_cliente__in=sobran[i:i + _DELETE_CHUNK]).delete()
+        state.last_run_ok = True
+        state.last_error = ""
+        state.rows_last_run = len(nuevos)
+        state.last_datetime = state.last_run_finished_at = timezone.now()
+        state.save()
+    return {"vistos": len(nuevos), "escritos": len(cambiados), "borrados": len(sobran)}
+
+
+def ultima_carga():
+    """Cuándo se cargó bien la copia por última vez (None si nunca)."""
+    from xsys.models import SyncState
+
+    return (
+        SyncState.objects.filter(stream=STREAM, last_datetime__isnull=False)
+        .values_list("last_datetime", flat=True)
+        .first()
+    )
+
+
+def cargado() -> bool:
+    return ultima_carga() is not None
+
+
+def asegurar(service=None) -> bool:
+    """Carga la copia si nunca se cargó. Devuelve si la cargó.
+
+    El refresco periódico lo hace ``anses_sync_candidates --loop``; un pedido
+    sólo paga la carga completa si ese servicio todavía no corrió nunca. Una
+    sola carga a la vez por proceso: quien llega mientras otro carga espera y
+    usa lo que ese dejó. Si MSSQL falla, el error sube.
+    """
+    if cargado():
+        return False
+    with _refresco:
+        if cargado():
+            return False
+        refrescar(service)
+    return True
+
+
+def rango_fecha_nac(min_age: int, max_age: int, hoy: date | None = None) -> tuple[date, date]:
+    """Rango de ``fecha_nac`` equivalente a ``DATEDIFF(YEAR, Fecha_Nac, hoy) BETWEEN``.
+
+    ``DATEDIFF(YEAR)`` cuenta cambios de año (no cumpleaños): la "edad" es
+    ``hoy.year - fecha_nac.year``, así que el filtro es por año de nacimiento.
+    """
+    hoy = hoy or timezone.localdate()
+    return date(max(1, hoy.year - max_age), 1, 1), date(max(1, hoy.year - min_age), 12, 31)
+
+
+def filtrar(user, *, min_age: int, max_age: int, exclude_consulted: bool = False,
+            verification_status: str = "all", hoy: date | None = None):
+    """Candidatos del rango con el estado de verificación del usuario, en una query."""
+    from access_control.models import AnsesCandidate, AnsesVerificationRecord
+
+    desde, hasta = rango_fecha_nac(min_age, max_age, hoy)
+    registro = AnsesVerificationRecord.objects.filter(requested_by=user, id_cliente=OuterRef("id_cliente"))
+    qs = (
+        AnsesCandidate.objects.filter(fecha_nac__gte=desde, fecha_nac__lte=hasta)
+        .annotate(
+            record_status=Subquery(registro.values("verification_status")[:1]),
+            record_message=Subquery(registro.values("verification_message")[:1]),
+        )
+        .order_by("fecha_nac", "id_cliente")
+    )
+    if exclude_consulted:
+        qs = qs.filter(Q(record_status__isnull=True) | ~Q(record_status__in=_CERRADOS))
+    if verification_status == "pending":
+        qs = qs.filter(record_status__isnull=True)
+    elif verification_status and verification_status != "all":
+        qs = qs.filter(record_status=verification_status)
+    return qs
+
+
+def item(candidato, hoy: date | None = None) -> dict[str, Any]:
+    """Fila con la misma forma que devolvía la consulta a MSSQL + los filtros."""
+    hoy = hoy or timezone.localdate()
+    status = getattr(candidato, "record_status", None)
+    return {
+        "id_cliente": candidato.id_cliente,
+        "doc_nro": candidato.doc_nro,
+        "nombre": candidato.nombre,
+        "apellido": candidato.apellido,
+        "sexo": candidato.sexo,
+        "fecha_nac": candidato.fecha_nac.isoformat(),
+        "edad": hoy.year - candidato.fecha_nac.year,
+        "consulted": status is not None,
+        "verification_status": status or "",
+        "verification_message": getattr(candidato, "record_message", None) or "",
+    }
+
+
+def cursor_de(candidato) -> str:
+    return f"{candidato.fecha_nac.isoformat()}:{candidato.id_cliente}"
+
+
+def parse_cursor(cursor: str) -> tuple[date, int]:
+    """``(fecha_nac, id_cliente)`` de un cursor de ``pagina``; ``ValueError`` si no lo es."""
+    fecha, _, pk = (cursor or "").partition(":")
+    parsed = _fecha(fecha)
+    if parsed is None or not pk.lstrip("-").isdigit():
+        raise ValueError("cursor inválido")
+    return parsed, int(pk)
+
+
+def pagina(qs, *, page_size: int, after: str | None = None, page: int = 1) -> tuple[list, str | None]:
+    """Una página de ``filtrar``: por keyset si hay ``after``, si no por ``page``.
+
+    Devuelve ``(filas, cursor_siguiente)``; el cursor es None en la última.
+    Lanza ``ValueError`` si ``after`` no es un cursor válido.
+    """
+    if after:
+        fecha, pk = parse_cursor(after)
+        qs = qs.filter(Q(fecha_nac__gt=fecha) | Q(fecha_nac=fecha, id_cliente__gt=pk))
+        filas = list(qs[: page_size + 1])
+    else:
+        offset = (max(1, page) - 1) * page_size
+        filas = list(qs[offset: offset + page_size + 1])
+    hay_mas = len(filas) > page_size
+    filas = filas[:page_size]
+    return filas, (cursor_de(filas[-1]) if hay_mas and filas else None)
@@ -94,27 +94,72 @@ class AnsesVerificationService:
             except Exception:
                 pass
 
+        return {"count": total, "results": [self._item_from_row(row) for row in rows]}
+
+    def fetch_all_candidates(self) -> list[dict[str, Any]]:
+        """Todos los candidatos (sin rango de edad ni paginado), en una consulta.
+
+        Es la fuente de la copia local (``anses_candidates.refrescar``): una
+        conexión y un solo SELECT en vez de páginas de 500 con un COUNT cada una.
+        """
+        if pyodbc is None:
+            raise AnsesVerificationError("El paquete pyodbc no está disponible.")
+
+        table = self.config["TABLE"]
+        query = f"""
+        SELECT
+            c.Id_Cliente,
+            c.Doc_Nro,
+            c.Nombre,
+            c.Apellido,
+            c.Sexo,
+            c.Fecha_Nac,
+            DATEDIFF(YEAR, c.Fecha_Nac, CAST(GETDATE() AS date)) AS Edad
+        FROM {table} c
+        INNER JOIN Clientes_Tipos ct
+            ON ct.Id_Tipo_Cli = c.Id_Tipo_Cli
+        WHERE c.Activo = 1
+          AND c.Fecha_Nac IS NOT NULL
+          AND c.Doc_Nro IS NOT NULL
+          AND ct.Descripcion LIKE '%vitalicio%'
+        """
         items: list[dict[str, Any]] = []
-        for row in rows:
-            fecha_nac = row[5]
-            if isinstance(fecha_nac, datetime):
-                fecha_nac_value = fecha_nac.date().isoformat()
-            elif fecha_nac:
-                fecha_nac_value = str(fecha_nac)
-            else:
-                fecha_nac_value = ""
-            items.append(
-                {
-                    "id_cliente": int(row[0]) if row[0] is not None else None,
-                    "doc_nro": int(row[1]) if row[1] is not None else None,
-                    "nombre": (row[2] or "").strip(),
-                    "apellido": (row[3] or "").strip(),
-                    "sexo": (row[4] or "").strip(),
-                    "fecha_nac": fecha_nac_value,
-                    "edad": int(row[6]) if row[6] is not None else None,
-                }
-            )
-        return {"count": total, "results": items}
+        try:
+            connection = pyodbc.connect(self._connection_string())  # type: ignore[union-attr]
+            cursor = connection.cursor()
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(2000)
+                if not rows:
+                    break
+                items.extend(self._item_from_row(row) for row in rows)
+        except Exception as exc:
+            raise AnsesVerificationError(f"No se pudo consultar MSSQL: {exc}") from exc
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return items
+
+    @staticmethod
+    def _item_from_row(row) -> dict[str, Any]:
+        fecha_nac = row[5]
+        if isinstance(fecha_nac, datetime):
+            fecha_nac_value = fecha_nac.date().isoformat()
+        elif fecha_nac:
+            fecha_nac_value = str(fecha_nac)
+        else:
+            fecha_nac_value = ""
+        return {
+            "id_cliente": int(row[0]) if row[0] is not None else None,
+            "doc_nro": int(row[1]) if row[1] is not None else None,
+            "nombre": (row[2] or "").strip(),
+            "apellido": (row[3] or "").strip(),
+            "sexo": (row[4] or "").strip(),
+            "fecha_nac": fecha_nac_value,
+            "edad": int(row[6]) if row[6] is not None else None,
+        }
 
     def run_verification(self, dnis: list[int], *, headless: bool = True, no_download: bool = True, skip_anses: bool = False) -> dict[str, Any]:
         if not dnis:
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import timedelta, timezone as dt_timezone
 from typing import Any
 
+import logging
 import os
+import re
+import threading
+import time
 import requests
 from django.utils import timezone
 
 from access_control.models.biostar_config import BioStar2Config
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass(frozen=True)
 class BioStar2Env:
@@ -34,21 +41,98 @@ class BioStar2Env:
         )
 
 
+def _iso_biostar(dt) -> str:
+    """Fecha en el formato de BioStar ('2026-07-24T14:52:57.00Z'), en UTC."""
+    return dt.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.00Z")
+
+
+def fetch_pages(fetch, *, page_size: int, workers: int = 1, thread_name: str = "biostar-pages") -> list:
+    """Todas las filas de un listado paginado de BioStar.
+
+    ``fetch(limit, offset)`` devuelve ``(filas, total)``. La primera página va
+    sola para conocer el total; el resto se pide con ``workers`` hilos sobre la
+    misma sesión. Sin total se sigue en serie hasta una página corta. Cualquier
+    página que falle propaga la excepción: el llamador no debe tomar como
+    completo un listado parcial.
+    """
+    filas, total = fetch(page_size, 0)
+    filas = list(filas or [])
+    try:
+        total = int(total)
+    except (TypeError, ValueError):
+        total = None
+
+    if total is None:
+        offset, ultima = page_size, filas
+        while len(ultima) >= page_size:
+            ultima, _ = fetch(page_size, offset)
+            ultima = list(ultima or [])
+            filas.extend(ultima)
+            offset += page_size
+        return filas
+
+    offsets = list(range(page_size, total, page_size))
+    if offsets:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(offsets))), thread_name_prefix=thread_name) as pool:
+            for pagina, _ in pool.map(lambda off: fetch(page_size, off), offsets):
+                filas.extend(pagina or [])
+    return filas
+
+
+# Un cliente por proceso (clave: pid, para no heredar sockets tras un fork).
+_shared: dict[int, "BioStar2Client"] = {}
+_shared_lock = threading.Lock()
+
+# "/api/users/123" y "/api/users/456" son el mismo endpoint para las métricas.
+_IDS_EN_PATH = re.compile(r"/\d+(?=/|$)")
+
+
 class BioStar2Client:
     """
     Cliente para BioStar 2 New Local API.
 
-    - Mantiene bs-session-id en DB (BioStar2Config)
+    - Mantiene bs-session-id en DB (BioStar2Config), compartido entre procesos
     - Reintenta login automáticamente si la sesión expira / el server devuelve 401/LOGIN REQUIRED
+
+    Se usa compartido y desde varios hilos: ``from_db_and_env()`` devuelve UNA
+    instancia por proceso (el poller de 1 s ya no arma sesión ni handshake TLS
+    nuevos en cada ciclo), el pool HTTP de la sesión se dimensiona para los
+    pedidos en paralelo, y el re-login es single-flight: si varios pedidos reciben
+    401 a la vez, loguea uno solo y los demás reusan la sesión nueva. Cada pedido
+    suma su latencia a ``metrics()``, por endpoint.
     """
 
     def __init__(self, cfg: BioStar2Config, env: BioStar2Env):
         self.cfg = cfg
         self.env = env
         self.session = requests.Session()
+        self._login_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics: dict[str, list] = {}
+        # El default de requests guarda 10 conexiones por host; con PUTs en
+        # paralelo (biostar_access_state) las que sobran se abren y se tiran.
+        pool = int(os.getenv("BIOSTAR_HTTP_POOL_SIZE", "16") or 16)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_db_and_env(cls, *, shared: bool = True) -> "BioStar2Client":
+        """Cliente del proceso (``shared=False`` arma uno nuevo, aislado)."""
+        if not shared:
+            return cls._build()
+        pid = os.getpid()
+        with _shared_lock:
+            client = _shared.get(pid)
+            if client is None:
+                _shared.clear()
+                client = _shared[pid] = cls._build()
+            return client
 
     @classmethod
-    def from_db_and_env(cls) -> "BioStar2Client":
+    def _build(cls) -> "BioStar2Client":
         cfg = BioStar2Config.get_solo()
         env = BioStar2Env.from_env()
 
@@ -71,13 +155,14 @@ class BioStar2Client:
 
         return cls(cfg=cfg, env=env)
 
-    def _headers(self) -> dict[str, str]:
+    def _headers(self, session_id: str | None = None) -> dict[str, str]:
         headers = {
             "Content-Type": "application/json",
             "accept": "application/json",
         }
-        if self.cfg.bs_session_id:
-            headers["bs-session-id"] = self.cfg.bs_session_id
+        session_id = self.cfg.bs_session_id if session_id is None else session_id
+        if session_id:
+            headers["bs-session-id"] = session_id
         return headers
 
     def login(self) -> None:
@@ -99,37 +184,84 @@ class BioStar2Client:
 
         self.cfg.set_session(session_id.strip())
 
+    def _recargar(self) -> None:
+        """Relee la config de la DB: otro proceso pudo haber renovado la sesión."""
+        try:
+            self.cfg.refresh_from_db()
+        except Exception as exc:
+            logger.warning("BioStar2Client: no se pudo releer la config: %s", exc)
+
+    def ensure_login(self, vencida: str | None = None) -> str:
+        """Sesión vigente; loguea si falta o si sigue siendo ``vencida``.
+
+        Single-flight: el que entra primero al lock loguea; los que esperaban
+        encuentran una sesión distinta de la que les dio 401 y la reusan. Antes
+        de loguear se relee la DB, así un worker no pisa con un login propio la
+        sesión que otro ya renovó.
+        """
+        with self._login_lock:
+            self._recargar()
+            actual = self.cfg.bs_session_id
+            if not actual or actual == vencida:
+                self.login()
+                actual = self.cfg.bs_session_id
+            return actual
+
+    def _send(self, method: str, url: str, path: str, session_id: str, *, json=None, params=None):
+        t0 = time.monotonic()
+        status = None
+        try:
+            resp = self.session.request(
+                method=method,
+                url=url,
+                headers=self._headers(session_id),
+                json=json,
+                params=params,
+                verify=self.env.verify_tls,
+                timeout=self.env.timeout_seconds,
+            )
+            status = resp.status_code
+            return resp
+        finally:
+            self._medir(method, path, time.monotonic() - t0, status)
+
+    def _medir(self, method: str, path: str, segundos: float, status: int | None) -> None:
+        clave = f"{method} {_IDS_EN_PATH.sub('/{id}', path)}"
+        error = status is None or status >= 400
+        with self._metrics_lock:
+            m = self._metrics.setdefault(clave, [0, 0, 0.0, 0.0])  # n, errores, total, max
+            m[0] += 1
+            m[1] += int(error)
+            m[2] += segundos
+            m[3] = max(m[3], segundos)
+
+    def metrics(self, *, reset: bool = False) -> dict[str, dict[str, Any]]:
+        """Latencia por endpoint desde el arranque (o desde el último ``reset``)."""
+        with self._metrics_lock:
+            datos = {k: list(v) for k, v in self._metrics.items()}
+            if reset:
+                self._metrics.clear()
+        return {
+            k: {"n": n, "errores": err, "avg_ms": round(total / n * 1000, 1) if n else 0.0,
+                "max_ms": round(mx * 1000, 1)}
+            for k, (n, err, total, mx) in sorted(datos.items())
+        }
+
     def request(self, method: str, path: str, *, json=None, params=None, check: bool = True):
         if not path.startswith("/"):
             path = "/" + path
+        method = method.upper()
 
-        if not self.cfg.bs_session_id:
-            self.login()
+        session_id = self.cfg.bs_session_id or self.ensure_login()
 
         url = f"{self.env.base_url}{path}"
 
-        resp = self.session.request(
-            method=method.upper(),
-            url=url,
-            headers=self._headers(),
-            json=json,
-            params=params,
-            verify=self.env.verify_tls,
-            timeout=self.env.timeout_seconds,
-        )
+        resp = self._send(method, url, path, session_id, json=json, params=params)
 
         if resp.status_code == 401:
             # sesión vencida o inválida
-            self.login()
-            resp = self.session.request(
-                method=method.upper(),
-                url=url,
-                headers=self._headers(),
-                json=json,
-                params=params,
-                verify=self.env.verify_tls,
-                timeout=self.env.timeout_seconds,
-            )
+            session_id = self.ensure_login(vencida=session_id)
+            resp = self._send(method, url, path, session_id, json=json, params=params)
 
         # check=False permite inspeccionar el cuerpo de un 4xx/5xx (p. ej. el
         # enrolamiento facial, que ante una foto grande devuelve 500 code 1000).
@@ -406,6 +538,7 @@ class BioStar2Client:
         *,
         device_id=None,
         after_id=None,
+        after_datetime=None,
         limit: int = 200,
         order_column: str = "id",
         descending: bool = False,
@@ -419,12 +552,24 @@ class BioStar2Client:
         Se ordena por ``id`` (secuencia real de inserción), NO por ``datetime``:
         el datetime del evento viene desfasado por la zona del equipo y ordenar
         por él se saltea eventos. El llamador clasifica por tipo de evento.
+
+        - ``after_datetime``: solo eventos con ``datetime`` desde ese instante
+          (operator 3 = BETWEEN, hasta mañana). Lo usa el cursor híbrido de
+          ``biostar_events.ingest_hybrid``, que igual verifica contra el
+          sondeo por id por si esta instancia no respeta el filtro.
         """
         conditions = []
         if device_id is not None:
             conditions.append({"column": "device_id.id", "operator": 0, "values": [str(device_id)]})
         if after_id is not None:
             conditions.append({"column": "id", "operator": 5, "values": [str(after_id)]})
+        if after_datetime is not None:
+            hasta = timezone.now() + timedelta(days=1)
+            conditions.append({
+                "column": "datetime",
+                "operator": 3,
+                "values": [_iso_biostar(after_datetime), _iso_biostar(hasta)],
+            })
         query: dict[str, Any] = {
             "limit": int(limit),
             "orders": [{"column": order_column, "descending": bool(descending)}],
@@ -24,6 +24,7 @@ from __future__ import annotations
 
 import logging
 import os
+import time
 from typing import Any, Sequence
 
 logger = logging.getLogger(__name__)
@@ -179,24 +180,92 @@ def resolve_state_targets(
     return {"to_disable": to_disable, "to_enable": to_enable, "ignorados": ajenos}
 
 
-def _apply(client, ids: list[int], *, enabled: bool, method: str, result: dict, key_ok: str) -> None:
-    for cid in ids:
+def _cfg_int(env: str, default: int) -> int:
+    try:
+        return int(os.getenv(env, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _ok(resp) -> tuple[bool, str]:
+    """(ok, detalle) de la respuesta de un PUT de estado."""
+    code = None
+    try:
+        code = str(resp.json().get("Response", {}).get("code"))
+    except Exception:
+        pass
+    status = getattr(resp, "status_code", None)
+    return (status == 200 and code == "0"), f"HTTP {status if status is not None else '?'} code {code}"
+
+
+def _put_con_reintentos(client, cid: int, *, enabled: bool, method: str, retries: int) -> tuple[bool, str]:
+    """PUT de un usuario; reintenta con backoff los errores de red y los 5xx/429."""
+    detalle = ""
+    for intento in range(retries + 1):
+        if intento:
+            time.sleep(min(8.0, 0.5 * 2 ** (intento - 1)))
         try:
             resp = client.set_user_access_state(cid, enabled=enabled, method=method)
-            code = None
-            try:
-                code = str(resp.json().get("Response", {}).get("code"))
-            except Exception:
-                pass
-            if getattr(resp, "status_code", None) == 200 and code == "0":
-                result[key_ok] += 1
-            else:
-                result["errores"] += 1
-                logger.warning("biostar_disable[on]: %s (enabled=%s) HTTP %s code %s",
-                               cid, enabled, getattr(resp, "status_code", "?"), code)
         except Exception as exc:  # pragma: no cover - red/BioStar
+            detalle = str(exc)[:120]
+            continue
+        ok, detalle = _ok(resp)
+        status = getattr(resp, "status_code", None)
+        if ok or not (status == 429 or (isinstance(status, int) and status >= 500)):
+            return ok, detalle
+    return False, detalle
+
+
+def _put_en_hilo(client, cid: int, *, enabled: bool, method: str, retries: int) -> tuple[bool, str]:
+    """``_put_con_reintentos`` desde un hilo del pool: cierra la conexión a la DB
+    que abrió el hilo (``ensure_login`` relee la config del cliente)."""
+    from django.db import close_old_connections
+
+    try:
+        return _put_con_reintentos(client, cid, enabled=enabled, method=method, retries=retries)
+    finally:
+        close_old_connections()
+
+
+def _apply(client, ids: list[int], *, enabled: bool, method: str, result: dict, key_ok: str) -> dict[int, tuple[bool, str]]:
+    """Aplica el estado a ``ids`` y devuelve ``{id: (ok, detalle)}``.
+
+    Antes era un PUT por socio, en serie: tras un corte de gracia (~1.200 socios)
+    eran varios minutos. Ahora van ``BIOSTAR_STATE_WORKERS`` PUTs en paralelo
+    sobre la misma sesión HTTP (pool de conexiones del cliente), cada uno con
+    hasta ``BIOSTAR_STATE_RETRIES`` reintentos con backoff. Si la sesión venció,
+    el cliente re-loguea una sola vez para todos.
+
+    El tope de ``max_disable_per_run`` se controla antes de llegar acá.
+    """
+    resultados: dict[int, tuple[bool, str]] = {}
+    if not ids:
+        return resultados
+    workers = max(1, _cfg_int("BIOSTAR_STATE_WORKERS", 8))
+    retries = max(0, _cfg_int("BIOSTAR_STATE_RETRIES", 2))
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(ids)), thread_name_prefix="biostar-state") as pool:
+        for cid, res in zip(ids, pool.map(
+            lambda c: _put_en_hilo(client, c, enabled=enabled, method=method, retries=retries),
+            ids,
+        )):
+            resultados[cid] = res
+
+    fallidos = []
+    for cid in ids:
+        ok, detalle = resultados.get(cid, (False, "sin respuesta"))
+        if ok:
+            result[key_ok] += 1
+        else:
             result["errores"] += 1
-            logger.warning("biostar_disable[on]: %s (enabled=%s) falló: %s", cid, enabled, str(exc)[:120])
+            fallidos.append(cid)
+            logger.warning("biostar_disable[on]: %s (enabled=%s) falló: %s", cid, enabled, detalle)
+    if fallidos:
+        # Muestra acotada: el resumen se imprime entero en los comandos.
+        muestra = result.setdefault("errores_ids", [])
+        muestra.extend(fallidos[:max(0, 50 - len(muestra))])
+    return resultados
 
 
 def push_access_state_affected(
@@ -0,0 +1,243 @@
+"""Índice local de usuarios por equipo BioStar (``BioStarDeviceUser``).
+
+Buscar un documento en un equipo era paginar ``/api/devices/<id>/users`` hasta
+encontrarlo: decenas de pedidos HTTP en un facial grande. ``indexar_equipo``
+trae las páginas (en paralelo, ``BIOSTAR_INDEX_WORKERS``) y escribe sólo lo que
+cambió; si falla una página no toca nada. ``agregado``/``quitado``/``vaciado``
+reflejan al instante las acciones de la consola y ``buscar`` es una query por
+``(device_id, user_key|unique_key|name_key)``.
+
+Lo refrescan ``biostar_index_device_users`` y el poller de BioStar (cada
+``--index-refresh`` s). Un equipo sin índice vigente (``vigente``), o un
+documento que el índice no tiene, se sigue buscando en vivo.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Iterable
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 200
+_DELETE_CHUNK = 500
+
+
+def normalizar_documento(value: object) -> str:
+    """Dígitos del valor, o el texto en minúsculas si no tiene dígitos."""
+    if value is None:
+        return ""
+    raw = str(value).strip()
+    digits = "".join(ch for ch in raw if ch.isdigit())
+    return digits if digits else raw.lower()
+
+
+def extract_collection(payload: dict) -> dict:
+    return (
+        payload.get("DeviceUserCollection")
+        or payload.get("device_user_collection")
+        or payload.get("UserCollection")
+        or payload.get("user_collection")
+        or {}
+    )
+
+
+def match_document(row: dict, doc_value: str) -> bool:
+    normalized = normalizar_documento(doc_value)
+    if not normalized:
+        return False
+    for key in ("user_unique_id", "user_unique_id_str", "user_id", "id", "name"):
+        candidate = row.get(key)
+        if candidate is None:
+            continue
+        if normalizar_documento(candidate) == normalized:
+            return True
+    return False
+
+
+def _user_id(row: dict) -> int | None:
+    for key in ("user_id", "id"):
+        try:
+            return int(row.get(key))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _claves(row: dict) -> tuple[str, str, str]:
+    """``(user_key, unique_key, name_key)``: las mismas claves que mira ``match_document``."""
+    user_key = normalizar_documento(row.get("user_id") or row.get("id"))
+    unique_key = normalizar_documento(row.get("user_unique_id") or row.get("user_unique_id_str"))
+    return user_key[:128], unique_key[:128], normalizar_documento(row.get("name"))[:255]
+
+
+def _max_edad() -> float:
+    try:
+        return max(0.0, float(os.getenv("BIOSTAR_INDEX_MAX_AGE_SECONDS", "7200")))
+    except (TypeError, ValueError):
+        return 7200.0
+
+
+def _workers() -> int:
+    try:
+        return max(1, int(os.getenv("BIOSTAR_INDEX_WORKERS", "4")))
+    except (TypeError, ValueError):
+        return 4
+
+
+def _paginas(client, device_id: int, page_size: int) -> list[dict]:
+    """Todas las filas del equipo. Lanza si falla cualquier página."""
+    from access_control.services.biostar2_client import fetch_pages
+
+    def fetch(limit, offset):
+        coleccion = extract_collection(client.list_device_users(device_id, limit=limit, offset=offset))
+        return coleccion.get("rows") or [], coleccion.get("total")
+
+    return fetch_pages(fetch, page_size=page_size, workers=_workers(), thread_name="biostar-index")
+
+
+def indexar_equipo(client, device_id: int, *, page_size: int = PAGE_SIZE) -> dict[str, int]:
+    """Sincroniza el índice de un equipo. Devuelve ``{"vistos", "escritos", "borrados"}``."""
+    from access_control.models import BioStarDevice, BioStarDeviceUser
+
+    device_id = int(device_id)
+    filas = _paginas(client, device_id, page_size)
+
+    nuevos: dict[int, BioStarDeviceUser] = {}
+    for row in filas:
+        if not isinstance(row, dict):
+            continue
+        uid = _user_id(row)
+        if uid is None:
+            continue
+        user_key, unique_key, name_key = _claves(row)
+        nuevos[uid] = BioStarDeviceUser(
+            device_id=device_id, user_id=uid, user_key=user_key, unique_key=unique_key,
+            name_key=name_key, raw_payload=row,
+        )
+
+    actuales = {
+        uid: (uk, qk, nk, payload)
+        for uid, uk, qk, nk, payload in BioStarDeviceUser.objects.filter(device_id=device_id).values_list(
+            "user_id", "user_key", "unique_key", "name_key", "raw_payload"
+        )
+    }
+    cambiados = [
+        obj for uid, obj in nuevos.items()
+        if actuales.get(uid) != (obj.user_key, obj.unique_key, obj.name_key, obj.raw_payload)
+    ]
+    sobran = [uid for uid in actuales if uid not in nuevos]
+
+    with transaction.atomic():
+        if cambiados:
+            BioStarDeviceUser.objects.bulk_create(
+                cambiados,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["device_id", "user_id"],
+                update_fields=["user_key", "unique_key", "name_key", "raw_payload", "synced_at"],
+            )
+        for i in range(0, len(sobran), _DELETE_CHUNK):
+            BioStarDeviceUser.objects.filter(
+                device_id=device_id, user_id__in=sobran[i:i + _DELETE_CHUNK]
+            ).delete()
+        BioStarDevice.objects.filter(device_id=device_id).update(users_indexed_at=timezone.now())
+    return {"vistos": len(nuevos), "escritos": len(cambiados), "borrados": len(sobran)}
+
+
+def indexar_todos(client, device_ids: Iterable[int] | None = None) -> dict[int, Any]:
+    """Indexa cada equipo (todos los de la caché si no se indican). Best-effort:
+    el error de un equipo queda en su entrada y no corta a los demás."""
+    from access_control.models import BioStarDevice
+
+    if device_ids is None:
+        device_ids = BioStarDevice.objects.order_by("device_id").values_list("device_id", flat=True)
+    resultados: dict[int, Any] = {}
+    for device_id in device_ids:
+        try:
+            resultados[int(device_id)] = indexar_equipo(client, device_id)
+        except Exception as exc:
+            logger.warning("biostar_device_index: equipo %s: %s", device_id, exc)
+            resultados[int(device_id)] = {"error": str(exc)[:200]}
+    return resultados
+
+
+def indexado(device_id: int) -> bool:
+    from access_control.models import BioStarDevice
+
+    return BioStarDevice.objects.filter(device_id=device_id, users_indexed_at__isnull=False).exists()
+
+
+def vigente(device_id: int) -> bool:
+    """Indexado hace menos de ``BIOSTAR_INDEX_MAX_AGE_SECONDS`` (default 2 h)."""
+    from datetime import timedelta
+
+    from access_control.models import BioStarDevice
+
+    desde = timezone.now() - timedelta(seconds=_max_edad())
+    return BioStarDevice.objects.filter(device_id=device_id, users_indexed_at__gte=desde).exists()
+
+
+def buscar(device_id: int, document: str) -> dict | None:
+    """Fila (tal como la devolvió BioStar) del documento en el equipo, o None."""
+    from django.db.models import Q
+
+    from access_control.models import BioStarDeviceUser
+
+    clave = normalizar_documento(document)
+    if not clave:
+        return None
+    obj = (
+        BioStarDeviceUser.objects.filter(device_id=device_id)
+        .filter(Q(user_key=clave) | Q(unique_key=clave) | Q(name_key=clave))
+        .order_by("user_id")
+        .only("raw_payload")
+        .first()
+    )
+    return obj.raw_payload if obj else None
+
+
+def contar(device_id: int) -> int:
+    from access_control.models import BioStarDeviceUser
+
+    return BioStarDeviceUser.objects.filter(device_id=device_id).count()
+
+
+def registrar_fila(device_id: int, row: dict) -> None:
+    """Guarda una fila vista en vivo (p. ej. al verificar una búsqueda)."""
+    from access_control.models import BioStarDeviceUser
+
+    uid = _user_id(row)
+    if uid is None:
+        return
+    user_key, unique_key, name_key = _claves(row)
+    BioStarDeviceUser.objects.update_or_create(
+        device_id=int(device_id), user_id=uid,
+        defaults={"user_key": user_key, "unique_key": unique_key, "name_key": name_key, "raw_payload": row},
+    )
+
+
+def agregado(device_id: int, user_ids) -> None:
+    """Refleja un alta en el equipo. El nombre sale del espejo ``BioStarUser``."""
+    from access_control.models import BioStarUser
+
+    ids = [int(u) for u in (user_ids if isinstance(user_ids, (list, tuple, set)) else [user_ids])]
+    nombres = dict(BioStarUser.objects.filter(user_id__in=ids).values_list("user_id", "name"))
+    for uid in ids:
+        registrar_fila(device_id, {"user_id": str(uid), "name": nombres.get(uid, "")})
+
+
+def quitado(device_id: int, user_id) -> None:
+    from access_control.models import BioStarDeviceUser
+
+    BioStarDeviceUser.objects.filter(device_id=int(device_id), user_id=int(user_id)).delete()
+
+
+def vaciado(device_id: int) -> None:
+    from access_control.models import BioStarDeviceUser
+
+    BioStarDeviceUser.objects.filter(device_id=int(device_id)).delete()
@@ -0,0 +1,244 @@
+"""Rostros/usuarios por equipo BioStar, consultados en paralelo y cacheados.
+
+``consultar`` pide ``discover_userdata`` a todos los equipos a la vez
+(``BIOSTAR_STATS_WORKERS``) y espera a cada uno como mucho
+``BIOSTAR_STATS_TIMEOUT_SECONDS``: un facial caído ya no frena la página el
+timeout completo del cliente. Lo último bueno de cada equipo queda en memoria;
+si la consulta siguiente falla se muestra ese dato marcado ``stale``.
+
+``snapshot`` contesta desde la caché y, pasados
+``BIOSTAR_STATS_REFRESH_SECONDS``, refresca en un hilo de fondo que se apaga
+solo tras ``BIOSTAR_STATS_IDLE_SECONDS`` sin pedidos.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# device_id -> {"num_faces", "num_users", "ok_at", "error", "error_at"}
+_cache: dict[int, dict[str, Any]] = {}
+_ultimo_refresco = 0.0
+_ultimo_pedido = 0.0
+_refrescando = False
+
+
+def _cfg_float(env: str, default: float) -> float:
+    try:
+        return float(os.getenv(env, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def workers() -> int:
+    return max(1, int(_cfg_float("BIOSTAR_STATS_WORKERS", 8)))
+
+
+def timeout_seconds() -> float:
+    return max(0.5, _cfg_float("BIOSTAR_STATS_TIMEOUT_SECONDS", 5.0))
+
+
+def refresh_seconds() -> float:
+    return max(0.0, _cfg_float("BIOSTAR_STATS_REFRESH_SECONDS", 60.0))
+
+
+def idle_seconds() -> float:
+    return max(0.0, _cfg_float("BIOSTAR_STATS_IDLE_SECONDS", 600.0))
+
+
+def _leer(client, device_id: int) -> tuple[int, int]:
+    payload = client.discover_device_userdata(device_id)
+    s = payload.get("UserStatistics") or payload.get("user_statistics") or {}
+    return int(s.get("numFaces") or 0), int(s.get("numUsers") or 0)
+
+
+def _leer_midiendo(client, device_id: int, inicios: dict[int, float]) -> tuple[int, int]:
+    inicios[device_id] = time.monotonic()
+    return _leer(client, device_id)
+
+
+def _esperar(futuros, inicios: dict[int, float], plazo: float, n_workers: int) -> None:
+    """Espera a cada equipo ``plazo`` segundos desde que su consulta arrancó.
+
+    Los que todavía no arrancaron se abandonan cuando todos los hilos quedaron
+    tomados por equipos ya vencidos (no se van a liberar a tiempo).
+    """
+    pendientes = set(futuros)
+    vencidos: set = set()
+    while pendientes:
+        ahora = time.monotonic()
+        vencen: list[float] = []
+        for fut in list(pendientes):
+            inicio = inicios.get(futuros[fut])
+            if fut.done():
+                pendientes.discard(fut)
+            elif inicio is None:
+                continue
+            elif ahora - inicio >= plazo:
+                pendientes.discard(fut)
+                vencidos.add(fut)
+            else:
+                vencen.append(inicio + plazo - ahora)
+        colgados = sum(1 for fut in vencidos if not fut.done())
+        if not pendientes or (not vencen and colgados >= n_workers):
+            return
+        wait(pendientes, timeout=min(vencen, default=plazo), return_when=FIRST_COMPLETED)
+
+
+def consultar(client, device_ids) -> dict[int, dict[str, Any]]:
+    """Consulta los equipos en paralelo y actualiza la caché.
+
+    Devuelve ``{device_id: {"num_faces", "num_users", "error"}}`` de ESTA
+    consulta (sin completar con lo viejo; eso lo hace ``snapshot``).
+    """
+    global _ultimo_refresco
+    ids = [int(d) for d in device_ids]
+    if not ids:
+        with _lock:
+            _ultimo_refresco = time.time()
+        return {}
+
+    n_workers = min(workers(), len(ids))
+    plazo = timeout_seconds()
+    inicios: dict[int, float] = {}
+    pool = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="biostar-stats")
+    try:
+        futuros = {pool.submit(_leer_midiendo, client, d, inicios): d for d in ids}
+        _esperar(futuros, inicios, plazo, n_workers)
+    finally:
+        # Los que sigan colgados de la red terminan solos; no se los espera.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    ahora = time.time()
+    resultado: dict[int, dict[str, Any]] = {}
+    for fut, device_id in futuros.items():
+        entry: dict[str, Any] = {"num_faces": None, "num_users": None, "error": None}
+        if not fut.done() or fut.cancelled():
+            entry["error"] = f"Sin respuesta en {timeout_seconds():g} s."
+        else:
+            exc = fut.exception()
+            if exc is None:
+                entry["num_faces"], entry["num_users"] = fut.result()
+            elif isinstance(exc, requests.RequestException):
+                entry["error"] = str(exc)
+            elif isinstance(exc, (TypeError, ValueError, AttributeError)):
+                entry["error"] = "Respuesta inesperada de BioStar."
+            else:
+                logger.warning("biostar_device_stats: equipo %s: %s", device_id, exc)
+                entry["error"] = str(exc)[:200]
+        resultado[device_id] = entry
+
+    with _lock:
+        for device_id, entry in resultado.items():
+            previo = _cache.setdefault(device_id, {"num_faces": None, "num_users": None, "ok_at": None})
+            if entry["error"] is None:
+                previo.update(num_faces=entry["num_faces"], num_users=entry["num_users"],
+                              ok_at=ahora, error=None, error_at=None)
+            else:
+                previo.update(error=entry["error"], error_at=ahora)
+        _ultimo_refresco = ahora
+    return resultado
+
+
+def registrar(device_id: int, payload: dict) -> None:
+    """Guarda en la caché lo que trajo una consulta en vivo de un solo equipo."""
+    try:
+        s = payload.get("UserStatistics") or payload.get("user_statistics") or {}
+        faces, users = int(s.get("numFaces") or 0), int(s.get("numUsers") or 0)
+    except (AttributeError, TypeError, ValueError):
+        return
+    with _lock:
+        _cache[int(device_id)] = {"num_faces": faces, "num_users": users,
+                                  "ok_at": time.time(), "error": None, "error_at": None}
+
+
+def snapshot(client_factory, devices, *, refrescar: bool = False) -> list[dict[str, Any]]:
+    """Stats de ``devices`` (pares ``(device_id, name)``) para la API.
+
+    ``client_factory`` se llama sólo si hace falta consultar. Cada fila trae
+    ``updated_at`` (epoch del último dato bueno), ``age_seconds`` y ``stale``
+    (el último intento falló o el dato es más viejo que dos refrescos).
+    """
+    global _ultimo_pedido
+    devices = [(int(d), name) for d, name in devices]
+    ids = [d for d, _ in devices]
+    with _lock:
+        _ultimo_pedido = time.time()
+        faltan = [d for d in ids if d not in _cache]
+        vencido = time.time() - _ultimo_refresco >= refresh_seconds()
+
+    if refrescar or faltan:
+        consultar(client_factory(), ids if refrescar else faltan)
+    elif vencido:
+        _refrescar_en_fondo(client_factory, ids)
+
+    ahora = time.time()
+    limite = 2 * refresh_seconds()
+    filas = []
+    with _lock:
+        for device_id, name in devices:
+            c = _cache.get(device_id) or {}
+            ok_at = c.get("ok_at")
+            edad = round(ahora - ok_at, 1) if ok_at else None
+            filas.append({
+                "device_id": device_id,
+                "name": name,
+                "num_faces": c.get("num_faces"),
+                "num_users": c.get("num_users"),
+                "error": c.get("error"),
+                "updated_at": ok_at,
+                "age_seconds": edad,
+                "stale": bool(c.get("error")) or edad is None or (limite > 0 and edad > limite),
+            })
+    return filas
+
+
+def _refrescar_en_fondo(client_factory, ids: list[int]) -> None:
+    global _refrescando
+    with _lock:
+        if _refrescando:
+            return
+        _refrescando = True
+    threading.Thread(
+        target=_loop, args=(client_factory, ids), name="biostar-stats-refresh", daemon=True
+    ).start()
+
+
+def _loop(client_factory, ids: list[int]) -> None:
+    global _refrescando
+    from django.db import close_old_connections
+
+    try:
+        while True:
+            try:
+                consultar(client_factory(), ids)
+            except Exception as exc:  # pragma: no cover - red/BioStar
+                logger.warning("biostar_device_stats: falló el refresco: %s", exc)
+            finally:
+                close_old_connections()
+            with _lock:
+                inactivo = time.time() - _ultimo_pedido >= idle_seconds()
+            if inactivo or not refresh_seconds():
+                return
+            time.sleep(refresh_seconds())
+    finally:
+        with _lock:
+            _refrescando = False
+
+
+def reset() -> None:
+    """Vacía la caché (tests)."""
+    global _ultimo_refresco, _ultimo_pedido
+    with _lock:
+        _cache.clear()
+        _ultimo_refresco = 0.0
+        _ultimo_pedido = 0.0
@@ -9,7 +9,14 @@ depender de números mágicos.
 
 from __future__ import annotations
 
-from datetime import datetime, timezone as _tz
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as _tz
+
+logger = logging.getLogger(__name__)
 
 # Prefijos de nombre de tipo de evento (BioStar 2 New Local API).
 _GRANTED_PREFIXES = ("VERIFY_SUCCESS", "IDENTIFY_SUCCESS")
@@ -62,23 +69,71 @@ def _int_or_none(value):
         return None
 
 
-def _store_event(event_types: dict, e: dict) -> bool:
-    """Persiste UN evento si es de acceso. Devuelve True si creó una fila."""
-    from access_control.models import BiostarAccessEvent  # import diferido
+# ids de BioStar ya guardados, recordados entre ciclos: el poll sondea cada
+# segundo los mismos ~300 eventos y casi todos ya los conocemos.
+_VISTOS_MAX = 5000
+_vistos: "OrderedDict[str, None]" = OrderedDict()
+_vistos_lock = threading.Lock()
+
+
+def _recordar(bids) -> None:
+    with _vistos_lock:
+        for bid in bids:
+            _vistos[bid] = None
+            _vistos.move_to_end(bid)
+        while len(_vistos) > _VISTOS_MAX:
+            _vistos.popitem(last=False)
+
+
+def _ya_vistos(bids) -> set[str]:
+    with _vistos_lock:
+        out = {b for b in bids if b in _vistos}
+        for b in out:
+            _vistos.move_to_end(b)
+    return out
+
+
+def olvidar_vistos() -> None:
+    """Vacía la memoria de ids vistos (tests, o tras purgar la tabla)."""
+    with _vistos_lock:
+        _vistos.clear()
+
+
+# Retardo de ingesta (hora del evento → alta local) de los últimos eventos.
+_lags: "deque[float]" = deque(maxlen=1000)
+
+
+def _registrar_lag(objs) -> None:
+    for o in objs:
+        if o.fecha is not None and o.synced_at is not None:
+            # Un reloj de equipo adelantado daría negativo: se cuenta como 0.
+            _lags.append(max(0.0, (o.synced_at - o.fecha).total_seconds()))
+
 
+def ingest_lag(*, reset: bool = False) -> dict:
+    """Retardo de ingesta de los últimos eventos: n, p50, p95 y máximo en segundos."""
+    datos = sorted(_lags)
+    if reset:
+        _lags.clear()
+    if not datos:
+        return {"n": 0}
+
+    def pct(p: float) -> float:
+        return round(datos[min(len(datos) - 1, int(p * len(datos)))], 2)
+
+    return {"n": len(datos), "p50_s": pct(0.5), "p95_s": pct(0.95), "max_s": round(datos[-1], 2)}
+
+
+def _parse_event(event_types: dict, e: dict) -> dict | None:
+    """Campos de ``BiostarAccessEvent`` para un evento de acceso, o None si no lo es."""
     code = (e.get("event_type_id") or {}).get("code")
     name = event_types.get(str(code), "")
     es_acceso, permitido = clasificar_evento(name)
     if not es_acceso:
-        return False
+        return None
     bid = str(e.get("id") or "")
     if not bid:
-        return False
-    # Cortar acá si ya lo teníamos: ``ingest_recent`` re-sondea los mismos
-    # eventos cada ciclo, y evaluar la regla de paso pendiente sobre un evento ya
-    # visto volvería a reservarle el molinete al socio cada medio segundo.
-    if BiostarAccessEvent.objects.filter(biostar_id=bid).exists():
-        return False
+        return None
     # OJO: el server BioStar de esta instancia emite ``server_datetime`` en hora
     # LOCAL rotulada como 'Z' (queda ~3h atrasada); el campo ``datetime`` del
     # evento es la hora real (UTC). Por eso preferimos ``datetime`` para la
@@ -87,36 +142,89 @@ def _store_event(event_types: dict, e: dict) -> bool:
     # ante relojes de equipo/servidor mal configurados.
     fecha = parse_server_datetime(e.get("datetime")) or parse_server_datetime(e.get("server_datetime"))
     if fecha is None:
-        return False
+        return None
     dev = e.get("device_id") or {}
-    device_id = _int_or_none(dev.get("id")) or 0
-    id_cliente = _int_or_none((e.get("user_id") or {}).get("user_id"))
-    conflicto = ""
+    return {
+        "biostar_id": bid,
+        "device_id": _int_or_none(dev.get("id")) or 0,
+        "device_name": dev.get("name") or "",
+        "id_cliente": _int_or_none((e.get("user_id") or {}).get("user_id")),
+        "fecha": fecha,
+        "event_code": _int_or_none(code),
+        "event_name": name,
+        "permitido": permitido,
+    }
+
+
+def _store_events(event_types: dict, rows, *, equipos: Counter | None = None) -> int:
+    """Persiste los eventos de acceso nuevos de ``rows`` (en el orden dado).
+
+    Antes era, por evento, un ``exists()`` y un ``get_or_create``: ~600 queries
+    por ciclo aunque no hubiera nada nuevo. Ahora:
+
+    1. se descartan los ids que este proceso ya guardó o vio (``_vistos``);
+    2. los que quedan se resuelven contra la base en UNA query ``biostar_id__in``;
+    3. los nuevos se evalúan contra la regla de paso pendiente EN ORDEN (el
+       llamador los pasa cronológicos) y se insertan en UN ``bulk_create``.
+
+    Un ciclo sin eventos nuevos no toca Postgres. Cortar antes de evaluar la
+    regla importa: sobre un evento ya visto le volvería a reservar el molinete
+    al socio en cada ciclo. Devuelve la cantidad de filas nuevas; si se pasa
+    ``equipos``, suma ahí las nuevas de cada ``device_id``.
+    """
+    from access_control.models import BiostarAccessEvent  # import diferido
+
+    candidatos: dict[str, dict] = {}
+    for e in rows:
+        datos = _parse_event(event_types, e)
+        if datos is not None:
+            candidatos.setdefault(datos["biostar_id"], datos)
+    if not candidatos:
+        return 0
+    pendientes = set(candidatos) - _ya_vistos(candidatos)
+    if not pendientes:
+        return 0
+    en_base = set(
+        BiostarAccessEvent.objects.filter(biostar_id__in=pendientes).values_list("biostar_id", flat=True)
+    )
+    _recordar(en_base)
+    nuevos = [d for bid, d in candidatos.items() if bid in pendientes and bid not in en_base]
+    if not nuevos:
+        return 0
+
+    mapa = None
+    objs = []
+    for datos in nuevos:
+        conflicto = ""
+        if datos["id_cliente"]:
+            try:
+                from access_control.services import paso_pendiente as pp
+
+                if mapa is None:
+                    mapa = pp.mapa_molinetes()
+                conflicto = pp.evaluar(
+                    datos["id_cliente"],
+                    pp.resolver_molinete(mapa, device_id=datos["device_id"]),
+                    origen="facial",
+                )[:60]
+            except Exception:  # pragma: no cover - nunca romper la ingesta
+                conflicto = ""
+        objs.append(BiostarAccessEvent(conflicto_molinete=conflicto, **datos))
+    # ignore_conflicts: si otro proceso guardó el mismo id entre la consulta y
+    # el alta, no es un error.
+    BiostarAccessEvent.objects.bulk_create(objs, ignore_conflicts=True)
+    _recordar(d["biostar_id"] for d in nuevos)
+    _registrar_lag(objs)
+    if equipos is not None:
+        equipos.update(o.device_id for o in objs)
+    # bulk_create no dispara post_save: se avisa a los visores a mano.
     try:
-        from access_control.services import paso_pendiente as pp
-
-        if id_cliente:
-            conflicto = pp.evaluar(
-                id_cliente,
-                pp.resolver_molinete(pp.mapa_molinetes(), device_id=device_id),
-                origen="facial",
-            )[:60]
+        from xsys.services import puerta_feed
+
+        puerta_feed.bump(devices={o.device_id for o in objs})
     except Exception:  # pragma: no cover - nunca romper la ingesta
-        conflicto = ""
-    _, created = BiostarAccessEvent.objects.get_or_create(
-        biostar_id=bid,
-        defaults={
-            "conflicto_molinete": conflicto,
-            "device_id": device_id,
-            "device_name": dev.get("name") or "",
-            "id_cliente": _int_or_none((e.get("user_id") or {}).get("user_id")),
-            "fecha": fecha,
-            "event_code": _int_or_none(code),
-            "event_name": name,
-            "permitido": permitido,
-        },
-    )
-    return created
+        pass
+    return len(objs)
 
 
 def current_max_event_id(client) -> int | None:
@@ -148,13 +256,14 @@ def ingest_new_events(client, event_types: dict, last_id: int, *, limit: int = 2
             break
         # Garantizar orden por id ascendente (no depender solo del server).
         rows.sort(key=lambda r: _int_or_none(r.get("id")) or 0)
+        pagina = []
         for e in rows:
             eid = _int_or_none(e.get("id"))
             if eid is None or eid <= cur:
                 continue
-            if _store_event(event_types, e):
-                nuevos += 1
+            pagina.append(e)
             cur = eid
+        nuevos += _store_events(event_types, pagina)
         if len(rows) < limit:
             break
     return nuevos, cur
@@ -165,15 +274,9 @@ def ingest_backfill(client, event_types: dict, *, limit: int = 1000) -> tuple[in
     persiste los de acceso. Evita traer TODO el histórico la primera vez.
     Devuelve ``(nuevos, max_id)`` para sembrar el high-water."""
     rows = client.events_search(limit=limit, order_column="id", descending=True)
-    nuevos = 0
-    mx = 0
-    for e in rows:
-        eid = _int_or_none(e.get("id")) or 0
-        if eid > mx:
-            mx = eid
-        if _store_event(event_types, e):
-            nuevos += 1
-    return nuevos, mx
+    mx = max((_int_or_none(e.get("id")) or 0 for e in rows), default=0)
+    # Más viejo primero, por la regla de paso pendiente.
+    return _store_events(event_types, list(reversed(rows))), mx
 
 
 def ingest_recent(client, event_types: dict, *, limit: int = 300, max_age_days: int = 2) -> int:
@@ -189,22 +292,170 @@ def ingest_recent(client, event_types: dict, *, limit: int = 300, max_age_days:
     ``max_age_days`` descarta eventos claramente viejos (los ids-mina traen fecha
     de hace meses) por si el orden descendente los devolviera.
     """
-    from datetime import timedelta
+    return _tail(client, event_types, limit=limit, max_age_days=max_age_days)[0]
+
+
+def _fecha_evento(e: dict):
+    return parse_server_datetime(e.get("datetime")) or parse_server_datetime(e.get("server_datetime"))
 
+
+def _tail(client, event_types: dict, *, limit: int, max_age_days: int, viejos_hasta=None):
+    """``ingest_recent`` que además devuelve la fecha más nueva vista (para el cursor).
+
+    Devuelve ``(nuevos, marca, viejos)``: ``viejos`` cuenta, por ``device_id``,
+    los nuevos con fecha hasta ``viejos_hasta`` (o sin fecha), los que un delta
+    desde esa fecha no podía traer.
+    """
     from django.utils import timezone as _dj_tz
 
-    cutoff = _dj_tz.now() - timedelta(days=max_age_days)
+    ahora = _dj_tz.now()
+    cutoff = ahora - timedelta(days=max_age_days)
     rows = client.events_search(limit=limit, order_column="id", descending=True)
-    nuevos = 0
     # Se recorren al REVÉS (más viejo primero): vienen por id descendente, y la
     # regla de paso pendiente necesita verlos en el orden en que ocurrieron.
+    recientes, anteriores = [], []
+    marca = None
     for e in reversed(list(rows)):
-        f = parse_server_datetime(e.get("datetime")) or parse_server_datetime(e.get("server_datetime"))
+        f = _fecha_evento(e)
         if f is not None and f < cutoff:
             continue  # evento viejo (id-mina de un reinicio de BioStar): ignorar
-        if _store_event(event_types, e):
-            nuevos += 1
-    return nuevos
+        if viejos_hasta is not None and (f is None or f <= viejos_hasta):
+            anteriores.append(e)
+        else:
+            recientes.append(e)
+        if f is not None and f <= ahora + _FUTURO_TOLERADO and (marca is None or f > marca):
+            marca = f
+    viejos: Counter = Counter()
+    if anteriores:
+        _store_events(event_types, anteriores, equipos=viejos)
+    return sum(viejos.values()) + _store_events(event_types, recientes), marca, viejos
+
+
+# ------------------------------------------------------------ cursor híbrido
+# Un equipo con el reloj adelantado no puede llevarse la marca al futuro: el
+# cursor dejaría de ver todo lo que llegue hasta esa hora.
+_FUTURO_TOLERADO = timedelta(seconds=60)
+
+
+@dataclass
+class CursorEventos:
+    """Estado del poll híbrido (vive en el proceso del poller).
+
+    ``marca`` es la fecha más nueva ya ingerida; cada ciclo pide sólo lo
+    posterior a ``marca - solape``. El solape cubre eventos que llegan con unos
+    segundos de atraso, y los ids repetidos los descarta la memoria de vistos de
+    ``_store_events`` sin tocar la base.
+
+    ``castigados`` guarda cuándo cada equipo mandó el poll a tail por última
+    vez: uno con el reloj atrasado no vuelve a hacerlo antes de ``reincidencia``
+    segundos (sus eventos los sigue trayendo la verificación).
+    """
+
+    solape: float = 10.0
+    verificar_cada: float = 15.0
+    castigo: float = 600.0
+    marca: datetime | None = None
+    ultima_verificacion: float = 0.0
+    tail_hasta: float = 0.0
+    huecos: int = 0
+    reincidencia: float = 3600.0
+    castigados: dict[int, float] = field(default_factory=dict)
+
+    @property
+    def modo(self) -> str:
+        return "tail" if self.marca is None or time.monotonic() < self.tail_hasta else "delta"
+
+
+def _delta(client, event_types: dict, cursor: CursorEventos, *, limit: int, max_pages: int) -> int:
+    """Eventos con fecha posterior a ``cursor.marca - solape``; avanza la marca."""
+    from django.utils import timezone as _dj_tz
+
+    ahora = _dj_tz.now()
+    desde = cursor.marca - timedelta(seconds=cursor.solape)
+    total = 0
+    for _ in range(max_pages):
+        rows = client.events_search(after_datetime=desde, limit=limit, order_column="datetime", descending=False)
+        fechas = [(_fecha_evento(e), e) for e in rows]
+        fechas.sort(key=lambda fe: (fe[0] is None, fe[0] or ahora, _int_or_none(fe[1].get("id")) or 0))
+        total += _store_events(event_types, [e for _f, e in fechas])
+        validas = [f for f, _e in fechas if f is not None and f <= ahora + _FUTURO_TOLERADO]
+        if validas and max(validas) > cursor.marca:
+            cursor.marca = max(validas)
+        if len(rows) < limit or not validas or max(validas) <= desde:
+            break
+        desde = max(validas)
+    return total
+
+
+def ingest_hybrid(
+    client,
+    event_types: dict,
+    cursor: CursorEventos,
+    *,
+    limit: int = 300,
+    max_pages: int = 5,
+    max_age_days: int = 2,
+) -> int:
+    """Ingesta por cursor de fecha, con el sondeo del tope como red de seguridad.
+
+    ``ingest_recent`` relee en cada ciclo los ``limit`` eventos de id más alto
+    (~300 por segundo, casi todos repetidos) porque el id de BioStar no es
+    monótono. Acá, en régimen, se piden sólo los eventos con ``datetime``
+    posterior a la marca menos un solape: unas decenas de filas por ciclo.
+
+    Cada ``verificar_cada`` segundos, DESPUÉS del delta del mismo ciclo, se
+    corre además el sondeo por id descendente. Un evento que aparece ahí y no
+    vino en el delta, con fecha anterior a la ventana que pidió el delta (un
+    equipo que descargó su buffer con fechas viejas, una restauración de la
+    base de BioStar), es un hueco: se cuenta, se avisa y se queda en modo tail
+    durante ``castigo`` segundos. Un evento normal que llegó entre las dos
+    consultas se guarda igual, pero no cuenta como hueco.
+
+    No hay una fecha de inserción confiable contra la cual comparar (el id de
+    BioStar no es monótono y ``server_datetime`` viene corrido), así que un
+    equipo con el reloj atrasado genera huecos en cada verificación. Esos se
+    cuentan y se avisan, pero el mismo equipo sólo vuelve a poner el modo tail
+    pasados ``reincidencia`` segundos.
+    """
+    ahora_m = time.monotonic()
+    if cursor.modo == "tail":
+        nuevos, marca, _ = _tail(client, event_types, limit=limit, max_age_days=max_age_days)
+        cursor.ultima_verificacion = ahora_m
+        if marca is not None and (cursor.marca is None or marca > cursor.marca):
+            cursor.marca = marca
+        return nuevos
+
+    ventana = cursor.marca - timedelta(seconds=cursor.solape)
+    total = _delta(client, event_types, cursor, limit=limit, max_pages=max_pages)
+    if ahora_m - cursor.ultima_verificacion < cursor.verificar_cada:
+        return total
+
+    nuevos, marca, huecos = _tail(
+        client, event_types, limit=limit, max_age_days=max_age_days, viejos_hasta=ventana
+    )
+    cursor.ultima_verificacion = ahora_m
+    if marca is not None and marca > cursor.marca:
+        cursor.marca = marca
+    if not huecos:
+        return total + nuevos
+    cursor.huecos += sum(huecos.values())
+    nuevos_culpables = [
+        d for d in huecos
+        if d not in cursor.castigados or ahora_m - cursor.castigados[d] >= cursor.reincidencia
+    ]
+    if nuevos_culpables:
+        cursor.tail_hasta = ahora_m + cursor.castigo
+        cursor.castigados.update((d, ahora_m) for d in nuevos_culpables)
+        logger.warning(
+            "biostar_events: el cursor por fecha se perdió %s eventos de acceso (equipos %s); "
+            "modo tail por %.0fs", sum(huecos.values()), sorted(huecos), cursor.castigo,
+        )
+    else:
+        logger.warning(
+            "biostar_events: %s eventos atrasados de equipos ya castigados %s (¿reloj atrasado?); "
+            "sigue en modo delta", sum(huecos.values()), sorted(huecos),
+        )
+    return total + nuevos
 
 
 def purge_old(days: int) -> int:
@@ -75,12 +75,16 @@ def enroll_one(
     access_group_ids=(ACCESS_GROUP_SOCIOS,),
     exists: bool = True,
     sizes=None,
+    rostro: bytes | None = None,
 ) -> dict:
     """Enrola/actualiza el rostro de un socio, redimensionando ante rechazo por tamaño.
 
+    ``rostro`` es la variante ya redimensionada del espejo
+    (``XsysSocioFoto.rostro``): si viene, el primer intento la usa tal cual.
+
     Devuelve {id_cliente, action: enrolled|created|failed, reason, maxside}.
     """
-    from xsys.services.images import resize_for_face
+    from xsys.services.images import face_max_side, resize_for_face
 
     sizes = sizes or resize_steps()
 
@@ -103,7 +107,10 @@ def enroll_one(
     # 2) Asignar grupo + rostro por PUT, redimensionando ante rechazo por tamaño.
     last = (None, None)
     for maxside in sizes:
-        img = resize_for_face(jpeg_bytes, max_side=maxside)
+        if rostro and maxside == sizes[0] == face_max_side():
+            img = rostro
+        else:
+            img = resize_for_face(jpeg_bytes, max_side=maxside)
         if not img:
             return {"id_cliente": id_cliente, "action": "failed", "reason": "no se pudo procesar la imagen"}
         b64 = base64.b64encode(img).decode("ascii")
@@ -252,7 +259,8 @@ def push_faces_affected(changed_ids, *, mode: str | None = None, max_per_run: in
             probe = client.request("GET", f"/api/users/{cid}", check=False)
             exists = probe.status_code == 200
             res = enroll_one(client, id_cliente=cid, jpeg_bytes=jpeg,
-                             name=nombres.get(cid, ""), exists=exists)
+                             name=nombres.get(cid, ""), exists=exists,
+                             rostro=bytes(foto.rostro) if foto.rostro else None)
             action = res.get("action")
             if action == "enrolled":
                 result["enrolados"] += 1
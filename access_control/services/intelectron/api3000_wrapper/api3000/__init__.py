@@ -5,6 +5,8 @@ from .structs import (
     ITKDateTime,
     ITKUserInfo,
     ITKMarkInfo,
+    MarkRecord,
+    decode_marks,
     ITKAuxInput,
     ITKScheduleHeader,
     ITKScheduleSegment,
@@ -19,6 +21,8 @@ __all__ = [
     "ITKDateTime",
     "ITKUserInfo",
     "ITKMarkInfo",
+    "MarkRecord",
+    "decode_marks",
     "ITKAuxInput",
     "ITKScheduleHeader",
     "ITKScheduleSegment",
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import socket
 from ctypes import byref, c_int16, c_long, c_uint8, create_string_buffer
 from datetime import datetime
 from typing import Iterable
@@ -7,7 +8,42 @@ from typing import Iterable
 from .constants import PacketProtocol
 from .errors import Api3000Error, ensure_ok
 from .native import NativeLibrary
-from .structs import ITKAuxInput, ITKDateTime, ITKMarkInfo, ITKUserInfo
+from .structs import ITKAuxInput, ITKDateTime, ITKMarkInfo, ITKUserInfo, MarkRecord, decode_marks
+
+
+def _hex_ip(valor: str) -> str:
+    """IP de ``/proc/net/tcp[6]`` (hex en orden del host) a texto."""
+    raw = bytes.fromhex(valor)
+    # Palabras de 32 bits en little-endian: se dan vuelta de a 4 bytes.
+    raw = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    if len(raw) == 16 and raw[:12] == b"\x00" * 10 + b"\xff\xff":
+        raw = raw[12:]  # IPv4 mapeada en IPv6
+    return socket.inet_ntop(socket.AF_INET if len(raw) == 4 else socket.AF_INET6, raw)
+
+
+def peer_ip(local_port: int | None, remote_port: int | None) -> str:
+    """IP del otro extremo de la conexión TCP establecida ``local_port`` ↔ ``remote_port``.
+
+    ``itk_accept`` devuelve el puerto del equipo pero no su IP: se busca la
+    conexión en ``/proc/net/tcp`` (Linux). Devuelve "" si no se encuentra.
+    """
+    if not local_port or not remote_port:
+        return ""
+    for tabla in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(tabla, encoding="ascii") as fh:
+                next(fh, None)
+                for linea in fh:
+                    campos = linea.split()
+                    if len(campos) < 4 or campos[3] != "01":  # 01 = ESTABLISHED
+                        continue
+                    local, remota = campos[1], campos[2]
+                    if (int(local.rsplit(":", 1)[1], 16) == local_port
+                            and int(remota.rsplit(":", 1)[1], 16) == remote_port):
+                        return _hex_ip(remota.rsplit(":", 1)[0])
+        except (OSError, ValueError):
+            continue
+    return ""
 
 
 class Api3000Client:
@@ -38,6 +74,8 @@ class Api3000Client:
         self._native = NativeLibrary(lib_path)
         self._initialized = False
         self._handle: int | None = None
+        self._marks_buffer = None
+        self._listen_port: int | None = None
 
     @property
     def handle(self) -> int:
@@ -147,6 +185,7 @@ class Api3000Client:
         if h_listen <= 0:
             code = int(error_code.value) if error_code.value else h_listen
             raise Api3000Error(f"itk_listen fallo. codigo={code}, port={port}")
+        self._listen_port = int(port)
         return int(h_listen)
 
     def close_listen(self, h_listen: int) -> None:
@@ -157,9 +196,10 @@ class Api3000Client:
                accept_timeout: int = 60000, rcv_timeout: int = 20000) -> dict:
         """Espera (bloqueante) que un equipo se conecte al socket de escucha.
 
-        Devuelve {h_link, dest_node, port} del equipo que se conecto. El
+        Devuelve {h_link, dest_node, port, ip} del equipo que se conecto. El
         ``h_link`` resultante se usa como cualquier conexion (get_time,
         rele_control, etc.) y es por donde llegan los eventos del equipo.
+        ``ip`` sale de la tabla TCP del sistema ("" si no se pudo resolver).
         """
         h_link = c_long(0)
         dest_node = c_int16(0)
@@ -172,12 +212,65 @@ class Api3000Client:
         )
         ensure_ok(code, "itk_accept")
         self._handle = int(h_link.value)
+        remote_port = int(port.value) & 0xFFFF  # c_int16: puertos > 32767 vienen negativos
         return {
             "h_link": int(h_link.value),
             "dest_node": int(dest_node.value),
-            "port": int(port.value),
+            "port": remote_port,
+            "ip": peer_ip(self._listen_port, remote_port),
         }
 
+    def for_link(self, h_link: int) -> "Api3000Client":
+        """Cliente para un link ya establecido (p. ej. el de ``accept()``).
+
+        Comparte la librería inicializada con este cliente, así un servidor que
+        acepta varias placas usa un cliente por sesión sin reinicializar nada.
+        """
+        other = Api3000Client.__new__(Api3000Client)
+        other.source_node = self.source_node
+        other.packet_protocol = self.packet_protocol
+        other.conn_string = None
+        other.timeout = self.timeout
+        other.log_path = self.log_path
+        other.log_level = self.log_level
+        other._native = self._native
+        # La librería la libera el cliente dueño (el del listen), no éste.
+        other._initialized = False
+        other._handle = int(h_link)
+        other._marks_buffer = None
+        other._listen_port = None
+        return other
+
+    def open_link(self, conn_string: str, *, timeout: int | None = None) -> "Api3000Client":
+        """Abre una conexión más y la devuelve como cliente propio (``for_link``).
+
+        A diferencia de ``open()``, no ocupa el handle de este cliente: un
+        proceso que lee varias placas inicializa la librería una vez y abre un
+        link por placa.
+        """
+        if not self._initialized:
+            self.init_library()
+
+        error_code = c_long(0)
+        handle = self._native.cdll.itk_open(
+            byref(error_code),
+            self.source_node,
+            int(self.packet_protocol),
+            conn_string.encode("latin-1", errors="ignore"),
+            self.timeout if timeout is None else int(timeout),
+            0,
+            0,
+            0,
+            0,
+        )
+        if handle <= 0:
+            code = int(error_code.value) if error_code.value else handle
+            raise Api3000Error(f"itk_open fallo. codigo={code}, conn_string='{conn_string}'")
+
+        link = self.for_link(int(handle))
+        link.conn_string = conn_string
+        return link
+
     def close(self) -> None:
         """Cierra la conexión abierta."""
         if self._handle is None:
@@ -402,6 +495,35 @@ class Api3000Client:
         count = int(listed.value)
         return list(items[:count]), count
 
+    def list_mark_records(
+        self,
+        *,
+        dest_node: int,
+        start_position: int = 0,
+        records_to_list: int = 1,
+    ) -> tuple[list[MarkRecord], int]:
+        """Como ``list_marks`` pero decodificado a ``MarkRecord``.
+
+        Reusa un buffer por cliente (se agranda si hace falta) en vez de
+        alocar un array por llamada: pensado para leer la misma placa en loop.
+        Los registros son tuplas independientes del buffer.
+        """
+        if self._marks_buffer is None or len(self._marks_buffer) < records_to_list:
+            self._marks_buffer = (ITKMarkInfo * records_to_list)()
+        listed = c_int16(0)
+
+        code = self._native.cdll.itk_list_marks(
+            self.handle,
+            dest_node,
+            start_position,
+            records_to_list,
+            self._marks_buffer,
+            byref(listed),
+        )
+        ensure_ok(code, "itk_list_marks")
+        count = min(int(listed.value), records_to_list)
+        return decode_marks(self._marks_buffer, count), count
+
     def rele_control(self, *, dest_node: int, rele: int = 1, action: int = 1) -> None:
         """Controla un relé del equipo (abrir puerta / activar salida).
 
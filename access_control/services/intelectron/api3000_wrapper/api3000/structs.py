@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import struct
 from ctypes import (
     Array,
     Structure,
@@ -9,9 +10,11 @@ from ctypes import (
     c_int32,
     c_uint8,
     c_uint32,
+    sizeof,
 )
 from dataclasses import dataclass
 from datetime import datetime
+from typing import NamedTuple
 
 
 class ITKDateTime(Structure):
@@ -153,6 +156,44 @@ class ITKMarkInfo(Structure):
         return _decode_fixed(self.job_order)
 
 
+class MarkRecord(NamedTuple):
+    """Marca decodificada sin pasar por ``ITKMarkInfo`` (ver ``decode_marks``).
+
+    Sólo los campos que se usan al guardar; el año va en dos dígitos, como en
+    ``ITKDateTime``.
+    """
+
+    access_id: int
+    hour: int
+    minute: int
+    seconds: int
+    year: int
+    month: int
+    day: int
+    event_code: int
+    source: int
+    direction: int
+
+
+# Mismo layout que ITKMarkInfo (40 bytes, sin padding): se saltean mask_fields,
+# type, dayofweek y todo lo que sigue a direction.
+MARK_RECORD = struct.Struct("<8xI6BxBhB17x")
+assert MARK_RECORD.size == sizeof(ITKMarkInfo)
+
+
+def decode_marks(buffer, count: int) -> list[MarkRecord]:
+    """Decodifica las primeras ``count`` marcas de un array ``ITKMarkInfo``.
+
+    Lee directo de la memoria del array (``memoryview``, sin copiarlo) con un
+    ``struct.Struct`` precompilado: una llamada en C por marca en vez de un
+    objeto ctypes y siete accesos a campo.
+    """
+    if count <= 0:
+        return []
+    view = memoryview(buffer).cast("B")[: count * MARK_RECORD.size]
+    return list(map(MarkRecord._make, MARK_RECORD.iter_unpack(view)))
+
+
 class ITKScheduleHeader(Structure):
     """Equivalente ctypes de `ITK_SCHD_HEADER`."""
 
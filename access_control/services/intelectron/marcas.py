@@ -0,0 +1,220 @@
+"""Alta de marcas Intelektron en ``IntelektronEvent`` (común a listener y servidor).
+
+Antes cada marca leída era un ``get_or_create`` por su hash, y se releía la
+misma ventana de ``list_marks`` en cada ciclo. Acá:
+
+- las marcas de una tanda se deduplican contra la base en UNA query
+  (``dedupe_key__in``) y las nuevas entran en un ``bulk_create``;
+- cada marca nueva con socio identificable y hora de equipo dentro de la
+  ventana pasa por ``paso_pendiente`` (con esa hora) en el molinete de su
+  controlador (``c<id_controlador>``, el mismo que usa CD_ES),
+  así un reuso de credencial contra un facial se detecta apenas la placa lo
+  reporta y no recién cuando xSys lo vuelca en CD_ES;
+- si entró algo se avisa a los visores (``puerta_feed.bump``).
+
+Las lecturas en loop (servidor y supervisor) usan ``guardar_registros`` sobre
+los ``MarkRecord`` que decodifica el wrapper: claves y dicts en una pasada.
+
+El ``access_id`` de la placa suele ser la credencial de xSys y a veces el
+``Id_Cliente``: se resuelve contra el espejo ``XsysSocio`` (primero por
+credencial) y si no aparece el socio, la marca se guarda sin evaluar la regla.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Iterable
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Mapeos de códigos → nombre legible (constants.py del wrapper).
+EVENT_NAMES = {
+    0: "Desconocido", 1: "OK", 106: "Intruso", 146: "Huella inválida",
+    108: "Deshabilitado", 150: "Password", 148: "Licencia", 107: "No autorizado",
+}
+DIRECTION_NAMES = {
+    0: "Desconocido", 200: "Entrada", 201: "Salida",
+    202: "Inter-entrada", 203: "Inter-salida", 204: "Software",
+}
+
+
+def dedupe_key(ip: str, mark: dict) -> str:
+    ts = mark.get("timestamp") or {}
+    parts = [
+        ip,
+        str(ts.get("year")), str(ts.get("month")), str(ts.get("day")),
+        str(ts.get("hour")), str(ts.get("minute")), str(ts.get("seconds")),
+        str(mark.get("access_id")), str(mark.get("event_code")),
+        str(mark.get("direction")), str(mark.get("source")),
+    ]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def parse_time(ts: dict | None):
+    if not ts:
+        return None
+    try:
+        year = int(ts.get("year") or 0)
+        if year < 100:
+            year += 2000
+        month = int(ts.get("month") or 0)
+        day = int(ts.get("day") or 0)
+        if not (year and month and day):
+            return None
+        naive = timezone.datetime(
+            year, month, day,
+            int(ts.get("hour") or 0), int(ts.get("minute") or 0), int(ts.get("seconds") or 0),
+        )
+        return timezone.make_aware(naive, timezone.get_current_timezone())
+    except (ValueError, TypeError):
+        return None
+
+
+def _socios(access_ids: set[int]) -> dict[int, int]:
+    """``access_id -> id_cliente`` según el espejo de socios."""
+    from xsys.models import XsysSocio
+
+    if not access_ids:
+        return {}
+    out: dict[int, int] = {}
+    por_credencial = XsysSocio.objects.filter(
+        credencial_nro__in=[str(a) for a in access_ids]
+    ).values_list("credencial_nro", "id_cliente")
+    for cred, id_cliente in por_credencial:
+        try:
+            out[int(cred)] = id_cliente
+        except (TypeError, ValueError):
+            continue
+    resto = access_ids - set(out)
+    if resto:
+        out.update((i, i) for i in XsysSocio.objects.filter(pk__in=resto).values_list("pk", flat=True))
+    return out
+
+
+def candidatas_de_registros(device_ip: str, records: Iterable) -> dict[str, dict]:
+    """``dedupe_key -> marca`` desde ``MarkRecord`` del wrapper, en una pasada.
+
+    Da las mismas claves y el mismo dict que ``_serialize_mark`` + ``dedupe_key``
+    (así conviven con lo ya guardado), sin el dict anidado intermedio ni el
+    ``join`` por marca.
+    """
+    sha1 = hashlib.sha1
+    out: dict[str, dict] = {}
+    for r in records:
+        clave = sha1(
+            f"{device_ip}|{r.year}|{r.month}|{r.day}|{r.hour}|{r.minute}|{r.seconds}|"
+            f"{r.access_id}|{r.event_code}|{r.direction}|{r.source}".encode()
+        ).hexdigest()
+        if clave not in out:
+            out[clave] = {
+                "access_id": r.access_id, "event_code": r.event_code,
+                "direction": r.direction, "source": r.source,
+                "timestamp": {
+                    "year": r.year, "month": r.month, "day": r.day,
+                    "hour": r.hour, "minute": r.minute, "seconds": r.seconds,
+                },
+            }
+    return out
+
+
+def guardar(marks: Iterable[dict], *, device_ip: str, dest_node: int, id_controlador=None) -> int:
+    """Persiste las marcas nuevas de una tanda. Devuelve cuántas entraron."""
+    candidatas: dict[str, dict] = {}
+    for mark in marks:
+        candidatas.setdefault(dedupe_key(device_ip, mark), mark)
+    return guardar_candidatas(candidatas, device_ip=device_ip, dest_node=dest_node, id_controlador=id_controlador)
+
+
+def guardar_registros(records: Iterable, *, device_ip: str, dest_node: int, id_controlador=None) -> int:
+    """``guardar`` para lo que devuelve ``Api3000Client.list_mark_records``."""
+    return guardar_candidatas(
+        candidatas_de_registros(device_ip, records),
+        device_ip=device_ip, dest_node=dest_node, id_controlador=id_controlador,
+    )
+
+
+def guardar_candidatas(candidatas: dict[str, dict], *, device_ip: str, dest_node: int, id_controlador=None) -> int:
+    from access_control.models import IntelektronEvent
+
+    if not candidatas:
+        return 0
+    existentes = set(
+        IntelektronEvent.objects.filter(dedupe_key__in=list(candidatas)).values_list("dedupe_key", flat=True)
+    )
+    nuevas = {k: m for k, m in candidatas.items() if k not in existentes}
+    if not nuevas:
+        return 0
+
+    conflictos = _evaluar_paso_pendiente(nuevas, id_controlador) if id_controlador is not None else {}
+    ahora = timezone.now()
+    objs = []
+    for key, mark in nuevas.items():
+        event_code = mark.get("event_code")
+        direction = mark.get("direction")
+        objs.append(IntelektronEvent(
+            dedupe_key=key,
+            device_ip=device_ip,
+            dest_node=dest_node,
+            id_controlador=id_controlador,
+            access_id=mark.get("access_id"),
+            event_code=event_code,
+            event_name=EVENT_NAMES.get(event_code, ""),
+            direction=direction,
+            direction_name=DIRECTION_NAMES.get(direction, ""),
+            source=mark.get("source"),
+            device_time=parse_time(mark.get("timestamp")),
+            raw=mark,
+            conflicto_molinete=conflictos.get(key, ""),
+            created_at=ahora,
+        ))
+    # ignore_conflicts: otro proceso (listener y servidor a la vez) pudo
+    # guardar la misma marca entre la consulta y el alta.
+    IntelektronEvent.objects.bulk_create(objs, ignore_conflicts=True)
+    try:
+        from xsys.services import puerta_feed
+
+        puerta_feed.bump(controladores=[id_controlador] if id_controlador is not None else ())
+    except Exception:  # pragma: no cover - nunca romper la ingesta
+        pass
+    return len(objs)
+
+
+def _evaluar_paso_pendiente(nuevas: dict[str, dict], id_controlador) -> dict[str, str]:
+    """``dedupe_key -> molinete en conflicto``. Como en CD_ES, se evalúa toda
+    marca con socio identificado, aceptada o no."""
+    conflictos: dict[str, str] = {}
+    try:
+        from access_control.services import paso_pendiente as pp
+
+        # Sólo marcas dentro de la ventana, con su hora de equipo: una relectura
+        # del buffer (cursor en 0 al arrancar, o tras la purga) trae marcas
+        # viejas que no deben reservar molinete como si fueran de ahora.
+        desde = timezone.now() - timezone.timedelta(seconds=pp.ventana_segundos())
+        con_id = {}
+        for k, m in nuevas.items():
+            cuando = parse_time(m.get("timestamp"))
+            if m.get("access_id") and cuando is not None and cuando >= desde:
+                con_id[k] = (int(m["access_id"]), cuando)
+        if not con_id:
+            return conflictos
+        socios = _socios({access_id for access_id, _ in con_id.values()})
+        molinete = pp.resolver_molinete(pp.mapa_molinetes(), id_controlador=id_controlador)
+        for key, (access_id, cuando) in sorted(con_id.items(), key=lambda kv: kv[1][1]):
+            id_cliente = socios.get(access_id)
+            if id_cliente:
+                conflictos[key] = pp.evaluar(id_cliente, molinete, cuando=cuando, origen="intelektron")[:60]
+    except Exception as exc:  # pragma: no cover - nunca romper la ingesta
+        logger.warning("intelektron: no se pudo evaluar paso pendiente: %s", exc)
+    return conflictos
+
+
+def purgar(retention_days: int) -> int:
+    from access_control.models import IntelektronEvent
+
+    cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+    borrados, _ = IntelektronEvent.objects.filter(created_at__lt=cutoff).delete()
+    return borrados
+
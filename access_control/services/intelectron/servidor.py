@@ -0,0 +1,327 @@
+"""Servidor de marcas Intelektron: una sesión persistente por placa.
+
+Con ``itk_listen`` + ``itk_accept`` es la placa la que se conecta y el link queda
+abierto (el listener, en cambio, abre y cierra el equipo en cada ciclo). Cada
+placa aceptada es una ``Sesion`` con su hilo, que lee las marcas desde su cursor
+cada ``intervalo`` y las pasa en lote a ``marcas.guardar``. La librería no
+expone un callback de recepción usable, así que "push" es leer sobre el link ya
+abierto apenas hay algo.
+
+Las llamadas nativas, ``accept`` incluido, pasan por ``con_plazo``: semáforo de
+``INTELEKTRON_NATIVE_CONCURRENCY`` lugares (no está documentado que
+``libitkcom`` sea reentrante) y un deadline; una llamada abandonada conserva su
+lugar hasta que vuelve. Cada placa se identifica por su IP y su
+``dest_node``; ``nodos`` mapea la IP o el nodo al ``Id_Controlador`` de xSys.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from django.db import close_old_connections
+
+from access_control.services.intelectron import marcas
+from access_control.services.watchdog import WatchdogTimeout, run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+# Códigos de libitkcom que en un accept significan "nadie se conectó todavía".
+_TIMEOUTS = frozenset({1014, 1021, 1026})
+MAX_ESPERA_ACCEPT = 30.0
+# Cada cuánto, sin marcas nuevas, se verifica que el cursor no quedó más allá de
+# lo que guarda la placa (memoria borrada o que dio la vuelta).
+VERIFICAR_CURSOR = 60.0
+
+
+def _es_timeout(exc: Exception) -> bool:
+    return isinstance(exc, TimeoutError) or getattr(exc, "code", None) in _TIMEOUTS
+
+
+def _native_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("INTELEKTRON_NATIVE_CONCURRENCY", "1")))
+    except (TypeError, ValueError):
+        return 1
+
+
+# Es por proceso: intelektron_server e intelektron_supervisor corren en procesos
+# distintos y cada uno tiene el suyo; no se coordinan entre sí.
+_semaforo = threading.BoundedSemaphore(_native_concurrency())
+
+
+def con_plazo(fn: Callable[..., Any], plazo: float, /, *args, **kwargs) -> Any:
+    """``fn`` con el semáforo nativo y a lo sumo ``plazo`` segundos.
+
+    Si no vuelve a tiempo levanta ``WatchdogTimeout``, pero el lugar en el
+    semáforo lo suelta la llamada abandonada recién cuando vuelve: mientras
+    tanto nadie más entra a ``libitkcom`` por ese lugar. Esperar el semáforo
+    también tiene ``plazo``, así los demás hilos fallan y reintentan en vez de
+    quedar bloqueados detrás de una placa colgada.
+    """
+    if not _semaforo.acquire(timeout=plazo):
+        raise WatchdogTimeout(f"libitkcom sigue ocupada tras {plazo:g}s (llamada colgada en otra placa)")
+
+    def llamada():
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _semaforo.release()
+
+    return run_with_deadline(llamada, plazo)
+
+
+def cursor_fuera_de_rango(leer: Callable[..., tuple[Any, int]], *, dest_node: int, cursor: int) -> bool:
+    """¿La placa ya no tiene la marca anterior al cursor? (se borró o dio la vuelta)"""
+    _, count = leer(dest_node=dest_node, start_position=cursor - 1, records_to_list=1)
+    return not count
+
+
+def nuevo_cliente(*, source_node: int, **kwargs):
+    """``Api3000Client`` del wrapper (instalado o el que viene en el repo)."""
+    try:
+        from api3000 import Api3000Client, PacketProtocol
+    except ImportError:
+        from access_control.services.intelectron.api3000_wrapper.api3000 import Api3000Client, PacketProtocol
+
+    return Api3000Client(source_node=source_node, packet_protocol=PacketProtocol.NEXT, **kwargs)
+
+
+class Sesion:
+    """Una placa conectada: lee sus marcas nuevas sobre el link abierto."""
+
+    def __init__(self, client, *, dest_node: int, etiqueta: str, id_controlador=None,
+                 lote: int = 50, intervalo: float = 0.25, cursor: int = 0, plazo: float = 25.0):
+        self.client = client
+        self.dest_node = int(dest_node)
+        self.etiqueta = etiqueta
+        self.id_controlador = id_controlador
+        self.lote = max(1, int(lote))
+        self.intervalo = max(0.05, float(intervalo))
+        self.cursor = int(cursor)
+        self.plazo = float(plazo)
+        self._verificado = 0.0
+        self._colgada: threading.Event | None = None
+        self.conectada_en = time.time()
+        self.ultima_lectura: float | None = None
+        self.ultima_marca: float | None = None
+        self.marcas = 0
+        self.error = ""
+        self._stop = threading.Event()
+        self._hilo: threading.Thread | None = None
+
+    def _nativa(self, fn: Callable[..., Any], /, **kwargs) -> Any:
+        empezo, termino = threading.Event(), threading.Event()
+
+        def llamada():
+            empezo.set()
+            try:
+                return fn(**kwargs)
+            finally:
+                termino.set()
+
+        try:
+            return con_plazo(llamada, self.plazo)
+        except WatchdogTimeout:
+            if empezo.is_set():  # si no empezó, el semáforo lo tenía otra placa
+                self._colgada = termino
+            raise
+
+    @property
+    def colgada(self) -> bool:
+        """Quedó una llamada nativa abandonada que todavía no volvió."""
+        return self._colgada is not None and not self._colgada.is_set()
+
+    def ciclo(self) -> tuple[int, int]:
+        """Una lectura. Devuelve ``(leídas, nuevas)``; lanza si el link cayó o no contestó."""
+        registros, count = self._nativa(
+            self.client.list_mark_records,
+            dest_node=self.dest_node, start_position=self.cursor, records_to_list=self.lote,
+        )
+        self.ultima_lectura = time.time()
+        if not count:
+            if self.cursor and time.monotonic() - self._verificado >= VERIFICAR_CURSOR:
+                self._verificado = time.monotonic()
+                if cursor_fuera_de_rango(
+                    lambda **kw: self._nativa(self.client.list_mark_records, **kw),
+                    dest_node=self.dest_node, cursor=self.cursor,
+                ):
+                    logger.warning("intelektron[%s]: la placa tiene menos marcas que el cursor (%s); se relee desde 0",
+                                   self.etiqueta, self.cursor)
+                    self.cursor = 0
+            return 0, 0
+        nuevas = marcas.guardar_registros(
+            registros, device_ip=self.etiqueta, dest_node=self.dest_node, id_controlador=self.id_controlador,
+        )
+        self.cursor += count
+        if nuevas:
+            self.marcas += nuevas
+            self.ultima_marca = time.time()
+        return count, nuevas
+
+    def _loop(self) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    leidas, _ = self.ciclo()
+                except WatchdogTimeout as exc:
+                    self.error = str(exc)[:200]
+                    if self.colgada:  # el link quedó tomado: la placa se reconecta por accept
+                        logger.warning("intelektron[%s]: la placa no contestó, sesión terminada: %s",
+                                       self.etiqueta, exc)
+                        return
+                    logger.warning("intelektron[%s]: %s", self.etiqueta, exc)
+                    self._stop.wait(self.intervalo)
+                    continue
+                except Exception as exc:  # link caído: la placa se reconecta por accept
+                    self.error = str(exc)[:200]
+                    logger.warning("intelektron[%s]: sesión terminada: %s", self.etiqueta, exc)
+                    return
+                finally:
+                    close_old_connections()
+                if leidas < self.lote:
+                    self._stop.wait(self.intervalo)
+        finally:
+            self.cerrar()
+
+    def iniciar(self) -> None:
+        self._hilo = threading.Thread(target=self._loop, name=f"itk-{self.etiqueta}", daemon=True)
+        self._hilo.start()
+
+    def viva(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive() and not self._stop.is_set()
+
+    def detener(self) -> None:
+        self._stop.set()
+
+    def cerrar(self) -> None:
+        self._stop.set()
+        if self.colgada:
+            return  # el link sigue tomado por la llamada que no volvió
+        try:
+            self._nativa(self.client.close)
+        except Exception:  # pragma: no cover - el link ya estaba caído
+            pass
+
+    def estado(self) -> dict[str, Any]:
+        ahora = time.time()
+        return {
+            "placa": self.etiqueta,
+            "dest_node": self.dest_node,
+            "id_controlador": self.id_controlador,
+            "viva": self.viva(),
+            "cursor": self.cursor,
+            "marcas": self.marcas,
+            "llamada_colgada": self.colgada,
+            "seg_desde_lectura": round(ahora - self.ultima_lectura, 1) if self.ultima_lectura else None,
+            "seg_desde_marca": round(ahora - self.ultima_marca, 1) if self.ultima_marca else None,
+            "error": self.error,
+        }
+
+
+class ServidorMarcas:
+    """``listen`` único + una ``Sesion`` por placa aceptada."""
+
+    def __init__(self, *, port: int, source_node: int = 0, nodos: dict[int | str, Any] | None = None,
+                 lote: int = 50, intervalo: float = 0.25, accept_timeout: float = 0.25,
+                 rcv_timeout: float = 20.0, client_factory: Callable[..., Any] | None = None,
+                 plazo: float | None = None):
+        self.port = int(port)
+        self.nodos = dict(nodos or {})
+        self.lote = lote
+        self.intervalo = intervalo
+        self.accept_timeout_ms = int(accept_timeout * 1000)
+        self.rcv_timeout_ms = int(rcv_timeout * 1000)
+        # Deadline de cada llamada nativa: el timeout propio de la librería más un margen.
+        self.plazo = float(plazo) if plazo is not None else float(rcv_timeout) + 5.0
+        self.client = (client_factory or nuevo_cliente)(source_node=source_node, log_path="/tmp/itk_server.log")
+        self.sesiones: dict[tuple[str, int], Sesion] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._h_listen: int | None = None
+        self._hilo: threading.Thread | None = None
+
+    def iniciar(self) -> None:
+        self.client.init_library()
+        self._h_listen = self.client.listen(self.port, timeout=self.accept_timeout_ms)
+        self._hilo = threading.Thread(target=self._aceptar_loop, name="itk-accept", daemon=True)
+        self._hilo.start()
+
+    def aceptar(self) -> Sesion | None:
+        """Espera una placa (hasta ``accept_timeout``) y arma su sesión, sin arrancarla.
+
+        Devuelve None si nadie se conectó; cualquier otro error sube.
+        """
+        try:
+            info = con_plazo(self.client.accept, self.plazo,
+                             accept_timeout=self.accept_timeout_ms, rcv_timeout=self.rcv_timeout_ms)
+        except Exception as exc:
+            if not _es_timeout(exc):
+                raise
+            return None  # nadie conectó: el caso normal en reposo
+        dest_node = int(info["dest_node"])
+        ip = info.get("ip") or ""
+        if not ip:
+            # Sin IP la marca no deduplica contra lo que lee el supervisor (que
+            # usa la IP de la placa): se avisa y se guarda igual.
+            logger.warning("intelektron: no se pudo resolver la IP del nodo %s (puerto %s)",
+                           dest_node, info.get("port"))
+        clave = (ip or f"nodo{dest_node}", dest_node)
+        sesion = Sesion(
+            self.client.for_link(info["h_link"]),
+            dest_node=dest_node,
+            etiqueta=clave[0],
+            id_controlador=self.nodos.get(ip, self.nodos.get(dest_node)),
+            lote=self.lote,
+            intervalo=self.intervalo,
+            plazo=self.plazo,
+        )
+        with self._lock:
+            vieja = self.sesiones.get(clave)
+            self.sesiones[clave] = sesion
+        if vieja is not None:
+            logger.info("intelektron: %s (nodo %s) se reconectó; se cierra la sesión anterior", *clave)
+            vieja.detener()
+        return sesion
+
+    def _aceptar_loop(self) -> None:
+        espera = 0.0
+        while not self._stop.is_set():
+            try:
+                sesion = self.aceptar()
+            except Exception as exc:
+                espera = min(MAX_ESPERA_ACCEPT, max(1.0, espera * 2))
+                logger.warning("intelektron: accept falló: %s; reintento en %.0fs", exc, espera)
+                self._stop.wait(espera)
+                continue
+            espera = 0.0
+            if sesion is None:
+                self._stop.wait(self.intervalo)  # el semáforo queda libre para las sesiones
+            else:
+                logger.info("intelektron: conectó %s nodo %s (controlador %s)",
+                            sesion.etiqueta, sesion.dest_node, sesion.id_controlador)
+                sesion.iniciar()
+
+    def estado(self) -> list[dict[str, Any]]:
+        with self._lock:
+            sesiones = list(self.sesiones.values())
+        return [s.estado() for s in sorted(sesiones, key=lambda s: (s.etiqueta, s.dest_node))]
+
+    def detener(self) -> None:
+        self._stop.set()
+        with self._lock:
+            sesiones = list(self.sesiones.values())
+        for s in sesiones:
+            s.detener()
+        try:
+            if self._h_listen is not None:
+                self.client.close_listen(self._h_listen)
+        except Exception:  # pragma: no cover - apagado best-effort
+            pass
+        try:
+            self.client.uninit_library()
+        except Exception:  # pragma: no cover - apagado best-effort
+            pass
@@ -0,0 +1,344 @@
+"""Supervisor de placas Intelektron: un proceso lee todas las placas.
+
+Reemplaza un ``intelektron_listener --ip ...`` por molinete. ``registro()`` arma
+la lista desde la base (controladores de puerta que en xSys son molinetes
+activos con IP) y se relee cada tanto. Un ``Lector`` por equipo mantiene su link
+abierto y su cursor sobre ``list_marks``; al arrancar el cursor es 0 y el dedupe
+de ``marcas.guardar`` descarta lo ya guardado. Si la placa queda con menos
+marcas que el cursor (memoria borrada), el cursor vuelve a 0.
+
+Las llamadas nativas pasan por ``servidor.con_plazo``: si una no vuelve a
+tiempo se abandona, conserva su lugar en el semáforo hasta que termine y esa
+placa no se vuelve a leer hasta entonces. Antes de abrir un link se sondea
+el puerto fuera del semáforo. Un error cierra el link y reintenta con espera
+creciente. Las marcas se guardan con ``device_ip`` = IP del equipo, igual que
+el listener.
+"""
+
+from __future__ import annotations
+
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from django.db import close_old_connections
+
+from access_control.services.intelectron import marcas
+from access_control.services.intelectron.servidor import (
+    VERIFICAR_CURSOR,
+    _native_concurrency,
+    con_plazo,
+    cursor_fuera_de_rango,
+    nuevo_cliente,
+)
+from access_control.services.watchdog import WatchdogTimeout
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF = 300.0
+SONDEO_TIMEOUT = 3.0
+
+
+@dataclass(frozen=True)
+class Equipo:
+    ip: str
+    port: int = 3001
+    dest_node: int = 1
+    id_controlador: int | None = None
+    descripcion: str = ""
+
+    @property
+    def clave(self) -> tuple[str, int, int]:
+        return (self.ip, self.port, self.dest_node)
+
+    @property
+    def conn_string(self) -> str:
+        return f"{self.ip}:{self.port}"
+
+
+def _ip_y_puerto(valor: str, port: int) -> tuple[str, int]:
+    ip, _, resto = valor.strip().partition(":")
+    try:
+        return ip, int(resto) if resto else port
+    except ValueError:
+        return ip, port
+
+
+def registro(*, port: int = 3001, dest_node: int = 1) -> list[Equipo]:
+    """Molinetes Intelektron asignados a puertas, con la IP que tiene xSys."""
+    from institutions.models import DoorController
+    from xsys.models import XsysControlador
+
+    asignados = set(DoorController.objects.values_list("id_controlador", flat=True))
+    filas = (
+        XsysControlador.objects.filter(id_controlador__in=asignados, tipo_cont="K")
+        .exclude(activo=0)
+        .exclude(ip="")
+        .order_by("id_controlador")
+        .values_list("id_controlador", "ip", "descripcion")
+    )
+    equipos: dict[tuple, Equipo] = {}
+    for id_controlador, ip, descripcion in filas:
+        ip, puerto = _ip_y_puerto(ip, port)
+        if not ip:
+            continue
+        equipo = Equipo(ip=ip, port=puerto, dest_node=dest_node,
+                        id_controlador=id_controlador, descripcion=descripcion)
+        # Dos controladores con la misma placa: se lee una vez (el primero).
+        equipos.setdefault(equipo.clave, equipo)
+    return list(equipos.values())
+
+
+def sondear(equipo: Equipo) -> None:
+    """``connect`` TCP corto al equipo; lanza ``OSError`` si no atiende."""
+    socket.create_connection((equipo.ip, equipo.port), timeout=SONDEO_TIMEOUT).close()
+
+
+class Lector:
+    """Un equipo: su link abierto, su cursor y su salud."""
+
+    def __init__(self, equipo: Equipo, *, abrir: Callable[[Equipo], Any], lote: int = 50,
+                 plazo: float = 30.0, sondeo: Callable[[Equipo], Any] | None = sondear):
+        self.equipo = equipo
+        self.abrir = abrir
+        self.lote = max(1, int(lote))
+        self.plazo = float(plazo)
+        self.sondeo = sondeo
+        self._colgada: threading.Event | None = None
+        self.cursor = 0
+        self._verificado = 0.0
+        self.link = None
+        self.marcas = 0
+        self.errores = 0
+        self.error = ""
+        self.ultima_lectura: float | None = None
+        self.ultima_marca: float | None = None
+        self.al_dia = False
+        self.proximo = 0.0
+
+    def _nativa(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """``fn`` por ``servidor.con_plazo`` (semáforo nativo y ``plazo`` segundos)."""
+        if self.colgado:
+            raise WatchdogTimeout("la llamada anterior a la placa sigue sin volver")
+        empezo, termino = threading.Event(), threading.Event()
+
+        def llamada():
+            empezo.set()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                termino.set()
+
+        try:
+            return con_plazo(llamada, self.plazo)
+        except WatchdogTimeout:
+            if empezo.is_set():  # si no empezó, el semáforo lo tenía otra placa
+                self._colgada = termino
+            raise
+
+    @property
+    def colgado(self) -> bool:
+        """Quedó una llamada nativa abandonada que todavía no volvió."""
+        return self._colgada is not None and not self._colgada.is_set()
+
+    def ciclo(self) -> tuple[int, int]:
+        """Una lectura desde el cursor. Devuelve ``(leídas, nuevas)``; lanza si falla."""
+        try:
+            if self.link is None:
+                if self.sondeo is not None:
+                    self.sondeo(self.equipo)  # fuera del semáforo
+                self.link = self._nativa(self.abrir, self.equipo)
+            registros, count = self._nativa(
+                self.link.list_mark_records,
+                dest_node=self.equipo.dest_node, start_position=self.cursor, records_to_list=self.lote,
+            )
+            if not count and self.cursor and time.monotonic() - self._verificado >= VERIFICAR_CURSOR:
+                self._verificado = time.monotonic()
+                if cursor_fuera_de_rango(
+                    lambda **kw: self._nativa(self.link.list_mark_records, **kw),
+                    dest_node=self.equipo.dest_node, cursor=self.cursor,
+                ):
+                    logger.warning("intelektron[%s]: la placa tiene menos marcas que el cursor (%s); se relee desde 0",
+                                   self.equipo.ip, self.cursor)
+                    self.cursor = 0
+                    self.ultima_lectura = time.time()
+                    self.al_dia = False  # que la próxima ronda no espere
+                    return 0, 0
+        except WatchdogTimeout:
+            if self.colgado:
+                # El link quedó tomado por la llamada colgada: se abandona sin cerrarlo.
+                self.link = None
+            raise
+        except Exception:
+            self.cerrar()
+            raise
+        nuevas = marcas.guardar_registros(
+            registros,
+            device_ip=self.equipo.ip, dest_node=self.equipo.dest_node, id_controlador=self.equipo.id_controlador,
+        )
+        self.cursor += count
+        self.ultima_lectura = time.time()
+        self.al_dia = count < self.lote
+        if nuevas:
+            self.marcas += nuevas
+            self.ultima_marca = self.ultima_lectura
+        return count, nuevas
+
+    def ejecutar(self, intervalo: float) -> int:
+        """``ciclo`` con su contabilidad de errores y reintento. Devuelve las nuevas."""
+        try:
+            _, nuevas = self.ciclo()
+        except Exception as exc:
+            self.errores += 1
+            self.error = str(exc)[:200]
+            self.proximo = time.monotonic() + min(MAX_BACKOFF, intervalo * 2 ** min(self.errores, 10))
+            logger.warning("intelektron[%s]: %s (error %s seguido)", self.equipo.ip, exc, self.errores)
+            return 0
+        finally:
+            close_old_connections()
+        self.errores = 0
+        self.error = ""
+        # Tanda llena: quedan marcas en la placa, se sigue en la próxima ronda.
+        self.proximo = 0.0 if not self.al_dia else time.monotonic() + intervalo
+        return nuevas
+
+    def cerrar(self) -> None:
+        link, self.link = self.link, None
+        if link is None:
+            return
+        try:
+            self._nativa(link.close)
+        except Exception:  # pragma: no cover - el link ya estaba caído
+            pass
+
+    def estado(self) -> dict[str, Any]:
+        e = self.equipo
+        return {
+            "ip": e.ip,
+            "port": e.port,
+            "dest_node": e.dest_node,
+            "id_controlador": e.id_controlador,
+            "descripcion": e.descripcion,
+            "conectado": self.link is not None,
+            "cursor": self.cursor,
+            "al_dia": self.al_dia,
+            "marcas": self.marcas,
+            "lag_segundos": round(time.time() - self.ultima_lectura, 1) if self.ultima_lectura else None,
+            "seg_desde_marca": round(time.time() - self.ultima_marca, 1) if self.ultima_marca else None,
+            "errores": self.errores,
+            "error": self.error,
+            "llamada_colgada": self.colgado,
+        }
+
+
+class Supervisor:
+    """Lee todos los equipos del registro desde un solo proceso."""
+
+    def __init__(self, equipos: Iterable[Equipo] = (), *, source_node: int = 255, lote: int = 50,
+                 intervalo: float = 1.0, call_timeout: float = 20.0, workers: int | None = None,
+                 client_factory: Callable[..., Any] | None = None,
+                 sondeo: Callable[[Equipo], Any] | None = sondear, plazo: float | None = None):
+        self.lote = lote
+        self.intervalo = max(0.1, float(intervalo))
+        self.call_timeout = float(call_timeout)
+        self.sondeo = sondeo
+        # Deadline de cada llamada nativa: el timeout propio de la librería más un margen.
+        self.plazo = float(plazo) if plazo is not None else self.call_timeout + 5.0
+        self.client = (client_factory or nuevo_cliente)(
+            source_node=source_node, timeout=int(self.call_timeout * 1000), log_path="/tmp/itk_supervisor.log"
+        )
+        self.lectores: dict[tuple, Lector] = {}
+        # Más hilos que lugares en el semáforo: los sondeos y las esperas de
+        # deadline no ocupan el semáforo y no deben frenar al resto.
+        self._pool = ThreadPoolExecutor(max_workers=workers or max(4, _native_concurrency()),
+                                        thread_name_prefix="itk")
+        self._en_curso: dict[tuple, tuple[Any, float, Lector]] = {}
+        self.actualizar(equipos)
+
+    def _abrir(self, equipo: Equipo):
+        link = self.client.open_link(equipo.conn_string, timeout=int(self.call_timeout * 1000))
+        try:
+            link.set_timeouts(receive_timeout=int(self.call_timeout * 1000))
+        except Exception:  # pragma: no cover - timeout por defecto de la librería
+            pass
+        return link
+
+    def _lector(self, equipo: Equipo) -> Lector:
+        return Lector(equipo, abrir=self._abrir, lote=self.lote, plazo=self.plazo, sondeo=self.sondeo)
+
+    def actualizar(self, equipos: Iterable[Equipo]) -> tuple[int, int]:
+        """Aplica un registro nuevo: suma los equipos nuevos y saca los que ya no están.
+
+        Un equipo que sigue conserva su link y su cursor. Uno que sale deja de
+        leerse ya; si tenía una lectura en curso, se cierra cuando termine.
+        Devuelve ``(altas, bajas)``.
+        """
+        nuevos = {e.clave: e for e in equipos}
+        bajas = [k for k in self.lectores if k not in nuevos]
+        for k in bajas:
+            lector = self.lectores.pop(k)
+            if k not in self._en_curso:
+                lector.cerrar()
+        altas = 0
+        for k, equipo in nuevos.items():
+            actual = self.lectores.get(k)
+            if actual is None:
+                self.lectores[k] = self._lector(equipo)
+                altas += 1
+            elif actual.equipo != equipo:
+                actual.equipo = equipo  # cambió el controlador o la descripción, no la placa
+        return altas, len(bajas)
+
+    def ronda(self) -> int:
+        """Lanza la lectura de los equipos que toca y espera hasta ``intervalo``.
+
+        Un equipo que no terminó (placa colgada) sigue en curso, no frena a los
+        demás y no se relanza hasta que vuelva. Devuelve cuántas marcas nuevas
+        entraron en las lecturas que terminaron.
+        """
+        ahora = time.monotonic()
+        for k, lector in self.lectores.items():
+            if k not in self._en_curso and lector.proximo <= ahora:
+                self._en_curso[k] = (self._pool.submit(lector.ejecutar, self.intervalo), ahora, lector)
+        if not self._en_curso:
+            return 0
+        wait([f for f, _, _ in self._en_curso.values()], timeout=self.intervalo)
+        nuevas = 0
+        for k in [k for k, (f, _, _) in self._en_curso.items() if f.done()]:
+            futuro, _, lector = self._en_curso.pop(k)
+            nuevas += futuro.result()
+            if self.lectores.get(k) is not lector:
+                lector.cerrar()  # salió del registro mientras leía
+        return nuevas
+
+    def espera(self) -> float:
+        """Segundos hasta que algún equipo vuelva a tocar (acotado a ``intervalo``)."""
+        if not self.lectores:
+            return self.intervalo
+        proximo = min(lector.proximo for lector in self.lectores.values())
+        return max(0.0, min(self.intervalo, proximo - time.monotonic()))
+
+    def estado(self) -> list[dict[str, Any]]:
+        ahora = time.monotonic()
+        filas = []
+        for k in sorted(self.lectores):
+            lector = self.lectores[k]
+            fila = lector.estado()
+            desde = self._en_curso[k][1] if k in self._en_curso else None
+            fila["colgado"] = lector.colgado or (desde is not None and ahora - desde > self.call_timeout)
+            filas.append(fila)
+        return filas
+
+    def detener(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for lector in self.lectores.values():
+            if not lector.colgado:
+                lector.cerrar()
+        try:
+            self.client.uninit_library()
+        except Exception:  # pragma: no cover - apagado best-effort
+            pass
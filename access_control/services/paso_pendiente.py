@@ -35,6 +35,21 @@ busca alcanza: una persona no puede estar físicamente en dos molinetes con
 segundos de diferencia, así que la detección del reuso es lo que importa, no el
 límite exacto. Cuando el molinete valide contra nosotros en línea, el instante
 será exacto y esto se vuelve preciso.
+
+Costo por evento
+----------------
+Las dos ingestas (CD_ES y facial) evalúan la regla evento por evento, en el
+camino crítico de la latencia del visor. Por eso:
+
+- ``evaluar`` resuelve "¿estaba pendiente en otro molinete?" y "dejarlo
+  pendiente en este" en UNA sentencia: un ``INSERT ... ON CONFLICT DO UPDATE``
+  que sólo pisa la reserva si venció o es del mismo molinete, y con
+  ``RETURNING`` devuelve la que quedó. Si la que quedó es de otro molinete, es
+  el conflicto. En Postgres la tabla es ``UNLOGGED`` (migración 0020): son
+  reservas de segundos, perderlas en una caída no importa y no pagan WAL.
+- ``mapa_molinetes`` sale del índice de topología en memoria
+  (``xsys.services.topologia``), que se rearma sólo cuando cambia la
+  configuración de las puertas.
 """
 
 from __future__ import annotations
@@ -80,19 +95,12 @@ def mapa_molinetes() -> dict[str, dict]:
     Claves: ``c<id_controlador>`` para los eventos de xSys y ``d<device_id>``
     para los faciales de BioStar. El molinete es el grupo (la columna del visor),
     que es justamente la unidad física que le interesa a la regla.
+
+    Es el de ``topologia`` (compartido, en memoria): no modificarlo.
     """
-    from institutions.models import DoorTurnstileGroup
+    from xsys.services import topologia
 
-    mapa: dict[str, dict] = {}
-    for g in DoorTurnstileGroup.objects.all().only(
-        "id", "nombre", "door_id", "id_controladores", "biostar_device_ids"
-    ):
-        destino = {"key": f"g{g.id}", "nombre": g.nombre, "door_id": g.door_id}
-        for c in (g.id_controladores or []):
-            mapa[f"c{int(c)}"] = destino
-        for d in (g.biostar_device_ids or []):
-            mapa[f"d{int(d)}"] = destino
-    return mapa
+    return topologia.actual().molinetes
 
 
 def resolver_molinete(mapa: dict[str, dict], *, id_controlador=None, device_id=None) -> dict:
@@ -130,6 +138,10 @@ def evaluar(id_cliente, molinete: dict, *, cuando=None, origen: str = "") -> str
     expira = cuando + timedelta(seconds=ventana)
 
     try:
+        if _upsert_soportado():
+            key, nombre = _upsert(id_cliente, molinete, cuando, expira, origen)
+            return "" if key == molinete["key"] else (nombre or key)
+
         actual = PasoPendiente.objects.filter(pk=id_cliente).first()
         if actual and actual.expira_en > cuando and actual.molinete_key != molinete["key"]:
             # Conflicto: la misma identidad en otro molinete dentro de la ventana.
@@ -154,6 +166,49 @@ def evaluar(id_cliente, molinete: dict, *, cuando=None, origen: str = "") -> str
     return ""
 
 
+_COLUMNAS = ("molinete_key", "molinete_nombre", "door_id", "origen", "iniciado_en", "expira_en")
+
+
+def _upsert_soportado() -> bool:
+    from django.db import connection
+
+    return connection.vendor in ("postgresql", "sqlite") and connection.features.can_return_columns_from_insert
+
+
+def _upsert(id_cliente, molinete: dict, cuando, expira, origen: str) -> tuple[str, str]:
+    """Reserva ``molinete`` salvo que haya otra vigente; devuelve la que quedó.
+
+    La reserva existente se conserva (todas las columnas) si sigue vigente y es
+    de otro molinete: es el mismo criterio que el camino por ORM.
+    """
+    from django.db import connection
+
+    from access_control.models import PasoPendiente
+
+    tabla = connection.ops.quote_name(PasoPendiente._meta.db_table)
+    libre = f"{tabla}.expira_en <= EXCLUDED.iniciado_en OR {tabla}.molinete_key = EXCLUDED.molinete_key"
+    sets = ", ".join(
+        f"{c} = CASE WHEN {libre} THEN EXCLUDED.{c} ELSE {tabla}.{c} END" for c in _COLUMNAS
+    )
+    sql = (
+        f"INSERT INTO {tabla} (id_cliente, {', '.join(_COLUMNAS)}) VALUES (%s, %s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT (id_cliente) DO UPDATE SET {sets} "
+        f"RETURNING molinete_key, molinete_nombre"
+    )
+    fecha = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            int(id_cliente),
+            molinete["key"],
+            (molinete.get("nombre") or "")[:60],
+            molinete.get("door_id"),
+            origen[:12],
+            fecha(cuando),
+            fecha(expira),
+        ])
+        return cursor.fetchone()
+
+
 def purgar(antiguedad_horas: int = 6) -> int:
     """Borra reservas viejas. Son efímeras; sin purga la tabla sólo acumula."""
     from access_control.models import PasoPendiente
@@ -199,3 +254,4 @@ def bloqueado_por_antipassback(id_cliente, *, cuando=None) -> int:
     transcurridos = (cuando - ultimo.iniciado_en).total_seconds() / 60.0
     restan = minutos - transcurridos
     return int(restan) + 1 if restan > 0 else 0
+
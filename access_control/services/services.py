@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
 from typing import Any, Iterable
 
@@ -186,24 +187,32 @@ class MSSQLClientLookupService:
         }
         return ";".join(f"{key}={value}" for key, value in params.items() if value) + ";"
 
-    def fetch_by_dni(self, dni: int) -> dict[str, Any] | None:
-        query = f"SELECT TOP 1 Id_Cliente, Doc_Nro, Ult_Cuota_Paga FROM {self.config['TABLE']} WHERE Doc_Nro = ? ORDER BY Ult_Cuota_Paga DESC"
+    def _connect(self):
         try:
-            connection = pyodbc.connect(self._connection_string())  # type: ignore[union-attr]
+            return pyodbc.connect(self._connection_string())  # type: ignore[union-attr]
         except Exception as exc:  # pragma: no cover
             raise ClientLookupError("No se pudo conectar a MSSQL para buscar cliente: " + str(exc)) from exc
 
+    @contextmanager
+    def _checkout(self):
+        """Conexión del pool del proceso (ver ``common.mssql_pool``)."""
+        from common import mssql_pool
+
         try:
-            cursor = connection.cursor()
-            cursor.execute(query, dni)
-            row = cursor.fetchone()
-        except Exception as exc:  # pragma: no cover
-            raise ClientLookupError("Error al consultar cliente en MSSQL: " + str(exc)) from exc
-        finally:
+            with mssql_pool.pooled(self._connection_string(), self._connect, name="client_lookup") as conn:
+                yield conn
+        except mssql_pool.PoolTimeoutError as exc:
+            raise ClientLookupError(str(exc)) from exc
+
+    def fetch_by_dni(self, dni: int) -> dict[str, Any] | None:
+        query = f"SELECT TOP 1 Id_Cliente, Doc_Nro, Ult_Cuota_Paga FROM {self.config['TABLE']} WHERE Doc_Nro = ? ORDER BY Ult_Cuota_Paga DESC"
+        with self._checkout() as connection:
             try:
-                connection.close()
-            except Exception:  # pragma: no cover
-                pass
+                cursor = connection.cursor()
+                cursor.execute(query, dni)
+                row = cursor.fetchone()
+            except Exception as exc:  # pragma: no cover
+                raise ClientLookupError("Error al consultar cliente en MSSQL: " + str(exc)) from exc
 
         if not row:
             return None
@@ -301,6 +310,21 @@ class MSSQLAccessCheckService:
                 "No se pudo establecer la conexión con MSSQL: " + str(exc)
             ) from exc
 
+    @contextmanager
+    def _checkout(self):
+        """Conexión del pool del proceso para una verificación suelta.
+
+        Reusa una conexión ya logueada (ver ``common.mssql_pool``): la
+        re-verificación de un socio rechazado en el molinete no paga el handshake.
+        """
+        from common import mssql_pool
+
+        try:
+            with mssql_pool.pooled(self._connection_string(), self._connect, name="access_check") as conn:
+                yield conn
+        except mssql_pool.PoolTimeoutError as exc:
+            raise AccessCheckError(str(exc)) from exc
+
     @staticmethod
     def _scalar(cursor, sql: str, params: tuple) -> Any:
         try:
@@ -313,15 +337,8 @@ class MSSQLAccessCheckService:
     def resolve_id_cliente(self, *, identifier_type: str, identifier_value: str) -> int | None:
         """Resuelve doc_nro/id_cliente/credencial a Id_Cliente, sin evaluar ningún acceso."""
 
-        connection = self._connect()
-        try:
-            cursor = connection.cursor()
-            return self._resolve_id_cliente(cursor, identifier_type, identifier_value)
-        finally:
-            try:
-                connection.close()
-            except Exception:  # pragma: no cover - cierre defensivo
-                pass
+        with self._checkout() as connection:
+            return self._resolve_id_cliente(connection.cursor(), identifier_type, identifier_value)
 
     def _resolve_id_cliente(self, cursor, identifier_type: str, identifier_value: str) -> int | None:
         if identifier_type == "id_cliente":
@@ -406,19 +423,17 @@ class MSSQLAccessCheckService:
         """Determina si un socio puede ingresar por un acceso, sin escribir en MSSQL.
 
         Si se pasa ``cursor`` (de una conexión ya abierta) se reutiliza y NO se
-        abre ni cierra una conexión nueva. Esto permite evaluar muchos socios
-        sobre una única conexión MSSQL (evita miles de handshakes TLS al validar
-        la lista blanca completa).
+        toma ninguna del pool. Esto permite evaluar muchos socios sobre una
+        única conexión MSSQL (evita miles de handshakes TLS al validar la lista
+        blanca completa).
         """
 
         if id_acceso is None and id_controlador is None:
             raise AccessCheckError("Debe indicar id_acceso o id_controlador.")
 
-        own_connection = cursor is None
-        connection = self._connect() if own_connection else None
-        try:
-            if own_connection:
-                cursor = connection.cursor()
+        with ExitStack() as stack:
+            if cursor is None:
+                cursor = stack.enter_context(self._checkout()).cursor()
 
             # La fecha por defecto sale del RELOJ DEL SERVIDOR SQL, no de
             # ``datetime.now()``: los contenedores corren en UTC y el club está
@@ -565,12 +580,6 @@ class MSSQLAccessCheckService:
                     return resolved(True, "producto_titular", producto_titular["descripcion"])
 
             return resolved(False, "sin_habilitacion")
-        finally:
-            if own_connection and connection is not None:
-                try:
-                    connection.close()
-                except Exception:  # pragma: no cover - cierre defensivo
-                    pass
 
 
 class ExternalAccessLogSynchronizer:
@@ -667,6 +676,11 @@ class ExternalAccessLogSynchronizer:
                 update_fields=update_fields,
                 unique_fields=["external_id"],
             )
+        if objects:
+            # bulk_create no dispara señales: avisar a los visores de puerta.
+            from xsys.services import puerta_feed
+
+            puerta_feed.bump(controladores={o.id_controlador for o in objects})
 
         return len(objects)
 
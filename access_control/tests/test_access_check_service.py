@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 from django.test import SimpleTestCase
 
 from access_control.services import AccessCheckError, MSSQLAccessCheckService
+from common import mssql_pool
 
 
 class _FakeCursor:
@@ -48,6 +49,9 @@ class MSSQLAccessCheckServiceTestCase(SimpleTestCase):
         original = getattr(svc_module, "pyodbc", None)
         svc_module.pyodbc = SimpleNamespace(connect=connect_mock)
         self.addCleanup(lambda: setattr(svc_module, "pyodbc", original))
+        # El pool es por proceso: sin esto el próximo test recibe esta conexión falsa.
+        self.addCleanup(mssql_pool.close_all)
+        self.connect_mock = connect_mock
 
     def _base_responses(self, **overrides) -> dict[str, tuple | None]:
         responses = {
@@ -168,3 +172,11 @@ class MSSQLAccessCheckServiceTestCase(SimpleTestCase):
         service = MSSQLAccessCheckService(self.config)
         with self.assertRaises(AccessCheckError):
             service.check_access(identifier_type="bogus", identifier_value="x", id_acceso=18)
+
+    def test_reusa_la_conexion_del_pool_entre_verificaciones(self):
+        cursor = _FakeCursor(self._base_responses(**{"CF_SCA_ValidarMaster": (1,)}))
+        self._install_pyodbc_stub(cursor)
+        service = MSSQLAccessCheckService(self.config)
+        for _ in range(3):
+            service.check_access(identifier_type="id_cliente", identifier_value="831446", id_acceso=18)
+        self.connect_mock.assert_called_once()
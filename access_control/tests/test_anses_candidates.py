@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from access_control.models import AnsesCandidate, AnsesVerificationRecord
+from access_control.services import anses_candidates
+from access_control.services.anses_verification_service import AnsesVerificationError
+from xsys.models import SyncState
+
+HOY = date(2026, 10, 17)
+Status = AnsesVerificationRecord.VerificationStatus
+
+
+class _FakeService:
+    def __init__(self, items):
+        self.items = items
+        self.llamadas = 0
+
+    def fetch_all_candidates(self):
+        self.llamadas += 1
+        if isinstance(self.items, Exception):
+            raise self.items
+        return list(self.items)
+
+
+def _item(id_cliente, fecha_nac, **kw):
+    return {"id_cliente": id_cliente, "doc_nro": 30_000_000 + id_cliente, "nombre": "Ana",
+            "apellido": "Perez", "sexo": "F", "fecha_nac": fecha_nac, "edad": None, **kw}
+
+
+class RefrescarTests(TestCase):
+    def test_escribe_solo_cambios_y_borra_los_que_no_vienen(self):
+        res = anses_candidates.refrescar(_FakeService([_item(1, "1930-01-01"), _item(2, "1931-05-02")]))
+        self.assertEqual(res, {"vistos": 2, "escritos": 2, "borrados": 0})
+        self.assertTrue(anses_candidates.cargado())
+
+        res = anses_candidates.refrescar(
+            _FakeService([_item(1, "1930-01-01"), _item(3, "1932-01-01", apellido="Gomez")])
+        )
+        self.assertEqual(res, {"vistos": 2, "escritos": 1, "borrados": 1})
+        self.assertEqual(list(AnsesCandidate.objects.values_list("id_cliente", flat=True)), [1, 3])
+
+    def test_listado_vacio_no_borra(self):
+        anses_candidates.refrescar(_FakeService([_item(1, "1930-01-01")]))
+        self.assertEqual(anses_candidates.refrescar(_FakeService([]))["borrados"], 0)
+        self.assertEqual(AnsesCandidate.objects.count(), 1)
+
+    def test_asegurar_solo_carga_si_nunca_se_cargo(self):
+        anses_candidates.refrescar(_FakeService([_item(1, "1930-01-01")]))
+        SyncState.objects.filter(stream=anses_candidates.STREAM).update(
+            last_datetime=timezone.now() - timedelta(days=1)
+        )
+        # Vencida: la refresca el servicio periódico, no el pedido.
+        servicio = _FakeService([_item(2, "1931-01-01")])
+        self.assertFalse(anses_candidates.asegurar(servicio))
+        self.assertEqual(servicio.llamadas, 0)
+
+        # Nunca cargada: se carga, y si MSSQL falla el error sube.
+        SyncState.objects.all().delete()
+        with self.assertRaises(AnsesVerificationError):
+            anses_candidates.asegurar(_FakeService(AnsesVerificationError("sin MSSQL")))
+        self.assertTrue(anses_candidates.asegurar(servicio))
+        self.assertEqual(servicio.llamadas, 1)
+
+
+class FiltrarTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user("tester")
+        self.otro = User.objects.create_user("otro")
+        anses_candidates.refrescar(_FakeService([
+            _item(1, "1930-12-31"),   # 96 en años DATEDIFF
+            _item(2, "1931-01-01"),   # 95
+            _item(3, "1925-06-01"),   # 101: fuera de 90..100
+            _item(4, "1935-03-03"),   # 91
+            _item(5, "1935-03-03"),   # 91 (misma fecha: desempata id_cliente)
+        ]))
+        for id_cliente, st in [(1, Status.GENERATED), (2, Status.OFFICE_REQUIRED), (4, Status.DECEASED)]:
+            AnsesVerificationRecord.objects.create(requested_by=self.user, id_cliente=id_cliente, dni=1,
+                                                   verification_status=st, verification_message=st)
+        AnsesVerificationRecord.objects.create(requested_by=self.otro, id_cliente=5, dni=1,
+                                               verification_status=Status.GENERATED)
+
+    def _ids(self, **kw):
+        qs = anses_candidates.filtrar(self.user, min_age=90, max_age=100, hoy=HOY, **kw)
+        return [c.id_cliente for c in qs]
+
+    def test_rango_y_filtros_de_estado(self):
+        self.assertEqual(self._ids(), [1, 2, 4, 5])
+        self.assertEqual(self._ids(exclude_consulted=True), [2, 5])
+        self.assertEqual(self._ids(verification_status="pending"), [5])
+        self.assertEqual(self._ids(verification_status=Status.DECEASED), [4])
+
+    def test_item_con_estado_del_usuario(self):
+        qs = anses_candidates.filtrar(self.user, min_age=90, max_age=100, hoy=HOY)
+        primero, *_, ultimo = [anses_candidates.item(c, HOY) for c in qs]
+        self.assertEqual(
+            (primero["edad"], primero["consulted"], primero["verification_status"]),
+            (96, True, "generated"),
+        )
+        self.assertEqual((ultimo["id_cliente"], ultimo["consulted"], ultimo["verification_status"]), (5, False, ""))
+
+    def test_pagina_por_keyset_en_una_query(self):
+        qs = anses_candidates.filtrar(self.user, min_age=90, max_age=100, hoy=HOY)
+        with self.assertNumQueries(1):
+            filas, cursor = anses_candidates.pagina(qs, page_size=3)
+        self.assertEqual(([f.id_cliente for f in filas], cursor), ([1, 2, 4], "1935-03-03:4"))
+        with self.assertNumQueries(1):
+            filas, cursor = anses_candidates.pagina(qs, page_size=3, after=cursor)
+        self.assertEqual(([f.id_cliente for f in filas], cursor), ([5], None))
+        # Por número de página da lo mismo.
+        self.assertEqual([f.id_cliente for f in anses_candidates.pagina(qs, page_size=3, page=2)[0]], [5])
+
+
+class AnsesCandidatesLocalAPITestCase(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("tester")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        self.url = reverse("anses_candidates_api")
+        hoy = timezone.localdate()
+        anses_candidates.refrescar(_FakeService([
+            _item(i, (date(hoy.year - 95, 1, 1) + timedelta(days=i)).isoformat()) for i in range(1, 61)
+        ]))
+        AnsesVerificationRecord.objects.create(requested_by=user, id_cliente=1, dni=1,
+                                               verification_status=Status.GENERATED)
+
+    @patch("access_control.api.v1.api_views.AnsesVerificationService")
+    def test_filtros_y_cursor_sin_ir_a_mssql(self, service_cls):
+        params = {"page_size": 50, "min_age": 90, "max_age": 100, "exclude_consulted": "true"}
+        r1 = self.client.get(self.url, params)
+        self.assertEqual(r1.status_code, 200)
+        self.assertEqual((r1.data["count"], len(r1.data["results"])), (59, 50))
+        self.assertEqual(r1.data["results"][0]["id_cliente"], 2)
+
+        r2 = self.client.get(self.url, {**params, "after": r1.data["next_cursor"]})
+        self.assertEqual([i["id_cliente"] for i in r2.data["results"]], list(range(52, 61)))
+        self.assertIsNone(r2.data["next_cursor"])
+        service_cls.assert_not_called()
+
+    def test_cursor_invalido(self):
+        r = self.client.get(self.url, {"page_size": 50, "after": "ayer:x"})
+        self.assertEqual(r.status_code, 400)
@@ -715,7 +715,7 @@ class AnsesVerificationAPITestCase(BaseAPITestCase):
         response = self.client.get(self.export_url)
 
         self.assertEqual(response.status_code, 200)
-        workbook = zipfile.ZipFile(BytesIO(response.content))
+        workbook = zipfile.ZipFile(BytesIO(response.getvalue()))
         sheet_xml = workbook.read("xl/worksheets/sheet1.xml").decode("utf-8")
         self.assertIn("<t>7100</t>", sheet_xml)
         self.assertIn("<t>30222444</t>", sheet_xml)
@@ -749,7 +749,7 @@ class AnsesVerificationAPITestCase(BaseAPITestCase):
         )
         self.assertIn(".xlsx", response["Content-Disposition"])
         self.assertIn("attachment; filename=", response["Content-Disposition"])
-        workbook = zipfile.ZipFile(BytesIO(response.content))
+        workbook = zipfile.ZipFile(BytesIO(response.getvalue()))
         sheet_xml = workbook.read("xl/worksheets/sheet1.xml").decode("utf-8")
         self.assertIn("<t>Cliente_id</t>", sheet_xml)
         self.assertIn("<t>DNI</t>", sheet_xml)
@@ -766,6 +766,32 @@ class AnsesVerificationAPITestCase(BaseAPITestCase):
         self.assertIn("<t>Si</t>", sheet_xml)
         self.assertIn("<t>constancia generada.</t>", sheet_xml)
 
+    def test_export_processed_records_as_csv(self):
+        AnsesVerificationRecord.objects.create(
+            requested_by=self.user,
+            id_cliente=7200,
+            dni=30222555,
+            verification_status=AnsesVerificationRecord.VerificationStatus.DECEASED,
+            verification_message="fallecido, con acento: Peña",
+            apellido="Peña",
+            nombre="José",
+        )
+
+        response = self.client.get(self.export_url, {"formato": "csv"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn(".csv", response["Content-Disposition"])
+        lines = response.getvalue().decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["Cliente_id", "DNI", "Apellido"])
+        self.assertEqual(lines[1].split(",")[:4], ["7200", "30222555", "Peña", "José"])
+        self.assertTrue(lines[1].endswith('"fallecido, con acento: Peña"'))
+
+    def test_export_processed_records_rejects_unknown_format(self):
+        response = self.client.get(self.export_url, {"formato": "pdf"})
+        self.assertEqual(response.status_code, 400)
+
     # close_old_connections() es necesario en producción (cada worker corre en su
     # propio hilo), pero dentro de un TestCase cierra la conexión del test: el
     # bloque atómico tiene autocommit desactivado y Django lo lee como desajuste
@@ -774,12 +800,10 @@ class AnsesVerificationAPITestCase(BaseAPITestCase):
     @patch("access_control.api.v1.api_views.close_old_connections")
     @patch("access_control.api.v1.api_views._save_anses_records")
     @patch("access_control.api.v1.api_views.AnsesVerificationService")
-    @patch("access_control.api.v1.api_views._apply_candidate_filters")
-    @patch("access_control.api.v1.api_views._fetch_all_anses_candidates")
+    @patch("access_control.api.v1.api_views._filtered_anses_candidates")
     def test_background_filtered_job_processes_clients_in_parallel(
         self,
-        fetch_candidates_mock,
-        apply_filters_mock,
+        filtered_mock,
         service_cls,
         save_records_mock,
         close_conns_mock,
@@ -793,8 +817,7 @@ class AnsesVerificationAPITestCase(BaseAPITestCase):
             "started_at": timezone.now().isoformat(),
             "finished_at": "",
         }
-        fetch_candidates_mock.return_value = [{"id_cliente": 1, "doc_nro": 30111111}]
-        apply_filters_mock.return_value = [
+        filtered_mock.return_value = [
             {"id_cliente": 1, "doc_nro": 30111111},
             {"id_cliente": 2, "doc_nro": 30222222},
             {"id_cliente": 3, "doc_nro": 30333333},
@@ -822,12 +845,10 @@ class AnsesVerificationAPITestCase(BaseAPITestCase):
     @patch("access_control.api.v1.api_views.close_old_connections")
     @patch("access_control.api.v1.api_views._save_anses_records")
     @patch("access_control.api.v1.api_views.AnsesVerificationService")
-    @patch("access_control.api.v1.api_views._apply_candidate_filters")
-    @patch("access_control.api.v1.api_views._fetch_all_anses_candidates")
+    @patch("access_control.api.v1.api_views._filtered_anses_candidates")
     def test_background_filtered_job_registers_error_and_continues_when_dni_fails(
         self,
-        fetch_candidates_mock,
-        apply_filters_mock,
+        filtered_mock,
         service_cls,
         save_records_mock,
         close_conns_mock,
@@ -841,8 +862,7 @@ class AnsesVerificationAPITestCase(BaseAPITestCase):
             "started_at": timezone.now().isoformat(),
             "finished_at": "",
         }
-        fetch_candidates_mock.return_value = [{"id_cliente": 1, "doc_nro": 30111111}]
-        apply_filters_mock.return_value = [
+        filtered_mock.return_value = [
             {"id_cliente": 1, "doc_nro": 30111111},
             {"id_cliente": 2, "doc_nro": 30222222},
         ]
@@ -1,7 +1,16 @@
+import ctypes
+import logging
+import socket
+import sys
+import time
+import unittest
 from unittest.mock import MagicMock, patch
 
 from django.test import SimpleTestCase
 
+from access_control.services.intelectron import marcas
+from access_control.services.intelectron.api3000_console import _serialize_mark
+from access_control.services.intelectron.api3000_wrapper.api3000.client import Api3000Client, peer_ip
 from access_control.services.intelectron.api3000_wrapper.api3000.errors import Api3000Error
 from access_control.services.intelectron.api3000_wrapper.api3000.native import (
     NativeLibrary,
@@ -9,6 +18,9 @@ from access_control.services.intelectron.api3000_wrapper.api3000.native import (
     WINDOWS_LIB_FILENAME,
     resolve_library_candidates,
 )
+from access_control.services.intelectron.api3000_wrapper.api3000.structs import ITKMarkInfo, decode_marks
+
+logger = logging.getLogger(__name__)
 
 
 class ResolveLibraryCandidatesTestCase(SimpleTestCase):
@@ -61,3 +73,110 @@ class NativeLibraryFallbackTestCase(SimpleTestCase):
         self.assertIn(linux_path, str(excinfo.exception))
         self.assertIn(windows_alt_path, str(excinfo.exception))
         self.assertIn(windows_path, str(excinfo.exception))
+
+
+class _FakeMarksCdll:
+    """``itk_list_marks`` que copia marcas de un buffer armado de antemano."""
+
+    def __init__(self, total):
+        self.total = total
+        self.origen = (ITKMarkInfo * total)()
+        for i, m in enumerate(self.origen):
+            m.mask_fields = 0x3F
+            m.access_id = 3_000_000_000 + i
+            m.date_time.year, m.date_time.month, m.date_time.day = 26, 10, 1 + i % 28
+            m.date_time.hour, m.date_time.minute, m.date_time.seconds = i % 24, i % 60, (i * 7) % 60
+            m.date_time.dayofweek = 3
+            m.event_code = (1, 106, 107)[i % 3]
+            m.source = -1 if i % 5 == 0 else 2
+            m.direction = 200 + i % 2
+            m.job_order = b"JOB"
+        self.arrays = set()
+
+    def itk_list_marks(self, handle, dest_node, start, n, items, listed):
+        self.arrays.add(ctypes.addressof(items))
+        count = max(0, min(n, self.total - start))
+        size = ctypes.sizeof(ITKMarkInfo)
+        ctypes.memmove(items, ctypes.addressof(self.origen) + start * size, count * size)
+        listed._obj.value = count
+        return 1  # OP_OK
+
+
+def _client_with(cdll):
+    with patch("access_control.services.intelectron.api3000_wrapper.api3000.client.NativeLibrary") as native:
+        native.return_value.cdll = cdll
+        client = Api3000Client()
+    client._handle = 1
+    return client
+
+
+class MarkRecordsTestCase(SimpleTestCase):
+    def test_decode_matches_ctypes_fields(self):
+        cdll = _FakeMarksCdll(7)
+        for m, r in zip(cdll.origen, decode_marks(cdll.origen, 7)):
+            self.assertEqual(
+                (r.access_id, r.event_code, r.source, r.direction),
+                (m.access_id, m.event_code, m.source, m.direction),
+            )
+            self.assertEqual(
+                (r.year, r.month, r.day, r.hour, r.minute, r.seconds),
+                (m.date_time.year, m.date_time.month, m.date_time.day,
+                 m.date_time.hour, m.date_time.minute, m.date_time.seconds),
+            )
+
+    def test_list_mark_records_reuses_its_buffer(self):
+        cdll = _FakeMarksCdll(120)
+        client = _client_with(cdll)
+
+        primeros, n1 = client.list_mark_records(dest_node=1, start_position=0, records_to_list=50)
+        segundos, n2 = client.list_mark_records(dest_node=1, start_position=100, records_to_list=50)
+
+        self.assertEqual((n1, n2), (50, 20))
+        self.assertEqual(len(cdll.arrays), 1)
+        # Los registros no quedan atados al buffer que se pisó.
+        self.assertEqual(primeros[0].access_id, 3_000_000_000)
+        self.assertEqual(segundos[-1].access_id, 3_000_000_119)
+
+    def test_benchmark_records_vs_structs(self):
+        """Micro-benchmark: lectura + dedupe de una tanda por los dos caminos."""
+        lote, vueltas = 50, 200
+        cdll = _FakeMarksCdll(lote)
+        client = _client_with(cdll)
+
+        def viejo():
+            items, count = client.list_marks(dest_node=1, start_position=0, records_to_list=lote)
+            out = {}
+            for mark in (_serialize_mark(m) for m in items[:count]):
+                out.setdefault(marcas.dedupe_key("10.0.0.60", mark), mark)
+            return out
+
+        def nuevo():
+            registros, _ = client.list_mark_records(dest_node=1, start_position=0, records_to_list=lote)
+            return marcas.candidatas_de_registros("10.0.0.60", registros)
+
+        self.assertEqual(viejo(), nuevo())
+
+        def medir(fn):
+            t0 = time.perf_counter()
+            for _ in range(vueltas):
+                fn()
+            return time.perf_counter() - t0
+
+        # Sólo se informa: un tiempo de pared no es algo que un test pueda
+        # afirmar sin fallar de a ratos en una máquina cargada.
+        t_viejo, t_nuevo = min(medir(viejo) for _ in range(3)), min(medir(nuevo) for _ in range(3))
+        logger.info("records %.4fs vs structs %.4fs (%s vueltas de %s)", t_nuevo, t_viejo, vueltas, lote)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "usa /proc/net/tcp")
+class PeerIpTestCase(SimpleTestCase):
+    def test_ip_del_otro_extremo_por_los_puertos(self):
+        with socket.socket() as servidor:
+            servidor.bind(("127.0.0.1", 0))
+            servidor.listen(1)
+            puerto = servidor.getsockname()[1]
+            with socket.create_connection(("127.0.0.1", puerto)) as cliente:
+                conexion, _ = servidor.accept()
+                with conexion:
+                    self.assertEqual(peer_ip(puerto, cliente.getsockname()[1]), "127.0.0.1")
+        self.assertEqual(peer_ip(puerto, None), "")
@@ -0,0 +1,83 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from access_control.services import biostar2_client
+from access_control.services.biostar2_client import BioStar2Client, BioStar2Env
+
+
+def _cfg(session_id=""):
+    cfg = MagicMock(bs_session_id=session_id)
+    cfg.set_session.side_effect = lambda sid: setattr(cfg, "bs_session_id", sid)
+    return cfg
+
+
+def _client(session_id=""):
+    env = BioStar2Env(base_url="https://bs", username="u", password="p", verify_tls=False, timeout_seconds=5)
+    return BioStar2Client(cfg=_cfg(session_id), env=env)
+
+
+class BioStar2ClientTests(SimpleTestCase):
+    def test_relogin_single_flight_ante_401_concurrentes(self):
+        client = _client("vieja")
+        logins = []
+        barrera = threading.Barrier(6, timeout=2)
+
+        def post(url, **kwargs):
+            logins.append(url)
+            return MagicMock(status_code=200, headers={"bs-session-id": f"nueva{len(logins)}"})
+
+        def request(method, url, headers, **kwargs):
+            if headers.get("bs-session-id") == "vieja":
+                barrera.wait()  # los 6 reciben el 401 a la vez
+                return MagicMock(status_code=401)
+            return MagicMock(status_code=200)
+
+        client.session.post = MagicMock(side_effect=post)
+        client.session.request = MagicMock(side_effect=request)
+        hilos = [threading.Thread(target=client.request, args=("GET", f"/api/users/{i}")) for i in range(6)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        self.assertEqual(len(logins), 1)
+        self.assertEqual(client.cfg.bs_session_id, "nueva1")
+        self.assertEqual(client.session.request.call_count, 12)
+
+    def test_401_reusa_la_sesion_que_renovo_otro_proceso(self):
+        client = _client("vieja")
+        # Otro worker ya logueó y dejó su sesión en la DB.
+        client.cfg.refresh_from_db.side_effect = lambda: setattr(client.cfg, "bs_session_id", "de_otro")
+        client.session.post = MagicMock()
+        client.session.request = MagicMock(side_effect=[MagicMock(status_code=401), MagicMock(status_code=200)])
+
+        client.request("GET", "/api/users/1")
+
+        client.session.post.assert_not_called()
+        self.assertEqual(client.session.request.call_args.kwargs["headers"]["bs-session-id"], "de_otro")
+
+    def test_metricas_por_endpoint(self):
+        client = _client("s")
+        client.session.request = MagicMock(side_effect=[
+            MagicMock(status_code=200), MagicMock(status_code=200), MagicMock(status_code=500),
+        ])
+        client.request("GET", "/api/users/1")
+        client.request("GET", "/api/users/22")
+        client.request("POST", "/api/events/search", check=False)
+        m = client.metrics(reset=True)
+        self.assertEqual(set(m), {"GET /api/users/{id}", "POST /api/events/search"})
+        self.assertEqual((m["GET /api/users/{id}"]["n"], m["GET /api/users/{id}"]["errores"]), (2, 0))
+        self.assertEqual(m["POST /api/events/search"]["errores"], 1)
+        self.assertEqual(client.metrics(), {})
+
+    def test_instancia_compartida_por_proceso(self):
+        biostar2_client._shared.clear()
+        self.addCleanup(biostar2_client._shared.clear)
+        with patch.object(BioStar2Client, "_build", side_effect=lambda: _client("s")) as build:
+            a = BioStar2Client.from_db_and_env()
+            b = BioStar2Client.from_db_and_env()
+            c = BioStar2Client.from_db_and_env(shared=False)
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        self.assertEqual(build.call_count, 2)
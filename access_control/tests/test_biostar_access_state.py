@@ -0,0 +1,87 @@
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase
+
+from access_control.models import BioStarUser
+from access_control.services import biostar_access_state as bas
+from xsys.models import XsysWhitelist
+
+
+def _resp(status=200, code="0"):
+    r = MagicMock(status_code=status)
+    r.json.return_value = {"Response": {"code": code}}
+    return r
+
+
+class _Client:
+    """Cliente BioStar de mentira: responde el PUT de estado según ``fallas``."""
+
+    def __init__(self, fallas=None, esperar_otro_hilo=False):
+        self.cfg = MagicMock(bs_session_id="s")
+        self.fallas = dict(fallas or {})
+        self.puts: list[int] = []
+        self.hilos: set[str] = set()
+        self._lock = threading.Lock()
+        self._dos_hilos = threading.Event()
+        if not esperar_otro_hilo:
+            self._dos_hilos.set()
+
+    def set_user_access_state(self, cid, *, enabled, method):
+        with self._lock:
+            self.puts.append(cid)
+            self.hilos.add(threading.current_thread().name)
+            if len(self.hilos) > 1:
+                self._dos_hilos.set()
+            pendientes = self.fallas.get(cid)
+            if pendientes:
+                self.fallas[cid] = pendientes[1:]
+                return pendientes[0]
+        # Retiene el primer PUT hasta que llegue otro hilo (o 2 s, si es secuencial).
+        self._dos_hilos.wait(2)
+        return _resp()
+
+
+@patch.dict(os.environ, {"BIOSTAR_STATE_WORKERS": "4", "BIOSTAR_STATE_RETRIES": "2"})
+@patch("access_control.services.biostar_access_state.time.sleep")
+class ApplyTests(SimpleTestCase):
+    def _result(self):
+        return {"deshabilitados": 0, "errores": 0}
+
+    def test_en_paralelo_con_resultado_por_id(self, _sleep):
+        client = _Client(fallas={7: [_resp(400, "1000")]}, esperar_otro_hilo=True)
+        result = self._result()
+        out = bas._apply(client, list(range(1, 41)), enabled=False, method="expiry",
+                         result=result, key_ok="deshabilitados")
+        self.assertEqual(result, {"deshabilitados": 39, "errores": 1, "errores_ids": [7]})
+        self.assertEqual(out[7], (False, "HTTP 400 code 1000"))
+        self.assertGreater(len(client.hilos), 1)
+        self.assertEqual(client.puts.count(7), 1)  # un 4xx no se reintenta
+
+    def test_reintenta_5xx_con_backoff(self, sleep):
+        client = _Client(fallas={3: [_resp(503, "None"), _resp(500, "None")]})
+        result = self._result()
+        bas._apply(client, [3], enabled=False, method="expiry", result=result, key_ok="deshabilitados")
+        self.assertEqual(result["deshabilitados"], 1)
+        self.assertEqual(client.puts, [3, 3, 3])
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+    def test_cada_hilo_cierra_su_conexion(self, _sleep):
+        client = _Client()
+        with patch("django.db.close_old_connections") as cerrar:
+            bas._apply(client, [1, 2, 3], enabled=False, method="expiry",
+                       result=self._result(), key_ok="deshabilitados")
+        self.assertEqual(cerrar.call_count, 3)
+
+
+class TopeTests(TestCase):
+    @patch.dict(os.environ, {"BIOSTAR_DISABLE_MODE": "on", "BIOSTAR_MAX_DISABLE_PER_RUN": "2"})
+    def test_el_tope_sigue_frenando_antes_de_tocar_biostar(self):
+        for cid in (10, 11, 12):
+            BioStarUser.objects.create(user_id=cid, raw_payload={})
+            XsysWhitelist.objects.create(id_cliente=cid, habilitado=False)
+        with patch("access_control.services.biostar_access_state._apply") as apply:
+            res = bas.push_access_state_affected(None)
+        apply.assert_not_called()
+        self.assertEqual(res["abortado_por_tope"], {"a_deshabilitar": 3, "tope": 2})
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from access_control.models import BioStarDevice, BioStarDeviceUser
+from access_control.services import biostar_device_index as idx
+
+
+class _Client:
+    """``list_device_users`` de mentira sobre una lista fija de filas."""
+
+    def __init__(self, rows, con_total=True):
+        self.rows = rows
+        self.con_total = con_total
+        self.pedidos: list[int] = []
+
+    def list_device_users(self, device_id, *, limit=1, offset=0):
+        self.pedidos.append(offset)
+        coleccion = {"rows": self.rows[offset:offset + limit]}
+        if self.con_total:
+            coleccion["total"] = len(self.rows)
+        return {"DeviceUserCollection": coleccion}
+
+
+def _rows(n, desde=1):
+    return [{"user_id": str(i), "name": f"Socio {i}"} for i in range(desde, desde + n)]
+
+
+class IndexarEquipoTests(TestCase):
+    def setUp(self):
+        BioStarDevice.objects.create(device_id=7, name="Facial")
+
+    def test_indexa_todas_las_paginas_y_marca_el_equipo(self):
+        client = _Client(_rows(450))
+        res = idx.indexar_equipo(client, 7)
+        self.assertEqual(res, {"vistos": 450, "escritos": 450, "borrados": 0})
+        self.assertEqual(sorted(client.pedidos), [0, 200, 400])
+        self.assertTrue(idx.indexado(7))
+        self.assertEqual(idx.buscar(7, "3-1-0")["user_id"], "310")
+
+    def test_sin_total_pagina_en_serie(self):
+        idx.indexar_equipo(_Client(_rows(250), con_total=False), 7)
+        self.assertEqual(BioStarDeviceUser.objects.filter(device_id=7).count(), 250)
+
+    def test_reindexar_escribe_solo_cambios_y_borra_los_que_no_estan(self):
+        idx.indexar_equipo(_Client(_rows(10)), 7)
+        rows = _rows(9, desde=2)
+        rows[0]["name"] = "Otro nombre"
+        res = idx.indexar_equipo(_Client(rows), 7)
+        self.assertEqual(res, {"vistos": 9, "escritos": 1, "borrados": 1})
+        self.assertIsNone(idx.buscar(7, "1"))
+
+    def test_indexa_tambien_el_user_unique_id(self):
+        idx.indexar_equipo(_Client([{"user_id": "5", "user_unique_id": "30111222", "name": "Socio"}]), 7)
+        self.assertEqual(idx.buscar(7, "30.111.222")["user_id"], "5")
+        self.assertEqual(idx.buscar(7, "5")["user_id"], "5")
+
+    def test_acciones_de_consola_actualizan_el_indice(self):
+        idx.indexar_equipo(_Client(_rows(3)), 7)
+        idx.agregado(7, 99)
+        self.assertEqual(idx.buscar(7, "99")["user_id"], "99")
+        idx.quitado(7, 99)
+        self.assertIsNone(idx.buscar(7, "99"))
+        idx.vaciado(7)
+        self.assertEqual(idx.contar(7), 0)
+
+
+class DeviceUsersDocumentAPITests(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user("op", password="x"))
+        BioStarDevice.objects.create(device_id=7, name="Facial")
+        self.client_bs = _Client(_rows(500))
+        patcher = patch(
+            "access_control.api.v1.api_views.BioStar2Client.from_db_and_env", return_value=self.client_bs
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sin_indice_busca_en_vivo(self):
+        resp = self.api.get("/api/biostar/devices/7/users/?document=450")
+        self.assertEqual(resp.data["source"], "live")
+        self.assertEqual(resp.data["match"]["user_id"], "450")
+        self.assertEqual(len(self.client_bs.pedidos), 3)
+
+    def test_con_indice_no_consulta_biostar(self):
+        idx.indexar_equipo(self.client_bs, 7)
+        self.client_bs.pedidos.clear()
+        resp = self.api.get("/api/biostar/devices/7/users/?document=450")
+        self.assertEqual(resp.data["source"], "index")
+        self.assertEqual(resp.data["match"]["user_id"], "450")
+        self.assertEqual(resp.data["total"], 500)
+        self.assertEqual(self.client_bs.pedidos, [])
+
+    def test_documento_fuera_del_indice_se_busca_en_vivo(self):
+        idx.indexar_equipo(_Client(_rows(400)), 7)
+        self.client_bs.pedidos.clear()
+        resp = self.api.get("/api/biostar/devices/7/users/?document=450")
+        self.assertEqual(resp.data["source"], "live")
+        self.assertEqual(resp.data["match"]["user_id"], "450")
+        # Queda en el índice para la próxima búsqueda.
+        self.assertEqual(idx.buscar(7, "450")["user_id"], "450")
+
+    def test_indice_viejo_se_busca_en_vivo(self):
+        idx.indexar_equipo(self.client_bs, 7)
+        BioStarDevice.objects.filter(device_id=7).update(users_indexed_at=timezone.now() - timedelta(hours=3))
+        self.client_bs.pedidos.clear()
+        resp = self.api.get("/api/biostar/devices/7/users/?document=450")
+        self.assertEqual(resp.data["source"], "live")
+        self.assertEqual(len(self.client_bs.pedidos), 3)
+
+    def test_verify_fuerza_la_consulta_en_vivo(self):
+        idx.indexar_equipo(self.client_bs, 7)
+        resp = self.api.get("/api/biostar/devices/7/users/?document=9999&verify=1")
+        self.assertEqual(resp.data["source"], "live")
+        self.assertIsNone(resp.data["match"])
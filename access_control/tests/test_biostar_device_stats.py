@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import requests
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from access_control.models import BioStarDevice
+from access_control.services import biostar_device_stats as bds
+
+
+class _Client:
+    """discover_userdata de mentira: ``lentos`` se cuelgan hasta ``soltar``."""
+
+    def __init__(self, stats=None, fallas=None, lentos=()):
+        self.stats = dict(stats or {})
+        self.fallas = dict(fallas or {})
+        self.lentos = set(lentos)
+        self.soltar = threading.Event()
+        self.pedidos: list[int] = []
+        self._lock = threading.Lock()
+
+    def discover_device_userdata(self, device_id):
+        with self._lock:
+            self.pedidos.append(device_id)
+        if device_id in self.lentos:
+            self.soltar.wait(5)
+        if device_id in self.fallas:
+            raise self.fallas[device_id]
+        faces, users = self.stats.get(device_id, (0, 0))
+        return {"UserStatistics": {"numFaces": str(faces), "numUsers": str(users)}}
+
+
+@patch.dict(os.environ, {"BIOSTAR_STATS_TIMEOUT_SECONDS": "0.5", "BIOSTAR_STATS_WORKERS": "4"})
+class ConsultarTests(SimpleTestCase):
+    def setUp(self):
+        bds.reset()
+
+    def test_un_equipo_colgado_no_frena_a_los_demas(self):
+        client = _Client(stats={1: (10, 12), 2: (20, 22)}, lentos={3})
+        t0 = time.monotonic()
+        res = bds.consultar(client, [1, 2, 3])
+        client.soltar.set()
+        self.assertLess(time.monotonic() - t0, 2.0)
+        self.assertEqual((res[1]["num_faces"], res[2]["num_users"]), (10, 22))
+        self.assertIn("Sin respuesta", res[3]["error"])
+
+    def test_el_plazo_es_de_cada_equipo_no_de_la_tanda(self):
+        # Con 2 hilos y 3 equipos, el colgado arranca enseguida y vence solo:
+        # no se lo espera por las dos tandas.
+        with patch.dict(os.environ, {"BIOSTAR_STATS_WORKERS": "2"}):
+            client = _Client(stats={1: (1, 1), 2: (2, 2)}, lentos={3})
+            t0 = time.monotonic()
+            res = bds.consultar(client, [1, 2, 3])
+            client.soltar.set()
+        self.assertLess(time.monotonic() - t0, 0.9)
+        self.assertEqual(res[2]["num_faces"], 2)
+        self.assertIn("Sin respuesta", res[3]["error"])
+
+    def test_hilos_tomados_por_colgados_abandonan_a_los_que_esperan(self):
+        with patch.dict(os.environ, {"BIOSTAR_STATS_WORKERS": "1"}):
+            client = _Client(stats={2: (2, 2)}, lentos={1})
+            t0 = time.monotonic()
+            res = bds.consultar(client, [1, 2])
+            client.soltar.set()
+        self.assertLess(time.monotonic() - t0, 0.9)
+        self.assertEqual(client.pedidos, [1])
+        self.assertIn("Sin respuesta", res[1]["error"])
+        self.assertIn("Sin respuesta", res[2]["error"])
+
+    def test_falla_conserva_el_ultimo_dato_marcado_stale(self):
+        bds.consultar(_Client(stats={1: (10, 12)}), [1])
+        caido = _Client(fallas={1: requests.ConnectionError("apagado")})
+        filas = bds.snapshot(lambda: caido, [(1, "Puerta")], refrescar=True)
+        self.assertEqual(filas[0]["num_faces"], 10)
+        self.assertTrue(filas[0]["stale"])
+        self.assertIn("apagado", filas[0]["error"])
+        self.assertIsNotNone(filas[0]["age_seconds"])
+
+    def test_snapshot_contesta_de_cache_sin_consultar(self):
+        bds.consultar(_Client(stats={1: (10, 12)}), [1])
+        client = _Client()
+        filas = bds.snapshot(lambda: client, [(1, "Puerta")])
+        self.assertEqual(client.pedidos, [])
+        self.assertEqual(filas[0]["num_users"], 12)
+        self.assertFalse(filas[0]["stale"])
+
+
+class BioStarDeviceStatsAPITests(TestCase):
+    def setUp(self):
+        bds.reset()
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user("op", password="x"))
+        BioStarDevice.objects.create(device_id=1, name="A")
+        BioStarDevice.objects.create(device_id=2, name="B")
+
+    def test_totales_y_equipos_stale(self):
+        client = _Client(stats={1: (5, 6)}, fallas={2: requests.Timeout("timeout")})
+        with patch("access_control.api.v1.api_views.BioStar2Client.from_db_and_env", return_value=client):
+            resp = self.api.get("/api/biostar/devices/stats/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data["total_faces"], resp.data["total_users"]), (5, 6))
+        self.assertEqual(resp.data["stale"], 1)
+        por_id = {s["device_id"]: s for s in resp.data["stats"]}
+        self.assertIsNone(por_id[2]["num_faces"])
+        self.assertTrue(por_id[2]["stale"])
@@ -1,4 +1,5 @@
 from django.test import TestCase
+from django.utils import timezone
 
 from access_control.models import BiostarAccessEvent
 from access_control.services import biostar_events as be
@@ -27,10 +28,12 @@ class ClasificarEventoTests(TestCase):
 
 class _FakeClient:
     """Cliente BioStar de mentira: guarda una lista de eventos crudos y responde
-    events_search filtrando por after_id (id > after_id) y ordenando por id."""
+    events_search filtrando por after_id (id > after_id) o after_datetime y
+    ordenando por id o por fecha."""
 
     def __init__(self, rows):
         self._rows = list(rows)
+        self.pedidos = []
 
     def _id(self, r):
         try:
@@ -38,11 +41,16 @@ class _FakeClient:
         except (TypeError, ValueError):
             return 0
 
-    def events_search(self, *, device_id=None, after_id=None, limit=200, order_column="id", descending=False):
+    def events_search(self, *, device_id=None, after_id=None, after_datetime=None, limit=200,
+                      order_column="id", descending=False):
+        self.pedidos.append("delta" if after_datetime is not None else "tail")
         rows = self._rows
         if after_id is not None:
             rows = [r for r in rows if self._id(r) > int(after_id)]
-        rows = sorted(rows, key=self._id, reverse=bool(descending))
+        if after_datetime is not None:
+            rows = [r for r in rows if be._fecha_evento(r) >= after_datetime]
+        clave = (lambda r: (be._fecha_evento(r), self._id(r))) if order_column == "datetime" else self._id
+        rows = sorted(rows, key=clave, reverse=bool(descending))
         return rows[: int(limit)]
 
 
@@ -59,6 +67,7 @@ def _ev(eid, code, *, user="916671", dev="538150641", name="Facial_Ombues_1", ts
 
 class IngestNewEventsTests(TestCase):
     def setUp(self):
+        be.olvidar_vistos()
         self.types = {
             "4867": "IDENTIFY_SUCCESS_FACE",
             "6147": "AUTH_FAILED_TIMEOUT",
@@ -109,3 +118,101 @@ class IngestNewEventsTests(TestCase):
         nuevos, mx = be.ingest_backfill(client, self.types, limit=1000)
         self.assertEqual(nuevos, 2)
         self.assertEqual(mx, 399603)
+
+
+class IngestRecentTests(TestCase):
+    def setUp(self):
+        be.olvidar_vistos()
+        self.types = {"4867": "IDENTIFY_SUCCESS_FACE", "8704": "UPDATE_SUCCESS"}
+        ahora = timezone.now().strftime("%Y-%m-%dT%H:%M:%S.00Z")
+        self.rows = [
+            _ev(500, "4867", user="916671", dev="111", ts=ahora),
+            _ev(501, "8704", user=None, ts=ahora),
+            _ev(502, "4867", user="916671", dev="222", ts=ahora),
+        ]
+
+    def test_orden_cronologico_y_ciclo_ocioso_sin_queries(self):
+        client = _FakeClient(self.rows)
+        self.assertEqual(be.ingest_recent(client, self.types), 2)
+        # El 500 pasó primero: el 502, en otro equipo dentro de la ventana, es el conflicto.
+        self.assertEqual(BiostarAccessEvent.objects.get(biostar_id="500").conflicto_molinete, "")
+        self.assertEqual(BiostarAccessEvent.objects.get(biostar_id="502").conflicto_molinete, "Facial 111")
+        with self.assertNumQueries(0):
+            self.assertEqual(be.ingest_recent(client, self.types), 0)
+
+    def test_ids_ya_guardados_se_resuelven_en_una_query(self):
+        be.ingest_recent(_FakeClient(self.rows), self.types)
+        be.olvidar_vistos()  # p. ej. tras reiniciar el poller
+        with self.assertNumQueries(1):
+            self.assertEqual(be.ingest_recent(_FakeClient(self.rows), self.types), 0)
+
+
+def _ts(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.00Z")
+
+
+class IngestHybridTests(TestCase):
+    def setUp(self):
+        be.olvidar_vistos()
+        be.ingest_lag(reset=True)
+        self.types = {"4867": "IDENTIFY_SUCCESS_FACE"}
+        self.t0 = timezone.now() - timezone.timedelta(minutes=5)
+        self.client = _FakeClient([_ev(10, "4867", dev="111", ts=_ts(self.t0))])
+        self.cursor = be.CursorEventos(verificar_cada=3600)
+
+    def test_arranca_en_tail_y_despues_pide_solo_lo_nuevo(self):
+        self.assertEqual(be.ingest_hybrid(self.client, self.types, self.cursor), 1)
+        self.assertEqual(self.cursor.modo, "delta")
+        self.client._rows.append(_ev(11, "4867", dev="111", ts=_ts(self.t0 + timezone.timedelta(minutes=1))))
+        self.assertEqual(be.ingest_hybrid(self.client, self.types, self.cursor), 1)
+        self.assertEqual(self.client.pedidos, ["tail", "delta"])
+        self.assertEqual(self.cursor.marca, self.t0.replace(microsecond=0) + timezone.timedelta(minutes=1))
+        self.assertEqual(BiostarAccessEvent.objects.count(), 2)
+        self.assertEqual(be.ingest_lag()["n"], 2)
+
+    def test_hueco_detectado_en_la_verificacion_vuelve_a_tail(self):
+        be.ingest_hybrid(self.client, self.types, self.cursor)
+        # Un equipo descarga su buffer con una fecha anterior a la marca: el delta no lo ve.
+        self.client._rows.append(_ev(12, "4867", dev="222", ts=_ts(self.t0 - timezone.timedelta(minutes=2))))
+        self.assertEqual(be.ingest_hybrid(self.client, self.types, self.cursor), 0)
+        self.cursor.ultima_verificacion = 0.0  # toca verificar
+        with self.assertLogs("access_control.services.biostar_events", "WARNING"):
+            self.assertEqual(be.ingest_hybrid(self.client, self.types, self.cursor), 1)
+        self.assertEqual(self.cursor.huecos, 1)
+        self.assertEqual(self.cursor.modo, "tail")
+
+    def test_equipo_con_reloj_atrasado_no_fuerza_tail_en_cada_verificacion(self):
+        be.ingest_hybrid(self.client, self.types, self.cursor)
+        atraso = timezone.timedelta(minutes=3)
+        for bid in (20, 21):
+            self.client._rows.append(_ev(bid, "4867", dev="222", ts=_ts(self.t0 - atraso)))
+            self.cursor.ultima_verificacion = 0.0  # toca verificar
+            self.cursor.tail_hasta = 0.0  # terminó el castigo anterior
+            with self.assertLogs("access_control.services.biostar_events", "WARNING"):
+                self.assertEqual(be.ingest_hybrid(self.client, self.types, self.cursor), 1)
+        # Se guardaron y contaron los dos, pero sólo el primero mandó a tail.
+        self.assertEqual(self.cursor.huecos, 2)
+        self.assertEqual(self.cursor.modo, "delta")
+        self.assertEqual(list(self.cursor.castigados), [222])
+        # Otro equipo sí vuelve a poner el modo tail.
+        self.client._rows.append(_ev(22, "4867", dev="333", ts=_ts(self.t0 - atraso)))
+        self.cursor.ultima_verificacion = 0.0
+        with self.assertLogs("access_control.services.biostar_events", "WARNING"):
+            be.ingest_hybrid(self.client, self.types, self.cursor)
+        self.assertEqual(self.cursor.modo, "tail")
+
+    def test_evento_normal_en_la_verificacion_no_es_hueco(self):
+        be.ingest_hybrid(self.client, self.types, self.cursor)
+        self.client._rows.append(_ev(13, "4867", dev="111", ts=_ts(self.t0 + timezone.timedelta(seconds=30))))
+        self.cursor.ultima_verificacion = 0.0  # toca verificar
+        del self.client.pedidos[:]
+        self.assertEqual(be.ingest_hybrid(self.client, self.types, self.cursor), 1)
+        self.assertEqual(self.client.pedidos, ["delta", "tail"])
+        self.assertEqual((self.cursor.huecos, self.cursor.modo), (0, "delta"))
+
+    def test_retardo_de_ingesta(self):
+        be.ingest_hybrid(self.client, self.types, self.cursor)
+        lag = be.ingest_lag(reset=True)
+        self.assertEqual(lag["n"], 1)
+        self.assertGreaterEqual(lag["max_s"], 299)
+        self.assertEqual(be.ingest_lag(), {"n": 0})
@@ -0,0 +1,68 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from access_control.models import BioStarUser
+
+
+class _Client:
+    def __init__(self, rows):
+        self.rows = rows
+        self.offsets: list[int] = []
+
+    def list_users(self, *, limit=200, offset=0):
+        self.offsets.append(offset)
+        return {"UserCollection": {"total": str(len(self.rows)), "rows": self.rows[offset:offset + limit]}}
+
+
+def _rows(ids):
+    return [{"user_id": str(i), "name": f"Socio {i}"} for i in ids]
+
+
+class SyncUsersTests(TestCase):
+    def _sync(self, rows, *args):
+        client = _Client(rows)
+        out = StringIO()
+        with patch(
+            "access_control.management.commands.biostar_sync_users.BioStar2Client.from_db_and_env",
+            return_value=client,
+        ):
+            call_command("biostar_sync_users", "--limit", "50", *args, stdout=out)
+        return client, out.getvalue()
+
+    def test_trae_todas_las_paginas(self):
+        client, out = self._sync(_rows(range(1, 121)))
+        self.assertEqual(sorted(client.offsets), [0, 50, 100])
+        self.assertEqual(BioStarUser.objects.filter(is_active=True).count(), 120)
+        self.assertIn("created=120", out)
+
+    def test_solo_reescribe_lo_que_cambio_y_desactiva_faltantes(self):
+        self._sync(_rows(range(1, 11)))
+        rows = _rows(range(2, 11))
+        rows[0]["name"] = "Cambiado"
+        visto = BioStarUser.objects.get(user_id=5).last_seen_at
+        # actuales + upsert + desactivar + last_seen_at (+ savepoint y release)
+        with self.assertNumQueries(6):
+            _, out = self._sync(rows)
+        self.assertIn("updated=1 unchanged=8 deactivated=1", out)
+        self.assertGreater(BioStarUser.objects.get(user_id=5).last_seen_at, visto)
+        self.assertLess(BioStarUser.objects.get(user_id=1).last_seen_at, BioStarUser.objects.get(user_id=5).last_seen_at)
+        self.assertFalse(BioStarUser.objects.get(user_id=1).is_active)
+        self.assertEqual(BioStarUser.objects.get(user_id=2).name, "Cambiado")
+
+    def test_vuelve_a_activar_al_que_reaparece(self):
+        self._sync(_rows([1, 2]))
+        self._sync(_rows([2]))
+        _, out = self._sync(_rows([1, 2]))
+        self.assertTrue(BioStarUser.objects.get(user_id=1).is_active)
+        self.assertIn("updated=1", out)
+
+    def test_pasada_parcial_o_vacia_no_desactiva(self):
+        self._sync(_rows(range(1, 121)))
+        self._sync(_rows(range(1, 121)), "--max-pages", "1")
+        visto = BioStarUser.objects.get(user_id=120).last_seen_at
+        self._sync([])
+        self.assertEqual(BioStarUser.objects.filter(is_active=True).count(), 120)
+        self.assertEqual(BioStarUser.objects.get(user_id=120).last_seen_at, visto)
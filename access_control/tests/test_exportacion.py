@@ -0,0 +1,38 @@
+import csv
+import io
+import zipfile
+
+from django.test import SimpleTestCase
+
+from access_control.services import exportacion
+
+
+class ExportacionTests(SimpleTestCase):
+    def test_columnas_pasada_la_z(self):
+        self.assertEqual(
+            [exportacion.columna(i) for i in (0, 25, 26, 27, 51, 52, 701, 702)],
+            ["A", "Z", "AA", "AB", "AZ", "BA", "ZZ", "AAA"],
+        )
+
+    def test_xlsx_en_varios_envios_es_un_zip_valido(self):
+        filas = ([i, f"<fila {i}>", None] + ["x"] * 27 for i in range(3000))
+        partes = list(exportacion.xlsx(["id", "texto", "vacío"] + [f"c{i}" for i in range(27)], filas, hoja="Prueba"))
+        self.assertGreater(len(partes), 1)
+
+        libro = zipfile.ZipFile(io.BytesIO(b"".join(partes)))
+        self.assertIsNone(libro.testzip())
+        self.assertIn('name="Prueba"', libro.read("xl/workbook.xml").decode())
+        hoja = libro.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertTrue(hoja.rstrip().endswith("</worksheet>"))
+        self.assertIn('<c r="AD1" t="inlineStr"><is><t>c26</t></is></c>', hoja)
+        self.assertIn('<c r="B3001" t="inlineStr"><is><t>&lt;fila 2999&gt;</t></is></c>', hoja)
+        self.assertIn('<c r="C2" t="inlineStr"><is><t></t></is></c>', hoja)
+        self.assertEqual(hoja.count("<row "), 3001)
+
+    def test_csv(self):
+        contenido = b"".join(exportacion.csv(["a", "b"], [[1, "coma, dentro"], [None, "ñ"]])).decode("utf-8-sig")
+        self.assertEqual(list(csv.reader(io.StringIO(contenido))), [["a", "b"], ["1", "coma, dentro"], ["", "ñ"]])
+
+    def test_respuesta_rechaza_formato_desconocido(self):
+        with self.assertRaises(ValueError):
+            exportacion.respuesta("pdf", [], [], nombre="x")
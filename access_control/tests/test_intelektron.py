@@ -0,0 +1,369 @@
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from access_control.models import IntelektronEvent, PasoPendiente
+from access_control.services import paso_pendiente as pp
+from access_control.services.intelectron import marcas
+from access_control.services.intelectron.api3000_wrapper.api3000.errors import Api3000NativeError
+from access_control.services.intelectron.api3000_wrapper.api3000.structs import MarkRecord
+from access_control.services.intelectron import supervisor as sup
+from access_control.services.intelectron import servidor
+from access_control.services.intelectron.servidor import Sesion, ServidorMarcas
+from access_control.services.watchdog import WatchdogTimeout
+from institutions.models import AccessDoor, DoorController
+from xsys.models import XsysControlador, XsysSocio
+from xsys.services import topologia
+
+
+def _mark(access_id, *, minute=0, seconds=0, event_code=1, direction=200):
+    return {
+        "access_id": access_id, "event_code": event_code, "direction": direction, "source": 1,
+        "timestamp": {"year": 26, "month": 10, "day": 17, "hour": 10, "minute": minute, "seconds": seconds},
+    }
+
+
+def _mark_ahora(access_id, *, hace=0):
+    """Marca con la hora de equipo de hace ``hace`` segundos."""
+    t = timezone.localtime() - timezone.timedelta(seconds=hace)
+    mark = _mark(access_id, minute=t.minute, seconds=t.second)
+    mark["timestamp"].update(year=t.year % 100, month=t.month, day=t.day, hour=t.hour)
+    return mark
+
+
+def _native(access_id, seconds):
+    """Marca como la devuelve el wrapper (``list_mark_records``)."""
+    return MarkRecord(access_id=access_id, hour=10, minute=0, seconds=seconds, year=26, month=10, day=17,
+                      event_code=1, source=1, direction=200)
+
+
+class GuardarTests(TestCase):
+    def setUp(self):
+        topologia.invalidar(avisar=False)
+
+    def test_deduplica_en_lote_y_entre_tandas(self):
+        tanda = [_mark(1, seconds=1), _mark(1, seconds=1), _mark(2, seconds=2)]
+        self.assertEqual(marcas.guardar(tanda, device_ip="nodo1", dest_node=1), 2)
+        self.assertEqual(marcas.guardar(tanda, device_ip="nodo1", dest_node=1), 0)
+        # La misma marca en otra placa es otro evento.
+        self.assertEqual(marcas.guardar(tanda[:1], device_ip="nodo2", dest_node=2), 1)
+        ev = IntelektronEvent.objects.get(device_ip="nodo1", access_id=1)
+        self.assertEqual((ev.event_name, ev.direction_name), ("OK", "Entrada"))
+        self.assertEqual(ev.device_time.year, 2026)
+
+    def test_registros_dan_las_mismas_claves_que_las_marcas(self):
+        from access_control.services.intelectron.api3000_console import _serialize_mark
+
+        reg = _native(9, 30)
+        nativa = SimpleNamespace(access_id=9, event_code=1, direction=200, source=1, date_time=reg)
+        mark = _serialize_mark(nativa)
+        self.assertEqual(marcas.candidatas_de_registros("nodo1", [reg, reg]),
+                         {marcas.dedupe_key("nodo1", mark): mark})
+        self.assertEqual(marcas.guardar([mark], device_ip="nodo1", dest_node=1), 1)
+        self.assertEqual(marcas.guardar_registros([reg], device_ip="nodo1", dest_node=1), 0)
+
+    def test_paso_pendiente_por_credencial_en_otro_molinete(self):
+        XsysSocio.objects.create(id_cliente=500, credencial_nro="9001")
+        pp.evaluar(500, {"key": "g7", "nombre": "Molinete 7", "door_id": None}, origen="xsys")
+
+        marcas.guardar([_mark_ahora(9001)], device_ip="nodo1", dest_node=1, id_controlador=53)
+
+        ev = IntelektronEvent.objects.get(access_id=9001)
+        self.assertEqual((ev.id_controlador, ev.conflicto_molinete), (53, "Molinete 7"))
+
+    def test_marca_vieja_releida_no_reserva_molinete(self):
+        XsysSocio.objects.create(id_cliente=700, credencial_nro="9100")
+        marcas.guardar([_mark_ahora(9100, hace=3600)], device_ip="nodo1", dest_node=1, id_controlador=53)
+        self.assertFalse(PasoPendiente.objects.exists())
+
+        marcas.guardar([_mark_ahora(9100, hace=1)], device_ip="nodo1", dest_node=1, id_controlador=53)
+        reserva = PasoPendiente.objects.get(pk=700)
+        self.assertLess(reserva.iniciado_en, timezone.now() - timezone.timedelta(milliseconds=500))
+
+    def test_sin_socio_o_sin_controlador_no_evalua(self):
+        marcas.guardar([_mark(77, seconds=4)], device_ip="nodo1", dest_node=1, id_controlador=53)
+        XsysSocio.objects.create(id_cliente=600, credencial_nro="600")
+        marcas.guardar([_mark(600, seconds=5)], device_ip="nodo1", dest_node=1)
+        self.assertEqual(set(IntelektronEvent.objects.values_list("conflicto_molinete", flat=True)), {""})
+        self.assertFalse(PasoPendiente.objects.exists())
+
+
+class _FakeLink:
+    """Link a una placa que guarda ``marcas`` en su memoria."""
+
+    def __init__(self, marcas, *, colgar=None):
+        self.marcas = list(marcas)
+        self.pedidos = []
+        self.cerrado = False
+        self.colgar = colgar
+
+    def list_mark_records(self, *, dest_node, start_position, records_to_list):
+        self.pedidos.append(start_position)
+        if self.colgar is not None:
+            self.colgar.wait(10)
+        items = self.marcas[start_position:start_position + records_to_list]
+        return items, len(items)
+
+    def close(self):
+        self.cerrado = True
+
+
+class SesionTests(TestCase):
+    def setUp(self):
+        topologia.invalidar(avisar=False)
+
+    def test_ciclo_avanza_el_cursor_y_guarda(self):
+        link = _FakeLink([_native(1, 1), _native(2, 2)])
+        sesion = Sesion(link, dest_node=1, etiqueta="nodo1", id_controlador=53, lote=50)
+
+        self.assertEqual(sesion.ciclo(), (2, 2))
+        self.assertEqual(sesion.ciclo(), (0, 0))
+        self.assertEqual(link.pedidos, [0, 2, 1])  # la última verifica que el cursor sigue en rango
+        self.assertEqual(sesion.estado()["marcas"], 2)
+        self.assertEqual(IntelektronEvent.objects.filter(device_ip="nodo1", id_controlador=53).count(), 2)
+
+    def test_memoria_borrada_vuelve_el_cursor_a_cero(self):
+        link = _FakeLink([_native(1, 1), _native(2, 2)])
+        sesion = Sesion(link, dest_node=1, etiqueta="nodo1", lote=50)
+        sesion.ciclo()
+        link.marcas = [_native(3, 3)]
+        with self.assertLogs("access_control.services.intelectron.servidor", "WARNING"):
+            self.assertEqual(sesion.ciclo(), (0, 0))
+        self.assertEqual(sesion.cursor, 0)
+        self.assertEqual(sesion.ciclo(), (1, 1))
+
+    def test_placa_que_no_contesta_abandona_la_sesion_sin_soltar_el_semaforo(self):
+        soltar = threading.Event()
+        link = _FakeLink([], colgar=soltar)
+        sesion = Sesion(link, dest_node=1, etiqueta="nodo1", plazo=0.2)
+        try:
+            with patch.object(servidor, "_semaforo", threading.BoundedSemaphore(1)) as semaforo:
+                with self.assertRaises(WatchdogTimeout):
+                    sesion.ciclo()
+                self.assertTrue(sesion.estado()["llamada_colgada"])
+                self.assertFalse(semaforo.acquire(blocking=False))
+                sesion.cerrar()
+                self.assertFalse(link.cerrado)  # el link sigue tomado por la llamada colgada
+
+                soltar.set()
+                time.sleep(0.05)
+                self.assertTrue(semaforo.acquire(blocking=False))
+                semaforo.release()
+        finally:
+            soltar.set()
+
+
+class _FakeServidorClient:
+    def __init__(self, **kwargs):
+        self.conexiones = []
+        self.links = {}
+
+    def accept(self, *, accept_timeout, rcv_timeout):
+        if not self.conexiones:
+            raise TimeoutError("accept timeout")
+        conexion = self.conexiones.pop(0)
+        if isinstance(conexion, Exception):
+            raise conexion
+        return conexion
+
+    def for_link(self, h_link):
+        self.links[h_link] = _FakeLink([])
+        return self.links[h_link]
+
+
+class ServidorMarcasTests(TestCase):
+    def test_aceptar_arma_sesion_y_reemplaza_reconexion(self):
+        servidor = ServidorMarcas(port=3002, nodos={4: 61, "10.0.0.61": 62}, client_factory=_FakeServidorClient)
+        self.assertIsNone(servidor.aceptar())
+
+        servidor.client.conexiones = [
+            {"h_link": 11, "dest_node": 4, "port": 40001, "ip": "10.0.0.60"},
+            {"h_link": 12, "dest_node": 4, "port": 40002, "ip": "10.0.0.61"},
+            {"h_link": 13, "dest_node": 4, "port": 40003, "ip": "10.0.0.60"},
+        ]
+        primera = servidor.aceptar()
+        self.assertEqual((primera.etiqueta, primera.dest_node, primera.id_controlador), ("10.0.0.60", 4, 61))
+        self.assertIs(primera.client, servidor.client.links[11])
+
+        # Otra placa con el mismo nodo no desplaza a la primera.
+        otra = servidor.aceptar()
+        self.assertEqual(otra.id_controlador, 62)
+        self.assertIs(servidor.sesiones[("10.0.0.60", 4)], primera)
+
+        segunda = servidor.aceptar()
+        self.assertIs(servidor.sesiones[("10.0.0.60", 4)], segunda)
+        self.assertFalse(primera.viva())
+        self.assertEqual([e["placa"] for e in servidor.estado()], ["10.0.0.60", "10.0.0.61"])
+
+
+    def test_accept_que_falla_no_es_timeout_y_espera_antes_de_reintentar(self):
+        servidor = ServidorMarcas(port=3002, client_factory=_FakeServidorClient)
+        servidor.client.conexiones = [Api3000NativeError(code=1026, operation="itk_accept")]
+        self.assertIsNone(servidor.aceptar())
+
+        servidor.client.conexiones = [OSError("socket de escucha cerrado")] * 5
+        with self.assertRaises(OSError):
+            servidor.aceptar()
+        hilo = threading.Thread(target=servidor._aceptar_loop)
+        with self.assertLogs("access_control.services.intelectron.servidor", "WARNING"):
+            hilo.start()
+            time.sleep(0.3)
+            servidor._stop.set()
+            hilo.join(2)
+        self.assertEqual(len(servidor.client.conexiones), 3)  # un solo intento, no un loop
+
+
+class RegistroTests(TestCase):
+    def test_molinetes_asignados_con_ip(self):
+        door = AccessDoor.objects.create(name="Alcorta")
+        for id_ctrl, tipo_cont, ip, activo in [
+            (53, "K", "10.0.0.60", 1), (54, "K", "10.0.0.61:3005", None), (55, "F", "10.0.0.62", 1),
+            (56, "K", "", 1), (57, "K", "10.0.0.63", 0), (58, "K", "10.0.0.60", 1),
+        ]:
+            XsysControlador.objects.create(id_controlador=id_ctrl, id_acceso=14, tipo_cont=tipo_cont,
+                                           ip=ip, activo=activo)
+            DoorController.objects.create(door=door, id_controlador=id_ctrl)
+        XsysControlador.objects.create(id_controlador=99, id_acceso=14, tipo_cont="K", ip="10.0.0.99", activo=1)
+
+        equipos = sup.registro()
+        self.assertEqual(
+            [(e.ip, e.port, e.id_controlador) for e in equipos],
+            [("10.0.0.60", 3001, 53), ("10.0.0.61", 3005, 54)],
+        )
+
+
+class _FakeOwner:
+    def __init__(self, **kwargs):
+        self.abiertos = []
+        self.tandas = {}
+        self.soltar = threading.Event()
+
+    def open_link(self, conn_string, *, timeout=None):
+        self.abiertos.append(conn_string)
+        if conn_string.startswith("10.0.0.66"):
+            raise OSError("sin respuesta")
+        if conn_string.startswith("10.0.0.67"):
+            self.soltar.wait(10)  # placa que atiende el TCP pero nunca contesta
+        return _FakeLink(self.tandas.get(conn_string, []))
+
+    def uninit_library(self):
+        pass
+
+
+class SupervisorTests(TestCase):
+    def setUp(self):
+        topologia.invalidar(avisar=False)
+
+    def _supervisor(self, equipos, **kwargs):
+        return sup.Supervisor(equipos, lote=2, intervalo=1.0, client_factory=_FakeOwner, sondeo=None, **kwargs)
+
+    def test_lector_sigue_su_cursor_sobre_el_mismo_link(self):
+        s = self._supervisor([sup.Equipo(ip="10.0.0.60", id_controlador=53)])
+        s.client.tandas["10.0.0.60:3001"] = [_native(1, 1), _native(2, 2), _native(3, 3)]
+        lector = s.lectores[("10.0.0.60", 3001, 1)]
+
+        self.assertEqual(lector.ciclo(), (2, 2))
+        self.assertFalse(lector.al_dia)
+        self.assertEqual(lector.ciclo(), (1, 1))
+        self.assertEqual(lector.ciclo(), (0, 0))
+        self.assertEqual(lector.link.pedidos, [0, 2, 3, 2])
+        self.assertEqual(s.client.abiertos, ["10.0.0.60:3001"])
+        self.assertEqual(IntelektronEvent.objects.filter(device_ip="10.0.0.60", id_controlador=53).count(), 3)
+        s.detener()
+
+    def test_ronda_aisla_al_equipo_caido_y_expone_su_salud(self):
+        s = self._supervisor([sup.Equipo(ip="10.0.0.60"), sup.Equipo(ip="10.0.0.66")])
+        with self.assertLogs(sup.logger, "WARNING"):
+            s.ronda()
+        sano, caido = s.estado()
+        self.assertEqual((sano["conectado"], sano["errores"], sano["al_dia"]), (True, 0, True))
+        self.assertIsNotNone(sano["lag_segundos"])
+        self.assertEqual((caido["conectado"], caido["errores"], caido["error"]), (False, 1, "sin respuesta"))
+        self.assertIsNone(caido["lag_segundos"])
+
+        # En espera de reintento: la ronda siguiente no vuelve a abrirlo.
+        s.ronda()
+        self.assertEqual(s.client.abiertos.count("10.0.0.66:3001"), 1)
+        s.detener()
+
+    def test_placa_colgada_conserva_su_lugar_y_no_se_reabre(self):
+        # Con dos lugares, la placa colgada se queda con uno hasta que vuelve y
+        # la sana sigue leyendo con el otro.
+        with patch.object(servidor, "_semaforo", threading.BoundedSemaphore(2)) as semaforo:
+            s = self._supervisor([sup.Equipo(ip="10.0.0.67"), sup.Equipo(ip="10.0.0.60")], plazo=0.3)
+            try:
+                with self.assertLogs(sup.logger, "WARNING"):
+                    s.ronda()
+                sana, colgada = s.estado()
+                self.assertEqual((colgada["ip"], colgada["colgado"], colgada["conectado"]), ("10.0.0.67", True, False))
+                self.assertEqual((sana["conectado"], sana["errores"]), (True, 0))
+                self.assertIsNotNone(sana["lag_segundos"])
+                self.assertTrue(semaforo.acquire(blocking=False))
+                self.assertFalse(semaforo.acquire(blocking=False))
+                semaforo.release()
+
+                # Mientras la llamada abandonada no vuelve, la placa no se vuelve a abrir.
+                for lector in s.lectores.values():
+                    lector.proximo = 0.0
+                with self.assertLogs(sup.logger, "WARNING"):
+                    s.ronda()
+                self.assertEqual(s.client.abiertos.count("10.0.0.67:3001"), 1)
+                s.client.soltar.set()
+                time.sleep(0.05)
+                self.assertFalse(s.lectores[("10.0.0.67", 3001, 1)].colgado)
+                self.assertTrue(semaforo.acquire(blocking=False) and semaforo.acquire(blocking=False))
+                semaforo.release()
+                semaforo.release()
+            finally:
+                s.client.soltar.set()
+                s.detener()
+
+    def test_semaforo_tomado_por_otra_placa_no_la_marca_colgada(self):
+        with patch.object(servidor, "_semaforo", threading.BoundedSemaphore(1)) as semaforo:
+            s = self._supervisor([sup.Equipo(ip="10.0.0.60")], plazo=0.1)
+            lector = s.lectores[("10.0.0.60", 3001, 1)]
+            semaforo.acquire()
+            try:
+                with self.assertRaises(WatchdogTimeout):
+                    lector.ciclo()
+            finally:
+                semaforo.release()
+            self.assertFalse(lector.colgado)
+            self.assertEqual(lector.ciclo(), (0, 0))
+            s.detener()
+
+    def test_baja_en_curso_deja_de_leerse_ya(self):
+        s = self._supervisor([sup.Equipo(ip="10.0.0.60"), sup.Equipo(ip="10.0.0.61")])
+        baja = s.lectores[("10.0.0.61", 3001, 1)]
+        baja.link = link_baja = _FakeLink([])
+        futuro = Future()
+        s._en_curso[("10.0.0.61", 3001, 1)] = (futuro, 0.0, baja)
+
+        self.assertEqual(s.actualizar([sup.Equipo(ip="10.0.0.60")]), (0, 1))
+        self.assertNotIn(("10.0.0.61", 3001, 1), s.lectores)
+        self.assertFalse(link_baja.cerrado)
+        futuro.set_result(0)
+        s.ronda()
+        self.assertTrue(link_baja.cerrado)
+        s.detener()
+
+    def test_actualizar_conserva_cursor_y_cierra_bajas(self):
+        s = self._supervisor([sup.Equipo(ip="10.0.0.60"), sup.Equipo(ip="10.0.0.61")])
+        s.lectores[("10.0.0.60", 3001, 1)].cursor = 40
+        baja = s.lectores[("10.0.0.61", 3001, 1)]
+        baja.link = _FakeLink([])
+        link_baja = baja.link
+
+        altas, bajas = s.actualizar([sup.Equipo(ip="10.0.0.60", id_controlador=53), sup.Equipo(ip="10.0.0.62")])
+
+        self.assertEqual((altas, bajas), (1, 1))
+        self.assertEqual(sorted(s.lectores), [("10.0.0.60", 3001, 1), ("10.0.0.62", 3001, 1)])
+        self.assertEqual(s.lectores[("10.0.0.60", 3001, 1)].cursor, 40)
+        self.assertEqual(s.lectores[("10.0.0.60", 3001, 1)].equipo.id_controlador, 53)
+        self.assertTrue(link_baja.cerrado)
+        s.detener()
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from access_control.models import PasoPendiente
+from access_control.services import paso_pendiente as pp
+
+M1 = {"key": "g1", "nombre": "Molinete 1", "door_id": None}
+M2 = {"key": "g2", "nombre": "Molinete 2", "door_id": None}
+
+
+class EvaluarTests(TestCase):
+    def setUp(self):
+        self.t0 = timezone.now()
+
+    def test_conflicto_en_otro_molinete_dentro_de_la_ventana(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(pp.evaluar(7, M1, cuando=self.t0), "")
+        with self.assertNumQueries(1):
+            self.assertEqual(pp.evaluar(7, M2, cuando=self.t0 + timedelta(seconds=2)), "Molinete 1")
+        # La reserva original no se pisa: un tercer intento sigue señalando la primera.
+        fila = PasoPendiente.objects.get(pk=7)
+        self.assertEqual((fila.molinete_key, fila.iniciado_en), ("g1", self.t0))
+        self.assertEqual(pp.evaluar(7, M2, cuando=self.t0 + timedelta(seconds=3)), "Molinete 1")
+
+    def test_mismo_molinete_o_ventana_vencida_no_es_conflicto(self):
+        pp.evaluar(7, M1, cuando=self.t0)
+        self.assertEqual(pp.evaluar(7, M1, cuando=self.t0 + timedelta(seconds=2)), "")
+        self.assertEqual(pp.evaluar(7, M2, cuando=self.t0 + timedelta(seconds=60)), "")
+        self.assertEqual(PasoPendiente.objects.get(pk=7).molinete_key, "g2")
+
+    def test_camino_orm_da_lo_mismo(self):
+        with mock.patch.object(pp, "_upsert_soportado", return_value=False):
+            self.assertEqual(pp.evaluar(7, M1, cuando=self.t0), "")
+            self.assertEqual(pp.evaluar(7, M2, cuando=self.t0 + timedelta(seconds=2)), "Molinete 1")
+
@@ -240,6 +240,81 @@ MSSQL_XSYS = {
     "WHITELIST_BATCH_PAUSE": _get_float_env("MSSQL_XSYS_WHITELIST_BATCH_PAUSE", 0.15),
 }
 
+# Caché de Django compartida por los workers de gunicorn (en disco): el visor de
+# puertas guarda ahí las columnas armadas de cada puerta. Sin DJANGO_CACHE_DIR
+# queda la LocMemCache por defecto (cada worker arma y guarda las suyas).
+if os.getenv("DJANGO_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("DJANGO_CACHE_DIR"),
+            "OPTIONS": {"MAX_ENTRIES": _get_int_env("DJANGO_CACHE_MAX_ENTRIES", 2000)},
+        }
+    }
+
+# Visor de puertas: las columnas se recalculan cuando entra un paso y, como
+# mucho, cada MAX_STALE_SECONDS (para lo que cambia sin un paso: avisos, cuota).
+XSYS_PUERTA_FEED = {
+    "ENABLED": os.getenv("XSYS_PUERTA_FEED_ENABLED", "1") == "1",
+    "MAX_STALE_SECONDS": _get_float_env("XSYS_PUERTA_FEED_MAX_STALE_SECONDS", 30.0),
+}
+
+# Pool de conexiones MSSQL por proceso (common.mssql_pool) para las consultas
+# sueltas: re-verificación online, AccessCheckAPI, workers de fotos y socios.
+# PING_AFTER: segundos ociosa tras los que se prueba con SELECT 1 antes de usarla.
+MSSQL_POOL = {
+    "ENABLED": os.getenv("MSSQL_POOL_ENABLED", "1") == "1",
+    "MAX_SIZE": _get_int_env("MSSQL_POOL_MAX_SIZE", 8),
+    "MAX_LIFETIME": _get_float_env("MSSQL_POOL_MAX_LIFETIME", 1800.0),
+    "PING_AFTER": _get_float_env("MSSQL_POOL_PING_AFTER", 30.0),
+    "ACQUIRE_TIMEOUT": _get_float_env("MSSQL_POOL_ACQUIRE_TIMEOUT", 10.0),
+}
+
 # Días de vencimiento de la cuota (gracia). El estatuto bloquea al acumular 2
 # cuotas impagas; este es el período de gracia dentro del mes (ej: 1 al 10 → 10).
 XSYS_CUOTA_DIAS_VENCIMIENTO = _get_int_env("XSYS_CUOTA_DIAS_VENCIMIENTO", 10)
+
+# Bitácora de transiciones de la whitelist (/api/xsys/whitelist/changes/): sólo
+# se entregan filas con al menos LAG_SECONDS (una escritura que commitea tarde no
+# queda detrás del cursor) y la barrida completa borra las de más de RETENTION_DAYS.
+XSYS_WHITELIST_CAMBIOS = {
+    "LAG_SECONDS": _get_float_env("WHITELIST_CAMBIOS_LAG_SECONDS", 5.0),
+    "RETENTION_DAYS": _get_int_env("WHITELIST_CAMBIOS_RETENTION_DAYS", 90),
+}
+
+# Caché en memoria de la decisión local (socio + whitelist) por worker. Se vacía
+# cuando otro proceso escribe (contador de versión releído cada CHECK_SECONDS).
+XSYS_DECISION_CACHE = {
+    "ENABLED": os.getenv("XSYS_DECISION_CACHE_ENABLED", "1") == "1",
+    "MAX_ENTRIES": _get_int_env("XSYS_DECISION_CACHE_MAX_ENTRIES", 50000),
+    "CHECK_SECONDS": _get_float_env("XSYS_DECISION_CACHE_CHECK_SECONDS", 1.0),
+}
+
+# Miniatura y variante facial de las fotos: se generan fuera de la sincronización
+# y del pedido del kiosco, en un hilo por proceso. El poller de fotos usa además
+# un pool de WORKERS procesos; los workers web las generan en ese hilo.
+XSYS_IMAGENES = {
+    "ASYNC": os.getenv("XSYS_IMAGENES_ASYNC", "1") == "1",
+    "WORKERS": _get_int_env("XSYS_IMAGENES_WORKERS", 2),
+}
+
+# Copia en disco de las fotos por sha256 (xsys.services.foto_store). Vacío = se
+# sirven desde la base. ACCEL_PREFIX: location interna de nginx (X-Accel-Redirect).
+XSYS_FOTO_STORE = {
+    "DIR": os.getenv("XSYS_FOTO_STORE_DIR", ""),
+    "ACCEL_PREFIX": os.getenv("XSYS_FOTO_STORE_ACCEL_PREFIX", ""),
+}
+
+# Índice en memoria puerta → molinetes → controladores/faciales (visor, buscador
+# y regla de paso pendiente). Se rearma cuando otro proceso cambia la config
+# (contador releído cada CHECK_SECONDS) y, por los nombres de xSys, cada MAX_AGE.
+XSYS_TOPOLOGIA = {
+    "CHECK_SECONDS": _get_float_env("XSYS_TOPOLOGIA_CHECK_SECONDS", 5.0),
+    "MAX_AGE_SECONDS": _get_float_env("XSYS_TOPOLOGIA_MAX_AGE_SECONDS", 300.0),
+}
+
+# Copia local de candidatos ANSES (access_control.services.anses_candidates): el
+# servicio anses-candidates la relee de MSSQL cada TTL_SECONDS.
+ANSES_CANDIDATES = {
+    "TTL_SECONDS": _get_int_env("ANSES_CANDIDATES_TTL_SECONDS", 3600),
+}
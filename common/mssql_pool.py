@@ -0,0 +1,249 @@
+"""Pool de conexiones MSSQL (pyodbc) compartido por proceso.
+
+Las consultas sueltas a xSys (re-verificación online, ``AccessCheckAPI``, los
+workers de fotos y socios) abrían una conexión por consulta y pagaban el login
+completo. No se usa el pooling de ODBC porque tras un corte de red devuelve
+conexiones muertas (por eso los pollers lo apagan). Este pool hace ping al
+sacar una conexión ociosa más de ``PING_AFTER`` s y tras un error, la recicla
+pasado ``MAX_LIFETIME`` y limita a ``MAX_SIZE`` las conexiones en uso por DSN
+(el resto espera hasta ``ACQUIRE_TIMEOUT``).
+
+Cada checkout es de un thread; un checkout anidado en el mismo thread recibe la
+misma conexión. Tras un ``fork`` el hijo arranca con pools vacíos.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _config() -> dict[str, Any]:
+    return getattr(settings, "MSSQL_POOL", {})
+
+
+def enabled() -> bool:
+    return bool(_config().get("ENABLED", True))
+
+
+class PoolTimeoutError(RuntimeError):
+    """No se liberó ninguna conexión del pool dentro de ``ACQUIRE_TIMEOUT``."""
+
+
+class _Slot:
+    __slots__ = ("conn", "created_at", "last_used", "depth")
+
+    def __init__(self, conn) -> None:
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.depth = 0
+
+
+def _close(conn) -> None:
+    try:
+        conn.close()
+    except Exception:  # pragma: no cover - cierre defensivo
+        pass
+
+
+def _ping(conn) -> bool:
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+class ConnectionPool:
+    """Pool de conexiones de UN DSN. ``factory()`` abre una conexión nueva."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        max_size: int = 8,
+        max_lifetime: float = 1800.0,
+        ping_after: float = 30.0,
+        acquire_timeout: float = 10.0,
+        name: str = "mssql",
+    ) -> None:
+        self.factory = factory
+        self.max_size = max(1, int(max_size))
+        self.max_lifetime = float(max_lifetime or 0)
+        self.ping_after = float(ping_after or 0)
+        self.acquire_timeout = float(acquire_timeout or 0)
+        self.name = name
+        self._idle: list[_Slot] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._local = threading.local()
+        self.stats = {"opened": 0, "reused": 0, "discarded": 0}
+
+    # ------------------------------------------------------------ internos
+    def _expired(self, slot: _Slot, now: float) -> bool:
+        return bool(self.max_lifetime) and (now - slot.created_at) >= self.max_lifetime
+
+    def _discard(self, slot: _Slot) -> None:
+        self.stats["discarded"] += 1
+        _close(slot.conn)
+
+    def _take_idle(self) -> _Slot | None:
+        """Conexión ociosa sana (la más reciente primero), o None."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                slot = self._idle.pop()
+            now = time.monotonic()
+            if self._expired(slot, now):
+                self._discard(slot)
+                continue
+            if self.ping_after and (now - slot.last_used) >= self.ping_after and not _ping(slot.conn):
+                logger.info("pool %s: conexión ociosa muerta, se descarta", self.name)
+                self._discard(slot)
+                continue
+            self.stats["reused"] += 1
+            return slot
+
+    def _checkout(self) -> _Slot:
+        timeout = self.acquire_timeout if self.acquire_timeout > 0 else None
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeoutError(
+                f"pool {self.name}: sin conexiones libres tras {self.acquire_timeout:.0f}s "
+                f"({self.max_size} en uso)"
+            )
+        try:
+            slot = self._take_idle()
+            if slot is None:
+                slot = _Slot(self.factory())
+                self.stats["opened"] += 1
+            return slot
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, slot: _Slot, *, failed: bool) -> None:
+        try:
+            keep = not failed or _ping(slot.conn)
+            if keep:
+                try:
+                    # Cierra la transacción implícita que deja abierta pyodbc
+                    # (autocommit off) para que el próximo arranque limpio.
+                    slot.conn.rollback()
+                except Exception:
+                    keep = False
+            now = time.monotonic()
+            if not keep or self._expired(slot, now):
+                self._discard(slot)
+                return
+            slot.last_used = now
+            with self._lock:
+                self._idle.append(slot)
+        finally:
+            self._slots.release()
+
+    # ------------------------------------------------------------- público
+    @contextmanager
+    def connection(self):
+        """Entrega una conexión del pool y la devuelve al salir.
+
+        Reentrante por thread: un checkout anidado reusa la conexión del externo.
+        """
+        slot: _Slot | None = getattr(self._local, "slot", None)
+        if slot is not None:
+            slot.depth += 1
+            try:
+                yield slot.conn
+            finally:
+                slot.depth -= 1
+            return
+
+        slot = self._checkout()
+        slot.depth = 1
+        self._local.slot = slot
+        failed = False
+        try:
+            yield slot.conn
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._local.slot = None
+            self._checkin(slot, failed=failed)
+
+    def close_all(self) -> None:
+        """Cierra las conexiones ociosas (las que están en uso se cierran al volver)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for slot in idle:
+            _close(slot.conn)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def pool_for(key: str, factory: Callable[[], Any], *, name: str = "mssql") -> ConnectionPool:
+    """Pool del proceso para el DSN ``key`` (se crea la primera vez)."""
+    global _pools_pid
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            # Hijo de un fork: los sockets heredados son del padre, no se tocan.
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            cfg = _config()
+            pool = ConnectionPool(
+                factory,
+                max_size=cfg.get("MAX_SIZE", 8),
+                max_lifetime=cfg.get("MAX_LIFETIME", 1800.0),
+                ping_after=cfg.get("PING_AFTER", 30.0),
+                acquire_timeout=cfg.get("ACQUIRE_TIMEOUT", 10.0),
+                name=name,
+            )
+            _pools[key] = pool
+        return pool
+
+
+@contextmanager
+def pooled(key: str, factory: Callable[[], Any], *, name: str = "mssql"):
+    """Conexión del pool de ``key``; con el pool apagado abre y cierra una suelta."""
+    if not enabled():
+        conn = factory()
+        try:
+            yield conn
+        finally:
+            _close(conn)
+        return
+    with pool_for(key, factory, name=name).connection() as conn:
+        yield conn
+
+
+def close_all() -> None:
+    """Cierra las conexiones ociosas de todos los pools (tests, shutdown)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
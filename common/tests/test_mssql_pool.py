@@ -0,0 +1,93 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from common.mssql_pool import ConnectionPool, PoolTimeoutError
+
+
+def _conexion(ping_ok=True):
+    conn = MagicMock()
+    if not ping_ok:
+        conn.cursor.return_value.execute.side_effect = RuntimeError("connection already closed")
+    return conn
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_reusa_la_conexion_entre_checkouts(self):
+        factory = MagicMock(side_effect=lambda: _conexion())
+        pool = ConnectionPool(factory, max_size=2)
+        with pool.connection() as a:
+            pass
+        with pool.connection() as b:
+            pass
+        self.assertIs(a, b)
+        factory.assert_called_once()
+        a.rollback.assert_called()
+        a.close.assert_not_called()
+
+    def test_checkout_anidado_en_el_mismo_thread_reusa(self):
+        pool = ConnectionPool(lambda: _conexion(), max_size=1, acquire_timeout=0.1)
+        with pool.connection() as externa:
+            with pool.connection() as interna:
+                self.assertIs(externa, interna)
+
+    def test_ociosa_muerta_se_descarta_con_ping(self):
+        muerta, nueva = _conexion(ping_ok=False), _conexion()
+        factory = MagicMock(side_effect=[muerta, nueva])
+        pool = ConnectionPool(factory, ping_after=10)
+        with patch("common.mssql_pool.time.monotonic", return_value=100.0):
+            with pool.connection():
+                pass
+        with patch("common.mssql_pool.time.monotonic", return_value=200.0):
+            with pool.connection() as conn:
+                self.assertIs(conn, nueva)
+        muerta.close.assert_called_once()
+
+    def test_error_con_conexion_rota_no_vuelve_al_pool(self):
+        rota = _conexion(ping_ok=False)
+        pool = ConnectionPool(lambda: rota)
+        with self.assertRaises(RuntimeError):
+            with pool.connection():
+                raise RuntimeError("se cortó")
+        self.assertEqual(pool.idle_count(), 0)
+        rota.close.assert_called_once()
+
+    def test_error_con_conexion_sana_vuelve_al_pool(self):
+        pool = ConnectionPool(lambda: _conexion())
+        with self.assertRaises(ValueError):
+            with pool.connection():
+                raise ValueError("error de la consulta, no de la conexión")
+        self.assertEqual(pool.idle_count(), 1)
+
+    def test_vida_maxima_recicla(self):
+        factory = MagicMock(side_effect=lambda: _conexion())
+        pool = ConnectionPool(factory, max_lifetime=60, ping_after=0)
+        with patch("common.mssql_pool.time.monotonic", return_value=0.0):
+            with pool.connection():
+                pass
+        with patch("common.mssql_pool.time.monotonic", return_value=61.0):
+            with pool.connection():
+                pass
+        self.assertEqual(factory.call_count, 2)
+
+    def test_pool_lleno_espera_y_corta_por_timeout(self):
+        pool = ConnectionPool(lambda: _conexion(), max_size=1, acquire_timeout=0.05)
+        tomada = threading.Event()
+        soltar = threading.Event()
+
+        def ocupar():
+            with pool.connection():
+                tomada.set()
+                soltar.wait(2)
+
+        t = threading.Thread(target=ocupar)
+        t.start()
+        tomada.wait(2)
+        try:
+            with self.assertRaises(PoolTimeoutError):
+                with pool.connection():
+                    pass
+        finally:
+            soltar.set()
+            t.join()
@@ -12,6 +12,7 @@ from xsys.models import (
     XsysSocio,
     XsysSocioFoto,
     XsysWhitelist,
+    XsysWhitelistChange,
 )
 
 
@@ -65,6 +66,14 @@ class XsysWhitelistAdmin(admin.ModelAdmin):
     list_filter = ("habilitado", "id_acceso")
 
 
+@admin.register(XsysWhitelistChange)
+class XsysWhitelistChangeAdmin(admin.ModelAdmin):
+    list_display = ("seq", "id_cliente", "habilitado_antes", "habilitado", "motivo_code", "origen", "creado")
+    search_fields = ("id_cliente",)
+    list_filter = ("origen", "habilitado")
+    readonly_fields = [f.name for f in XsysWhitelistChange._meta.fields]
+
+
 @admin.register(XsysNovedad)
 class XsysNovedadAdmin(admin.ModelAdmin):
     list_display = ("id_novedad", "id_cliente", "tipo", "estado_origen", "fecha", "processed_at")
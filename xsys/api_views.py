@@ -5,6 +5,7 @@ import hashlib
 from pathlib import Path
 
 from django.http import HttpResponse
+from django.utils.http import parse_etags
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.generics import ListAPIView
@@ -30,11 +31,12 @@ from xsys.models import (
 from xsys.serializers import (
     XsysSocioLookupSerializer,
     XsysSocioSerializer,
+    XsysWhitelistChangeSerializer,
     XsysWhitelistSerializer,
 )
 from xsys.services import contratos as contratos_svc
-from xsys.services import foto_fetch
-from xsys.services.access import resolver_acceso, resolver_socio
+from xsys.services import foto_fetch, puerta_feed, topologia
+from xsys.services.access import resolver_acceso, resolver_decision
 from xsys.services.cuota import cuota_al_dia
 
 
@@ -45,10 +47,6 @@ def _client_ip(request) -> str:
     return request.META.get("REMOTE_ADDR", "") or "0.0.0.0"
 
 
-def _resolve_socio(*, id_cliente=None, doc=None, credencial=None) -> XsysSocio | None:
-    return resolver_socio(id_cliente=id_cliente, doc=doc, credencial=credencial)
-
-
 def _flag(value, default=True) -> bool:
     if value is None:
         return default
@@ -96,11 +94,10 @@ class SocioLookupAPI(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        socio = _resolve_socio(id_cliente=id_cliente, doc=doc, credencial=credencial)
+        socio, whitelist = resolver_decision(id_cliente=id_cliente, doc=doc, credencial=credencial)
         if socio is None:
             return Response({"detail": "Socio no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-        whitelist = XsysWhitelist.objects.filter(id_cliente=socio.id_cliente).first()
         foto_disponible = XsysSocioFoto.objects.filter(id_cliente=socio.id_cliente).exists()
         if not foto_disponible:
             foto_fetch.request_foto(socio.id_cliente)  # buscar en xSys async
@@ -145,6 +142,35 @@ class SocioWhitelistAPI(APIView):
         return Response(XsysWhitelistSerializer(wl).data)
 
 
+class WhitelistCambiosAPI(APIView):
+    """GET /api/xsys/whitelist/changes/?since=<seq>[&limit=] → transiciones de la lista blanca.
+
+    Devuelve las filas de ``XsysWhitelistChange`` con ``seq > since`` en orden y
+    ``next``, el ``since`` para el próximo pedido. ``more`` indica que quedaron
+    más filas que las del límite. Las transiciones de los últimos
+    ``WHITELIST_CAMBIOS_LAG_SECONDS`` se entregan en un pedido posterior (ver
+    ``cambios_desde``).
+    """
+
+    LIMIT_MAX = 5000
+
+    def get(self, request):
+        from xsys.services.whitelist import cambios_desde
+
+        try:
+            since = int(request.query_params.get("since") or 0)
+            limit = int(request.query_params.get("limit") or 1000)
+        except (TypeError, ValueError):
+            return Response({"detail": "since y limit deben ser enteros."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.LIMIT_MAX))
+        filas, siguiente = cambios_desde(since, limit=limit)
+        return Response({
+            "results": XsysWhitelistChangeSerializer(filas, many=True).data,
+            "next": siguiente,
+            "more": len(filas) == limit,
+        })
+
+
 def _content_type(data: bytes) -> str:
     if data[:2] == b"\xff\xd8":
         return "image/jpeg"
@@ -156,38 +182,84 @@ def _content_type(data: bytes) -> str:
 
 
 class SocioFotoAPI(APIView):
-    """GET /api/xsys/socios/<id_cliente>/foto/[?nro=][?thumb=1] → bytes de la imagen."""
+    """GET /api/xsys/socios/<id_cliente>/foto/[?nro=][?thumb=1] → bytes de la imagen.
+
+    ETag fuerte = sha256 de la foto (más ``-t`` y los parámetros de la
+    miniatura, ver ``images.version_miniatura``): el visor revalida y recibe 304
+    sin que se lea el blob. Los bytes salen del store en
+    disco si está configurado (ver ``foto_store``) y si no, de la base.
+    """
 
     # Pública: la pantalla de puerta (sin login) carga las fotos por esta API.
     permission_classes = [AllowAny]
     authentication_classes = []
 
     def get(self, request, id_cliente: int):
+        from django.db.models import BooleanField, ExpressionWrapper, Q
+
+        from xsys.services import foto_store, images
+
         nro = request.query_params.get("nro")
         thumb = request.query_params.get("thumb") in ("1", "true", "yes")
-        qs = XsysSocioFoto.objects.filter(id_cliente=id_cliente)
-        foto = qs.filter(nro=nro).first() if nro else qs.order_by("nro").first()
-        if foto is None or not foto.imagen:
+        qs = XsysSocioFoto.objects.filter(id_cliente=id_cliente).exclude(imagen=None)
+        qs = qs.filter(nro=nro) if nro else qs.order_by("nro")
+        # Sin blobs: sólo lo necesario para decidir qué mandar.
+        fila = qs.annotate(
+            con_thumb=ExpressionWrapper(Q(thumbnail__isnull=False), output_field=BooleanField())
+        ).values_list("pk", "sha256", "con_thumb").first()
+        if fila is None:
             return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+        pk, sha, con_thumb = fila
 
-        data = None
+        variante = ""
+        provisoria = False
         if thumb:
-            data = bytes(foto.thumbnail) if foto.thumbnail else None
-            if data is None:
-                from xsys.services.images import make_thumbnail
-
-                data = make_thumbnail(bytes(foto.imagen))
-                if data:
-                    # Persistir la miniatura para próximas consultas.
-                    foto.thumbnail = data
-                    foto.save(update_fields=["thumbnail"])
-        if data is None:
-            data = bytes(foto.imagen)  # fallback: imagen completa
-
-        response = HttpResponse(data, content_type=_content_type(data))
-        response["Cache-Control"] = "private, max-age=300"
-        response["Content-Length"] = str(len(data))
-        return response
+            if con_thumb:
+                variante = foto_store.MINIATURA
+            else:
+                # No se genera acá (es el pedido del kiosco): se encola y mientras
+                # tanto va el original, sin caché para que la próxima traiga la miniatura.
+                images.encolar([pk])
+                provisoria = True
+        cache_control = "no-cache" if provisoria else "private, max-age=300"
+
+        # La miniatura lleva sus parámetros: si cambian, los visores no se
+        # quedan con la vieja detrás de un 304.
+        etag = f'"{sha}-{variante}{images.version_miniatura()}"' if variante else f'"{sha}"'
+        if sha and etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            resp = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif sha and foto_store.existe(sha, variante):
+            resp = _foto_desde_store(sha, variante)
+        else:
+            campo = "thumbnail" if variante else "imagen"
+            blob = XsysSocioFoto.objects.filter(pk=pk).values_list(campo, flat=True).first()
+            if not blob:
+                return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+            data = bytes(blob)
+            foto_store.guardar(sha, data, variante)
+            resp = HttpResponse(data, content_type=_content_type(data))
+            resp["Content-Length"] = str(len(data))
+        if sha:
+            resp["ETag"] = etag
+        resp["Cache-Control"] = cache_control
+        return resp
+
+
+def _foto_desde_store(sha: str, variante: str) -> HttpResponse:
+    from django.http import FileResponse
+
+    from xsys.services import foto_store
+
+    path = foto_store.ruta(sha, variante)
+    with open(path, "rb") as fh:
+        tipo = _content_type(fh.read(16))
+    interna = foto_store.url_interna(sha, variante)
+    if interna:
+        # El proxy manda el archivo; gunicorn sólo contesta los headers.
+        resp = HttpResponse(content_type=tipo)
+        resp["X-Accel-Redirect"] = interna
+        return resp
+    return FileResponse(open(path, "rb"), content_type=tipo)
 
 
 # ----------------------------------------------------------------------------
@@ -200,17 +272,32 @@ def _pantalla_token(request) -> str:
     return (request.META.get("HTTP_X_PANTALLA_TOKEN", "") or "").strip()[:64]
 
 
+# Cada cuánto se renueva ``last_seen``: la pantalla pide estado cada ~500 ms y
+# escribir la fila en cada pedido no aporta nada a "cuándo se la vio".
+_LATIDO_PANTALLA_SEGUNDOS = 30
+
+
 def _registrar_pantalla(request) -> PantallaPuerta | None:
-    """Upsert de la pantalla por token; None si no vino token."""
+    """Upsert de la pantalla por token (con su puerta); None si no vino token.
+
+    En régimen es una sola query: la fila se reescribe sólo si cambió la IP o
+    el navegador, o si ``last_seen`` quedó más viejo que el latido.
+    """
     token = _pantalla_token(request)
     if not token:
         return None
     ua = (request.META.get("HTTP_USER_AGENT", "") or "")[:255]
-    pantalla, _ = PantallaPuerta.objects.get_or_create(token=token)
-    PantallaPuerta.objects.filter(pk=pantalla.pk).update(
-        last_seen=timezone.now(), user_agent=ua, ip=_client_ip(request)
-    )
-    pantalla.refresh_from_db()
+    ip = _client_ip(request)
+    now = timezone.now()
+    qs = PantallaPuerta.objects.select_related("door")
+    pantalla = qs.filter(token=token).first()
+    if pantalla is None:
+        pantalla, _ = qs.get_or_create(token=token, defaults={"user_agent": ua, "ip": ip, "last_seen": now})
+        return pantalla
+    viejo = (now - pantalla.last_seen).total_seconds() >= _LATIDO_PANTALLA_SEGUNDOS
+    if viejo or pantalla.ip != ip or pantalla.user_agent != ua:
+        PantallaPuerta.objects.filter(pk=pantalla.pk).update(last_seen=now, user_agent=ua, ip=ip)
+        pantalla.last_seen, pantalla.user_agent, pantalla.ip = now, ua, ip
     return pantalla
 
 
@@ -310,19 +397,23 @@ def _accesos_barrera() -> set[int]:
     )
 
 
-def _ingresos_hoy_por_habilitacion(eventos, barreras: set[int]) -> dict[tuple, int]:
+def _clave_ingreso(ev: ExternalAccessLogEntry, barreras: set[int]) -> tuple | None:
+    """``(socio, habilitación)`` con la que se cuenta un paso por barrera, o None."""
+    if ev.id_cliente and ev.id_acceso in barreras:
+        return (ev.id_cliente, (ev.observacion or "").strip())
+    return None
+
+
+def _ingresos_hoy_por_habilitacion(claves, barreras: set[int]) -> dict[tuple, int]:
     """Cuántas veces ingresó hoy cada socio por barrera CON LA MISMA habilitación.
 
     La habilitación es lo que xSys dejó escrito en ``Observacion`` (p. ej.
     "Habilit. por Produc. Comprado CUOTA SOCIAL"), que es el contrato/producto
     con el que se le abrió. Se cuenta por (socio, habilitación) para que dos
-    contratos distintos lleven cuentas separadas.
+    contratos distintos lleven cuentas separadas. ``claves`` son las de
+    ``_clave_ingreso``.
     """
-    claves = {
-        (e.id_cliente, (e.observacion or "").strip())
-        for e in eventos
-        if e.id_cliente and e.id_acceso in barreras
-    }
+    claves = {c for c in claves if c}
     if not claves:
         return {}
     hoy = timezone.localdate()
@@ -340,6 +431,18 @@ def _ingresos_hoy_por_habilitacion(eventos, barreras: set[int]) -> dict[tuple, i
     return {c: cuenta.get(c, 0) for c in claves}
 
 
+def _refrescar_ingresos(cols: list[dict], barreras: set[int]) -> None:
+    """Recalcula ``ingresos_hoy`` de TODAS las tarjetas del anillo, no sólo las
+    nuevas: un paso por otra barrera con la misma habilitación cambia la cuenta
+    de una tarjeta que ya estaba en pantalla."""
+    claves = {clave for col in cols for _, _, clave in col["items"] if clave}
+    ingresos_hoy = _ingresos_hoy_por_habilitacion(claves, barreras)
+    for col in cols:
+        for _, payload, clave in col["items"]:
+            if clave:
+                payload["ingresos_hoy"] = ingresos_hoy.get(clave)
+
+
 def _evento_payload(ev: ExternalAccessLogEntry, socios: dict, fotos: set, motivos: dict, controladores: dict | None = None, avisos_por_socio: dict | None = None, contratos_por_socio: dict | None = None, barreras: set | None = None, ingresos_hoy: dict | None = None, sin_cuota: dict | None = None) -> dict:
     socio = socios.get(ev.id_cliente)
     tiene_foto = ev.id_cliente in fotos
@@ -511,27 +614,10 @@ class PuertaSeleccionarAPI(APIView):
 
 def _columnas_de_puerta(door: AccessDoor) -> list[dict]:
     """Columnas de una puerta: los grupos de molinetes definidos, o fallback
-    automático = una columna por cada controlador asignado a la puerta."""
-    grupos = list(door.turnstile_groups.order_by("orden", "id"))
-    if grupos:
-        return [
-            {"key": f"g{g.id}", "nombre": g.nombre,
-             "controladores": [int(c) for c in (g.id_controladores or [])],
-             "biostar_devices": [int(d) for d in (g.biostar_device_ids or [])]}
-            for g in grupos
-        ]
-    asignados = list(door.controllers.order_by("orden", "id"))
-    descs = {
-        c.id_controlador: c
-        for c in XsysControlador.objects.filter(pk__in=[a.id_controlador for a in asignados])
-    }
-    cols = []
-    for a in asignados:
-        x = descs.get(a.id_controlador)
-        nombre = x.descripcion if (x and x.descripcion) else f"Ctrl {a.id_controlador}"
-        cols.append({"key": f"c{a.id_controlador}", "nombre": nombre,
-                     "controladores": [a.id_controlador], "biostar_devices": []})
-    return cols
+    automático = una columna por cada controlador asignado a la puerta.
+
+    Salen del índice en memoria (``topologia``); no modificar lo devuelto."""
+    return topologia.columnas(door.id)
 
 
 class PuertaEstadoAPI(APIView):
@@ -557,8 +643,6 @@ class PuertaEstadoAPI(APIView):
                 "visor_version": _version_visor(),
             })
 
-        cols_def = _columnas_de_puerta(door)
-
         # Día a mostrar. Por defecto hoy; con ?fecha=YYYY-MM-DD se puede navegar
         # hacia atrás hasta donde llega la retención local (CD_ES y los eventos
         # faciales se purgan a los 7 días, así que más atrás sólo habría columnas
@@ -566,88 +650,34 @@ class PuertaEstadoAPI(APIView):
         # mande la pantalla.
         dia, minimo, hoy = _dia_pedido(request)
 
-        # Por columna: eventos xSys (por controlador) + accesos faciales BioStar
-        # (por device). Los faciales son la única fuente con identidad por-equipo.
-        xsys_por_col = []
-        facial_por_col = []
-        for cd in cols_def:
-            ctrls = cd["controladores"]
-            xs = list(
-                ExternalAccessLogEntry.objects
-                .filter(id_controlador__in=ctrls, tipo="E", fecha__date=dia)
-                .order_by("-external_id")[: HISTORIAL_LEN + 1]
-            ) if ctrls else []
-            devs = cd.get("biostar_devices") or []
-            # Se filtra/ordena por hora de INGESTA (synced_at ≈ tiempo real del
-            # poll, ~1-2s), NO por la hora reportada por BioStar: su server_datetime
-            # viene ~3h atrasado y algunos equipos driftean el reloj, lo que hacía
-            # que los pasos faciales aparecieran tarde (o cayeran en otro día).
-            fx = list(
-                BiostarAccessEvent.objects
-                .filter(device_id__in=devs, id_cliente__isnull=False, synced_at__date=dia)
-                .order_by("-synced_at")[: HISTORIAL_LEN + 1]
-            ) if devs else []
-            xsys_por_col.append(xs)
-            facial_por_col.append(fx)
-
-        # Resolución en lote de socios / fotos / motivos (ambas fuentes; evita N+1).
-        todos_x = [e for evs in xsys_por_col for e in evs]
-        todos_f = [e for evs in facial_por_col for e in evs]
-        cids = {e.id_cliente for e in todos_x if e.id_cliente}
-        cids |= {e.id_cliente for e in todos_f if e.id_cliente}
-        mids = {e.id_cd_motivo for e in todos_x if e.id_cd_motivo}
-        ctrl_ids = {e.id_controlador for e in todos_x if e.id_controlador}
-        socios = {s.id_cliente: s for s in XsysSocio.objects.filter(pk__in=cids)}
-        # Socios que no están en el espejo local (p.ej. inactivos): traerlos en
-        # segundo plano desde xSys para resolver el nombre en el próximo refresco.
-        faltantes_socio = cids - set(socios)
-        if faltantes_socio:
-            from xsys.services import socio_fetch
-
-            socio_fetch.request_many(faltantes_socio)
-        fotos = set(XsysSocioFoto.objects.filter(id_cliente__in=cids).values_list("id_cliente", flat=True))
-        # Fallback async: los socios sin foto local se buscan en xSys en segundo
-        # plano; la foto aparecerá en un refresco posterior.
-        foto_fetch.request_many(cids - fotos)
-        motivos = {m.id_cd_motivo: m for m in XsysMotivo.objects.filter(pk__in=mids)}
-        ctrls = {c.id_controlador: c for c in XsysControlador.objects.filter(pk__in=ctrl_ids)}
-        # Avisos locales por socio (los que se dejan en /diag-facial): se muestran
-        # en el visor cuando ese socio pasa.
-        avisos_por_socio: dict = {}
-        for a in SocioAviso.objects.filter(id_cliente__in=cids).order_by("-created_at"):
-            avisos_por_socio.setdefault(a.id_cliente, []).append(a.texto)
-        # Contratos vigentes + último pago de cada uno (una sola query al espejo).
-        contratos_por_socio = contratos_svc.resumen_por_socio(cids)
-        # Barreras: se muestra cuántas veces entró hoy con la misma habilitación.
-        sin_cuota = _cuota_no_aplica(cids)
-        barreras = _accesos_barrera()
-        todos_xsys = [e for col in xsys_por_col for e in col]
-        ingresos_hoy = _ingresos_hoy_por_habilitacion(todos_xsys, barreras)
-
-        columnas = []
-        for cd, xs, fx in zip(cols_def, xsys_por_col, facial_por_col):
-            # (fecha, payload) para poder ordenar la mezcla por tiempo (desc).
-            items = [(e.fecha, _evento_payload(e, socios, fotos, motivos, ctrls, avisos_por_socio, contratos_por_socio, barreras, ingresos_hoy, sin_cuota)) for e in xs]
-            # Los faciales se ubican en la línea de tiempo por su hora de ingesta
-            # (real), no por la hora de BioStar (atrasada). Los xSys sí por fecha.
-            items += [(e.synced_at, _facial_evento_payload(e, socios, fotos, avisos_por_socio, contratos_por_socio, sin_cuota)) for e in fx]
-            items.sort(key=lambda t: t[0], reverse=True)
-            payloads = [p for _, p in items[: HISTORIAL_LEN + 1]]
-            columnas.append({
-                "key": cd["key"],
-                "nombre": cd["nombre"],
-                "controladores": cd["controladores"],
-                "biostar_devices": cd.get("biostar_devices") or [],
-                "ultimo": payloads[0] if payloads else None,
-                "historial": payloads[1:],
-            })
-        return Response({
+        # Las columnas sólo cambian cuando entra un paso (ver puerta_feed): si la
+        # pantalla ya tiene esta versión se contesta 304 sin tocar nada más, y si
+        # no, las pantallas de la misma puerta comparten un único cálculo.
+        version = puerta_feed.version(door.id)
+        visor = _version_visor()
+        tag = puerta_feed.etag(
+            door.id, dia, hoy, version, visor, pantalla.ip, pantalla.nombre, door.name, door.xsys_id_acceso
+        )
+        if tag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            resp = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            resp["ETag"] = tag
+            resp["Cache-Control"] = "no-cache"
+            return resp
+
+        # Hoy se mantiene materializado y sólo se suman los pasos nuevos; los
+        # días anteriores ya no cambian y se arman de cero (quedan en caché).
+        columnas = puerta_feed.columnas(
+            door.id, dia, version,
+            construir=lambda: _calcular_columnas(door, dia),
+            actualizar=(lambda previo: _calcular_columnas(door, dia, previo)) if dia == hoy else None,
+        )
+        resp = Response({
             "configurada": True,
             "ip": pantalla.ip,
             "nombre": pantalla.nombre or door.name,
             "puerta": {"id": door.id, "nombre": door.name, "xsys_id_acceso": door.xsys_id_acceso},
             "columnas": columnas,
-            "visor_version": _version_visor(),
+            "visor_version": visor,
             # Navegación por día: la pantalla usa esto para pintar la fecha y
             # habilitar/deshabilitar las flechas sin conocer la retención.
             "dia": dia.isoformat(),
@@ -655,6 +685,130 @@ class PuertaEstadoAPI(APIView):
             "dia_min": minimo.isoformat(),
             "dia_max": hoy.isoformat(),
         })
+        resp["ETag"] = tag
+        # no-cache = "guardalo pero revalidá siempre": el navegador manda solo el
+        # If-None-Match y, ante un 304, le entrega al fetch el cuerpo que ya tenía.
+        resp["Cache-Control"] = "no-cache"
+        return resp
+
+
+def _calcular_columnas(door, dia, previo: dict | None = None) -> dict | None:
+    """Estado de cada columna (molinete) de la puerta para el día ``dia``.
+
+    Devuelve ``{"keys", "cols", "columnas"}``: ``columnas`` es lo que viaja al
+    visor y ``cols`` guarda, por columna, los ítems ya armados y hasta dónde se
+    leyó (``s``: último ``synced_at`` de xSys, ``f``: último ``synced_at``
+    facial).
+
+    Con ``previo`` (lo materializado en la vuelta anterior) sólo se leen y arman
+    los pasos ingeridos o re-sincronizados después de esas marcas y se suman a
+    los que ya estaban (un paso re-sincronizado, p. ej. porque xSys le completó
+    el Id_Cliente, reemplaza a su tarjeta anterior): un paso nuevo cuesta sus
+    propias búsquedas, no las de todo el historial. Devuelve None si cambió la
+    forma de la puerta y hay que rearmar de cero.
+    """
+    cols_def = _columnas_de_puerta(door)
+    keys = [cd["key"] for cd in cols_def]
+    if previo is not None and (previo.get("keys") != keys or any("s" not in c for c in previo["cols"])):
+        return None
+    prev_cols = previo["cols"] if previo is not None else [None] * len(cols_def)
+
+    # Por columna: eventos xSys (por controlador) + accesos faciales BioStar
+    # (por device). Los faciales son la única fuente con identidad por-equipo.
+    xsys_por_col = []
+    facial_por_col = []
+    for cd, prev in zip(cols_def, prev_cols):
+        ctrls = cd["controladores"]
+        xs_qs = ExternalAccessLogEntry.objects.filter(id_controlador__in=ctrls, tipo="E", fecha__date=dia)
+        # La marca de xSys es ``synced_at`` y no el Id_ES: la sincronización
+        # vuelve a escribir (y a sellar) los movimientos recientes, y así entra
+        # también el que ya estaba en pantalla y cambió, no sólo el nuevo.
+        if prev is not None and prev["s"] is not None:
+            xs_qs = xs_qs.filter(synced_at__gt=prev["s"])
+        xs = list(xs_qs.order_by("-external_id")[: HISTORIAL_LEN + 1]) if ctrls else []
+        devs = cd.get("biostar_devices") or []
+        # Se filtra/ordena por hora de INGESTA (synced_at ≈ tiempo real del
+        # poll, ~1-2s), NO por la hora reportada por BioStar: su server_datetime
+        # viene ~3h atrasado y algunos equipos driftean el reloj, lo que hacía
+        # que los pasos faciales aparecieran tarde (o cayeran en otro día).
+        fx_qs = BiostarAccessEvent.objects.filter(device_id__in=devs, id_cliente__isnull=False, synced_at__date=dia)
+        if prev is not None and prev["f"] is not None:
+            fx_qs = fx_qs.filter(synced_at__gt=prev["f"])
+        fx = list(fx_qs.order_by("-synced_at")[: HISTORIAL_LEN + 1]) if devs else []
+        xsys_por_col.append(xs)
+        facial_por_col.append(fx)
+
+    # Resolución en lote de socios / fotos / motivos (ambas fuentes; evita N+1).
+    todos_x = [e for evs in xsys_por_col for e in evs]
+    todos_f = [e for evs in facial_por_col for e in evs]
+    cids = {e.id_cliente for e in todos_x if e.id_cliente}
+    cids |= {e.id_cliente for e in todos_f if e.id_cliente}
+    barreras = _accesos_barrera()
+    if previo is not None and not todos_x and not todos_f:
+        # La versión cambió por un paso de otra puerta: sólo pueden haber
+        # cambiado las cuentas de ingresos de las tarjetas ya armadas.
+        _refrescar_ingresos(previo["cols"], barreras)
+        return previo
+    mids = {e.id_cd_motivo for e in todos_x if e.id_cd_motivo}
+    ctrl_ids = {e.id_controlador for e in todos_x if e.id_controlador}
+    socios = {s.id_cliente: s for s in XsysSocio.objects.filter(pk__in=cids)}
+    # Socios que no están en el espejo local (p.ej. inactivos): traerlos en
+    # segundo plano desde xSys para resolver el nombre en el próximo refresco.
+    faltantes_socio = cids - set(socios)
+    if faltantes_socio:
+        from xsys.services import socio_fetch
+
+        socio_fetch.request_many(faltantes_socio)
+    fotos = set(XsysSocioFoto.objects.filter(id_cliente__in=cids).values_list("id_cliente", flat=True))
+    # Fallback async: los socios sin foto local se buscan en xSys en segundo
+    # plano; la foto aparecerá en un refresco posterior.
+    foto_fetch.request_many(cids - fotos)
+    motivos = {m.id_cd_motivo: m for m in XsysMotivo.objects.filter(pk__in=mids)}
+    ctrls = {c.id_controlador: c for c in XsysControlador.objects.filter(pk__in=ctrl_ids)}
+    # Avisos locales por socio (los que se dejan en /diag-facial): se muestran
+    # en el visor cuando ese socio pasa.
+    avisos_por_socio: dict = {}
+    for a in SocioAviso.objects.filter(id_cliente__in=cids).order_by("-created_at"):
+        avisos_por_socio.setdefault(a.id_cliente, []).append(a.texto)
+    # Contratos vigentes + último pago de cada uno (una sola query al espejo).
+    contratos_por_socio = contratos_svc.resumen_por_socio(cids)
+    sin_cuota = _cuota_no_aplica(cids)
+
+    cols = []
+    for prev, xs, fx in zip(prev_cols, xsys_por_col, facial_por_col):
+        # (fecha, payload, clave de ingresos) para poder ordenar la mezcla por
+        # tiempo (desc) y recontar los ingresos de cada tarjeta.
+        items = [
+            (e.fecha, _evento_payload(e, socios, fotos, motivos, ctrls, avisos_por_socio, contratos_por_socio, barreras, None, sin_cuota), _clave_ingreso(e, barreras))
+            for e in xs
+        ]
+        # Los faciales se ubican en la línea de tiempo por su hora de ingesta
+        # (real), no por la hora de BioStar (atrasada). Los xSys sí por fecha.
+        items += [(e.synced_at, _facial_evento_payload(e, socios, fotos, avisos_por_socio, contratos_por_socio, sin_cuota), None) for e in fx]
+        if prev is not None:
+            releidos = {e.external_id for e in xs}
+            items += [it for it in prev["items"] if it[1]["id_es"] not in releidos]
+        items.sort(key=lambda t: t[0], reverse=True)
+        cols.append({
+            "s": max([e.synced_at for e in xs] + ([prev["s"]] if prev and prev["s"] else []), default=None),
+            "f": max([e.synced_at for e in fx] + ([prev["f"]] if prev and prev["f"] else []), default=None),
+            "items": items[: HISTORIAL_LEN + 1],
+        })
+    # Barreras: se muestra cuántas veces entró hoy con la misma habilitación.
+    _refrescar_ingresos(cols, barreras)
+
+    columnas = []
+    for cd, col in zip(cols_def, cols):
+        payloads = [p for _, p, _ in col["items"]]
+        columnas.append({
+            "key": cd["key"],
+            "nombre": cd["nombre"],
+            "controladores": cd["controladores"],
+            "biostar_devices": cd.get("biostar_devices") or [],
+            "ultimo": payloads[0] if payloads else None,
+            "historial": payloads[1:],
+        })
+    return {"keys": keys, "cols": cols, "columnas": columnas}
 
 
 class AccesosBuscarAPI(APIView):
@@ -939,6 +1093,7 @@ class PuertaControladoresAPI(_ConfigPuertasAPIView):
         DoorController.objects.bulk_create(
             [DoorController(door=door, id_controlador=cid, orden=i) for i, cid in enumerate(ids)]
         )
+        topologia.invalidar()  # bulk_create no dispara post_save
         # Limpiar de los grupos los controladores que ya no están en el pool.
         for g in door.turnstile_groups.all():
             filtrados = [c for c in (g.id_controladores or []) if c in ids]
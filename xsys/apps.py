@@ -5,3 +5,10 @@ class XsysConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "xsys"
     verbose_name = "Interfaz xSys"
+
+    def ready(self):
+        from xsys.services import decision_cache, puerta_feed, topologia
+
+        decision_cache.connect_signals()
+        puerta_feed.connect_signals()
+        topologia.connect_signals()
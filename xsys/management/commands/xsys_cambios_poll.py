@@ -19,6 +19,13 @@ Activo) cuesta **~0,5 s para 223.859 filas**. Siendo tan barato no hace falta
 adivinar quién cambió a partir de las novedades: se compara el padrón completo
 contra nuestro espejo en cada vuelta y se actúa sólo sobre los que difieren.
 
+Las dos fotos (xSys y espejo) son ``xsys.services.padron.Padron``: arrays
+compactos que se comparan por tramos en C. La del espejo se guarda entre vueltas
+(después de aplicar, el espejo ES lo que se leyó de xSys) y se relee de la base
+cada ``--recargar-espejo`` segundos por si otro proceso lo tocó. Con
+``--buckets`` ni siquiera se trae el padrón entero: MSSQL devuelve un
+``CHECKSUM_AGG`` por tramo de ids y se piden sólo los tramos que cambiaron.
+
 Hay una segunda señal, los comprobantes nuevos, porque la habilitación del
 acceso general NO se gatea por cuota (``Flag_Ult_Cuota_Paga=0``): se gana por
 producto comprado, y comprar algo que no sea la cuota social no mueve
@@ -37,6 +44,7 @@ tiempo y no de un cambio de dato.
 
 Uso:
     python manage.py xsys_cambios_poll --interval 20
+    python manage.py xsys_cambios_poll --interval 5 --buckets 2000
     python manage.py xsys_cambios_poll --once --dry-run
 """
 
@@ -72,6 +80,12 @@ class Command(BaseCommand):
                                  "así que puede aparecer alguno fuera de orden.")
         parser.add_argument("--no-biostar", action="store_true",
                             help="No empujar el estado a BioStar (sólo espejo y lista blanca).")
+        parser.add_argument("--buckets", type=int, default=0,
+                            help="Tamaño de tramo de Id_Cliente para comparar por CHECKSUM_AGG y "
+                                 "traer sólo los tramos que cambiaron (default 0 = padrón entero).")
+        parser.add_argument("--recargar-espejo", type=float, default=900.0,
+                            help="Cada cuántos segundos se relee el espejo local y el padrón "
+                                 "entero de xSys (default 900).")
 
     def handle(self, *args, **opts):
         self.stdout.write(self.style.SUCCESS(
@@ -99,26 +113,20 @@ class Command(BaseCommand):
     def _ciclo(self, opts):
         import pyodbc
 
-        from xsys.models import XsysSocio
-        from xsys.services.mssql import connect
+        from xsys.services.mssql import pooled_connection
         from xsys.services.sync import XsysSyncService
 
+        # El pooling de ODBC sigue apagado: devuelve conexiones muertas tras un corte.
         pyodbc.pooling = False
         t0 = time.time()
         service = XsysSyncService()
-        conn = connect()
-        try:
+        # Conexión del pool del proceso: el barrido corre cada ~20 s y reusarla
+        # ahorra el login. El pool la prueba con SELECT 1 si estuvo ociosa y la
+        # descarta si falla, que es lo que el pooling de ODBC no hace.
+        with pooled_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT Id_Cliente, Ult_Cuota_Paga, ISNULL(Activo,0) FROM Clientes")
-            remoto = {int(r[0]): (r[1], int(r[2])) for r in cursor.fetchall()}
-
-            local = {
-                cid: (ucp, act)
-                for cid, ucp, act in XsysSocio.objects.values_list(
-                    "id_cliente", "ult_cuota_paga", "activo")
-            }
-
-            cambiados = set(self._diferencias(remoto, local))
+            remoto, espejo = self._padrones(cursor, opts)
+            cambiados = set(remoto.diferencias(espejo))
             # Segunda señal: comprobantes nuevos. Hace falta porque la habilitación
             # del acceso general NO se gatea por cuota (Flag_Ult_Cuota_Paga=0): se
             # gana por producto comprado, y comprar un producto que no sea la cuota
@@ -127,6 +135,7 @@ class Command(BaseCommand):
             cambiados |= set(self._por_comprobantes(cursor, opts["margen_cbtes"]))
             cambiados = sorted(cambiados)
             if not cambiados:
+                self._espejo = remoto  # sin diferencias: el espejo ya es esto
                 return
 
             if len(cambiados) > opts["max_cambios"]:
@@ -153,11 +162,8 @@ class Command(BaseCommand):
             nc = service.sync_contratos_by_ids(cursor, cambiados)
             self.stdout.write(f"  contratos actualizados: {nc}")
             self._recalcular(cursor, cambiados)
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
+            # Aplicado: el espejo quedó igual a lo que se leyó de xSys.
+            self._espejo = remoto
 
         if not opts["no_biostar"]:
             self._push_biostar(cambiados)
@@ -203,36 +209,41 @@ class Command(BaseCommand):
         SyncState.advance("cbtes", last_id=maximo, rows=len(nuevos))
         return nuevos
 
-    def _diferencias(self, remoto: dict, local: dict) -> list[int]:
-        """Ids cuya cuota o estado activo difieren entre xSys y el espejo.
+    def _padrones(self, cursor, opts):
+        """(foto de xSys, foto del espejo) para esta vuelta.
 
-        Se comparan las fechas por día: ``Ult_Cuota_Paga`` es el mes pagado hasta
-        (día 1), y el espejo la guarda como datetime con zona.
+        El espejo se relee de la base sólo al arrancar y cada
+        ``--recargar-espejo``; en el medio se usa lo que quedó de la vuelta
+        anterior. De xSys se trae todo, salvo con ``--buckets``: ahí se traen
+        sólo los tramos de ids cuyo ``CHECKSUM_AGG`` cambió.
         """
-        from django.utils import timezone
-
-        cambiados: list[int] = []
-        for cid, (ucp_r, act_r) in remoto.items():
-            en_local = local.get(cid)
-            if en_local is None:
-                # Sólo interesan los activos que todavía no espejamos; los
-                # inactivos que nunca tuvimos no aportan nada al control de acceso.
-                if act_r == 1:
-                    cambiados.append(cid)
-                continue
-            ucp_l, act_l = en_local
-            if (act_l or 0) != act_r:
-                cambiados.append(cid)
-                continue
-            d_r = ucp_r.date() if ucp_r else None
-            d_l = timezone.localtime(ucp_l).date() if ucp_l else None
-            if d_r != d_l:
-                cambiados.append(cid)
-        return cambiados
+        from xsys.services import padron
+
+        ahora = time.monotonic()
+        recargar = (
+            getattr(self, "_espejo", None) is None
+            or ahora - getattr(self, "_recargado", 0.0) >= opts["recargar_espejo"]
+        )
+        tamano = opts["buckets"]
+        # Los checksums se piden ANTES que las filas: si algo cambia en el medio,
+        # la vuelta siguiente ve el tramo distinto y lo vuelve a traer.
+        sumas = padron.checksums(cursor, tamano) if tamano else None
+        previo = getattr(self, "_remoto", None)
+        if recargar or sumas is None or previo is None:
+            remoto = padron.Padron.desde_xsys(cursor)
+        else:
+            remoto = previo.copia()
+            for t in padron.tramos_cambiados(self._sumas, sumas):
+                desde, hasta = t * tamano, (t + 1) * tamano
+                remoto.reemplazar_rango(desde, hasta, padron.Padron.desde_xsys(cursor, desde=desde, hasta=hasta))
+        self._remoto, self._sumas = remoto, sumas
+        if recargar:
+            self._espejo = padron.Padron.desde_espejo()
+            self._recargado = ahora
+        return remoto, self._espejo
 
     def _recalcular(self, cursor, ids: list[int]) -> None:
-        from xsys.models import XsysWhitelist
-        from xsys.services.whitelist import persist_whitelist, whitelist_params
+        from xsys.services.whitelist import persist_whitelist_many, whitelist_params
         from xsys.services.whitelist_bulk import (
             compute_habilitacion_bulk,
             get_acceso_flags,
@@ -242,17 +253,12 @@ class Command(BaseCommand):
         id_acceso, _ = whitelist_params()
         flag_ucp, _fe, _d = get_acceso_flags(cursor, id_acceso)
         fecha = server_now(cursor)
-        previo = dict(
-            XsysWhitelist.objects.filter(id_cliente__in=ids).values_list("id_cliente", "habilitado")
-        )
         cambios_hab = 0
         for i in range(0, len(ids), 2000):
             res = compute_habilitacion_bulk(
                 cursor, ids[i:i + 2000], id_acceso=id_acceso, fecha=fecha, flag_ucp=flag_ucp)
-            for cid, r in res.items():
-                persist_whitelist(cid, r)
-                if bool(r["habilitado"]) != previo.get(cid):
-                    cambios_hab += 1
+            cambios = persist_whitelist_many(res, origen="cambios_poll")
+            cambios_hab += sum(1 for cid, antes in cambios.items() if antes != bool(res[cid]["habilitado"]))
         self.stdout.write(f"  habilitación recalculada; cambió en {cambios_hab}")
 
     def _push_biostar(self, ids: list[int]) -> None:
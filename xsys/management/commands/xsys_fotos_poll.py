@@ -16,6 +16,7 @@ import time
 from django.core.management.base import BaseCommand
 
 from common.dbhealth import reset_db_connections
+from xsys.services import images
 from xsys.services.mssql import connect
 from xsys.services.sync import XsysSyncService
 
@@ -33,6 +34,8 @@ class Command(BaseCommand):
         interval = max(30.0, options["interval"])
         reconnect_delay = options["reconnect_delay"]
         service = XsysSyncService()
+        # Las variantes de las fotos que trae este proceso van a un pool de procesos.
+        images.usar_pool()
 
         # Mismo blindaje que xsys_poll: sin pooling de ODBC, cada connect() abre un
         # socket fresco y el reconnect se recupera solo tras un corte de red.
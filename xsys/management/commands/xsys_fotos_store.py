@@ -0,0 +1,50 @@
+"""Mantenimiento de la copia en disco de las fotos (``xsys.services.foto_store``).
+
+Sin opciones exporta al store las fotos (y miniaturas) del espejo que todavía
+no tienen archivo: no hace falta para que funcione —``SocioFotoAPI`` completa
+lo que falta al servirlo— pero evita esa primera lectura de la base por foto.
+
+Con ``--purge`` borra los archivos cuyo sha ya no corresponde a ninguna foto
+(fotos reemplazadas o borradas).
+
+Ejemplos:
+    python manage.py xsys_fotos_store
+    python manage.py xsys_fotos_store --purge
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from xsys.models import XsysSocioFoto
+from xsys.services import foto_store
+
+
+class Command(BaseCommand):
+    help = "Exporta las fotos del espejo al store en disco, o purga los archivos huérfanos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--purge", action="store_true", help="Borra los archivos sin foto vigente.")
+        parser.add_argument("--batch-size", type=int, default=200, help="Fotos por lote de lectura.")
+
+    def handle(self, *args, **options):
+        if not foto_store.enabled():
+            raise CommandError("XSYS_FOTO_STORE_DIR no está configurado.")
+
+        if options["purge"]:
+            vigentes = set(XsysSocioFoto.objects.exclude(sha256="").values_list("sha256", flat=True))
+            borrados = foto_store.purgar(vigentes)
+            self.stdout.write(self.style.SUCCESS(f"Listo. Archivos borrados: {borrados}"))
+            return
+
+        escritos = 0
+        qs = XsysSocioFoto.objects.exclude(imagen=None).exclude(sha256="").order_by("pk")
+        for pk, sha in qs.values_list("pk", "sha256").iterator(chunk_size=options["batch_size"]):
+            # Los blobs se leen de a uno y sólo si falta el archivo.
+            for variante, campo in (("", "imagen"), (foto_store.MINIATURA, "thumbnail")):
+                if foto_store.existe(sha, variante):
+                    continue
+                blob = XsysSocioFoto.objects.filter(pk=pk).values_list(campo, flat=True).first()
+                if blob and foto_store.guardar(sha, bytes(blob), variante):
+                    escritos += 1
+        self.stdout.write(self.style.SUCCESS(f"Listo. Archivos escritos: {escritos}"))
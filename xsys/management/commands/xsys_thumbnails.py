@@ -1,20 +1,27 @@
 """Backfill de miniaturas para fotos ya cargadas en el espejo.
 
-Genera la miniatura (`XsysSocioFoto.thumbnail`) de las fotos existentes sin tener
-que re-sincronizar. Por defecto solo procesa las que aún no tienen miniatura.
+Genera la miniatura (`XsysSocioFoto.thumbnail`) y la variante para BioStar
+(`XsysSocioFoto.rostro`) de las fotos existentes sin tener que re-sincronizar.
+Por defecto solo procesa las que aún no tienen alguna de las dos.
+
+El trabajo de Pillow se reparte en ``--workers`` procesos
+(``images.procesar_fotos``) y se guarda con un ``bulk_update`` por lote.
 
 Ejemplos:
     python manage.py xsys_thumbnails
     python manage.py xsys_thumbnails --all        # regenera todas
     python manage.py xsys_thumbnails --limit 500
+    python manage.py xsys_thumbnails --workers 4
 """
 
 from __future__ import annotations
 
+import os
+
 from django.core.management.base import BaseCommand, CommandError
 
 from xsys.models import XsysSocioFoto
-from xsys.services.images import make_thumbnail, pillow_disponible
+from xsys.services.images import pillow_disponible, procesar_fotos, sin_variantes
 
 
 class Command(BaseCommand):
@@ -27,7 +34,13 @@ class Command(BaseCommand):
             help="Regenera la miniatura aunque ya exista (por defecto solo las faltantes).",
         )
         parser.add_argument("--limit", type=int, default=None, help="Máximo de fotos a procesar.")
-        parser.add_argument("--batch-size", type=int, default=200, help="Tamaño de lote de lectura.")
+        parser.add_argument("--batch-size", type=int, default=200, help="Fotos por lote de lectura/escritura.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(1, (os.cpu_count() or 2) - 1),
+            help="Procesos para generar las imágenes (default: CPUs - 1; 1 = en este proceso).",
+        )
 
     def handle(self, *args, **options):
         if not pillow_disponible():
@@ -35,30 +48,26 @@ class Command(BaseCommand):
 
         qs = XsysSocioFoto.objects.exclude(imagen__isnull=True)
         if not options["all"]:
-            qs = qs.filter(thumbnail__isnull=True)
-        qs = qs.only("id", "imagen").order_by("id")
+            qs = qs.filter(sin_variantes())
+        pks = list(qs.order_by("id").values_list("id", flat=True))
         if options["limit"]:
-            qs = qs[: options["limit"]]
+            pks = pks[: options["limit"]]
 
+        workers = max(1, options["workers"])
+        batch = max(1, options["batch_size"])
         generadas = 0
         omitidas = 0
-        total = 0
-        for foto in qs.iterator(chunk_size=options["batch_size"]):
-            total += 1
-            data = bytes(foto.imagen) if foto.imagen else None
-            thumb = make_thumbnail(data) if data else None
-            if thumb is None:
-                omitidas += 1
-                continue
-            foto.thumbnail = thumb
-            foto.save(update_fields=["thumbnail"])
-            generadas += 1
-            if generadas % 500 == 0:
-                self.stdout.write(f"  ...{generadas} miniaturas generadas")
+        # De a varios lotes por vuelta para poder informar el avance.
+        paso = batch * 5
+        for i in range(0, len(pks), paso):
+            g, o = procesar_fotos(pks[i:i + paso], workers=workers, batch=batch, regenerar=options["all"])
+            generadas += g
+            omitidas += o
+            self.stdout.write(f"  ...{generadas} miniaturas generadas")
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Listo. Procesadas: {total} · generadas: {generadas} · "
+                f"Listo. Procesadas: {len(pks)} · generadas: {generadas} · "
                 f"omitidas (sin imagen/corruptas): {omitidas}"
             )
         )
@@ -15,11 +15,18 @@ lotes (``whitelist_bulk``): ~4-5 minutos en vez de ~1 hora. Antes de escribir
 nada, verifica una muestra contra el camino de a uno; si difiere en un solo
 socio, aborta sin tocar la base.
 
+Con ``--workers N`` el padrón se reparte en N tramos contiguos de ids, cada uno
+con su conexión a xSys, y el tamaño de lote se ajusta solo según cuánto tarda
+cada query (``--objetivo``). Los resultados llegan a un único escritor que los
+va persistiendo por tandas (``persist_whitelist_many``: un upsert por tanda, y
+sólo las filas que cambiaron) mientras la evaluación sigue.
+
 Uso
 ---
     python manage.py xsys_whitelist_full --dry-run        # informe, no escribe
     python manage.py xsys_whitelist_full                  # una barrida
     python manage.py xsys_whitelist_full --loop --interval 1800
+    python manage.py xsys_whitelist_full --workers 8      # barrida en paralelo
     python manage.py xsys_whitelist_full --push-biostar   # además sincroniza BioStar
 """
 
@@ -29,8 +36,7 @@ import logging
 import time
 from django.core.management.base import BaseCommand
 from common.dbhealth import reset_db_connections
-from django.db import close_old_connections, transaction
-from django.utils import timezone
+from django.db import close_old_connections
 
 logger = logging.getLogger(__name__)
 
@@ -40,9 +46,18 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--batch", type=int, default=2000,
-                            help="Socios por query (default 2000).")
+                            help="Socios por query al arrancar; con --objetivo se ajusta "
+                                 "(default 2000, tope 2000 por el límite de parámetros de MSSQL).")
         parser.add_argument("--pause", type=float, default=0.2,
-                            help="Pausa entre lotes, en segundos (default 0.2).")
+                            help="Pausa entre lotes de cada conexión, en segundos (default 0.2).")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Conexiones a xSys en paralelo, cada una con un tramo de ids "
+                                 "(default 1).")
+        parser.add_argument("--objetivo", type=float, default=2.0,
+                            help="Segundos por query hacia los que se ajusta el tamaño de lote "
+                                 "(default 2.0; 0 deja fijo --batch).")
+        parser.add_argument("--write-batch", type=int, default=10000,
+                            help="Resultados que se acumulan antes de escribirlos (default 10000).")
         parser.add_argument("--verify", type=int, default=100,
                             help="Socios a verificar contra el camino de a uno antes de escribir "
                                  "(default 100; 0 desactiva la verificación).")
@@ -80,11 +95,10 @@ class Command(BaseCommand):
     def _run_once(self, opts):
         import pyodbc  # noqa: F401  (import tardío: sólo existe con el driver)
 
-        from xsys.models import XsysWhitelist
         from xsys.services.mssql import connect
-        from xsys.services.whitelist import whitelist_params
+        from xsys.services.whitelist import persist_whitelist_many, whitelist_params
         from xsys.services.whitelist_bulk import (
-            compute_habilitacion_bulk,
+            compute_habilitacion_paralelo,
             get_acceso_flags,
             server_now,
             verify_bulk_against_single,
@@ -129,39 +143,54 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS(
                     f"verificación masivo vs de-a-uno: {v['coinciden']}/{v['muestra']} idénticas"))
 
-            # --- estado previo, para saber qué cambió ---
-            previo = dict(XsysWhitelist.objects.values_list("id_cliente", "habilitado"))
-
             # Un único instante para toda la barrida, tomado del reloj de xSys
             # (no del contenedor, que corre en UTC): si no, socios evaluados en
             # lotes distintos podrían caer a distinto lado de un corte de gracia.
             fecha = server_now(cursor)
             self.stdout.write(f"fecha de evaluación (reloj de xSys): {fecha:%Y-%m-%d %H:%M:%S}")
-            batch = max(1, opts["batch"])
-            resultados: dict[int, dict] = {}
-            for i in range(0, len(ids), batch):
-                trozo = ids[i:i + batch]
-                resultados.update(compute_habilitacion_bulk(
-                    cursor, trozo, id_acceso=id_acceso, fecha=fecha, flag_ucp=flag_ucp))
-                hechos = min(i + batch, len(ids))
-                if (i // batch) % 5 == 0 or hechos == len(ids):
-                    tr = time.time() - t0
-                    self.stdout.write(f"  {hechos}/{len(ids)} ({tr:.0f}s, {hechos/max(tr,1e-9):.0f}/s)")
-                if opts["pause"]:
-                    time.sleep(opts["pause"])
         finally:
             try:
                 conn.close()
             except Exception:
                 pass
 
+        workers = max(1, opts["workers"])
+        escribir = not opts["dry_run"]
+        write_batch = max(1, opts["write_batch"])
+        nuevos_hab: dict[int, bool] = {}
+        pendientes: dict[int, dict] = {}
+        # {id: habilitado previo} de los que cambiaron (None = no tenía fila).
+        cambios: dict[int, bool | None] = {}
+        escritos = 0
+        lotes = 0
+        close_old_connections()
+        for parcial in compute_habilitacion_paralelo(
+            connect, ids,
+            id_acceso=id_acceso, fecha=fecha, flag_ucp=flag_ucp,
+            workers=workers, lote=max(1, opts["batch"]),
+            objetivo=opts["objetivo"], pausa=opts["pause"],
+        ):
+            nuevos_hab.update((cid, bool(r["habilitado"])) for cid, r in parcial.items())
+            pendientes.update(parcial)
+            if len(pendientes) >= write_batch:
+                cambios.update(persist_whitelist_many(pendientes, dry_run=not escribir, origen="full_sweep"))
+                escritos += len(pendientes)
+                pendientes = {}
+            lotes += 1
+            hechos = len(nuevos_hab)
+            if lotes % (5 * workers) == 0 or hechos == len(ids):
+                tr = time.time() - t0
+                self.stdout.write(f"  {hechos}/{len(ids)} ({tr:.0f}s, {hechos/max(tr,1e-9):.0f}/s)")
+        if pendientes:
+            cambios.update(persist_whitelist_many(pendientes, dry_run=not escribir, origen="full_sweep"))
+            escritos += len(pendientes)
+
         # --- diferencias ---
-        nuevos_hab = {cid: bool(r["habilitado"]) for cid, r in resultados.items()}
         # Se separan las filas nuevas de los cambios de opinión: sólo estos
         # últimos son "la whitelist estaba mal", y son los que hay que empujar.
-        sin_fila = sorted(c for c in nuevos_hab if c not in previo)
-        flip_a_si = sorted(c for c, h in nuevos_hab.items() if h and previo.get(c) is False)
-        flip_a_no = sorted(c for c, h in nuevos_hab.items() if not h and previo.get(c) is True)
+        sin_fila = sorted(c for c, antes in cambios.items() if antes is None)
+        flip_a_si = sorted(c for c, antes in cambios.items() if antes is False and nuevos_hab[c])
+        flip_a_no = sorted(c for c, antes in cambios.items() if antes is True and not nuevos_hab[c])
         self.stdout.write(
             f"habilitados: {sum(nuevos_hab.values())} de {len(nuevos_hab)} | "
             f"CORRIGE False→True: {len(flip_a_si)} | CORRIGE True→False: {len(flip_a_no)} | "
@@ -171,16 +200,23 @@ class Command(BaseCommand):
             self.stdout.write(f"  se les devuelve el acceso: {flip_a_si[:15]}")
         if flip_a_no[:15]:
             self.stdout.write(f"  se les quita el acceso   : {flip_a_no[:15]}")
-        pasan_a_si, pasan_a_no = flip_a_si, flip_a_no
 
-        if opts["dry_run"]:
+        if not escribir:
             self.stdout.write(self.style.WARNING("--dry-run: no se escribió la whitelist."))
             return
 
-        close_old_connections()
-        escritos = self._persist(resultados)
         self.stdout.write(self.style.SUCCESS(
-            f"whitelist actualizada: {escritos} filas en {time.time() - t0:.0f}s"))
+            f"whitelist actualizada: {escritos} filas ({len(cambios)} con cambios) en {time.time() - t0:.0f}s "
+            f"({workers} conexión/es)"))
+
+        try:
+            from xsys.services.whitelist import purgar_cambios
+
+            purgadas = purgar_cambios()
+            if purgadas:
+                self.stdout.write(f"bitácora de la whitelist: {purgadas} transiciones viejas borradas")
+        except Exception as exc:  # pragma: no cover - best effort
+            logger.warning("xsys_whitelist_full: no se pudo purgar la bitácora: %s", exc)
 
         if opts["push_biostar"]:
             self._push_biostar()
@@ -200,35 +236,6 @@ class Command(BaseCommand):
         out = sorted(ids)
         return out[:limit] if limit else out
 
-    def _persist(self, resultados: dict[int, dict]) -> int:
-        from xsys.models import XsysWhitelist
-
-        now = timezone.now()
-        objs = [
-            XsysWhitelist(
-                id_cliente=cid,
-                habilitado=bool(r["habilitado"]),
-                motivo_code=r.get("motivo_code"),
-                motivo=(r.get("motivo") or "")[:120],
-                detalle=(r.get("detalle") or "")[:120],
-                id_acceso=r.get("id_acceso"),
-                fecha_calculo=now,
-                synced_at=now,
-            )
-            for cid, r in resultados.items()
-        ]
-        campos = ["habilitado", "motivo_code", "motivo", "detalle", "id_acceso",
-                  "fecha_calculo", "synced_at"]
-        for i in range(0, len(objs), 1000):
-            with transaction.atomic():
-                XsysWhitelist.objects.bulk_create(
-                    objs[i:i + 1000],
-                    update_conflicts=True,
-                    unique_fields=["id_cliente"],
-                    update_fields=campos,
-                )
-        return len(objs)
-
     def _push_biostar(self) -> None:
         """Reconcilia BioStar con la whitelist.
 
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xsys', '0013_xsysacceso_flag_ult_cuota_paga'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XsysWhitelistChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('id_cliente', models.IntegerField(db_index=True)),
+                ('habilitado_antes', models.BooleanField(blank=True, null=True)),
+                ('habilitado', models.BooleanField()),
+                ('motivo_code_antes', models.IntegerField(blank=True, null=True)),
+                ('motivo_code', models.IntegerField(blank=True, null=True)),
+                ('origen', models.CharField(blank=True, choices=[('cambios_poll', 'Poller de cambios'), ('full_sweep', 'Barrida completa'), ('reverify', 'Re-verificación online'), ('recompute', 'Recálculo del sync')], default='', max_length=20)),
+                ('creado', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Cambio de lista blanca (xSys)',
+                'verbose_name_plural': 'Cambios de lista blanca (xSys)',
+                'db_table': 'xsys_whitelist_change',
+                'ordering': ('seq',),
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xsys', '0014_xsyswhitelistchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xsyssociofoto',
+            name='rostro',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
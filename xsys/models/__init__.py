@@ -6,12 +6,13 @@ from .novedad import XsysNovedad
 from .pantalla import PantallaPuerta
 from .socio import XsysSocio
 from .sync_state import SyncState
-from .whitelist import XsysWhitelist
+from .whitelist import XsysWhitelist, XsysWhitelistChange
 
 __all__ = [
     "XsysSocio",
     "XsysSocioFoto",
     "XsysWhitelist",
+    "XsysWhitelistChange",
     "XsysNovedad",
     "SyncState",
     "XsysAcceso",
@@ -15,6 +15,8 @@ class XsysSocioFoto(models.Model):
     nro = models.PositiveSmallIntegerField()
     imagen = models.BinaryField(null=True, blank=True)
     thumbnail = models.BinaryField(null=True, blank=True)
+    # Variante para enrolar en BioStar (ver ``xsys.services.images``).
+    rostro = models.BinaryField(null=True, blank=True)
     sha256 = models.CharField(max_length=64, blank=True, default="", db_index=True)
     fecha = models.DateTimeField(null=True, blank=True)
     synced_at = models.DateTimeField(default=timezone.now)
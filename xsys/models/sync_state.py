@@ -8,7 +8,8 @@ class SyncState(models.Model):
     """High-water marks por stream de sincronización.
 
     Streams: ``novedades`` (max Id_Novedad), ``cd_es`` (max Id_ES),
-    ``fotos`` (max Fecha), ``whitelist`` (fecha del último recálculo).
+    ``fotos`` (max Fecha), ``whitelist`` (fecha del último recálculo),
+    ``anses_candidatos`` (última carga de ``access_control.AnsesCandidate``).
     """
 
     stream = models.CharField(max_length=40, unique=True)
@@ -31,3 +31,38 @@ class XsysWhitelist(models.Model):
     def __str__(self) -> str:  # pragma: no cover - representación auxiliar
         estado = "OK" if self.habilitado else "NO"
         return f"{self.id_cliente} [{estado}] {self.motivo}"
+
+
+class XsysWhitelistChange(models.Model):
+    """Bitácora append-only de transiciones de la lista blanca.
+
+    Se escribe sólo cuando cambia ``habilitado`` o ``motivo_code`` de un socio
+    (no en cada recálculo), en la misma transacción que la fila de
+    ``XsysWhitelist``. ``seq`` es creciente: quien consume (push a BioStar,
+    consistencia, visor) guarda el último que vio y pide ``?since=<seq>``.
+    """
+
+    ORIGENES = (
+        ("cambios_poll", "Poller de cambios"),
+        ("full_sweep", "Barrida completa"),
+        ("reverify", "Re-verificación online"),
+        ("recompute", "Recálculo del sync"),
+    )
+
+    seq = models.BigAutoField(primary_key=True)
+    id_cliente = models.IntegerField(db_index=True)
+    habilitado_antes = models.BooleanField(null=True, blank=True)
+    habilitado = models.BooleanField()
+    motivo_code_antes = models.IntegerField(null=True, blank=True)
+    motivo_code = models.IntegerField(null=True, blank=True)
+    origen = models.CharField(max_length=20, choices=ORIGENES, blank=True, default="")
+    creado = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = "xsys_whitelist_change"
+        verbose_name = "Cambio de lista blanca (xSys)"
+        verbose_name_plural = "Cambios de lista blanca (xSys)"
+        ordering = ("seq",)
+
+    def __str__(self) -> str:  # pragma: no cover - representación auxiliar
+        return f"#{self.seq} {self.id_cliente}: {self.habilitado_antes} → {self.habilitado}"
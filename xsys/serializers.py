@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from rest_framework import serializers
 
-from xsys.models import XsysSocio, XsysSocioFoto, XsysWhitelist
+from xsys.models import XsysSocio, XsysSocioFoto, XsysWhitelist, XsysWhitelistChange
 
 
 class XsysSocioSerializer(serializers.ModelSerializer):
@@ -64,6 +64,21 @@ class XsysWhitelistSerializer(serializers.ModelSerializer):
         )
 
 
+class XsysWhitelistChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = XsysWhitelistChange
+        fields = (
+            "seq",
+            "id_cliente",
+            "habilitado_antes",
+            "habilitado",
+            "motivo_code_antes",
+            "motivo_code",
+            "origen",
+            "creado",
+        )
+
+
 class XsysSocioLookupSerializer(serializers.Serializer):
     """Respuesta combinada del lookup: socio + lista blanca + foto."""
 
@@ -1,17 +1,20 @@
-from .access import resolver_acceso, resolver_socio
-from .mssql import XsysConnectionError, connect, xsys_connection_string, xsys_cursor
+from .access import resolver_acceso, resolver_decision, resolver_socio
+from .mssql import XsysConnectionError, connect, pooled_connection, xsys_connection_string, xsys_cursor
 from .sync import XsysSyncService
-from .whitelist import XsysAccessCheckService, compute_habilitacion, persist_whitelist
+from .whitelist import XsysAccessCheckService, compute_habilitacion, persist_whitelist, persist_whitelist_many
 
 __all__ = [
     "XsysConnectionError",
     "connect",
+    "pooled_connection",
     "xsys_connection_string",
     "xsys_cursor",
     "XsysSyncService",
     "XsysAccessCheckService",
     "compute_habilitacion",
     "persist_whitelist",
+    "persist_whitelist_many",
     "resolver_acceso",
+    "resolver_decision",
     "resolver_socio",
 ]
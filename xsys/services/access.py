@@ -18,6 +18,7 @@ from typing import Any
 
 from xsys.models import XsysSocio, XsysWhitelist
 
+from . import decision_cache
 from .mssql import XsysConnectionError
 from .whitelist import compute_habilitacion, persist_whitelist
 
@@ -46,6 +47,25 @@ def resolver_socio(
     return None
 
 
+def resolver_decision(
+    *, id_cliente=None, doc=None, credencial=None
+) -> tuple[XsysSocio | None, XsysWhitelist | None]:
+    """``(socio, whitelist)`` del espejo local, pasando primero por la caché del worker.
+
+    Los objetos devueltos pueden venir de la caché: son de solo lectura.
+    """
+    key = decision_cache.key_for(id_cliente=id_cliente, doc=doc, credencial=credencial)
+    cacheado = decision_cache.get(key)
+    if cacheado is not None:
+        return cacheado
+    socio = resolver_socio(id_cliente=id_cliente, doc=doc, credencial=credencial)
+    if socio is None:
+        return None, None
+    wl = XsysWhitelist.objects.filter(id_cliente=socio.id_cliente).first()
+    decision_cache.put(key, socio, wl)
+    return socio, wl
+
+
 def resolver_acceso(
     *,
     id_cliente=None,
@@ -64,7 +84,7 @@ def resolver_acceso(
     if not any([id_cliente, doc, credencial]):
         raise ValueError("Debe indicar id_cliente, doc o credencial.")
 
-    socio = resolver_socio(id_cliente=id_cliente, doc=doc, credencial=credencial)
+    socio, wl = resolver_decision(id_cliente=id_cliente, doc=doc, credencial=credencial)
     if socio is None:
         return {
             "found": False,
@@ -76,7 +96,6 @@ def resolver_acceso(
             "detalle": "",
         }
 
-    wl = XsysWhitelist.objects.filter(id_cliente=socio.id_cliente).first()
     local_ok = bool(wl and wl.habilitado)
     motivo_local = wl.motivo if wl else "sin_evaluar"
 
@@ -110,7 +129,7 @@ def resolver_acceso(
         cambio = (res["habilitado"] != local_ok) or (res["motivo"] != motivo_local)
         reverif["cambio"] = cambio
         # Write-through: actualizar el espejo local con el estado fresco.
-        persist_whitelist(socio.id_cliente, res)
+        persist_whitelist(socio.id_cliente, res, origen="reverify")
         result.update(
             {
                 "puede_ingresar": bool(res["habilitado"]),
@@ -0,0 +1,206 @@
+"""Caché en memoria (por worker) de la decisión de acceso local.
+
+Guarda, por proceso, el par ``(socio, whitelist)`` que ``resolver_acceso``
+resolvió, bajo cada clave por la que se lo puede buscar: ``id`` / ``doc`` /
+``cred`` (credencial normalizada). Ahorra las dos idas a Postgres por consulta
+para los socios que se repiten en hora pico.
+
+Quien escribe (``persist_whitelist``, ``_upsert_socios``, la barrida,
+``xsys_cambios_poll``, y ``post_save``/``post_delete`` para el resto) llama a
+``invalidate(ids)`` en su proceso e incrementa ``SyncState('decision_cache')``.
+Los demás procesos releen ese contador como mucho cada ``CHECK_SECONDS`` y, si
+cambió, vacían su caché entera (con 0 se relee en cada consulta).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM = "decision_cache"
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple, tuple[int, Any, Any]]" = OrderedDict()
+# id_cliente -> claves que apuntan a él (para invalidar por socio).
+_keys_by_id: dict[int, set[tuple]] = {}
+_version: int | None = None
+_checked_at = 0.0
+
+
+def _config() -> dict[str, Any]:
+    return getattr(settings, "XSYS_DECISION_CACHE", {})
+
+
+def enabled() -> bool:
+    return bool(_config().get("ENABLED", True))
+
+
+def normalize_credencial(credencial) -> str:
+    return str(credencial).strip().upper()
+
+
+def key_for(*, id_cliente=None, doc=None, credencial=None) -> tuple | None:
+    """Clave de caché con la MISMA precedencia que ``resolver_socio``."""
+    try:
+        if id_cliente:
+            return ("id", int(id_cliente))
+        if doc:
+            return ("doc", int(doc))
+    except (TypeError, ValueError):
+        return None
+    if credencial:
+        return ("cred", normalize_credencial(credencial))
+    return None
+
+
+# ----------------------------------------------------------------- versión
+def _read_version() -> int:
+    from xsys.models import SyncState
+
+    row = SyncState.objects.filter(stream=STREAM).values_list("last_id", flat=True).first()
+    return int(row or 0)
+
+
+def bump_version() -> None:
+    """Avisa a los demás procesos que algo cambió (best-effort, nunca lanza)."""
+    from django.db.models import F
+
+    from xsys.models import SyncState
+
+    try:
+        if not SyncState.objects.filter(stream=STREAM).update(last_id=F("last_id") + 1):
+            SyncState.objects.get_or_create(stream=STREAM, defaults={"last_id": 1})
+    except Exception as exc:  # pragma: no cover - nunca romper una escritura
+        logger.warning("decision_cache: no se pudo incrementar la versión: %s", exc)
+
+
+def _sync_version_locked(now: float) -> None:
+    """Vacía la caché si otro proceso escribió desde la última verificación."""
+    global _version, _checked_at
+    intervalo = float(_config().get("CHECK_SECONDS", 1.0) or 0)
+    if _version is not None and intervalo and (now - _checked_at) < intervalo:
+        return
+    actual = _read_version()
+    _checked_at = now
+    if actual != _version:
+        _entries.clear()
+        _keys_by_id.clear()
+        _version = actual
+
+
+# ------------------------------------------------------------------ lectura
+def get(key: tuple | None):
+    """``(socio, whitelist)`` cacheados para ``key``, o None si no hay entrada."""
+    if key is None or not enabled():
+        return None
+    with _lock:
+        try:
+            _sync_version_locked(time.monotonic())
+        except Exception as exc:  # pragma: no cover - sin base no se arriesga
+            logger.warning("decision_cache: no se pudo leer la versión: %s", exc)
+            return None
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        _entries.move_to_end(key)
+        return entry[1], entry[2]
+
+
+def put(key: tuple | None, socio, whitelist) -> None:
+    """Guarda la decisión resuelta. Sólo se cachean socios encontrados."""
+    if key is None or socio is None or not enabled():
+        return
+    maximo = int(_config().get("MAX_ENTRIES", 50_000) or 0)
+    if maximo <= 0:
+        return
+    with _lock:
+        if _version is None:
+            return  # nunca se leyó la versión: no hay contra qué validar
+        cid = int(socio.id_cliente)
+        _entries[key] = (cid, socio, whitelist)
+        _entries.move_to_end(key)
+        _keys_by_id.setdefault(cid, set()).add(key)
+        while len(_entries) > maximo:
+            viejo, (viejo_cid, _s, _w) = _entries.popitem(last=False)
+            claves = _keys_by_id.get(viejo_cid)
+            if claves is not None:
+                claves.discard(viejo)
+                if not claves:
+                    _keys_by_id.pop(viejo_cid, None)
+
+
+# ------------------------------------------------------------ invalidación
+def keys_of(socio) -> list[tuple]:
+    """Claves por documento/credencial de un socio.
+
+    Hacen falta además del id: si entra un socio nuevo con el mismo documento
+    (o la misma credencial) que uno ya cacheado, la entrada vieja de esa clave
+    queda apuntando al socio equivocado aunque ninguno de los dos ids cambie.
+    """
+    claves = []
+    doc = getattr(socio, "doc_nro", None)
+    if doc:
+        claves.append(("doc", int(doc)))
+    cred = getattr(socio, "credencial_nro", "")
+    if cred:
+        claves.append(("cred", normalize_credencial(cred)))
+    return claves
+
+
+def invalidate(
+    ids: Iterable[int] | None = None,
+    *,
+    keys: Iterable[tuple] = (),
+    bump: bool = True,
+) -> None:
+    """Tira las entradas de ``ids``/``keys`` (o todas, con ids=None) y avisa a los demás procesos."""
+    with _lock:
+        if ids is None:
+            _entries.clear()
+            _keys_by_id.clear()
+        else:
+            for cid in ids:
+                if cid is None:
+                    continue
+                for key in _keys_by_id.pop(int(cid), ()):
+                    _entries.pop(key, None)
+            for key in keys:
+                entry = _entries.pop(key, None)
+                if entry is not None:
+                    claves = _keys_by_id.get(entry[0])
+                    if claves is not None:
+                        claves.discard(key)
+    if bump:
+        bump_version()
+
+
+def clear() -> None:
+    """Vacía la caché local sin tocar la versión compartida (tests, shell)."""
+    global _version, _checked_at
+    with _lock:
+        _entries.clear()
+        _keys_by_id.clear()
+        _version = None
+        _checked_at = 0.0
+
+
+def _on_model_change(sender, instance, **kwargs) -> None:
+    invalidate([getattr(instance, "id_cliente", None)], keys=keys_of(instance))
+
+
+def connect_signals() -> None:
+    """Invalida ante escrituras sueltas por ORM (las masivas llaman a ``invalidate``)."""
+    from django.db.models.signals import post_delete, post_save
+
+    from xsys.models import XsysSocio, XsysWhitelist
+
+    for model in (XsysSocio, XsysWhitelist):
+        post_save.connect(_on_model_change, sender=model, dispatch_uid=f"decision_cache_save_{model.__name__}")
+        post_delete.connect(_on_model_change, sender=model, dispatch_uid=f"decision_cache_delete_{model.__name__}")
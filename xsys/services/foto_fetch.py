@@ -85,6 +85,7 @@ def _worker_loop() -> None:
     # Import diferido: evita ciclos y trabajo en import-time.
     from django.db import connection as django_conn
 
+    from xsys.services import puerta_feed
     from xsys.services.mssql import XsysConnectionError, xsys_cursor
     from xsys.services.sync import XsysSyncService
 
@@ -97,6 +98,8 @@ def _worker_loop() -> None:
                 written = service.sync_fotos_by_ids(cursor, batch)
             if written:
                 logger.info("foto_fetch: %s foto(s) traídas para %s socio(s)", written, len(batch))
+                # La foto ya está: que los visores la muestren sin esperar otro paso.
+                puerta_feed.bump(full=True)
         except XsysConnectionError as exc:
             logger.warning("foto_fetch sin conexión a xSys: %s", exc)
         except Exception as exc:  # pragma: no cover - depende de red/datos
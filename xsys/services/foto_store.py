@@ -0,0 +1,100 @@
+"""Copia de las fotos en disco, por contenido (sha256), para servirlas sin la base.
+
+La base sigue siendo la fuente; acá se guarda ``<DIR>/<sha[:2]>/<sha>`` (y
+``<sha>.t`` para la miniatura). Como el nombre es el contenido, un archivo se
+escribe una vez (temporal + ``os.replace``) y nunca cambia.
+
+``SocioFotoAPI`` lee sólo el ``sha256`` de la fila: contesta 304 con
+``If-None-Match``, manda el archivo con ``FileResponse`` (o ``X-Accel-Redirect``
+con ``ACCEL_PREFIX``) y, si falta, lo deja en disco desde el blob de la base.
+Sin ``XSYS_FOTO_STORE_DIR`` queda apagado. ``xsys_fotos_store`` exporta lo
+existente y borra lo que ya no corresponde a ninguna foto.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MINIATURA = "t"
+
+
+def _config() -> dict[str, Any]:
+    return getattr(settings, "XSYS_FOTO_STORE", {})
+
+
+def enabled() -> bool:
+    return bool(_config().get("DIR"))
+
+
+def ruta(sha: str, variante: str = "") -> Path:
+    nombre = f"{sha}.{variante}" if variante else sha
+    return Path(_config()["DIR"]) / sha[:2] / nombre
+
+
+def url_interna(sha: str, variante: str = "") -> str | None:
+    """Ruta para ``X-Accel-Redirect`` si hay un proxy configurado delante."""
+    prefijo = (_config().get("ACCEL_PREFIX") or "").rstrip("/")
+    if not prefijo:
+        return None
+    nombre = f"{sha}.{variante}" if variante else sha
+    return f"{prefijo}/{sha[:2]}/{nombre}"
+
+
+def existe(sha: str, variante: str = "") -> bool:
+    return enabled() and bool(sha) and ruta(sha, variante).is_file()
+
+
+def guardar(sha: str, data: bytes | None, variante: str = "", *, reemplazar: bool = False) -> bool:
+    """Deja ``data`` en disco bajo ``sha`` (best-effort, nunca lanza).
+
+    ``reemplazar`` es para una variante regenerada (mismo original, otra
+    miniatura); el original nunca cambia bajo el mismo sha.
+    """
+    if not enabled() or not sha or not data:
+        return False
+    destino = ruta(sha, variante)
+    if destino.is_file() and not reemplazar:
+        return True
+    try:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, destino)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError as exc:
+        logger.warning("foto_store: no se pudo guardar %s: %s", destino, exc)
+        return False
+    return True
+
+
+def archivos() -> Iterable[Path]:
+    """Todos los archivos del store (sin temporales)."""
+    if not enabled():
+        return []
+    base = Path(_config()["DIR"])
+    return (p for p in base.glob("??/*") if p.is_file() and not p.name.startswith(".tmp-"))
+
+
+def purgar(shas_vigentes: set[str]) -> int:
+    """Borra los archivos cuyo sha no está en ``shas_vigentes``. Devuelve borrados."""
+    borrados = 0
+    for p in archivos():
+        if p.name.split(".", 1)[0] not in shas_vigentes:
+            try:
+                p.unlink()
+                borrados += 1
+            except OSError as exc:  # pragma: no cover - permisos / carrera
+                logger.warning("foto_store: no se pudo borrar %s: %s", p, exc)
+    return borrados
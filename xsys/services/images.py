@@ -1,9 +1,34 @@
-"""Generación de miniaturas de fotos de socios (Pillow)."""
+"""Generación de miniaturas de fotos de socios (Pillow).
+
+Variantes precalculadas
+-----------------------
+Cada foto del espejo guarda, junto al original, la miniatura del visor
+(``thumbnail``, 96x120) y la variante para enrolar en BioStar (``rostro``, lado
+mayor ``BIOSTAR_FACE_MAX_SIDE``). Antes la miniatura se calculaba dentro de la
+transacción de la sincronización, o en el pedido del kiosco si faltaba, y el
+rostro en cada enrolamiento.
+
+Ahora ninguno de esos caminos toca Pillow: al escribir una foto se dejan las
+variantes vacías y se encola el id (``encolar``). Un hilo por proceso junta los
+ids y los pasa a ``procesar_fotos``, que decodifica cada imagen UNA vez y
+produce las dos variantes. En los pollers que sincronizan fotos (``usar_pool``)
+eso va a un pool de procesos (LANCZOS sobre fotos grandes es CPU pura); en un
+worker web se hace en el mismo hilo de la cola, para no sumar un pool de
+procesos por worker. ``xsys_thumbnails --workers N`` usa la misma función para
+el backfill.
+
+Lo que se pierda de la cola (el proceso termina, la base no responde) queda con
+las variantes en NULL: el kiosco sirve el original y el backfill lo completa.
+"""
 
 from __future__ import annotations
 
 import io
 import logging
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -14,12 +39,22 @@ except ModuleNotFoundError:  # pragma: no cover
 
 # Tamaño máximo de la miniatura (ancho x alto), se conserva aspecto.
 THUMBNAIL_SIZE = (96, 120)
+THUMBNAIL_QUALITY = 80
+# Variante para BioStar: mismo tamaño y calidad que el primer intento de
+# ``biostar_face_sync.enroll_one``.
+FACE_QUALITY = 88
 
 
 def pillow_disponible() -> bool:
     return Image is not None
 
 
+def version_miniatura() -> str:
+    """Parámetros de la miniatura (``96x120q80``); va en su ETag."""
+    ancho, alto = THUMBNAIL_SIZE
+    return f"{ancho}x{alto}q{THUMBNAIL_QUALITY}"
+
+
 def make_thumbnail(data: bytes, size: tuple[int, int] = THUMBNAIL_SIZE) -> bytes | None:
     """Devuelve una miniatura JPEG de ``data`` o None si no se puede generar."""
     if not data or Image is None:
@@ -29,7 +64,7 @@ def make_thumbnail(data: bytes, size: tuple[int, int] = THUMBNAIL_SIZE) -> bytes
             img = img.convert("RGB")
             img.thumbnail(size, Image.LANCZOS)
             out = io.BytesIO()
-            img.save(out, format="JPEG", quality=80, optimize=True)
+            img.save(out, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
             return out.getvalue()
     except Exception as exc:  # pragma: no cover - imágenes corruptas
         logger.warning("no se pudo generar miniatura: %s", exc)
@@ -55,3 +90,204 @@ def resize_for_face(data: bytes, max_side: int = 600, quality: int = 88) -> byte
     except Exception as exc:  # pragma: no cover - imágenes corruptas
         logger.warning("no se pudo redimensionar foto para facial: %s", exc)
         return None
+
+
+def face_max_side() -> int:
+    try:
+        return int(os.getenv("BIOSTAR_FACE_MAX_SIDE", "600"))
+    except (TypeError, ValueError):
+        return 600
+
+
+def _jpeg(img, quality: int) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def variantes(data: bytes, *, face_side: int | None = None) -> tuple[bytes | None, bytes | None]:
+    """``(miniatura, rostro)`` de ``data`` decodificando la imagen una sola vez.
+
+    Con JPEG se usa ``draft`` para que el decodificador ya entregue la imagen
+    reducida (en potencias de 2, nunca por debajo del rostro): una foto de
+    cámara de 4000 px se decodifica a 1000 en vez de a tamaño completo. La
+    miniatura sale del rostro, no del original.
+    """
+    if not data or Image is None:
+        return None, None
+    lado = face_side or face_max_side()
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("RGB", (lado, lado))
+            img = img.convert("RGB")
+            img.thumbnail((lado, lado), Image.LANCZOS)
+            rostro = _jpeg(img, FACE_QUALITY)
+            img.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+            return _jpeg(img, THUMBNAIL_QUALITY), rostro
+    except Exception as exc:  # pragma: no cover - imágenes corruptas
+        logger.warning("no se pudieron generar las variantes de la foto: %s", exc)
+        return None, None
+
+
+def _variantes_de(item: tuple[int, bytes, int]) -> tuple[int, bytes | None, bytes | None]:
+    """Para el pool de procesos: ``(pk, imagen, lado) -> (pk, miniatura, rostro)``."""
+    pk, data, lado = item
+    return (pk, *variantes(data, face_side=lado))
+
+
+# --------------------------------------------------------------------- pool
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    """Pool de procesos del proceso actual (se crea una vez y se reusa).
+
+    ``spawn`` y no ``fork``: el que lo pide puede tener hilos (waitress, el
+    worker de fotos) y un fork con hilos puede dejar locks tomados en el hijo.
+    Los hijos arrancan con ``django.setup()``: importar este módulo carga el
+    paquete ``xsys.services``, que importa modelos.
+    """
+    global _pool, _pool_workers
+    import multiprocessing
+
+    import django
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup,
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def procesar_fotos(pks, *, workers: int = 1, batch: int = 50, regenerar: bool = False) -> tuple[int, int]:
+    """Genera y guarda miniatura y rostro de las fotos ``pks``. Devuelve ``(generadas, omitidas)``.
+
+    Sin ``regenerar`` se saltean las que ya tienen las dos variantes. Con
+    ``workers`` > 1 el trabajo de Pillow va al pool de procesos; la lectura y
+    la escritura quedan en este proceso, de a ``batch`` fotos (son blobs: no
+    conviene traer muchas juntas). Cada foto se escribe condicionada al
+    ``sha256`` leído: una foto reemplazada en el medio no recibe variantes
+    ajenas y se cuenta como omitida.
+    """
+    from xsys.models import XsysSocioFoto
+
+    from . import foto_store
+
+    pks = list(pks)
+    lado = face_max_side()
+    batch = max(1, int(batch))
+    generadas = omitidas = 0
+    for i in range(0, len(pks), batch):
+        qs = XsysSocioFoto.objects.filter(pk__in=pks[i:i + batch]).exclude(imagen=None)
+        if not regenerar:
+            qs = qs.filter(sin_variantes())
+        shas: dict[int, str] = {}
+        items = []
+        for pk, sha, img in qs.values_list("pk", "sha256", "imagen"):
+            if img:
+                shas[pk] = sha
+                items.append((pk, bytes(img), lado))
+        if not items:
+            continue
+        if workers > 1:
+            hechas = list(_executor(workers).map(_variantes_de, items, chunksize=max(1, len(items) // (workers * 2))))
+        else:
+            hechas = [_variantes_de(it) for it in items]
+        for pk, thumb, rostro in hechas:
+            # Sólo si la foto sigue siendo la que se leyó: si el sync la
+            # reemplazó mientras tanto, estas variantes son de la vieja (la
+            # nueva ya quedó encolada con sus variantes en NULL).
+            if not thumb or not XsysSocioFoto.objects.filter(pk=pk, sha256=shas[pk]).update(
+                thumbnail=thumb, rostro=rostro,
+            ):
+                omitidas += 1
+                continue
+            generadas += 1
+            foto_store.guardar(shas[pk], thumb, foto_store.MINIATURA, reemplazar=regenerar)
+    return generadas, omitidas
+
+
+def sin_variantes():
+    """Fotos a las que les falta alguna variante."""
+    from django.db.models import Q
+
+    return Q(thumbnail__isnull=True) | Q(rostro__isnull=True)
+
+
+# -------------------------------------------------------------------- cola
+_queue: "queue.Queue[int]" = queue.Queue(maxsize=10_000)
+_worker_started = False
+_worker_lock = threading.Lock()
+_LOTE_COLA = 50
+# Procesos del pool para la cola de ESTE proceso; 1 = en el hilo de la cola.
+_procesos = 1
+
+
+def _config() -> dict:
+    from django.conf import settings
+
+    return getattr(settings, "XSYS_IMAGENES", {})
+
+
+def usar_pool(workers: int | None = None) -> None:
+    """La cola de este proceso usa un pool de ``workers`` procesos (default ``WORKERS``).
+
+    Sólo para los comandos que sincronizan fotos: cada hijo del pool corre
+    ``django.setup()``, y en los workers web eso multiplicaba la memoria.
+    """
+    global _procesos
+    _procesos = max(1, int(workers if workers is not None else (_config().get("WORKERS", 2) or 1)))
+
+
+def encolar(pks) -> None:
+    """Pide (sin esperar) las variantes de estas fotos. Si la cola está llena se
+    descartan: quedan en NULL y las completa el backfill."""
+    if Image is None or not _config().get("ASYNC", True):
+        return
+    _ensure_worker()
+    for pk in pks:
+        try:
+            _queue.put_nowait(int(pk))
+        except queue.Full:
+            logger.warning("images: cola de variantes llena; se completan con xsys_thumbnails")
+            return
+
+
+def _ensure_worker() -> None:
+    global _worker_started
+    if _worker_started:
+        return
+    with _worker_lock:
+        if _worker_started:
+            return
+        threading.Thread(target=_worker_loop, name="xsys-imagenes", daemon=True).start()
+        _worker_started = True
+
+
+def _worker_loop() -> None:
+    from django.db import connection as django_conn
+
+    while True:
+        tomados = [_queue.get()]
+        while len(tomados) < _LOTE_COLA:
+            try:
+                tomados.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            procesar_fotos(sorted(set(tomados)), workers=_procesos)
+        except Exception as exc:  # pragma: no cover - depende de la base
+            logger.warning("images: no se pudieron generar variantes (%s fotos): %s", len(tomados), exc)
+        finally:
+            try:
+                django_conn.close()
+            except Exception:  # pragma: no cover
+                pass
+            for _ in tomados:
+                _queue.task_done()
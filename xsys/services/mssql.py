@@ -7,6 +7,11 @@ contra el puerto 49331 falla) más timeouts de login y de query.
 
 Es estrictamente de solo lectura: quien lo use debe emitir únicamente
 ``SELECT`` / ``EXEC`` de funciones de lectura. La app legacy comparte la base.
+
+Las consultas sueltas (``xsys_cursor``, ``pooled_connection``) salen del pool de
+``common.mssql_pool``: reusan una conexión ya logueada en vez de pagar el
+handshake cada vez. ``connect()`` sigue abriendo una propia para los procesos
+de larga vida que manejan su conexión a mano.
 """
 
 from __future__ import annotations
@@ -16,6 +21,8 @@ from typing import Any
 
 from django.conf import settings
 
+from common import mssql_pool
+
 try:  # pragma: no cover - depende del entorno
     import pyodbc  # type: ignore
 except ModuleNotFoundError:  # pragma: no cover - cubierto por prueba negativa
@@ -78,15 +85,28 @@ def connect(config: dict[str, Any] | None = None):
 
 
 @contextmanager
-def xsys_cursor(config: dict[str, Any] | None = None):
-    """Context manager que entrega un cursor y cierra la conexión al salir."""
+def pooled_connection(config: dict[str, Any] | None = None):
+    """Conexión a xSys del pool del proceso; vuelve al pool al salir."""
 
-    conn = connect(config)
+    cfg = get_config(config)
+    _validate(cfg)
     try:
+        with mssql_pool.pooled(xsys_connection_string(cfg), lambda: connect(cfg), name="xsys") as conn:
+            yield conn
+    except mssql_pool.PoolTimeoutError as exc:
+        raise XsysConnectionError(str(exc)) from exc
+
+
+@contextmanager
+def xsys_cursor(config: dict[str, Any] | None = None):
+    """Context manager que entrega un cursor de una conexión del pool."""
+
+    with pooled_connection(config) as conn:
         cursor = conn.cursor()
-        yield cursor
-    finally:
         try:
-            conn.close()
-        except Exception:  # pragma: no cover - cierre defensivo
-            pass
+            yield cursor
+        finally:
+            try:
+                cursor.close()
+            except Exception:  # pragma: no cover - cierre defensivo
+                pass
@@ -0,0 +1,146 @@
+"""Foto compacta del padrón (id, cuota, activo) para detectar cambios barato.
+
+``xsys_cambios_poll`` compara en cada vuelta el padrón de xSys (~224k filas)
+contra el espejo. Cada lado es un ``Padron``: tres ``array`` paralelos ordenados
+por id (``ids``, ``ucp`` como ordinal de día, ``act``). La comparación va por
+tramos de ``_TRAMO`` filas comparados enteros en C, y sólo baja a Python en los
+que difieren. El ordinal de la cuota lo calcula MSSQL (``_SQL_UCP``) para no
+crear un ``datetime`` por fila.
+
+Con ``buckets`` (``CHECKSUM_AGG`` por tramos de ids, ver ``tramos_cambiados``)
+se traen sólo los tramos cuyo checksum cambió. Un checksum puede no ver algún
+cambio, por eso el comando igual trae el padrón entero cada tanto.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+# Ordinal de día compatible con ``date.toordinal()`` (0 = sin cuota).
+_SQL_UCP = "ISNULL(DATEDIFF(DAY, CAST('00010101' AS date), Ult_Cuota_Paga) + 1, 0)"
+SQL_PADRON = f"SELECT Id_Cliente, {_SQL_UCP}, ISNULL(Activo,0) FROM Clientes"
+
+_TRAMO = 4096
+
+
+class Padron:
+    """(id, ucp, activo) ordenado por id, en arrays."""
+
+    __slots__ = ("ids", "ucp", "act")
+
+    def __init__(self, ids: array | None = None, ucp: array | None = None, act: array | None = None) -> None:
+        self.ids = ids if ids is not None else array("q")
+        self.ucp = ucp if ucp is not None else array("l")
+        self.act = act if act is not None else array("b")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def desde_filas(cls, filas: Iterable) -> "Padron":
+        """Desde filas ``(id, ucp_ordinal, activo)`` en cualquier orden."""
+        ordenadas = sorted((int(i), int(u or 0), int(a or 0)) for i, u, a in filas)
+        p = cls()
+        for i, u, a in ordenadas:
+            p.ids.append(i)
+            p.ucp.append(u)
+            p.act.append(a)
+        return p
+
+    @classmethod
+    def desde_espejo(cls) -> "Padron":
+        """Foto del espejo local (``XsysSocio``), con la cuota en fecha local."""
+        from django.utils import timezone
+
+        from xsys.models import XsysSocio
+
+        filas = (
+            (cid, timezone.localtime(ucp).date().toordinal() if ucp else 0, act)
+            for cid, ucp, act in XsysSocio.objects.values_list("id_cliente", "ult_cuota_paga", "activo").iterator()
+        )
+        return cls.desde_filas(filas)
+
+    @classmethod
+    def desde_xsys(cls, cursor, *, desde: int | None = None, hasta: int | None = None) -> "Padron":
+        """Foto de ``Clientes`` en xSys (o del rango de ids [desde, hasta))."""
+        sql, params = SQL_PADRON, ()
+        if desde is not None:
+            sql += " WHERE Id_Cliente >= ? AND Id_Cliente < ?"
+            params = (desde, hasta)
+        cursor.execute(sql + " ORDER BY Id_Cliente", params)
+        # Ya viene ordenado: se vuelca por lotes sin armar la lista entera de filas.
+        p = cls()
+        while True:
+            filas = cursor.fetchmany(20000)
+            if not filas:
+                return p
+            for i, u, a in filas:
+                p.ids.append(int(i))
+                p.ucp.append(int(u or 0))
+                p.act.append(int(a or 0))
+
+    def copia(self) -> "Padron":
+        return Padron(array("q", self.ids), array("l", self.ucp), array("b", self.act))
+
+    def reemplazar_rango(self, desde: int, hasta: int, parcial: "Padron") -> None:
+        """Reemplaza las filas con id en [desde, hasta) por las de ``parcial``."""
+        lo = bisect_left(self.ids, desde)
+        hi = bisect_left(self.ids, hasta)
+        self.ids[lo:hi] = parcial.ids
+        self.ucp[lo:hi] = parcial.ucp
+        self.act[lo:hi] = parcial.act
+
+    def diferencias(self, espejo: "Padron") -> list[int]:
+        """Ids de ``self`` (xSys) cuya cuota o estado difieren de ``espejo``.
+
+        Los que faltan en el espejo cuentan sólo si están activos: los inactivos
+        que nunca espejamos no aportan nada al control de acceso.
+        """
+        if self.ids == espejo.ids:
+            return self._diferencias_alineadas(espejo)
+        return self._diferencias_intercaladas(espejo)
+
+    def _diferencias_alineadas(self, espejo: "Padron") -> list[int]:
+        cambiados: list[int] = []
+        n = len(self.ids)
+        for i in range(0, n, _TRAMO):
+            j = min(n, i + _TRAMO)
+            if self.ucp[i:j] == espejo.ucp[i:j] and self.act[i:j] == espejo.act[i:j]:
+                continue
+            for k in range(i, j):
+                if self.ucp[k] != espejo.ucp[k] or self.act[k] != espejo.act[k]:
+                    cambiados.append(self.ids[k])
+        return cambiados
+
+    def _diferencias_intercaladas(self, espejo: "Padron") -> list[int]:
+        """Merge de dos listas ordenadas (hay ids de un solo lado)."""
+        cambiados: list[int] = []
+        e_ids, e_ucp, e_act = espejo.ids, espejo.ucp, espejo.act
+        m = len(e_ids)
+        j = 0
+        for k, cid in enumerate(self.ids):
+            while j < m and e_ids[j] < cid:
+                j += 1
+            if j < m and e_ids[j] == cid:
+                if self.ucp[k] != e_ucp[j] or self.act[k] != e_act[j]:
+                    cambiados.append(cid)
+            elif self.act[k] == 1:
+                cambiados.append(cid)
+        return cambiados
+
+
+def checksums(cursor, tamano: int) -> dict[int, int]:
+    """``{tramo: CHECKSUM_AGG}`` de ``Clientes`` en tramos de ``tamano`` ids."""
+    t = int(tamano)
+    cursor.execute(
+        f"SELECT Id_Cliente / {t}, CHECKSUM_AGG(BINARY_CHECKSUM(Id_Cliente, {_SQL_UCP}, ISNULL(Activo,0))) "
+        f"FROM Clientes GROUP BY Id_Cliente / {t}"
+    )
+    return {int(b): int(c or 0) for b, c in cursor.fetchall()}
+
+
+def tramos_cambiados(previos: dict[int, int], actuales: dict[int, int]) -> list[int]:
+    """Tramos nuevos, desaparecidos o con checksum distinto."""
+    return sorted(b for b in set(previos) | set(actuales) if previos.get(b) != actuales.get(b))
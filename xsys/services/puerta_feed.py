@@ -0,0 +1,176 @@
+"""Versión del "estado de puerta" para que el visor no recalcule en cada poll.
+
+Cada pantalla pide ``/api/xsys/puerta/estado/`` cada 500 ms y armar las columnas
+cuesta ~15 queries, para mostrar casi siempre lo mismo. Cada puerta tiene un
+contador en ``SyncState('puerta_feed:<door_id>')`` que sólo se incrementa
+cuando entra un paso por uno de sus controladores o faciales. Los cambios de
+configuración o avisos, y los socios/fotos traídos en segundo plano, avisan a
+todas por ``SyncState('puerta_feed')``.
+
+Las columnas se calculan una vez por versión y quedan en la caché de Django
+(en disco, compartida por los workers; ver ``CACHES``). Las de hoy quedan
+además materializadas y un paso nuevo sólo suma lo posterior; lo que cambia
+pasos ya mostrados usa ``bump(full=True)``. La respuesta lleva ``ETag`` y sin
+cambios es un 304. Para lo que cambia sin aviso (cuota, contratos, ingresos por
+otra puerta) la versión incluye un tramo de ``MAX_STALE_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM = "puerta_feed"
+
+
+def _config() -> dict[str, Any]:
+    return getattr(settings, "XSYS_PUERTA_FEED", {})
+
+
+def enabled() -> bool:
+    return bool(_config().get("ENABLED", True))
+
+
+def bump(*, full: bool = False, controladores: Iterable = (), devices: Iterable = ()) -> None:
+    """Avisa que entró algo que el visor muestra (best-effort, nunca lanza).
+
+    Con los ``controladores``/``devices`` del paso sólo se avisa a las puertas
+    que los muestran (ver ``topologia``); sin ellos, a todas.
+
+    ``full=True`` es para lo que cambia pasos YA mostrados (una foto o un socio
+    que llegó tarde, la configuración de la puerta, un aviso): obliga a rearmar
+    las columnas de cero en vez de sólo sumar los pasos nuevos.
+    """
+    from django.db.models import F
+    from django.utils import timezone
+
+    from xsys.models import SyncState
+
+    controladores = {int(c) for c in controladores if c is not None}
+    devices = {int(d) for d in devices if d is not None}
+    try:
+        if not full and (controladores or devices):
+            from xsys.services import topologia
+
+            puertas = topologia.actual().puertas(controladores, devices)
+            streams = [f"{STREAM}:{door_id}" for door_id in sorted(puertas)]
+            if streams and SyncState.objects.filter(stream__in=streams).update(last_id=F("last_id") + 1) < len(streams):
+                existentes = set(SyncState.objects.filter(stream__in=streams).values_list("stream", flat=True))
+                for stream in set(streams) - existentes:
+                    SyncState.objects.get_or_create(stream=stream, defaults={"last_id": 1})
+            return
+        cambios = {"last_id": F("last_id") + 1}
+        if full:
+            cambios["last_datetime"] = timezone.now()
+        if not SyncState.objects.filter(stream=STREAM).update(**cambios):
+            SyncState.objects.get_or_create(
+                stream=STREAM, defaults={"last_id": 1, "last_datetime": timezone.now()}
+            )
+    except Exception as exc:  # pragma: no cover - nunca romper una ingesta
+        logger.warning("puerta_feed: no se pudo incrementar la versión: %s", exc)
+
+
+def version(door_id: int | None = None) -> str:
+    """Versión actual de la puerta: ``contador.propio:base``.
+
+    ``contador`` es el aviso a todas las puertas y ``propio`` el de ``door_id``.
+    ``base`` junta la marca del último ``bump(full=True)`` y el tramo de
+    ``MAX_STALE_SECONDS``; mientras no cambie, lo ya armado sigue valiendo y
+    alcanza con sumar los pasos posteriores.
+    """
+    from xsys.models import SyncState
+
+    propio_stream = f"{STREAM}:{int(door_id)}" if door_id is not None else None
+    filas = {
+        stream: (last_id, last_datetime)
+        for stream, last_id, last_datetime in SyncState.objects.filter(
+            stream__in=[STREAM, propio_stream] if propio_stream else [STREAM]
+        ).values_list("stream", "last_id", "last_datetime")
+    }
+    contador, completo = filas.get(STREAM, (0, None))
+    propio = filas.get(propio_stream, (0, None))[0]
+    tramo = float(_config().get("MAX_STALE_SECONDS", 30) or 0)
+    marca = int(time.time() // tramo) if tramo > 0 else 0
+    sello = int(completo.timestamp() * 1_000_000) if completo else 0
+    return f"{contador or 0}.{propio or 0}:{sello}.{marca}"
+
+
+def etag(*partes) -> str:
+    """ETag débil a partir de todo lo que determina el cuerpo de la respuesta."""
+    crudo = "|".join(str(p) for p in partes)
+    return 'W/"' + hashlib.sha1(crudo.encode()).hexdigest()[:20] + '"'
+
+
+def columnas(
+    door_id: int,
+    dia,
+    ver: str,
+    *,
+    construir: Callable[[], dict],
+    actualizar: Callable[[dict], dict | None] | None = None,
+) -> list:
+    """Columnas de la puerta para ``ver``: de la caché o calculadas una vez.
+
+    ``construir()`` arma el estado de cero. Si se pasa ``actualizar(previo)``,
+    el estado se mantiene materializado por puerta y día y, mientras la base de
+    la versión no cambie, sólo se le suman los pasos nuevos (ver
+    ``_calcular_columnas``). ``actualizar`` puede devolver None para forzar el
+    rearmado.
+    """
+    if not enabled():
+        return construir()["columnas"]
+    from django.core.cache import cache
+
+    clave = f"xsys:puerta_estado:{door_id}:{dia.isoformat()}:{ver}"
+    valor = cache.get(clave)
+    if valor is not None:
+        return valor
+    base = ver.split(":", 1)[-1]
+    ttl = max(5, int(float(_config().get("MAX_STALE_SECONDS", 30) or 0)) * 2)
+    clave_ring = f"xsys:puerta_ring:{door_id}:{dia.isoformat()}"
+    estado = None
+    if actualizar is not None:
+        previo = cache.get(clave_ring)
+        if previo is not None and previo.get("base") == base:
+            estado = actualizar(previo)
+    if estado is None:
+        estado = construir()
+    if actualizar is not None:
+        estado["base"] = base
+        cache.set(clave_ring, estado, ttl)
+    cache.set(clave, estado["columnas"], ttl)
+    return estado["columnas"]
+
+
+def _on_paso(sender, instance=None, **kwargs) -> None:
+    controlador = getattr(instance, "id_controlador", None)
+    device = getattr(instance, "device_id", None)
+    bump(controladores=[controlador] if controlador else (), devices=[device] if device else ())
+
+
+def _on_config(sender, **kwargs) -> None:
+    bump(full=True)
+
+
+def connect_signals() -> None:
+    """Escrituras sueltas por ORM (las masivas con bulk_create llaman a ``bump``)."""
+    from django.db.models.signals import post_delete, post_save
+
+    from access_control.models import BiostarAccessEvent, SocioAviso
+    from access_control.models.models import ExternalAccessLogEntry
+    from institutions.models import AccessDoor, DoorController, DoorTurnstileGroup
+
+    conexiones = (
+        (_on_paso, (ExternalAccessLogEntry, BiostarAccessEvent)),
+        (_on_config, (AccessDoor, DoorController, DoorTurnstileGroup, SocioAviso)),
+    )
+    for handler, modelos in conexiones:
+        for model in modelos:
+            post_save.connect(handler, sender=model, dispatch_uid=f"puerta_feed_save_{model.__name__}")
+            post_delete.connect(handler, sender=model, dispatch_uid=f"puerta_feed_delete_{model.__name__}")
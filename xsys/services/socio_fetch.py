@@ -81,6 +81,7 @@ def _drain_batch(first: int) -> list[int]:
 def _worker_loop() -> None:
     from django.db import connection as django_conn
 
+    from xsys.services import puerta_feed
     from xsys.services.mssql import XsysConnectionError, xsys_cursor
     from xsys.services.sync import XsysSyncService
 
@@ -93,6 +94,7 @@ def _worker_loop() -> None:
                 traidos = service.sync_socios_by_ids(cursor, batch, only_active=False)
             if traidos:
                 logger.info("socio_fetch: %s socio(s) traído(s) para %s id(s)", traidos, len(batch))
+                puerta_feed.bump(full=True)
         except XsysConnectionError as exc:
             logger.warning("socio_fetch sin conexión a xSys: %s", exc)
         except Exception as exc:  # pragma: no cover - depende de red/datos
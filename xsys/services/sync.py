@@ -30,9 +30,9 @@ from xsys.models import (
     XsysWhitelist,
 )
 
-from .images import make_thumbnail
+from . import decision_cache, foto_store, images, puerta_feed
 from .mssql import get_config, xsys_cursor
-from .whitelist import XsysAccessCheckService, compute_habilitacion, persist_whitelist
+from .whitelist import XsysAccessCheckService, compute_habilitacion, persist_whitelist_many
 
 logger = logging.getLogger(__name__)
 
@@ -160,6 +160,9 @@ class XsysSyncService:
             unique_fields=["id_cliente"],
             update_fields=_SOCIO_UPDATE_FIELDS,
         )
+        # bulk_create no dispara post_save: la caché de decisiones se invalida a mano.
+        claves = [k for o in objs for k in decision_cache.keys_of(o)]
+        decision_cache.invalidate([o.id_cliente for o in objs], keys=claves)
         return len(objs)
 
     def _upsert_foto(self, id_cliente: int, nro: int, fecha, blob) -> bool:
@@ -175,17 +178,22 @@ class XsysSyncService:
         existing = XsysSocioFoto.objects.filter(id_cliente=id_cliente, nro=nro).only("sha256").first()
         if existing and existing.sha256 == sha:
             return False
-        XsysSocioFoto.objects.update_or_create(
+        obj, _ = XsysSocioFoto.objects.update_or_create(
             id_cliente=id_cliente,
             nro=nro,
             defaults={
                 "imagen": data,
-                "thumbnail": make_thumbnail(data),
+                # Las variantes se generan aparte (``images.encolar``), no en
+                # esta transacción; hasta entonces el kiosco sirve el original.
+                "thumbnail": None,
+                "rostro": None,
                 "sha256": sha,
                 "fecha": _aware(fecha),
                 "synced_at": timezone.now(),
             },
         )
+        transaction.on_commit(lambda pk=obj.pk: images.encolar([pk]))
+        transaction.on_commit(lambda: foto_store.guardar(sha, data))
         return True
 
     # -------------------------------------------------------------- streams
@@ -565,6 +573,7 @@ class XsysSyncService:
                     unique_fields=["id_cliente"],
                     update_fields=["habilitado", "motivo", "fecha_calculo", "synced_at"],
                 )
+        decision_cache.invalidate(ids)
         return len(objs)
 
     def recompute_whitelist(self, ids: Sequence[int], service=None, cursor=None) -> int:
@@ -590,16 +599,22 @@ class XsysSyncService:
         batch = int(self.config.get("WHITELIST_BATCH_SIZE", 250) or 0)
         pause = float(self.config.get("WHITELIST_BATCH_PAUSE", 0.15) or 0)
         count = 0
+        pendientes: dict[int, dict] = {}
         for i, id_cliente in enumerate(ids):
             try:
-                res = compute_habilitacion(id_cliente, service=service, cursor=cursor)
+                pendientes[id_cliente] = compute_habilitacion(id_cliente, service=service, cursor=cursor)
             except Exception as exc:  # pragma: no cover - depende de datos/red
                 logger.warning("whitelist recompute fallo cliente %s: %s", id_cliente, exc)
                 continue
-            persist_whitelist(id_cliente, res)
             count += 1
-            if batch and pause and (i + 1) % batch == 0:
-                time.sleep(pause)
+            if batch and (i + 1) % batch == 0:
+                # Se escribe por lote (un upsert) y no socio por socio.
+                persist_whitelist_many(pendientes, origen="recompute")
+                pendientes = {}
+                if pause:
+                    time.sleep(pause)
+        if pendientes:
+            persist_whitelist_many(pendientes, origen="recompute")
         return count
 
     # --------------------------------------------------------------- comandos
@@ -693,6 +708,7 @@ class XsysSyncService:
         )
         total = 0
         max_id = last
+        controladores: set = set()
         while True:
             rows = cursor.fetchmany(self.batch_size)
             if not rows:
@@ -708,8 +724,11 @@ class XsysSyncService:
                 )
             total += len(objs)
             max_id = max(max_id, max(o.external_id for o in objs))
+            controladores.update(o.id_controlador for o in objs)
         if total:
             SyncState.advance("cd_es", last_id=max_id, rows=total)
+            # Movimientos nuevos: los visores de esas puertas tienen que recalcular.
+            puerta_feed.bump(controladores=controladores)
         return total
 
     def _marcar_paso_pendiente(self, objs) -> None:
@@ -0,0 +1,182 @@
+"""Índice en memoria de la topología puerta → molinete → controladores/faciales.
+
+Lo usan el visor (columnas de cada puerta), el buscador de accesos y la regla de
+paso pendiente; antes cada uno la derivaba de la base en cada pedido o lote. Se
+arma una vez por proceso y se consulta en O(1): ``molinete_de_controlador``,
+``molinete_de_device``, ``columnas(door_id)`` y ``puertas``.
+
+Igual que ``decision_cache``, guardar o borrar una puerta, un controlador de
+puerta o un grupo de molinetes lo tira en el proceso que escribe e incrementa
+``SyncState('topologia')``; los demás releen ese contador como mucho cada
+``CHECK_SECONDS``. Los nombres de las columnas automáticas salen de
+``XsysControlador`` (sin señales), por eso además se rearma cada ``MAX_AGE_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM = "topologia"
+
+_lock = threading.Lock()
+_actual: "Topologia | None" = None
+_verificado = 0.0
+
+
+def _config() -> dict[str, Any]:
+    return getattr(settings, "XSYS_TOPOLOGIA", {})
+
+
+@dataclass
+class Topologia:
+    """Foto de la topología. Se comparte entre hilos: no modificar lo que devuelve."""
+
+    version: int = 0
+    armada: float = 0.0
+    # ``c<id_controlador>`` / ``d<device_id>`` -> {"key", "nombre", "door_id"}.
+    molinetes: dict[str, dict] = field(default_factory=dict)
+    # door_id -> columnas del visor (ver ``columnas``).
+    por_puerta: dict[int, list[dict]] = field(default_factory=dict)
+    # ``c<id_controlador>`` / ``d<device_id>`` -> puertas cuyo visor lo muestra.
+    visores: dict[str, set[int]] = field(default_factory=dict)
+
+    def molinete_de_controlador(self, id_controlador) -> dict | None:
+        return self.molinetes.get(f"c{int(id_controlador)}")
+
+    def molinete_de_device(self, device_id) -> dict | None:
+        return self.molinetes.get(f"d{int(device_id)}")
+
+    def columnas(self, door_id) -> list[dict]:
+        return self.por_puerta.get(int(door_id), [])
+
+    def puertas(self, controladores=(), devices=()) -> set[int]:
+        """Puertas cuyo visor muestra alguno de esos controladores o faciales."""
+        claves = [f"c{int(c)}" for c in controladores] + [f"d{int(d)}" for d in devices]
+        return set().union(*(self.visores.get(k, ()) for k in claves))
+
+
+def _construir(version: int) -> Topologia:
+    from institutions.models import DoorController, DoorTurnstileGroup
+    from xsys.models import XsysControlador
+
+    topo = Topologia(version=version, armada=time.monotonic())
+    grupos = DoorTurnstileGroup.objects.order_by("door_id", "orden", "id").only(
+        "id", "nombre", "door_id", "id_controladores", "biostar_device_ids"
+    )
+    for g in grupos:
+        ctrls = [int(c) for c in (g.id_controladores or [])]
+        devices = [int(d) for d in (g.biostar_device_ids or [])]
+        destino = {"key": f"g{g.id}", "nombre": g.nombre, "door_id": g.door_id}
+        for c in ctrls:
+            topo.molinetes[f"c{c}"] = destino
+        for d in devices:
+            topo.molinetes[f"d{d}"] = destino
+        topo.por_puerta.setdefault(g.door_id, []).append(
+            {"key": f"g{g.id}", "nombre": g.nombre, "controladores": ctrls, "biostar_devices": devices}
+        )
+
+    # Puertas sin grupos: una columna automática por controlador asignado.
+    asignados = [
+        a for a in DoorController.objects.order_by("door_id", "orden", "id").only("door_id", "id_controlador")
+        if a.door_id not in topo.por_puerta
+    ]
+    descs = dict(
+        XsysControlador.objects.filter(pk__in={a.id_controlador for a in asignados})
+        .values_list("id_controlador", "descripcion")
+    )
+    automaticas: dict[int, list[dict]] = {}
+    for a in asignados:
+        nombre = descs.get(a.id_controlador) or f"Ctrl {a.id_controlador}"
+        automaticas.setdefault(a.door_id, []).append(
+            {"key": f"c{a.id_controlador}", "nombre": nombre,
+             "controladores": [a.id_controlador], "biostar_devices": []}
+        )
+    topo.por_puerta.update(automaticas)
+    for door_id, cols in topo.por_puerta.items():
+        for col in cols:
+            for c in col["controladores"]:
+                topo.visores.setdefault(f"c{c}", set()).add(door_id)
+            for d in col["biostar_devices"]:
+                topo.visores.setdefault(f"d{d}", set()).add(door_id)
+    return topo
+
+
+def _read_version() -> int:
+    from xsys.models import SyncState
+
+    return int(SyncState.objects.filter(stream=STREAM).values_list("last_id", flat=True).first() or 0)
+
+
+def actual() -> Topologia:
+    """Topología vigente: la de memoria o rearmada si otro proceso la cambió."""
+    global _actual, _verificado
+    with _lock:
+        ahora = time.monotonic()
+        intervalo = float(_config().get("CHECK_SECONDS", 5.0) or 0)
+        if _actual is not None and intervalo and ahora - _verificado < intervalo:
+            return _actual
+        version = _read_version()
+        _verificado = ahora
+        max_age = float(_config().get("MAX_AGE_SECONDS", 300.0) or 0)
+        if (
+            _actual is None
+            or version != _actual.version
+            or (max_age and ahora - _actual.armada >= max_age)
+        ):
+            _actual = _construir(version)
+        return _actual
+
+
+def columnas(door_id) -> list[dict]:
+    """Columnas del visor de una puerta: ``key``, ``nombre``, ``controladores``,
+    ``biostar_devices``. Los grupos definidos o, si no hay, una por controlador."""
+    return actual().columnas(door_id)
+
+
+def invalidar(*, avisar: bool = True) -> None:
+    """Tira el índice en este proceso y, con ``avisar``, en los demás (nunca lanza)."""
+    from django.db import transaction
+
+    _tirar()
+    # Si se rearma antes del commit (misma transacción) se vería lo no
+    # confirmado; se tira de nuevo al confirmar.
+    transaction.on_commit(_tirar)
+    if not avisar:
+        return
+    from django.db.models import F
+
+    from xsys.models import SyncState
+
+    try:
+        if not SyncState.objects.filter(stream=STREAM).update(last_id=F("last_id") + 1):
+            SyncState.objects.get_or_create(stream=STREAM, defaults={"last_id": 1})
+    except Exception as exc:  # pragma: no cover - nunca romper una escritura
+        logger.warning("topologia: no se pudo incrementar la versión: %s", exc)
+
+
+def _tirar() -> None:
+    global _actual
+    with _lock:
+        _actual = None
+
+
+def _on_cambio(sender, **kwargs) -> None:
+    invalidar()
+
+
+def connect_signals() -> None:
+    from django.db.models.signals import post_delete, post_save
+
+    from institutions.models import AccessDoor, DoorController, DoorTurnstileGroup
+
+    for model in (AccessDoor, DoorController, DoorTurnstileGroup):
+        post_save.connect(_on_cambio, sender=model, dispatch_uid=f"topologia_save_{model.__name__}")
+        post_delete.connect(_on_cambio, sender=model, dispatch_uid=f"topologia_delete_{model.__name__}")
@@ -7,6 +7,7 @@ Reutiliza la lógica de ``MSSQLAccessCheckService`` (reimplementación read-only
 
 from __future__ import annotations
 
+from datetime import timedelta
 from typing import Any
 
 from django.conf import settings
@@ -14,6 +15,7 @@ from django.conf import settings
 from access_control.services import MSSQLAccessCheckService
 
 from .mssql import connect as xsys_connect
+from .mssql import pooled_connection
 
 
 class XsysAccessCheckService(MSSQLAccessCheckService):
@@ -25,29 +27,216 @@ class XsysAccessCheckService(MSSQLAccessCheckService):
     def _connect(self):  # type: ignore[override]
         return xsys_connect(self.config)
 
+    def _checkout(self):  # type: ignore[override]
+        # Mismo pool que ``xsys_cursor``: una sola bolsa de conexiones por DSN.
+        return pooled_connection(self.config)
 
-def persist_whitelist(id_cliente: int, res: dict[str, Any]):
-    """Upsert de la decisión de habilitación en ``XsysWhitelist`` (escritura local)."""
+
+def persist_whitelist(id_cliente: int, res: dict[str, Any], *, origen: str = ""):
+    """Upsert de la decisión de habilitación en ``XsysWhitelist`` (escritura local).
+
+    Si cambió ``habilitado`` o ``motivo_code`` deja la transición en
+    ``XsysWhitelistChange``.
+    """
+    from django.db import transaction
     from django.utils import timezone
 
     from xsys.models import XsysWhitelist
 
     now = timezone.now()
-    obj, _ = XsysWhitelist.objects.update_or_create(
-        id_cliente=id_cliente,
-        defaults={
-            "habilitado": res["habilitado"],
-            "motivo_code": res.get("motivo_code"),
-            "motivo": (res.get("motivo") or "")[:120],
-            "detalle": (res.get("detalle") or "")[:120],
-            "id_acceso": res.get("id_acceso"),
-            "fecha_calculo": now,
-            "synced_at": now,
-        },
-    )
+    with transaction.atomic():
+        previa = (
+            XsysWhitelist.objects.filter(id_cliente=id_cliente)
+            .values_list("habilitado", "motivo_code").first()
+        )
+        obj, _ = XsysWhitelist.objects.update_or_create(
+            id_cliente=id_cliente,
+            defaults={
+                "habilitado": res["habilitado"],
+                "motivo_code": res.get("motivo_code"),
+                "motivo": (res.get("motivo") or "")[:120],
+                "detalle": (res.get("detalle") or "")[:120],
+                "id_acceso": res.get("id_acceso"),
+                "fecha_calculo": now,
+                "synced_at": now,
+            },
+        )
+        if previa != (obj.habilitado, obj.motivo_code):
+            _registrar_cambios({id_cliente: previa}, {id_cliente: res}, origen=origen, creado=now)
     return obj
 
 
+def _registrar_cambios(
+    previas: dict[int, tuple | None],
+    results: dict[int, dict[str, Any]],
+    *,
+    origen: str,
+    creado,
+) -> None:
+    """Agrega a la bitácora una fila por socio de ``previas`` (``(habilitado, motivo_code)`` o None).
+
+    Va al final de la transacción, así ``creado`` queda cerca del commit (ver
+    ``cambios_desde``).
+    """
+    from xsys.models import XsysWhitelistChange
+
+    XsysWhitelistChange.objects.bulk_create([
+        XsysWhitelistChange(
+            id_cliente=cid,
+            habilitado_antes=None if previa is None else previa[0],
+            habilitado=bool(results[cid]["habilitado"]),
+            motivo_code_antes=None if previa is None else previa[1],
+            motivo_code=results[cid].get("motivo_code"),
+            origen=origen,
+            creado=creado,
+        )
+        for cid, previa in previas.items()
+    ])
+
+
+def _cambios_config() -> dict[str, Any]:
+    return getattr(settings, "XSYS_WHITELIST_CAMBIOS", {})
+
+
+def _cambios_lag() -> float:
+    return max(0.0, float(_cambios_config().get("LAG_SECONDS", 5.0)))
+
+
+def purgar_cambios(dias: int | None = None) -> int:
+    """Borra de la bitácora las transiciones de más de ``dias`` (``RETENTION_DAYS``).
+
+    0 = sin límite. Devuelve cuántas borró.
+    """
+    from django.utils import timezone
+
+    from xsys.models import XsysWhitelistChange
+
+    dias = int(_cambios_config().get("RETENTION_DAYS", 90) if dias is None else dias)
+    if dias <= 0:
+        return 0
+    corte = timezone.now() - timedelta(days=dias)
+    borradas, _ = XsysWhitelistChange.objects.filter(creado__lt=corte).delete()
+    return borradas
+
+
+def cambios_desde(since: int = 0, *, limit: int = 1000, lag: float | None = None) -> tuple[list, int]:
+    """Transiciones con ``seq > since``, en orden, y el ``seq`` desde el cual seguir.
+
+    ``seq`` se asigna al insertar, no al commitear: dos escrituras concurrentes
+    pueden hacerse visibles fuera de orden y un cursor que ya pasó la ``seq``
+    más alta no vería nunca la más baja. Por eso sólo se entregan filas con al
+    menos ``lag`` segundos (``XSYS_WHITELIST_CAMBIOS["LAG_SECONDS"]``), y la respuesta
+    se corta en la primera más nueva: el cursor no avanza más allá de lo que
+    ya no puede tener un hueco por detrás.
+    """
+    from django.utils import timezone
+
+    from xsys.models import XsysWhitelistChange
+
+    lag = _cambios_lag() if lag is None else max(0.0, float(lag))
+    limite = timezone.now() - timedelta(seconds=lag)
+    filas = []
+    for fila in XsysWhitelistChange.objects.filter(seq__gt=int(since)).order_by("seq")[:max(1, int(limit))]:
+        if fila.creado > limite:
+            break
+        filas.append(fila)
+    return filas, (filas[-1].seq if filas else int(since))
+
+
+_CAMPOS_DECISION = ("habilitado", "motivo_code", "motivo", "detalle", "id_acceso")
+
+
+def _fila_whitelist(res: dict[str, Any]) -> tuple:
+    """Valores de ``_CAMPOS_DECISION`` tal como quedan guardados."""
+    return (
+        bool(res["habilitado"]),
+        res.get("motivo_code"),
+        (res.get("motivo") or "")[:120],
+        (res.get("detalle") or "")[:120],
+        res.get("id_acceso"),
+    )
+
+
+def persist_whitelist_many(
+    results: dict[int, dict[str, Any]],
+    *,
+    batch: int = 1000,
+    dry_run: bool = False,
+    origen: str = "",
+) -> dict[int, bool | None]:
+    """Upsert masivo de decisiones; devuelve ``{id: habilitado_previo}`` de las que cambiaron.
+
+    ``persist_whitelist`` hace un ``update_or_create`` por socio (SELECT + UPDATE o
+    INSERT): en una barrida son decenas de miles de idas y vueltas. Acá, por tanda
+    de ``batch`` socios, se lee lo guardado en UNA query y se escribe en a lo sumo
+    dos:
+
+    - las filas nuevas o con algún campo distinto, con un solo
+      ``INSERT ... ON CONFLICT DO UPDATE`` (``bulk_create(update_conflicts=True)``);
+    - las que no cambiaron, con un ``UPDATE`` sólo de ``fecha_calculo`` y
+      ``synced_at``, para que sigan mostrando cuándo se las verificó.
+
+    El resultado trae sólo los socios cuyo ``habilitado`` o ``motivo_code``
+    cambió (previo ``None`` = no tenía fila); así los llamadores no necesitan
+    leer el estado anterior por su cuenta. Esas mismas transiciones quedan en la
+    bitácora ``XsysWhitelistChange`` (con ``origen``), en la misma transacción.
+    Con ``dry_run`` se calcula lo mismo sin escribir.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from xsys.models import XsysWhitelist
+
+    from . import decision_cache
+
+    ids = sorted(int(i) for i in results)
+    cambios: dict[int, bool | None] = {}
+    tocados: list[int] = []
+    campos = list(_CAMPOS_DECISION)
+    batch = max(1, int(batch))
+    for i in range(0, len(ids), batch):
+        tanda = ids[i:i + batch]
+        now = timezone.now()
+        with transaction.atomic():
+            guardadas = {
+                fila[0]: fila[1:]
+                for fila in XsysWhitelist.objects.filter(id_cliente__in=tanda).values_list("id_cliente", *campos)
+            }
+            escribir: list = []
+            iguales: list[int] = []
+            transiciones: dict[int, tuple | None] = {}
+            for cid in tanda:
+                nueva = _fila_whitelist(results[cid])
+                previa = guardadas.get(cid)
+                if previa == nueva:
+                    iguales.append(cid)
+                    continue
+                if previa is None or previa[:2] != nueva[:2]:
+                    cambios[cid] = None if previa is None else previa[0]
+                    transiciones[cid] = None if previa is None else previa[:2]
+                escribir.append(XsysWhitelist(
+                    id_cliente=cid, **dict(zip(campos, nueva)), fecha_calculo=now, synced_at=now,
+                ))
+            if dry_run:
+                continue
+            if escribir:
+                XsysWhitelist.objects.bulk_create(
+                    escribir,
+                    update_conflicts=True,
+                    unique_fields=["id_cliente"],
+                    update_fields=campos + ["fecha_calculo", "synced_at"],
+                )
+                tocados.extend(o.id_cliente for o in escribir)
+            if iguales:
+                XsysWhitelist.objects.filter(id_cliente__in=iguales).update(fecha_calculo=now, synced_at=now)
+            if transiciones:
+                _registrar_cambios(transiciones, results, origen=origen, creado=timezone.now())
+    if tocados:
+        # bulk_create no dispara post_save; lo que no cambió no hace falta tirarlo.
+        decision_cache.invalidate(tocados)
+    return cambios
+
+
 def whitelist_params() -> tuple[int, int | None]:
     cfg = getattr(settings, "MSSQL_XSYS", {})
     return cfg.get("WHITELIST_ACCESO", 22), cfg.get("WHITELIST_CONTROLADOR")
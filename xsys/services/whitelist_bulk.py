@@ -19,13 +19,20 @@ Duplicar el orden de la cascada en SQL puede divergir de ``check_access`` si
 alguien toca uno de los dos lados. Por eso ``verify_bulk_against_single()``
 compara ambos caminos sobre una muestra y el comando la corre en cada barrida:
 si aparece una sola discrepancia, la barrida aborta sin escribir.
+
+La barrida entera se puede repartir entre varias conexiones
+(``compute_habilitacion_paralelo``): el cuello es la latencia de cada query en
+xSys, no nuestro CPU, así que N conexiones en hilos rinden ~N veces.
 """
 
 from __future__ import annotations
 
 import logging
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Any, Iterable, Sequence
+from typing import Any, Callable, Iterable, Iterator, Sequence
 
 logger = logging.getLogger(__name__)
 
@@ -295,3 +302,137 @@ def verify_bulk_against_single(
         "difieren": len(difieren),
         "detalle": difieren[:20],
     }
+
+
+# ---------------------------------------------------------------- en paralelo
+# SQL Server admite 2100 parámetros por query; dos se usan en @acc y @f.
+MAX_IDS_POR_QUERY = 2000
+
+
+class LoteAdaptivo:
+    """Tamaño de lote que se ajusta para que cada query tarde ~``objetivo`` s.
+
+    Lotes chicos pagan de más en round-trips; lotes grandes dejan a un hilo
+    solo con la última query larga mientras los demás ya terminaron. Se mide
+    cada lote y se corrige proporcionalmente, amortiguado (a lo sumo duplica o
+    baja a la mitad por vez) para no oscilar con una query que tardó de más.
+    ``objetivo=0`` lo deja fijo.
+    """
+
+    def __init__(self, inicial: int, *, objetivo: float = 2.0, minimo: int = 100,
+                 maximo: int = MAX_IDS_POR_QUERY) -> None:
+        self.minimo = max(1, min(minimo, maximo))
+        self.maximo = max(self.minimo, maximo)
+        self.objetivo = float(objetivo or 0)
+        self.tamano = min(self.maximo, max(self.minimo, int(inicial)))
+
+    def registrar(self, n: int, segundos: float) -> None:
+        if self.objetivo <= 0 or n <= 0 or segundos <= 0:
+            return
+        ideal = n * self.objetivo / segundos
+        ideal = min(max(ideal, self.tamano / 2), self.tamano * 2)
+        self.tamano = int(min(self.maximo, max(self.minimo, ideal)))
+
+
+def repartir(ids: Sequence[int], partes: int) -> list[list[int]]:
+    """Parte ``ids`` (ordenados) en ``partes`` tramos contiguos de tamaño parejo.
+
+    Contiguos y no salteados: cada conexión recorre un rango de la PK de
+    ``Clientes``, que es lo que mejor aprovecha el índice del lado de xSys.
+    """
+    partes = max(1, min(int(partes), len(ids) or 1))
+    tam, resto = divmod(len(ids), partes)
+    out, i = [], 0
+    for p in range(partes):
+        j = i + tam + (1 if p < resto else 0)
+        out.append(list(ids[i:j]))
+        i = j
+    return [t for t in out if t]
+
+
+def compute_habilitacion_paralelo(
+    connect: Callable[[], Any],
+    ids: Sequence[int],
+    *,
+    id_acceso: int,
+    fecha: datetime,
+    flag_ucp: int,
+    workers: int = 1,
+    lote: int = MAX_IDS_POR_QUERY,
+    objetivo: float = 2.0,
+    pausa: float = 0.0,
+) -> Iterator[dict[int, dict[str, Any]]]:
+    """Evalúa ``ids`` repartidos en ``workers`` conexiones y devuelve lote a lote.
+
+    Cada hilo abre SU conexión con ``connect()`` (una conexión pyodbc no se
+    comparte entre hilos) y recorre su tramo con un ``LoteAdaptivo`` propio. Los
+    resultados se entregan al que itera en cuanto están, así quien escribe puede
+    ir persistiendo mientras sigue la evaluación. ``fecha`` y ``flag_ucp`` se
+    fijan afuera para que todos los hilos evalúen el mismo instante.
+
+    Si un hilo falla, los demás se cortan y el error se relanza acá.
+    """
+    tramos = repartir([int(i) for i in ids], workers)
+    if not tramos:
+        return
+    cola: queue.Queue = queue.Queue(maxsize=len(tramos) * 4)
+    corte = threading.Event()
+    fin = object()
+
+    def encolar(item) -> bool:
+        while not corte.is_set():
+            try:
+                cola.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def trabajar(tramo: list[int]) -> None:
+        conn = None
+        try:
+            conn = connect()
+            cursor = conn.cursor()
+            tam = LoteAdaptivo(lote, objetivo=objetivo)
+            i = 0
+            while i < len(tramo) and not corte.is_set():
+                trozo = tramo[i:i + tam.tamano]
+                t0 = time.monotonic()
+                parcial = compute_habilitacion_bulk(
+                    cursor, trozo, id_acceso=id_acceso, fecha=fecha, flag_ucp=flag_ucp)
+                tam.registrar(len(trozo), time.monotonic() - t0)
+                i += len(trozo)
+                if not encolar(parcial):
+                    return
+                if pausa:
+                    time.sleep(pausa)
+        except BaseException as exc:  # se relanza en el hilo que itera
+            encolar(exc)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            encolar(fin)
+
+    hilos = [
+        threading.Thread(target=trabajar, args=(t,), name=f"whitelist-{n}", daemon=True)
+        for n, t in enumerate(tramos)
+    ]
+    for h in hilos:
+        h.start()
+    try:
+        vivos = len(hilos)
+        while vivos:
+            item = cola.get()
+            if item is fin:
+                vivos -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield item
+    finally:
+        corte.set()
+        for h in hilos:
+            h.join(timeout=5)
@@ -4,8 +4,9 @@ from django.contrib.auth.models import User
 from django.test import TestCase
 from django.utils import timezone
 
-from xsys.models import XsysSocio, XsysWhitelist
-from xsys.services.access import resolver_acceso
+from xsys.models import SyncState, XsysSocio, XsysWhitelist
+from xsys.services import decision_cache
+from xsys.services.access import resolver_acceso, resolver_decision
 from xsys.services.mssql import XsysConnectionError
 
 
@@ -80,6 +81,47 @@ class ResolverAccesoTests(TestCase):
             resolver_acceso()
 
 
+class DecisionCacheTests(TestCase):
+    def setUp(self):
+        decision_cache.clear()
+        _socio()
+        XsysWhitelist.objects.create(id_cliente=944426, habilitado=True, motivo="CUOTA SOCIAL")
+
+    def tearDown(self):
+        decision_cache.clear()
+
+    def test_hit_no_consulta_la_base(self):
+        resolver_decision(doc=31850936)
+        with patch.dict("django.conf.settings.XSYS_DECISION_CACHE", {"CHECK_SECONDS": 60}):
+            with self.assertNumQueries(0):
+                socio, wl = resolver_decision(doc=31850936)
+        self.assertEqual(socio.id_cliente, 944426)
+        self.assertTrue(wl.habilitado)
+
+    def test_save_de_whitelist_invalida(self):
+        self.assertTrue(resolver_acceso(credencial="bcb30514")["puede_ingresar"])
+        wl = XsysWhitelist.objects.get(id_cliente=944426)
+        wl.habilitado = False
+        wl.save()
+        r = resolver_acceso(credencial="BCB30514", verificar_online=False)
+        self.assertFalse(r["puede_ingresar"])
+
+    def test_escritura_de_otro_proceso_vacia_la_cache(self):
+        resolver_decision(id_cliente=944426)
+        # Otro proceso: cambia la fila sin señales y sube la versión compartida.
+        XsysWhitelist.objects.filter(id_cliente=944426).update(habilitado=False)
+        SyncState.objects.filter(stream=decision_cache.STREAM).update(last_id=999)
+        with patch.dict("django.conf.settings.XSYS_DECISION_CACHE", {"CHECK_SECONDS": 0}):
+            _socio_, wl = resolver_decision(id_cliente=944426)
+        self.assertFalse(wl.habilitado)
+
+    def test_no_cachea_socio_inexistente(self):
+        self.assertEqual(resolver_decision(doc=1), (None, None))
+        _socio(id_cliente=1, doc=1, cred="X1")
+        socio, _wl = resolver_decision(doc=1)
+        self.assertEqual(socio.id_cliente, 1)
+
+
 class AccesoApiTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user("op", password="pw")
@@ -1,13 +1,18 @@
 import io
+import os
+import tempfile
+from unittest import mock
 
 from django.contrib.auth.models import Group, User
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from PIL import Image
 
 from common.roles import GRUPO_ADMIN
 from xsys.models import SyncState, XsysSocio, XsysSocioFoto, XsysWhitelist
-from xsys.services.images import make_thumbnail
+from xsys.services.whitelist import persist_whitelist, persist_whitelist_many
+from xsys.services.images import make_thumbnail, procesar_fotos
 
 
 def _png_bytes(color=(54, 122, 199), size=(60, 80)):
@@ -41,6 +46,25 @@ class XsysApiTests(TestCase):
         self.user = User.objects.create_user("op", password="pw")
         self.client.force_login(self.user)
 
+    @override_settings(XSYS_WHITELIST_CAMBIOS={"LAG_SECONDS": 0})
+    def test_cambios_de_whitelist_por_cursor(self):
+        res = {"habilitado": False, "motivo_code": 5, "motivo": "VENCIDO", "detalle": "", "id_acceso": 22}
+        persist_whitelist_many({944426: res, 1: dict(res, habilitado=True, motivo_code=1)}, origen="full_sweep")
+        persist_whitelist(944426, res, origen="reverify")  # sin transición: no se registra
+        r = self.client.get("/api/xsys/whitelist/changes/", {"since": 0, "limit": 1})
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual([c["id_cliente"] for c in data["results"]], [1])
+        self.assertTrue(data["more"])
+        r = self.client.get("/api/xsys/whitelist/changes/", {"since": data["next"]})
+        cambio = r.json()["results"][0]
+        self.assertEqual(
+            (cambio["id_cliente"], cambio["habilitado_antes"], cambio["habilitado"], cambio["origen"]),
+            (944426, True, False, "full_sweep"),
+        )
+        self.assertFalse(r.json()["more"])
+        self.assertEqual(self.client.get("/api/xsys/whitelist/changes/", {"since": "x"}).status_code, 400)
+
     def test_lookup_por_doc(self):
         r = self.client.get("/api/xsys/socios/lookup/", {"doc": 31850936})
         self.assertEqual(r.status_code, 200)
@@ -68,15 +92,62 @@ class XsysApiTests(TestCase):
         self.assertEqual(r["Content-Type"], "image/png")
         self.assertEqual(r.content, self.png)
 
-    def test_foto_thumb_genera_jpeg_y_persiste(self):
-        self.assertFalse(XsysSocioFoto.objects.get(id_cliente=944426, nro=1).thumbnail)
-        r = self.client.get("/api/xsys/socios/944426/foto/", {"thumb": 1})
+    def test_foto_thumb_faltante_se_encola_y_sirve_el_original(self):
+        foto = XsysSocioFoto.objects.get(id_cliente=944426, nro=1)
+        self.assertFalse(foto.thumbnail)
+        with mock.patch("xsys.services.images.encolar") as encolar:
+            r = self.client.get("/api/xsys/socios/944426/foto/", {"thumb": 1})
+        # No se genera en el pedido: va el original, sin caché, y queda pedida.
         self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, self.png)
+        self.assertEqual(r["Cache-Control"], "no-cache")
+        encolar.assert_called_once_with([foto.pk])
+        # Cuando el worker la generó, se sirve la miniatura.
+        procesar_fotos([foto.pk])
+        r = self.client.get("/api/xsys/socios/944426/foto/", {"thumb": 1})
         self.assertEqual(r["Content-Type"], "image/jpeg")
         self.assertEqual(r.content[:2], b"\xff\xd8")
-        self.assertLess(len(r.content), len(self.png) + 5000)
-        # se persiste para próximas consultas
-        self.assertTrue(XsysSocioFoto.objects.get(id_cliente=944426, nro=1).thumbnail)
+        self.assertEqual(r["Cache-Control"], "private, max-age=300")
+
+    def test_foto_etag_y_304_sin_leer_el_blob(self):
+        r = self.client.get("/api/xsys/socios/944426/foto/")
+        self.assertEqual(r["ETag"], '"x"')
+        with self.assertNumQueries(1):
+            r2 = self.client.get("/api/xsys/socios/944426/foto/", HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(r2.status_code, 304)
+        self.assertEqual(r2["ETag"], '"x"')
+
+    def test_etag_de_la_miniatura_cambia_con_sus_parametros(self):
+        foto = XsysSocioFoto.objects.get(id_cliente=944426, nro=1)
+        procesar_fotos([foto.pk])
+        r = self.client.get("/api/xsys/socios/944426/foto/", {"thumb": 1})
+        self.assertEqual(r["ETag"], '"x-t96x120q80"')
+        with mock.patch("xsys.services.images.THUMBNAIL_QUALITY", 70):
+            r = self.client.get("/api/xsys/socios/944426/foto/", {"thumb": 1},
+                                HTTP_IF_NONE_MATCH='"x-t96x120q80"')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["ETag"], '"x-t96x120q70"')
+
+    def test_foto_desde_store_en_disco(self):
+        with tempfile.TemporaryDirectory() as d, override_settings(XSYS_FOTO_STORE={"DIR": d}):
+            # Primera vez: sale de la base y queda el archivo.
+            r = self.client.get("/api/xsys/socios/944426/foto/")
+            self.assertEqual(r.content, self.png)
+            self.assertTrue(os.path.isfile(os.path.join(d, "x", "x")))
+            # Después: del archivo, sin leer el blob.
+            with self.assertNumQueries(1):
+                r = self.client.get("/api/xsys/socios/944426/foto/")
+            self.assertEqual(b"".join(r.streaming_content), self.png)
+            self.assertEqual(r["Content-Type"], "image/png")
+            with override_settings(XSYS_FOTO_STORE={"DIR": d, "ACCEL_PREFIX": "/_fotos/"}):
+                r = self.client.get("/api/xsys/socios/944426/foto/")
+            self.assertEqual(r["X-Accel-Redirect"], "/_fotos/x/x")
+            # Un sha que ya no está en ninguna foto se purga.
+            os.makedirs(os.path.join(d, "ab"))
+            open(os.path.join(d, "ab", "abcd.t"), "wb").close()
+            call_command("xsys_fotos_store", "--purge", stdout=io.StringIO())
+            self.assertEqual(sorted(os.listdir(d)), ["ab", "x"])
+            self.assertEqual(os.listdir(os.path.join(d, "ab")), [])
 
     def test_serializer_incluye_thumb_url(self):
         r = self.client.get("/api/xsys/socios/lookup/", {"id": 944426})
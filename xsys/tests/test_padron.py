@@ -0,0 +1,71 @@
+import datetime
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from xsys.models import XsysSocio
+from xsys.services.padron import Padron, tramos_cambiados
+
+_DIA = datetime.date(2026, 8, 1).toordinal()
+
+
+class _CursorPadron:
+    """Devuelve las filas de ``Clientes`` por lotes, filtrando por rango si se pide."""
+
+    def __init__(self, filas):
+        self.filas = sorted(filas)
+        self._pend = []
+
+    def execute(self, sql, params=()):
+        filas = self.filas
+        if params:
+            desde, hasta = params
+            filas = [f for f in filas if desde <= f[0] < hasta]
+        self._pend = list(filas)
+        return self
+
+    def fetchmany(self, n):
+        lote, self._pend = self._pend[:n], self._pend[n:]
+        return lote
+
+
+class PadronTests(SimpleTestCase):
+    def test_sin_cambios_no_devuelve_nada(self):
+        filas = [(i, _DIA, 1) for i in range(1, 10_000)]
+        self.assertEqual(Padron.desde_filas(filas).diferencias(Padron.desde_filas(filas)), [])
+
+    def test_detecta_cuota_y_estado_en_tramos_distintos(self):
+        espejo = [(i, _DIA, 1) for i in range(1, 10_000)]
+        remoto = list(espejo)
+        remoto[10] = (11, _DIA + 31, 1)      # pagó
+        remoto[9_000] = (9_001, _DIA, 0)    # se dio de baja
+        self.assertEqual(Padron.desde_filas(remoto).diferencias(Padron.desde_filas(espejo)), [11, 9_001])
+
+    def test_ids_solo_en_xsys_cuentan_si_estan_activos(self):
+        espejo = Padron.desde_filas([(1, _DIA, 1), (5, _DIA, 1)])
+        remoto = Padron.desde_filas([(1, _DIA, 1), (2, _DIA, 1), (3, _DIA, 0), (5, 0, 1)])
+        self.assertEqual(remoto.diferencias(espejo), [2, 5])
+
+    def test_desde_xsys_y_reemplazo_de_un_tramo(self):
+        antes = [(i, _DIA, 1) for i in range(1, 50)]
+        p = Padron.desde_xsys(_CursorPadron(antes))
+        self.assertEqual(len(p), 49)
+        # En xSys cambió el tramo [20, 40): pagaron 20..29 y se borró el 30.
+        despues = [(i, _DIA + 1 if 20 <= i < 30 else _DIA, 1) for i in range(1, 50) if i != 30]
+        p.reemplazar_rango(20, 40, Padron.desde_xsys(_CursorPadron(despues), desde=20, hasta=40))
+        completo = Padron.desde_xsys(_CursorPadron(despues))
+        self.assertEqual((p.ids, p.ucp, p.act), (completo.ids, completo.ucp, completo.act))
+
+    def test_tramos_cambiados(self):
+        self.assertEqual(tramos_cambiados({0: 1, 1: 2, 2: 3}, {0: 1, 1: 9, 3: 4}), [1, 2, 3])
+
+
+class PadronEspejoTests(TestCase):
+    def test_cuota_del_espejo_por_dia_local(self):
+        ucp = timezone.make_aware(datetime.datetime(2026, 8, 1, 0, 0))
+        XsysSocio.objects.create(id_cliente=7, apellido="X", nombre="Y", activo=1, ult_cuota_paga=ucp)
+        XsysSocio.objects.create(id_cliente=8, apellido="X", nombre="Z", activo=0, ult_cuota_paga=None)
+        p = Padron.desde_espejo()
+        self.assertEqual(list(p.ids), [7, 8])
+        self.assertEqual(list(p.ucp), [_DIA, 0])
+        self.assertEqual(list(p.act), [1, 0])
@@ -1,5 +1,8 @@
+from unittest import mock
+
 from django.contrib.auth.models import Group, User
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from access_control.models.models import ExternalAccessLogEntry
@@ -13,6 +16,7 @@ from xsys.models import (
     XsysSocio,
     XsysSocioFoto,
 )
+from xsys.services import topologia
 
 TOKEN = "pantalla-token-abc123"
 
@@ -25,6 +29,7 @@ def _post(client, url, data):
     return client.post(url, data, content_type="application/json", HTTP_X_PANTALLA_TOKEN=TOKEN)
 
 
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
 class PuertaMonitorTests(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -46,6 +51,14 @@ class PuertaMonitorTests(TestCase):
         for orden, cid in enumerate((59, 60, 90)):
             DoorController.objects.create(door=cls.door, id_controlador=cid, orden=orden)
 
+    def setUp(self):
+        # Las columnas se cachean por versión, y la versión vuelve atrás con el
+        # rollback de cada test: sin esto un test vería las columnas de otro.
+        # Lo mismo con el índice de topología (los grupos de un test se borran
+        # con el rollback, sin señal).
+        cache.clear()
+        topologia.invalidar(avisar=False)
+
     def _ev(self, id_es, id_controlador, id_acceso=14, tipo="E", resultado="S", motivo=305):
         return ExternalAccessLogEntry.objects.create(
             external_id=id_es, tipo=tipo, id_cliente=944426, fecha=timezone.now(),
@@ -53,6 +66,116 @@ class PuertaMonitorTests(TestCase):
             id_cd_motivo=motivo, observacion="obs",
         )
 
+    def test_estado_sin_cambios_devuelve_304(self):
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        self._ev(8000, 59)
+        r = _get(self.client, "/api/xsys/puerta/estado/")
+        self.assertEqual(r.status_code, 200)
+        etag = r["ETag"]
+        # Pantalla (con su puerta) + versión: nada de lo que arma las columnas.
+        with self.assertNumQueries(2):
+            r2 = self.client.get("/api/xsys/puerta/estado/", HTTP_X_PANTALLA_TOKEN=TOKEN, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r2.status_code, 304)
+        self.assertEqual(r2["ETag"], etag)
+
+    def test_latido_de_pantalla_no_escribe_en_cada_pedido(self):
+        p = PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        _get(self.client, "/api/xsys/puerta/estado/")
+        visto = PantallaPuerta.objects.get(pk=p.pk).last_seen
+        _get(self.client, "/api/xsys/puerta/estado/")
+        self.assertEqual(PantallaPuerta.objects.get(pk=p.pk).last_seen, visto)
+        PantallaPuerta.objects.filter(pk=p.pk).update(last_seen=visto - timezone.timedelta(minutes=1))
+        _get(self.client, "/api/xsys/puerta/estado/")
+        self.assertGreater(PantallaPuerta.objects.get(pk=p.pk).last_seen, visto)
+
+    def test_paso_nuevo_cambia_el_etag(self):
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        self._ev(8000, 59)
+        etag = _get(self.client, "/api/xsys/puerta/estado/")["ETag"]
+        self._ev(8001, 59)
+        r = self.client.get("/api/xsys/puerta/estado/", HTTP_X_PANTALLA_TOKEN=TOKEN, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        by_nombre = {c["nombre"]: c for c in r.json()["columnas"]}
+        self.assertEqual(by_nombre["Alcorta Mol1"]["ultimo"]["id_es"], 8001)
+
+    def test_paso_por_otra_puerta_no_cambia_el_etag(self):
+        otra = AccessDoor.objects.create(name="SM-Noble", xsys_id_acceso=16)
+        DoorController.objects.create(door=otra, id_controlador=77, orden=0)
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        self._ev(8000, 59)
+        etag = _get(self.client, "/api/xsys/puerta/estado/")["ETag"]
+        self._ev(8001, 77, id_acceso=16)
+        r = self.client.get("/api/xsys/puerta/estado/", HTTP_X_PANTALLA_TOKEN=TOKEN, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+    def test_pantallas_de_la_misma_puerta_comparten_el_calculo(self):
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        PantallaPuerta.objects.create(token="otra-pantalla-xyz789", door=self.door)
+        self._ev(8000, 59)
+        from xsys import api_views
+
+        with mock.patch.object(api_views, "_calcular_columnas", wraps=api_views._calcular_columnas) as calc:
+            a = _get(self.client, "/api/xsys/puerta/estado/").json()
+            b = self.client.get("/api/xsys/puerta/estado/", HTTP_X_PANTALLA_TOKEN="otra-pantalla-xyz789").json()
+        calc.assert_called_once()
+        self.assertEqual(a["columnas"], b["columnas"])
+
+    def test_paso_nuevo_se_suma_sin_rearmar_la_columna(self):
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        self._ev(8000, 59)
+        _get(self.client, "/api/xsys/puerta/estado/")
+        self._ev(8001, 59)
+        from xsys import api_views
+
+        with mock.patch.object(api_views, "_calcular_columnas", wraps=api_views._calcular_columnas) as calc:
+            d = _get(self.client, "/api/xsys/puerta/estado/").json()
+        calc.assert_called_once()
+        self.assertIsNotNone(calc.call_args.args[2])  # incremental: recibió lo materializado
+        col = {c["nombre"]: c for c in d["columnas"]}["Alcorta Mol1"]
+        self.assertEqual(col["ultimo"]["id_es"], 8001)
+        self.assertEqual([h["id_es"] for h in col["historial"]], [8000])
+
+    def test_cuenta_de_ingresos_se_actualiza_en_tarjetas_ya_armadas(self):
+        XsysAcceso.objects.filter(id_acceso=14).update(flag_ult_cuota_paga=1)
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        self._ev(8000, 59)
+        d = _get(self.client, "/api/xsys/puerta/estado/").json()
+        col = {c["nombre"]: c for c in d["columnas"]}["Alcorta Mol1"]
+        self.assertEqual(col["ultimo"]["ingresos_hoy"], 1)
+        self._ev(8001, 60)  # misma habilitación, por el otro molinete
+        d = _get(self.client, "/api/xsys/puerta/estado/").json()
+        col = {c["nombre"]: c for c in d["columnas"]}["Alcorta Mol1"]
+        self.assertEqual(col["ultimo"]["id_es"], 8000)
+        self.assertEqual(col["ultimo"]["ingresos_hoy"], 2)
+
+    def test_paso_resincronizado_reemplaza_su_tarjeta(self):
+        from xsys.services import puerta_feed
+
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        ev = self._ev(8000, 59)
+        ExternalAccessLogEntry.objects.filter(pk=ev.pk).update(id_cliente=None)
+        _get(self.client, "/api/xsys/puerta/estado/")
+        # La sincronización le completa el Id_Cliente y lo vuelve a sellar.
+        ExternalAccessLogEntry.objects.filter(pk=ev.pk).update(id_cliente=944426, synced_at=timezone.now())
+        puerta_feed.bump()
+        d = _get(self.client, "/api/xsys/puerta/estado/").json()
+        col = {c["nombre"]: c for c in d["columnas"]}["Alcorta Mol1"]
+        self.assertEqual(col["ultimo"]["id_cliente"], 944426)
+        self.assertEqual(col["historial"], [])
+
+    def test_bump_completo_rearma_de_cero(self):
+        from xsys import api_views
+        from xsys.services import puerta_feed
+
+        PantallaPuerta.objects.create(token=TOKEN, door=self.door)
+        self._ev(8000, 59)
+        _get(self.client, "/api/xsys/puerta/estado/")
+        puerta_feed.bump(full=True)  # p. ej. llegó la foto de un socio ya mostrado
+        with mock.patch.object(api_views, "_calcular_columnas", wraps=api_views._calcular_columnas) as calc:
+            _get(self.client, "/api/xsys/puerta/estado/")
+        self.assertEqual(len(calc.call_args.args), 2)
+
     def test_sin_token_400(self):
         self.assertEqual(self.client.get("/api/xsys/puerta/estado/").status_code, 400)
 
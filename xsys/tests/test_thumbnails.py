@@ -1,10 +1,13 @@
 import io
 
+from unittest import mock
+
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from PIL import Image
 
 from xsys.models import XsysSocioFoto
+from xsys.services import images
 
 
 def _png(color=(10, 120, 200), size=(60, 80)):
@@ -17,12 +20,15 @@ class XsysThumbnailsCommandTests(TestCase):
     def test_backfill_solo_faltantes(self):
         valida = XsysSocioFoto.objects.create(id_cliente=1, nro=1, imagen=_png(), sha256="a")
         corrupta = XsysSocioFoto.objects.create(id_cliente=2, nro=1, imagen=b"noimg", sha256="b")
-        ya = XsysSocioFoto.objects.create(id_cliente=3, nro=1, imagen=_png(), thumbnail=b"prev", sha256="c")
+        ya = XsysSocioFoto.objects.create(
+            id_cliente=3, nro=1, imagen=_png(), thumbnail=b"prev", rostro=b"prev", sha256="c",
+        )
 
-        call_command("xsys_thumbnails")
+        call_command("xsys_thumbnails", "--workers", "1")
 
         valida.refresh_from_db(); corrupta.refresh_from_db(); ya.refresh_from_db()
         self.assertTrue(valida.thumbnail)
+        self.assertEqual(bytes(valida.rostro)[:2], b"\xff\xd8")
         # bytes(): en Postgres un BinaryField vuelve como memoryview, no bytes.
         self.assertEqual(bytes(valida.thumbnail)[:2], b"\xff\xd8")  # JPEG
         self.assertFalse(corrupta.thumbnail)                 # no se pudo generar
@@ -30,7 +36,40 @@ class XsysThumbnailsCommandTests(TestCase):
 
     def test_all_regenera(self):
         ya = XsysSocioFoto.objects.create(id_cliente=3, nro=1, imagen=_png(), thumbnail=b"prev", sha256="c")
-        call_command("xsys_thumbnails", "--all")
+        call_command("xsys_thumbnails", "--all", "--workers", "1")
         ya.refresh_from_db()
         self.assertNotEqual(bytes(ya.thumbnail), b"prev")
         self.assertEqual(bytes(ya.thumbnail)[:2], b"\xff\xd8")
+
+    def test_workers_en_pool_de_procesos(self):
+        fotos = [XsysSocioFoto.objects.create(id_cliente=i, nro=1, imagen=_png(size=(900, 1200)), sha256=str(i))
+                 for i in range(1, 5)]
+        call_command("xsys_thumbnails", "--workers", "2", "--batch-size", "2")
+        for f in fotos:
+            f.refresh_from_db()
+            self.assertLessEqual(Image.open(io.BytesIO(bytes(f.thumbnail))).size, (96, 120))
+            self.assertEqual(max(Image.open(io.BytesIO(bytes(f.rostro))).size), 600)
+
+    def test_foto_reemplazada_en_el_medio_no_recibe_variantes_viejas(self):
+        foto = XsysSocioFoto.objects.create(id_cliente=1, nro=1, imagen=_png(), sha256="vieja")
+        originales = images._variantes_de
+
+        def reemplazar_y_procesar(item):
+            XsysSocioFoto.objects.filter(pk=foto.pk).update(imagen=_png((200, 10, 10)), sha256="nueva")
+            return originales(item)
+
+        with mock.patch.object(images, "_variantes_de", side_effect=reemplazar_y_procesar):
+            self.assertEqual(images.procesar_fotos([foto.pk]), (0, 1))
+        foto.refresh_from_db()
+        self.assertEqual((foto.sha256, foto.thumbnail, foto.rostro), ("nueva", None, None))
+        # La reprocesada (la que quedó encolada) sí las recibe.
+        self.assertEqual(images.procesar_fotos([foto.pk]), (1, 0))
+
+    def test_la_cola_usa_el_pool_solo_si_el_proceso_lo_pide(self):
+        self.assertEqual(images._procesos, 1)  # worker web: en el hilo de la cola
+        try:
+            with override_settings(XSYS_IMAGENES={"WORKERS": 3}):
+                images.usar_pool()
+            self.assertEqual(images._procesos, 3)
+        finally:
+            images._procesos = 1
@@ -0,0 +1,53 @@
+from django.test import TestCase, override_settings
+
+from access_control.services import paso_pendiente as pp
+from institutions.models import AccessDoor, DoorController, DoorTurnstileGroup
+from xsys.models import SyncState, XsysControlador
+from xsys.services import topologia
+
+
+class TopologiaTests(TestCase):
+    def setUp(self):
+        topologia.invalidar(avisar=False)
+        self.door = AccessDoor.objects.create(name="SM-Alcorta", xsys_id_acceso=14)
+
+    def test_grupos_y_busquedas_por_controlador_y_device(self):
+        g = DoorTurnstileGroup.objects.create(
+            door=self.door, nombre="Molinete 1", id_controladores=[59, 90], biostar_device_ids=[538150641],
+        )
+        topo = topologia.actual()
+        self.assertEqual(topo.molinete_de_controlador(90)["key"], f"g{g.id}")
+        self.assertEqual(topo.molinete_de_device("538150641")["nombre"], "Molinete 1")
+        self.assertIsNone(topo.molinete_de_controlador(1))
+        self.assertEqual(topologia.columnas(self.door.id), [
+            {"key": f"g{g.id}", "nombre": "Molinete 1", "controladores": [59, 90], "biostar_devices": [538150641]},
+        ])
+        self.assertIs(pp.mapa_molinetes(), topo.molinetes)
+
+    def test_sin_grupos_una_columna_por_controlador(self):
+        XsysControlador.objects.create(id_controlador=60, id_acceso=14, descripcion="Molinete Norte")
+        DoorController.objects.create(door=self.door, id_controlador=60, orden=0)
+        DoorController.objects.create(door=self.door, id_controlador=61, orden=1)
+        self.assertEqual([c["nombre"] for c in topologia.columnas(self.door.id)], ["Molinete Norte", "Ctrl 61"])
+        self.assertEqual(topologia.columnas(999), [])
+
+    def test_se_cachea_y_se_invalida_al_guardar(self):
+        g = DoorTurnstileGroup.objects.create(door=self.door, nombre="Molinete 1", id_controladores=[59])
+        topologia.actual()
+        with self.assertNumQueries(0):
+            topologia.columnas(self.door.id)
+        g.nombre = "Molinete A"
+        g.save()
+        self.assertEqual(topologia.actual().molinete_de_controlador(59)["nombre"], "Molinete A")
+
+    @override_settings(XSYS_TOPOLOGIA={"CHECK_SECONDS": 0})
+    def test_otro_proceso_cambia_la_version(self):
+        DoorTurnstileGroup.objects.create(door=self.door, nombre="Molinete 1", id_controladores=[59])
+        topologia.actual()
+        # Sin señal (update por queryset) y sin aviso: sigue el índice armado.
+        DoorTurnstileGroup.objects.filter(door=self.door).update(nombre="Molinete B")
+        with self.assertNumQueries(1):
+            self.assertEqual(topologia.actual().molinete_de_controlador(59)["nombre"], "Molinete 1")
+        # Otro proceso guardó un grupo: incrementó el contador en SyncState.
+        SyncState.objects.update_or_create(stream=topologia.STREAM, defaults={"last_id": 99})
+        self.assertEqual(topologia.actual().molinete_de_controlador(59)["nombre"], "Molinete B")
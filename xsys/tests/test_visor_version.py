@@ -1,10 +1,11 @@
 from unittest import mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from xsys import api_views
 
 
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
 class VersionVisorTests(TestCase):
     """La versión del visor hace que las pantallas kiosco se auto-recarguen."""
 
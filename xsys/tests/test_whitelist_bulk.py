@@ -0,0 +1,159 @@
+import threading
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone as djtz
+
+from xsys.models import XsysWhitelist, XsysWhitelistChange
+from xsys.services.whitelist import cambios_desde, persist_whitelist_many, purgar_cambios
+from xsys.services.whitelist_bulk import (
+    MAX_IDS_POR_QUERY,
+    LoteAdaptivo,
+    compute_habilitacion_paralelo,
+    repartir,
+)
+
+_FECHA = datetime(2026, 8, 1, 12, 0)
+
+
+def _bulk_falso(cursor, ids, **kwargs):
+    return {cid: {"habilitado": cid % 2 == 0, "conn": cursor.conn_id} for cid in ids}
+
+
+class LoteAdaptivoTests(SimpleTestCase):
+    def test_crece_si_la_query_es_rapida_y_respeta_el_tope(self):
+        lote = LoteAdaptivo(500, objetivo=2.0)
+        lote.registrar(500, 0.5)
+        self.assertEqual(lote.tamano, 1000)  # amortiguado: a lo sumo duplica
+        lote.registrar(1000, 0.1)
+        self.assertEqual(lote.tamano, MAX_IDS_POR_QUERY)
+
+    def test_achica_si_la_query_es_lenta(self):
+        lote = LoteAdaptivo(2000, objetivo=2.0)
+        lote.registrar(2000, 5.0)
+        self.assertEqual(lote.tamano, 1000)
+
+    def test_objetivo_cero_lo_deja_fijo(self):
+        lote = LoteAdaptivo(700, objetivo=0)
+        lote.registrar(700, 30.0)
+        self.assertEqual(lote.tamano, 700)
+
+
+class ParaleloTests(SimpleTestCase):
+    def test_repartir_en_tramos_contiguos(self):
+        self.assertEqual(repartir(list(range(7)), 3), [[0, 1, 2], [3, 4], [5, 6]])
+        self.assertEqual(repartir([1, 2], 8), [[1], [2]])
+        self.assertEqual(repartir([], 4), [])
+
+    def test_cada_hilo_usa_su_conexion_y_se_evaluan_todos(self):
+        conexiones = []
+        lock = threading.Lock()
+
+        def connect():
+            conn = MagicMock()
+            with lock:
+                conn.cursor.return_value.conn_id = len(conexiones)
+                conexiones.append(conn)
+            return conn
+
+        ids = list(range(1, 1001))
+        with patch("xsys.services.whitelist_bulk.compute_habilitacion_bulk", side_effect=_bulk_falso):
+            resultados = {}
+            for parcial in compute_habilitacion_paralelo(
+                connect, ids, id_acceso=1, fecha=_FECHA, flag_ucp=1, workers=4, lote=100, objetivo=0,
+            ):
+                resultados.update(parcial)
+        self.assertEqual(sorted(resultados), ids)
+        self.assertEqual(len(conexiones), 4)
+        self.assertEqual({r["conn"] for r in resultados.values()}, {0, 1, 2, 3})
+        for conn in conexiones:
+            conn.close.assert_called_once()
+
+    def test_error_de_un_hilo_se_relanza(self):
+        def bulk(cursor, ids, **kwargs):
+            if 500 in ids:
+                raise RuntimeError("timeout en xSys")
+            return _bulk_falso(cursor, ids)
+
+        conn = MagicMock()
+        conn.cursor.return_value.conn_id = 0
+        with patch("xsys.services.whitelist_bulk.compute_habilitacion_bulk", side_effect=bulk):
+            with self.assertRaisesMessage(RuntimeError, "timeout en xSys"):
+                for _ in compute_habilitacion_paralelo(
+                    lambda: conn, list(range(1, 1001)), id_acceso=1, fecha=_FECHA, flag_ucp=1,
+                    workers=2, lote=100, objetivo=0,
+                ):
+                    pass
+
+
+def _res(hab, code=1, motivo="CUOTA SOCIAL"):
+    return {"habilitado": hab, "motivo_code": code, "motivo": motivo, "detalle": "", "id_acceso": 22}
+
+
+class PersistWhitelistManyTests(TestCase):
+    def test_devuelve_solo_los_que_cambiaron(self):
+        XsysWhitelist.objects.create(id_cliente=1, habilitado=True, motivo_code=1, motivo="CUOTA SOCIAL", id_acceso=22)
+        XsysWhitelist.objects.create(id_cliente=2, habilitado=True, motivo_code=1, motivo="CUOTA SOCIAL", id_acceso=22)
+        XsysWhitelist.objects.create(id_cliente=3, habilitado=False, motivo_code=5, motivo="VENCIDO", id_acceso=22)
+        cambios = persist_whitelist_many({
+            1: _res(True),                     # igual
+            2: _res(False, 5, "VENCIDO"),      # pierde el acceso
+            3: _res(False, 5, "VENCIDO (2)"),  # sólo cambia el texto: se escribe, no se informa
+            4: _res(True),                     # nuevo
+        }, batch=2)
+        self.assertEqual(cambios, {2: True, 4: None})
+        self.assertFalse(XsysWhitelist.objects.get(id_cliente=2).habilitado)
+        self.assertEqual(XsysWhitelist.objects.get(id_cliente=3).motivo, "VENCIDO (2)")
+        self.assertTrue(XsysWhitelist.objects.get(id_cliente=4).habilitado)
+        self.assertEqual(
+            list(XsysWhitelistChange.objects.values_list("id_cliente", "habilitado_antes", "habilitado",
+                                                         "motivo_code_antes", "motivo_code", "origen")),
+            [(2, True, False, 1, 5, ""), (4, None, True, None, 1, "")],
+        )
+
+    def test_sin_cambios_solo_actualiza_la_fecha(self):
+        viejo = datetime(2026, 7, 1, tzinfo=timezone.utc)
+        XsysWhitelist.objects.create(id_cliente=1, habilitado=True, motivo_code=1, motivo="CUOTA SOCIAL",
+                                     id_acceso=22, fecha_calculo=viejo, synced_at=viejo)
+        with self.assertNumQueries(4):  # savepoint, SELECT, UPDATE de fechas, release: sin INSERT
+            self.assertEqual(persist_whitelist_many({1: _res(True)}), {})
+        self.assertGreater(XsysWhitelist.objects.get(id_cliente=1).fecha_calculo, viejo)
+
+    def test_dry_run_no_escribe(self):
+        self.assertEqual(persist_whitelist_many({7: _res(True)}, dry_run=True), {7: None})
+        self.assertFalse(XsysWhitelist.objects.exists())
+        self.assertFalse(XsysWhitelistChange.objects.exists())
+
+
+class CambiosDesdeTests(TestCase):
+    def _cambio(self, seq, id_cliente):
+        return XsysWhitelistChange.objects.create(seq=seq, id_cliente=id_cliente, habilitado=True)
+
+    def test_commit_fuera_de_orden_no_queda_detras_del_cursor(self):
+        # B (seq 11) commitea antes que A (seq 10), que sigue en su transacción.
+        self._cambio(11, 2)
+        filas, siguiente = cambios_desde(0, lag=5)
+        self.assertEqual((filas, siguiente), ([], 0))  # B es muy nueva: el cursor no la pasa
+
+        self._cambio(10, 1)  # commitea A
+        XsysWhitelistChange.objects.update(creado=djtz.now() - djtz.timedelta(seconds=6))
+        filas, siguiente = cambios_desde(0, lag=5)
+        self.assertEqual(([f.seq for f in filas], siguiente), ([10, 11], 11))
+
+    def test_corta_en_la_primera_fila_reciente(self):
+        self._cambio(1, 1)
+        XsysWhitelistChange.objects.update(creado=djtz.now() - djtz.timedelta(seconds=60))
+        self._cambio(2, 2)
+        self._cambio(3, 3)
+        XsysWhitelistChange.objects.filter(seq=3).update(creado=djtz.now() - djtz.timedelta(seconds=60))
+        filas, siguiente = cambios_desde(0, lag=5)
+        self.assertEqual(([f.seq for f in filas], siguiente), ([1], 1))
+
+    def test_purga_las_transiciones_viejas(self):
+        self._cambio(1, 1)
+        self._cambio(2, 2)
+        XsysWhitelistChange.objects.filter(seq=1).update(creado=djtz.now() - djtz.timedelta(days=91))
+        self.assertEqual(purgar_cambios(90), 1)
+        self.assertEqual(list(XsysWhitelistChange.objects.values_list("seq", flat=True)), [2])
+        self.assertEqual(purgar_cambios(0), 0)
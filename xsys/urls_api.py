@@ -20,6 +20,7 @@ from xsys.api_views import (
     SocioLookupAPI,
     SocioSearchAPI,
     SocioWhitelistAPI,
+    WhitelistCambiosAPI,
 )
 
 urlpatterns = [
@@ -42,5 +43,6 @@ urlpatterns = [
     path("xsys/socios/<int:id_cliente>/detalle/", SocioDetalleAPI.as_view(), name="xsys_socio_detalle_api"),
     path("xsys/socios/<int:id_cliente>/aviso/", PantallaAvisoAPI.as_view(), name="xsys_socio_aviso_api"),
     path("xsys/socios/<int:id_cliente>/whitelist/", SocioWhitelistAPI.as_view(), name="xsys_socio_whitelist_api"),
+    path("xsys/whitelist/changes/", WhitelistCambiosAPI.as_view(), name="xsys_whitelist_changes_api"),
     path("xsys/socios/<int:id_cliente>/foto/", SocioFotoAPI.as_view(), name="xsys_socio_foto_api"),
 ]